@@ -1,13 +1,24 @@
 """
 Add sample data to the SQLite database for the DeepWork app.
 This will create some sample sessions and interruptions.
+
+The samples are back-dated, so they are written as rows rather than through
+the store. The event log and the daily_focus rollup are projections of those
+rows (see deepwork.events), so both are cleared with them and rebuilt from
+the samples at the end.
 """
 
+import os
 import sqlite3
+import sys
 import uuid
 import datetime
 import random
 
+# Shared engine code lives in backend/deepwork
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), 'backend'))
+from deepwork import events, ids, rollup, timestamps
+
 # SQLite database setup
 DB_PATH = 'deepwork.db'
 
@@ -16,7 +27,25 @@ def add_sample_data():
     conn = sqlite3.connect(DB_PATH)
     cursor = conn.cursor()
     
-    # Clear existing data
+    # Tables are keyed by rowid with the uuid stored as a 16-byte public_id
+    if ids.migrate(conn):
+        print(f"Migrated {DB_PATH} to integer keys")
+    
+    # Sample times are built as ISO strings and stored in the database's format
+    codec = timestamps.for_connection(conn)
+    
+    def store(value):
+        if value is None:
+            return None
+        if isinstance(value, str):
+            value = datetime.datetime.fromisoformat(value)
+        return codec.from_datetime(value)
+    
+    # Clear existing data, with the log and rollup describing it
+    events.create_stdlib_table(conn)
+    rollup.create_table(cursor)
+    cursor.execute("DELETE FROM events")
+    cursor.execute("DELETE FROM daily_focus")
     cursor.execute("DELETE FROM interruptions")
     cursor.execute("DELETE FROM sessions")
     
@@ -182,22 +211,25 @@ def add_sample_data():
         cursor.execute(
             """
             INSERT INTO sessions 
-            (id, title, goal, status, scheduled_duration, created_at, started_at, completed_at, actual_duration, interruption_count) 
-            VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+            (public_id, title, goal, status, scheduled_duration, created_at, started_at, paused_at, completed_at, actual_duration, interruption_count) 
+            VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
             """, 
             (
-                session["id"],
+                ids.parse(session["id"]),
                 session["title"],
                 session["goal"],
                 session["status"],
                 session["scheduled_duration"],
-                session["created_at"],
-                session["started_at"],
-                session["completed_at"],
-                session["actual_duration"],
+                store(session["created_at"]),
+                store(session["started_at"]),
+                store(session.get("paused_at")),
+                store(session["completed_at"]),
+                # Like the store, only a completed session has a duration
+                session["actual_duration"] if session["completed_at"] else None,
                 session["interruption_count"]
             )
         )
+        session["rowid"] = cursor.lastrowid
     
     # Create sample interruptions
     interruption_reasons = [
@@ -227,15 +259,15 @@ def add_sample_data():
                     cursor.execute(
                         """
                         INSERT INTO interruptions 
-                        (id, session_id, reason, start_time, end_time) 
+                        (public_id, session_id, reason, start_time, end_time) 
                         VALUES (?, ?, ?, ?, ?)
                         """, 
                         (
-                            interruption_id,
-                            session["id"],
+                            ids.parse(interruption_id),
+                            session["rowid"],
                             random.choice(interruption_reasons),
-                            start_time.isoformat(),
-                            end_time.isoformat()
+                            store(start_time),
+                            store(end_time)
                         )
                     )
                 
@@ -246,19 +278,24 @@ def add_sample_data():
                     cursor.execute(
                         """
                         INSERT INTO interruptions 
-                        (id, session_id, reason, start_time, end_time) 
+                        (public_id, session_id, reason, start_time, end_time) 
                         VALUES (?, ?, ?, ?, ?)
                         """, 
                         (
-                            interruption_id,
-                            session["id"],
+                            ids.parse(interruption_id),
+                            session["rowid"],
                             "Urgent meeting with team lead",
-                            start_time.isoformat(),
+                            store(start_time),
                             None  # No end time since it's still paused
                         )
                     )
     
     conn.commit()
+    
+    # Log the samples' transitions as if the store had written them, then
+    # roll the completed ones into daily_focus from that log
+    events.create_stdlib_table(conn)
+    events.rebuild(conn, projections=("daily_focus",))
     conn.close()
     
     print(f"Added {len(sessions)} sample sessions and {sum(s['interruption_count'] for s in sessions)} interruptions to the database.")
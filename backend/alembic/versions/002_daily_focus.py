@@ -0,0 +1,47 @@
+"""Add daily_focus rollup
+
+Revision ID: 002
+Revises: 001
+Create Date: 2026-10-19
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '002'
+down_revision = '001'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    # One row per (day, status) of completed sessions
+    op.create_table('daily_focus',
+        sa.Column('day', sa.Date(), nullable=False),
+        sa.Column('status', sa.String(), nullable=False),
+        sa.Column('focused_minutes', sa.Float(), nullable=False, server_default='0'),
+        sa.Column('scheduled_minutes', sa.Integer(), nullable=False, server_default='0'),
+        sa.Column('pause_count', sa.Integer(), nullable=False, server_default='0'),
+        sa.Column('session_count', sa.Integer(), nullable=False, server_default='0'),
+        sa.PrimaryKeyConstraint('day', 'status'),
+        sqlite_with_rowid=False
+    )
+    
+    # Backfill from sessions completed before the rollup existed
+    op.execute("""
+        INSERT INTO daily_focus (day, status, focused_minutes, scheduled_minutes, pause_count, session_count)
+        SELECT date(end_time), status,
+               SUM(MAX((julianday(end_time) - julianday(start_time)) * 1440, 0)),
+               SUM(scheduled_duration),
+               SUM((SELECT COUNT(*) FROM interruptions WHERE interruptions.session_id = sessions.id)),
+               COUNT(*)
+        FROM sessions
+        WHERE end_time IS NOT NULL
+        GROUP BY 1, 2
+    """)
+
+
+def downgrade() -> None:
+    op.drop_table('daily_focus')
@@ -0,0 +1,41 @@
+"""Record resume time on interruptions
+
+Revision ID: 003
+Revises: 002
+Create Date: 2026-10-19
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '003'
+down_revision = '002'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    # NULL means the pause was never resumed (it lasts until the session end)
+    op.add_column('interruptions', sa.Column('resume_time', sa.DateTime(timezone=True), nullable=True))
+    
+    # Resume times were never recorded before, so close existing pauses at their
+    # pause time (which keeps past focus totals unchanged), except the pause a
+    # session is still sitting in
+    op.execute("""
+        UPDATE interruptions SET resume_time = pause_time
+        WHERE id NOT IN (
+            SELECT MAX(i.id)
+            FROM interruptions AS i JOIN sessions AS s ON s.id = i.session_id
+            WHERE s.status IN ('paused', 'interrupted')
+            GROUP BY i.session_id
+        )
+    """)
+    op.create_index('ix_interruptions_session_id', 'interruptions', ['session_id'])
+
+
+def downgrade() -> None:
+    op.drop_index('ix_interruptions_session_id', table_name='interruptions')
+    with op.batch_alter_table('interruptions') as batch_op:
+        batch_op.drop_column('resume_time')
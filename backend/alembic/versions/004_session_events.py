@@ -0,0 +1,70 @@
+"""Add the session event log
+
+Revision ID: 004
+Revises: 003
+Create Date: 2026-10-19
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '004'
+down_revision = '003'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    # Every session transition, oldest first (see deepwork.events)
+    op.create_table('events',
+        sa.Column('seq', sa.Integer(), autoincrement=True, nullable=False),
+        sa.Column('session_id', sa.Integer(), nullable=False),
+        sa.Column('type', sa.String(), nullable=False),
+        sa.Column('at', sa.DateTime(timezone=True), nullable=False),
+        sa.Column('data', sa.Text(), nullable=True),
+        sa.PrimaryKeyConstraint('seq')
+    )
+    op.create_index('ix_events_session_id', 'events', ['session_id'])
+    
+    # Backfill the history of existing sessions from their rows, in lifecycle
+    # order per session: created, started, each pause and its resume, completed.
+    # Focused minutes exclude pauses clipped to the session, as the rollup does.
+    op.execute("""
+        INSERT INTO events (session_id, type, at, data)
+        SELECT session_id, type, at, data FROM (
+            SELECT id AS session_id, 'created' AS type, created_at AS at, 0 AS step,
+                   json_object('title', title, 'goal', goal, 'scheduled_duration', scheduled_duration) AS data
+            FROM sessions WHERE created_at IS NOT NULL
+            UNION ALL
+            SELECT id, 'started', start_time, 1, NULL FROM sessions WHERE start_time IS NOT NULL
+            UNION ALL
+            SELECT session_id, 'paused', pause_time, 2 * n,
+                   json_object('reason', reason, 'status', CASE WHEN n >= 4 THEN 'interrupted' ELSE 'paused' END,
+                               'pause_count', n, 'interruption_id', id)
+            FROM (SELECT *, row_number() OVER (PARTITION BY session_id ORDER BY id) AS n FROM interruptions)
+            UNION ALL
+            SELECT session_id, 'resumed', resume_time, 2 * n + 1, NULL
+            FROM (SELECT *, row_number() OVER (PARTITION BY session_id ORDER BY id) AS n FROM interruptions)
+            WHERE resume_time IS NOT NULL
+            UNION ALL
+            SELECT id, 'completed', end_time, 1000000,
+                   json_object('status', status, 'focused_minutes', MAX((
+                       julianday(end_time) - julianday(start_time) - IFNULL((
+                           SELECT SUM(MAX(
+                               julianday(MIN(IFNULL(i.resume_time, sessions.end_time), sessions.end_time))
+                               - julianday(MAX(i.pause_time, sessions.start_time)),
+                               0))
+                           FROM interruptions AS i
+                           WHERE i.session_id = sessions.id
+                       ), 0)) * 1440, 0))
+            FROM sessions WHERE end_time IS NOT NULL
+        )
+        ORDER BY session_id, step
+    """)
+
+
+def downgrade() -> None:
+    op.drop_index('ix_events_session_id', table_name='events')
+    op.drop_table('events')
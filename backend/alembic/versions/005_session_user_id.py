@@ -0,0 +1,28 @@
+"""Add the owning user to sessions
+
+Revision ID: 005
+Revises: 004
+Create Date: 2026-10-19
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '005'
+down_revision = '004'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    # Existing sessions have no user; they are listed for requests without one
+    op.add_column('sessions', sa.Column('user_id', sa.String(), nullable=True))
+    op.create_index('ix_sessions_user_id', 'sessions', ['user_id'])
+
+
+def downgrade() -> None:
+    op.drop_index('ix_sessions_user_id', table_name='sessions')
+    with op.batch_alter_table('sessions') as batch_op:
+        batch_op.drop_column('user_id')
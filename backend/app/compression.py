@@ -0,0 +1,69 @@
+from starlette.datastructures import Headers, MutableHeaders
+
+from deepwork import compression
+
+# Responses that never have a body
+_BODILESS = frozenset({204, 304})
+
+
+class CompressionMiddleware:
+    """
+    Pure ASGI middleware compressing response bodies the client accepts
+    (see deepwork.compression).
+
+    A body sent in one message is compressed whole when it reaches the
+    policy's threshold, with its Content-Length replaced. A streamed body
+    (more_body) is compressed chunk by chunk as it is sent, each chunk
+    flushed so the client can decode it on arrival, without a Content-Length.
+    """
+
+    def __init__(self, app, policy):
+        self.app = app
+        self.policy = policy
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or scope["method"] == "HEAD":
+            await self.app(scope, receive, send)
+            return
+
+        accept_encoding = Headers(scope=scope).get("accept-encoding", "")
+        # The start message is held until the first body message shows the body's size
+        held = []
+        stream = None
+
+        async def send_compressed(message):
+            nonlocal stream
+            if message["type"] == "http.response.start":
+                held.append(message)
+                return
+            if message["type"] != "http.response.body":
+                await send(message)
+                return
+            body = message.get("body", b"")
+            more_body = message.get("more_body", False)
+            if held:
+                start = held.pop()
+                headers = MutableHeaders(raw=list(start.get("headers", [])))
+                content_type = headers.get("content-type")
+                if (
+                    start["status"] not in _BODILESS
+                    and "content-encoding" not in headers
+                    and compression.is_compressible(content_type)
+                ):
+                    headers.add_vary_header("Accept-Encoding")
+                    size = None if more_body else len(body)
+                    encoding = self.policy.encoding_for(accept_encoding, content_type, size)
+                    if encoding is not None:
+                        headers["Content-Encoding"] = encoding
+                        if more_body:
+                            stream = compression.compressor(encoding)
+                            del headers["Content-Length"]
+                        else:
+                            body = compression.compress(encoding, body)
+                            headers["Content-Length"] = str(len(body))
+                await send(dict(start, headers=headers.raw))
+            if stream is not None:
+                body = stream.compress(body) + (stream.flush() if more_body else stream.finish())
+            await send(dict(message, body=body))
+
+        await self.app(scope, receive, send_compressed)
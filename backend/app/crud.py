@@ -1,162 +1,138 @@
 from sqlalchemy.orm import Session
-from sqlalchemy import func, desc
-from datetime import datetime, timedelta
+from datetime import date, timedelta
 from fastapi import HTTPException
-from typing import List, Optional
+from typing import Dict, List, Optional
 from . import schemas
-from .models.models import Session as DbSession, Interruption
+from .models import database
+from .models.models import DailyFocus
+from .store import SQLAlchemySessionStore
+from deepwork import projection, rollup
+from deepwork.tracing import traced
+from deepwork.store import InvalidTransition, SessionNotFound
 
-# Create a new session
+# Run a store operation, mapping lifecycle errors onto HTTP errors
+def _call(operation, *args):
+    try:
+        return operation(*args)
+    except SessionNotFound as e:
+        raise HTTPException(status_code=404, detail=str(e))
+    except InvalidTransition as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+# Run a store write, on the shard's single writer when one is running (DEEPWORK_SINGLE_WRITER=1)
+def _write(db: Session, method: str, *args):
+    writer = database.get_writer(db.info.get("shard", 0))
+    if writer is None:
+        return _call(getattr(SQLAlchemySessionStore(db), method), *args)
+    return _call(writer.call, method, *args)
+
+# Session fields of schemas.SessionResponse, which ?fields= picks from
+SESSION_FIELDS = (
+    "id", "title", "goal", "scheduled_duration", "status", "start_time", "end_time", "created_at", "user_id",
+)
+
+# The store fields a ?fields= value asks for (every served one when absent)
+# and whether ?include= asks for interruptions; unknown names are a 400
+def _projection(fields: Optional[str], include: Optional[str]):
+    try:
+        return (
+            projection.parse_fields(fields, SESSION_FIELDS) or SESSION_FIELDS,
+            "interruptions" in projection.parse_include(include),
+        )
+    except projection.InvalidProjection as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+# Attach each session's interruptions (one query for all of them)
+def _with_interruptions(store: SQLAlchemySessionStore, sessions: List[Dict]):
+    interruptions = store.interruptions_for_sessions([s["id"] for s in sessions])
+    for session in sessions:
+        session["interruptions"] = interruptions.get(session["id"], [])
+    return sessions
+
+# Create a new session, owned by the requesting user (db.info, see database.get_db)
+@traced()
 def create_session(db: Session, session_data: schemas.SessionCreate):
-    new_session = DbSession(
-        title=session_data.title,
-        goal=session_data.goal,
-        scheduled_duration=session_data.scheduled_duration,
-        status="scheduled"
+    return _write(
+        db, "create_session", session_data.title, session_data.goal, session_data.scheduled_duration,
+        db.info.get("user_id"),
     )
-    db.add(new_session)
-    db.commit()
-    db.refresh(new_session)
-    return new_session
-
-# Get all sessions
-def get_sessions(db: Session, skip: int = 0, limit: int = 100):
-    return db.query(DbSession).order_by(desc(DbSession.created_at)).offset(skip).limit(limit).all()
-
-# Get a specific session by ID
-def get_session(db: Session, session_id: int):
-    session = db.query(DbSession).filter(DbSession.id == session_id).first()
-    if not session:
-        raise HTTPException(status_code=404, detail=f"Session with id {session_id} not found")
-    return session
-
-# Start a session
+
+# Get the requesting user's sessions (everyone's when anonymous), with only the
+# fields asked for and their interruptions only when included
+@traced()
+def get_sessions(db: Session, skip: int = 0, limit: int = 100,
+                 fields: Optional[str] = None, include: Optional[str] = None):
+    fields, interruptions = _projection(fields, include)
+    store = SQLAlchemySessionStore(db)
+    sessions = store.list_sessions(skip, limit, db.info.get("user_id"), fields)
+    return _with_interruptions(store, sessions) if interruptions else sessions
+
+# Get a specific session by ID, projected like get_sessions
+@traced()
+def get_session(db: Session, session_id: int, fields: Optional[str] = None, include: Optional[str] = None):
+    fields, interruptions = _projection(fields, include)
+    store = SQLAlchemySessionStore(db)
+    session = _call(store.get_session, session_id, fields, db.info.get("user_id"))
+    return _with_interruptions(store, [session])[0] if interruptions else session
+
+# Start a session; like every by-id operation, another user's session is a 404
+@traced()
 def start_session(db: Session, session_id: int):
-    session = get_session(db, session_id)
-    
-    # Validate current status
-    if session.status != "scheduled":
-        raise HTTPException(
-            status_code=400,
-            detail=f"Cannot start session: Session must be in 'scheduled' state, current state: {session.status}"
-        )
-    
-    # Update session status and start time
-    session.status = "active"
-    session.start_time = datetime.now()
-    
-    db.commit()
-    db.refresh(session)
-    return session
-
-# Pause a session
+    session = _write(db, "start_session", session_id, db.info.get("user_id"))
+    return _with_interruptions(SQLAlchemySessionStore(db), [session])[0]
+
+# Pause a session (the 4th pause ends it as interrupted)
+@traced()
 def pause_session(db: Session, session_id: int, interruption_data: schemas.InterruptionCreate):
-    session = get_session(db, session_id)
-    
-    # Validate current status
-    if session.status != "active":
-        raise HTTPException(
-            status_code=400,
-            detail=f"Cannot pause session: Session must be in 'active' state, current state: {session.status}"
-        )
-    
-    # Create interruption record
-    interruption = Interruption(
-        session_id=session_id,
-        reason=interruption_data.reason,
-        pause_time=datetime.now()
-    )
-    db.add(interruption)
-    
-    # Update session status
-    session.status = "paused"
-    
-    # Check if this is the 4th or more interruption
-    interruption_count = db.query(Interruption).filter(Interruption.session_id == session_id).count() + 1
-    if interruption_count >= 4:
-        session.status = "interrupted"
-    
-    db.commit()
-    db.refresh(session)
-    return session
+    session = _write(db, "pause_session", session_id, interruption_data.reason, db.info.get("user_id"))
+    return _with_interruptions(SQLAlchemySessionStore(db), [session])[0]
 
 # Resume a session
+@traced()
 def resume_session(db: Session, session_id: int):
-    session = get_session(db, session_id)
-    
-    # Validate current status
-    if session.status != "paused":
-        raise HTTPException(
-            status_code=400,
-            detail=f"Cannot resume session: Session must be in 'paused' state, current state: {session.status}"
-        )
-    
-    # Update session status
-    session.status = "active"
-    
-    db.commit()
-    db.refresh(session)
-    return session
-
-# Complete a session
+    session = _write(db, "resume_session", session_id, db.info.get("user_id"))
+    return _with_interruptions(SQLAlchemySessionStore(db), [session])[0]
+
+# Complete a session; the daily_focus rollup is updated in the same transaction
+@traced()
 def complete_session(db: Session, session_id: int):
-    session = get_session(db, session_id)
-    
-    # Validate current status
-    if session.status not in ["active", "paused"]:
-        raise HTTPException(
-            status_code=400,
-            detail=f"Cannot complete session: Session must be in 'active' or 'paused' state, current state: {session.status}"
-        )
-    
-    # Set end time
-    current_time = datetime.now()
-    session.end_time = current_time
-    
-    # Check if session was abandoned (paused but never resumed)
-    if session.status == "paused":
-        session.status = "abandoned"
-    else:
-        # Calculate if session is overdue
-        if session.start_time:
-            actual_duration = (current_time - session.start_time).total_seconds() / 60  # in minutes
-            if actual_duration > session.scheduled_duration * 1.1:  # 10% over scheduled time
-                session.status = "overdue"
-            else:
-                session.status = "completed"
-    
-    db.commit()
-    db.refresh(session)
-    return session
-
-# Get session history with stats
+    session = _write(db, "complete_session", session_id, db.info.get("user_id"))
+    return _with_interruptions(SQLAlchemySessionStore(db), [session])[0]
+
+# Get the daily focus rollup for the last N days (at most one row per day and
+# status), summed across the shards
+@traced()
+def get_daily_focus(dbs: List[Session], days: int = 7):
+    start_day = date.today() - timedelta(days=days - 1)
+    columns = [DailyFocus.day, DailyFocus.status] + [getattr(DailyFocus, c) for c in rollup.ROLLUP_TOTALS]
+
+    def read(shard):
+        rows = dbs[shard].query(*columns).filter(DailyFocus.day >= start_day).all()
+        return [row._asdict() for row in rows]
+
+    return rollup.merge(database.get_router().fan_out(read))
+
+# Get the requesting user's finished sessions with stats, most recently ended first
+@traced()
 def get_session_history(db: Session):
-    sessions = db.query(DbSession).all()
-    history = []
-    
-    for session in sessions:
-        # Calculate pause count
-        pause_count = db.query(Interruption).filter(Interruption.session_id == session.id).count()
-        
-        # Calculate completion ratio
-        completion_ratio = 0
-        if session.status in ["completed", "overdue"] and session.start_time and session.end_time:
-            actual_duration = (session.end_time - session.start_time).total_seconds() / 60  # in minutes
-            completion_ratio = actual_duration / session.scheduled_duration if session.scheduled_duration > 0 else 0
-        
-        history.append({
-            "id": session.id,
-            "title": session.title,
-            "goal": session.goal,
-            "status": session.status,
-            "pause_count": pause_count,
-            "completion_ratio": completion_ratio
-        })
-    
-    return history
+    return [
+        dict(record, pause_count=record["interruption_count"])
+        for record in SQLAlchemySessionStore(db).session_history(db.info.get("user_id"))
+    ]
 
 # Get interruptions for a session
+@traced()
 def get_session_interruptions(db: Session, session_id: int):
-    # First check if the session exists
-    get_session(db, session_id)
-    return db.query(Interruption).filter(Interruption.session_id == session_id).all()
+    return _call(SQLAlchemySessionStore(db).list_interruptions, session_id, db.info.get("user_id"))
+
+# Get completion ratio, overrun and pause distributions over all sessions of every shard
+@traced()
+def get_session_distributions(dbs: List[Session]):
+    # Hand the raw DB-API connections to the analytics loader so columns are
+    # fetched as plain tuples and converted to NumPy arrays in bulk. NumPy
+    # is imported on first use, not when the app starts
+    from deepwork import analytics
+    columns = database.get_router().fan_out(
+        lambda shard: analytics.load_columns(dbs[shard].connection().connection)
+    )
+    return analytics.distributions(analytics.SessionColumns.concat(columns))
@@ -1,50 +1,131 @@
+import os
+from contextlib import asynccontextmanager
+
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import Response
 
-# Fix imports to work when running from within the app directory
-import sys
-import os
-sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
-
-# Now import with relative imports
-from models.database import engine
-from models.models import Base
-from routers import sessions
-
-# Create FastAPI app
-app = FastAPI(
-    title="DeepWork Session Tracker",
-    description="Track and manage your deep work sessions to improve productivity",
-    version="1.0.0",
-)
-
-# Configure CORS
-app.add_middleware(
-    CORSMiddleware,
-    allow_origins=["*"],  # In production, replace with specific origins
-    allow_credentials=True,
-    allow_methods=["*"],
-    allow_headers=["*"],
-)
-
-# Create database tables
-Base.metadata.create_all(bind=engine)
-
-# Include routers
-app.include_router(sessions.router)
-
-@app.get("/")
-async def root():
-    return {
-        "message": "✅ DeepWork Session Tracker API is running successfully!",
-        "status": "online",
-        "version": "1.0.0",
-        "documentation": {
-            "swagger": "/docs",
-            "redoc": "/redoc"
-        },
-        "endpoints": {
-            "sessions": "/sessions",
-            "history": "/sessions/history"
+from app import schema
+from app.compression import CompressionMiddleware
+from app.metrics import METRICS, MetricsMiddleware, instrument_engines
+from app.models import database
+from app.profiler import ProfilerMiddleware
+from app.routers import sessions, stats
+from app.tracing import TracingMiddleware
+from deepwork.compression import Compression
+from deepwork.metrics import CONTENT_TYPE
+from deepwork.profiler import Profiler
+from deepwork.replica import FRESHNESS_HEADER
+from deepwork.tracing import Tracer
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # The database is first touched here, not at import: check the schema of
+    # every shard (or create/upgrade it when asked to), and close the pools
+    # on shutdown
+    for engine in database.get_engines():
+        if app.state.create_schema:
+            schema.upgrade(engine)
+        schema.verify(engine)
+    database.start_writer()
+    database.start_replica()
+    try:
+        yield
+    finally:
+        database.dispose_engine()
+
+
+def create_app(create_schema=None, database_url=None) -> FastAPI:
+    """
+    Build the API. Nothing is opened until startup, which verifies that the
+    database is at the Alembic head revision; with create_schema (default:
+    DEEPWORK_CREATE_SCHEMA=1) it runs the migrations first.
+    """
+    if database_url:
+        database.configure(database_url)
+
+    app = FastAPI(
+        title="DeepWork Session Tracker",
+        description="Track and manage your deep work sessions to improve productivity",
+        version="1.0.0",
+        lifespan=lifespan,
+    )
+    if create_schema is None:
+        create_schema = os.environ.get("DEEPWORK_CREATE_SCHEMA") == "1"
+    app.state.create_schema = create_schema
+
+    # Configure CORS
+    app.add_middleware(
+        CORSMiddleware,
+        allow_origins=["*"],  # In production, replace with specific origins
+        allow_credentials=True,
+        allow_methods=["*"],
+        allow_headers=["*"],
+        expose_headers=["X-DB-Queries", "X-DB-Time", "X-Trace-Id", FRESHNESS_HEADER],
+    )
+
+    # Opt-in SQL profiling (DEEPWORK_SQL_PROFILE=warn|fail)
+    profiler = Profiler.from_environ()
+    if profiler:
+        app.add_middleware(ProfilerMiddleware, profiler=profiler)
+
+    # Per-route request and query metrics, served at /metrics; the engine
+    # events also feed the profiler
+    app.add_middleware(MetricsMiddleware)
+    instrument_engines()
+
+    # Response compression negotiated with Accept-Encoding (off with
+    # DEEPWORK_COMPRESSION=off); outside the metrics, which count body bytes
+    # before compression as the stdlib servers do
+    compression = Compression.from_environ()
+    if compression:
+        app.add_middleware(CompressionMiddleware, policy=compression)
+
+    # Sampled request tracing (DEEPWORK_TRACE_SAMPLE), recent traces at /debug/traces
+    tracer = Tracer.from_environ(service_name="deepwork-api")
+    app.add_middleware(TracingMiddleware, tracer=tracer)
+    app.state.tracer = tracer
+
+    # Include routers
+    app.include_router(sessions.router)
+    app.include_router(stats.router)
+
+    @app.get("/metrics", include_in_schema=False)
+    def metrics():
+        # Set directly: a text/ media_type would get a second charset appended
+        return Response(METRICS.render(), headers={"Content-Type": CONTENT_TYPE})
+
+    @app.get("/debug/traces", include_in_schema=False)
+    def debug_traces():
+        return tracer.buffer.view()
+
+    @app.get("/")
+    async def root():
+        return {
+            "message": "✅ DeepWork Session Tracker API is running successfully!",
+            "status": "online",
+            "version": "1.0.0",
+            "documentation": {
+                "swagger": "/docs",
+                "redoc": "/redoc"
+            },
+            "endpoints": {
+                "sessions": "/sessions",
+                "history": "/sessions/history",
+                "daily_focus": "/stats/daily-focus",
+                "distributions": "/stats/distributions",
+                "metrics": "/metrics"
+            }
         }
-    }
+
+    return app
+
+
+def __getattr__(name):
+    # `uvicorn app.main:app` builds the app on first access;
+    # `uvicorn --factory app.main:create_app` calls the factory directly
+    if name == "app":
+        app = globals()["app"] = create_app()
+        return app
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
@@ -0,0 +1,86 @@
+import time
+
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+from deepwork.metrics import UNMATCHED, Metrics, record_query
+from deepwork.profiler import record_statement
+from deepwork.tracing import record_statement as trace_statement
+
+# Per-route request metrics for the FastAPI app, served at /metrics
+METRICS = Metrics()
+
+
+# Attribute every SQLAlchemy statement to the request being handled (its
+# metrics, profile and trace)
+def instrument_engines():
+    if event.contains(Engine, "before_cursor_execute", _before_cursor_execute):
+        return
+    event.listen(Engine, "before_cursor_execute", _before_cursor_execute)
+    event.listen(Engine, "after_cursor_execute", _after_cursor_execute)
+
+
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    context._metrics_started = time.perf_counter()
+
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    elapsed = time.perf_counter() - context._metrics_started
+    record_query(elapsed)
+    trace_statement(statement, elapsed)
+    record_statement(statement, elapsed)
+
+
+# Endpoint -> route template, rebuilt when an endpoint is missing
+_templates = {}
+
+
+# Route template of a routed request, or "unmatched"
+def route_template(scope):
+    global _templates
+    endpoint = scope.get("endpoint")
+    if endpoint is None:
+        return UNMATCHED
+    template = _templates.get(endpoint)
+    if template is None:
+        _templates = {
+            route.endpoint: route.path
+            for route in scope["app"].routes if hasattr(route, "endpoint")
+        }
+        template = _templates.get(endpoint, UNMATCHED)
+    return template
+
+
+class MetricsMiddleware:
+    """
+    Pure ASGI middleware recording each request under its route template.
+
+    The template is looked up from the endpoint the router matched, so it is
+    known only once the request has been routed; unrouted requests are
+    recorded as "unmatched". Scrapes of /metrics are not recorded.
+    """
+
+    def __init__(self, app, registry=METRICS):
+        self.app = app
+        self.registry = registry
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or scope["path"] == "/metrics":
+            await self.app(scope, receive, send)
+            return
+
+        # [status, body bytes]
+        response = [500, 0]
+
+        async def send_and_record(message):
+            if message["type"] == "http.response.start":
+                response[0] = message["status"]
+            elif message["type"] == "http.response.body":
+                response[1] += len(message.get("body", b""))
+            await send(message)
+
+        started = self.registry.start()
+        try:
+            await self.app(scope, receive, send_and_record)
+        finally:
+            self.registry.finish(started, scope["method"], route_template(scope), response[0], response[1])
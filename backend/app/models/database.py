@@ -1,25 +1,215 @@
-from sqlalchemy import create_engine
+import os
+import time
+
+import contextlib
+from typing import Optional
+
+from fastapi import Header, Response
+from sqlalchemy import create_engine, event
+from sqlalchemy.engine import make_url
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import sessionmaker
 
+from deepwork.replica import FRESHNESS_HEADER, SnapshotReplica, oldest_freshness
+from deepwork.shards import ShardRouter, shard_path
+from deepwork.slowlog import SlowQueryLog
+from deepwork.writer import SingleWriter
+
 # SQLite database URL
 SQLALCHEMY_DATABASE_URL = "sqlite:///./deepwork.db"
 
-# Create SQLAlchemy engine with SQLite-specific parameters
-engine = create_engine(
-    SQLALCHEMY_DATABASE_URL, connect_args={"check_same_thread": False}
-)
+# Created by get_engine() on first use, one per shard: importing the models
+# or the app never opens the database
+_engines = {}
+_database_url = SQLALCHEMY_DATABASE_URL
+
+# Opt-in sharding by user (DEEPWORK_SHARDS=<n>), read when the first engine
+# is created; see deepwork.shards
+_router = None
+
+# Opt-in single writer for session lifecycle writes (DEEPWORK_SINGLE_WRITER=1),
+# started with the app, one per shard; see deepwork.writer
+_writers = {}
+
+# Opt-in snapshot replica for history and stats reads (DEEPWORK_REPLICA),
+# started with the app, one per shard; see deepwork.replica
+_replicas = {}
+
+
+def configure(database_url):
+    """Point the engine at another database (before it is first used)"""
+    global _database_url
+    dispose_engine()
+    _database_url = database_url
+
+
+def get_router(environ=os.environ):
+    """The shard router, read from DEEPWORK_SHARDS on first call"""
+    global _router
+    if _router is None:
+        _router = ShardRouter.from_environ(environ)
+    return _router
+
+
+def get_engine(shard=0):
+    """The engine of one shard (the only one without sharding), created on first call"""
+    engine = _engines.get(shard)
+    if engine is None:
+        url = make_url(_database_url)
+        router = get_router()
+        if router.count > 1:
+            url = url.set(database=shard_path(url.database, shard, router.count))
+        # SQLite-specific: sessions are used from the threadpool
+        engine = _engines[shard] = create_engine(url, connect_args={"check_same_thread": False})
+        _watch_slow_queries(engine)
+    return engine
+
+
+def get_engines():
+    """Every shard's engine, in shard order"""
+    return [get_engine(shard) for shard in get_router()]
+
+
+def start_writer(environ=os.environ):
+    """
+    The single writers if DEEPWORK_SINGLE_WRITER=1 (started on first call),
+    one per shard, else an empty dict
+    """
+    from ..store import SQLAlchemySessionStore
+
+    def open_store(shard):
+        engine = get_engine(shard)
+        # Reads on the pool's connections do not wait for the writer
+        with engine.connect() as connection:
+            connection.exec_driver_sql("PRAGMA journal_mode=WAL")
+        return SQLAlchemySessionStore(SessionLocal(bind=engine))
 
-# Create sessionmaker
-SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+    for shard in get_router():
+        if shard not in _writers:
+            writer = SingleWriter.from_environ(lambda shard=shard: open_store(shard), environ)
+            if writer is None:
+                break
+            _writers[shard] = writer
+    return _writers
+
+
+def get_writer(shard=0):
+    """The running single writer of a shard, or None"""
+    return _writers.get(shard)
+
+
+def start_replica(environ=os.environ):
+    """
+    The snapshot replicas if DEEPWORK_REPLICA is set (started on first call),
+    one per shard, else an empty dict
+    """
+    router = get_router()
+    for shard in router:
+        if shard not in _replicas:
+            replica = SnapshotReplica.from_environ(
+                get_engine(shard).url.database, environ, shard=shard, shards=router.count
+            )
+            if replica is None:
+                break
+            _replicas[shard] = replica.start()
+    return _replicas
+
+
+def dispose_engine():
+    """
+    Stop the writers and the replicas and close pooled connections; the next
+    get_engine() creates new engines
+    """
+    global _router
+    for writer in _writers.values():
+        writer.close()
+    _writers.clear()
+    for replica in _replicas.values():
+        replica.close()
+    _replicas.clear()
+    for engine in _engines.values():
+        engine.dispose()
+    _engines.clear()
+    if _router is not None:
+        _router.close()
+        _router = None
+
+
+def _watch_slow_queries(engine):
+    # Log statements slower than DEEPWORK_SLOW_QUERY_MS with their query plan
+    slow_queries = SlowQueryLog.from_environ()
+    if not slow_queries:
+        return
+
+    @event.listens_for(engine, "before_cursor_execute")
+    def _start_slow_query_timer(conn, cursor, statement, parameters, context, executemany):
+        context._slow_query_started = time.perf_counter()
+
+    @event.listens_for(engine, "after_cursor_execute")
+    def _log_slow_query(conn, cursor, statement, parameters, context, executemany):
+        slow_queries.observe(
+            engine.url.database, statement, parameters,
+            time.perf_counter() - context._slow_query_started, executemany, source="sqlalchemy",
+        )
+
+
+def __getattr__(name):
+    # `from app.models.database import engine` still works, creating it then
+    if name == "engine":
+        return get_engine()
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
+
+# Create sessionmaker; bound to the engine per session
+SessionLocal = sessionmaker(autocommit=False, autoflush=False)
 
 # Create base class for models
 Base = declarative_base()
 
-# Dependency to get DB session
-def get_db():
-    db = SessionLocal()
+# Dependency to get DB session: on the shard of the user in the X-User-Id
+# header, who owns the sessions it creates and lists
+def get_db(x_user_id: Optional[str] = Header(None)):
+    user_id = x_user_id or None
+    shard = get_router().shard_for(user_id)
+    db = SessionLocal(bind=get_engine(shard), info={"shard": shard, "user_id": user_id})
     try:
         yield db
     finally:
         db.close()
+
+# Dependency for history: a session on the user's shard, on the replica's
+# snapshot when there is one, with the snapshot's age in the X-Snapshot-Age header
+def get_read_db(response: Response, x_user_id: Optional[str] = Header(None)):
+    user_id = x_user_id or None
+    shard = get_router().shard_for(user_id)
+    replica = _replicas.get(shard)
+    if replica is None:
+        yield from get_db(x_user_id)
+        return
+    with replica.read() as snapshot:
+        db = SessionLocal(bind=snapshot.engine(), info={"shard": shard, "user_id": user_id})
+        try:
+            response.headers[FRESHNESS_HEADER] = snapshot.freshness()
+            yield db
+        finally:
+            db.close()
+
+# Dependency for stats over every user: one session per shard (on the
+# replicas' snapshots when there are any), in shard order
+def get_shard_dbs(response: Response):
+    with contextlib.ExitStack() as stack:
+        dbs, snapshots = [], []
+        for shard in get_router():
+            replica = _replicas.get(shard)
+            if replica is None:
+                bind = get_engine(shard)
+            else:
+                snapshot = stack.enter_context(replica.read())
+                snapshots.append(snapshot)
+                bind = snapshot.engine()
+            db = SessionLocal(bind=bind, info={"shard": shard})
+            stack.callback(db.close)
+            dbs.append(db)
+        if snapshots:
+            response.headers[FRESHNESS_HEADER] = oldest_freshness(snapshots)
+        yield dbs
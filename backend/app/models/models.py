@@ -1,7 +1,8 @@
-from sqlalchemy import Column, Integer, String, Text, ForeignKey, DateTime, CheckConstraint
+from sqlalchemy import Column, Integer, Float, String, Text, Date, ForeignKey, DateTime, CheckConstraint
 from sqlalchemy.orm import relationship
 from sqlalchemy.sql import func
 from .database import Base
+from deepwork import intervals
 
 class Session(Base):
     __tablename__ = "sessions"
@@ -14,6 +15,8 @@ class Session(Base):
     end_time = Column(DateTime(timezone=True))
     status = Column(String, default="scheduled")
     created_at = Column(DateTime(timezone=True), server_default=func.now())
+    # Owner, from the X-User-Id header; picks the shard (see deepwork.shards)
+    user_id = Column(String, index=True)
     
     # Add check constraint for status values
     __table_args__ = (
@@ -30,21 +33,57 @@ class Session(Base):
     def pause_count(self):
         return len(self.interruptions)
     
+    @property
+    def focus_summary(self):
+        # Net focused time with pauses (until resumed, or until the end) excluded
+        return intervals.summarize(
+            intervals.to_seconds(self.start_time),
+            intervals.to_seconds(self.end_time),
+            [
+                (intervals.to_seconds(i.pause_time), intervals.to_seconds(i.resume_time))
+                for i in self.interruptions
+            ]
+        )
+    
     @property
     def completion_ratio(self):
         if not self.start_time or not self.end_time or self.scheduled_duration == 0:
             return 0
         
-        actual_duration = (self.end_time - self.start_time).total_seconds() / 60  # in minutes
+        actual_duration = self.focus_summary.focus_seconds / 60  # in minutes
         return actual_duration / self.scheduled_duration
 
 class Interruption(Base):
     __tablename__ = "interruptions"
     
     id = Column(Integer, primary_key=True, autoincrement=True)
-    session_id = Column(Integer, ForeignKey("sessions.id", ondelete="CASCADE"), nullable=False)
+    session_id = Column(Integer, ForeignKey("sessions.id", ondelete="CASCADE"), nullable=False, index=True)
     reason = Column(String, nullable=False)
     pause_time = Column(DateTime(timezone=True), server_default=func.now())
+    resume_time = Column(DateTime(timezone=True))  # NULL until the session is resumed
     
     # Relationships
     session = relationship("Session", back_populates="interruptions")
+
+class DailyFocus(Base):
+    """Per (day, status) totals of completed sessions, maintained by crud.complete_session"""
+    __tablename__ = "daily_focus"
+    
+    day = Column(Date, primary_key=True)
+    status = Column(String, primary_key=True)
+    focused_minutes = Column(Float, nullable=False, default=0)
+    scheduled_minutes = Column(Integer, nullable=False, default=0)
+    pause_count = Column(Integer, nullable=False, default=0)
+    session_count = Column(Integer, nullable=False, default=0)
+    
+    __table_args__ = {"sqlite_with_rowid": False}
+
+class Event(Base):
+    """Append-only log of session transitions; the other tables are projections of it (see deepwork.events)"""
+    __tablename__ = "events"
+    
+    seq = Column(Integer, primary_key=True, autoincrement=True)
+    session_id = Column(Integer, nullable=False, index=True)
+    type = Column(String, nullable=False)
+    at = Column(DateTime(timezone=True), nullable=False)
+    data = Column(Text)  # JSON, see deepwork.events
@@ -0,0 +1,34 @@
+class ProfilerMiddleware:
+    """
+    Pure ASGI middleware profiling the SQL each request runs (see
+    deepwork.profiler) and adding X-DB-Queries/X-DB-Time to the response.
+
+    Statements are fed in by the engine events from app.metrics.
+    """
+
+    def __init__(self, app, profiler):
+        self.app = app
+        self.profiler = profiler
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        started = self.profiler.start()
+        profile = started[0]
+
+        async def send_with_headers(message):
+            if message["type"] == "http.response.start":
+                headers = list(message.get("headers", []))
+                headers.extend(
+                    (name.lower().encode("latin-1"), value.encode("latin-1"))
+                    for name, value in profile.headers().items()
+                )
+                message = dict(message, headers=headers)
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_headers)
+        finally:
+            self.profiler.finish(started, f"{scope['method']} {scope['path']}")
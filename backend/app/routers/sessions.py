@@ -1,11 +1,22 @@
 from fastapi import APIRouter, Depends, HTTPException, Query
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import JSONResponse
 from sqlalchemy.orm import Session
-from typing import List
+from typing import List, Optional
 
-from app.models.database import get_db
+from app.models.database import get_db, get_read_db
 from app import schemas, crud
+from app.tracing import TracedRoute
 
-router = APIRouter(tags=["sessions"])
+router = APIRouter(tags=["sessions"], route_class=TracedRoute)
+
+FIELDS = Query(None, description="Comma-separated session fields to return (id is always returned)")
+INCLUDE = Query(None, description="'interruptions' to embed each session's interruptions")
+
+# A projected response has only some of the SessionResponse fields, so it is
+# sent as is; a full one goes through the model, interruptions only when included
+def _projected(sessions, fields: Optional[str]):
+    return sessions if fields is None else JSONResponse(jsonable_encoder(sessions))
 
 @router.post("/sessions/", response_model=schemas.SessionResponse, status_code=201)
 def create_session(session_data: schemas.SessionCreate, db: Session = Depends(get_db)):
@@ -14,19 +25,38 @@ def create_session(session_data: schemas.SessionCreate, db: Session = Depends(ge
     """
     return crud.create_session(db=db, session_data=session_data)
 
-@router.get("/sessions/", response_model=List[schemas.SessionResponse])
-def get_sessions(skip: int = 0, limit: int = 100, db: Session = Depends(get_db)):
+@router.get("/sessions/", response_model=List[schemas.SessionResponse], response_model_exclude_unset=True)
+def get_sessions(
+    skip: int = 0,
+    limit: int = 100,
+    fields: Optional[str] = FIELDS,
+    include: Optional[str] = INCLUDE,
+    db: Session = Depends(get_db)
+):
+    """
+    Get all sessions, with only the given fields and, when included, their interruptions.
     """
-    Get all sessions.
+    return _projected(crud.get_sessions(db=db, skip=skip, limit=limit, fields=fields, include=include), fields)
+
+@router.get("/sessions/history", response_model=List[schemas.SessionHistoryResponse])
+def get_session_history(db: Session = Depends(get_read_db)):
+    """
+    Get a summary of past sessions with durations, pauses, and completion ratio.
+    Declared before /sessions/{session_id} so "history" is not parsed as an id.
     """
-    return crud.get_sessions(db=db, skip=skip, limit=limit)
+    return crud.get_session_history(db=db)
 
-@router.get("/sessions/{session_id}", response_model=schemas.SessionResponse)
-def get_session(session_id: int, db: Session = Depends(get_db)):
+@router.get("/sessions/{session_id}", response_model=schemas.SessionResponse, response_model_exclude_unset=True)
+def get_session(
+    session_id: int,
+    fields: Optional[str] = FIELDS,
+    include: Optional[str] = INCLUDE,
+    db: Session = Depends(get_db)
+):
     """
-    Get a specific session by ID.
+    Get a specific session by ID, with only the given fields and, when included, its interruptions.
     """
-    return crud.get_session(db=db, session_id=session_id)
+    return _projected(crud.get_session(db=db, session_id=session_id, fields=fields, include=include), fields)
 
 @router.patch("/sessions/{session_id}/start", response_model=schemas.SessionResponse)
 def start_session(session_id: int, db: Session = Depends(get_db)):
@@ -61,13 +91,6 @@ def complete_session(session_id: int, db: Session = Depends(get_db)):
     """
     return crud.complete_session(db=db, session_id=session_id)
 
-@router.get("/sessions/history", response_model=List[schemas.SessionHistoryResponse])
-def get_session_history(db: Session = Depends(get_db)):
-    """
-    Get a summary of past sessions with durations, pauses, and completion ratio.
-    """
-    return crud.get_session_history(db=db)
-
 @router.get("/sessions/{session_id}/interruptions", response_model=List[schemas.InterruptionResponse])
 def get_session_interruptions(session_id: int, db: Session = Depends(get_db)):
     """
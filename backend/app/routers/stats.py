@@ -0,0 +1,25 @@
+from fastapi import APIRouter, Depends, Query
+from sqlalchemy.orm import Session
+from typing import List
+
+from app.models.database import get_shard_dbs
+from app import schemas, crud
+from app.tracing import TracedRoute
+
+router = APIRouter(tags=["stats"], route_class=TracedRoute)
+
+@router.get("/stats/daily-focus", response_model=List[schemas.DailyFocusResponse])
+def get_daily_focus(days: int = Query(7, ge=1, le=366), dbs: List[Session] = Depends(get_shard_dbs)):
+    """
+    Get focused and scheduled minutes, pauses and session counts per day and status.
+    Served from the daily_focus rollup, so it reads at most one row per day, status and shard.
+    """
+    return crud.get_daily_focus(dbs=dbs, days=days)
+
+@router.get("/stats/distributions", response_model=schemas.SessionDistributions)
+def get_session_distributions(dbs: List[Session] = Depends(get_shard_dbs)):
+    """
+    Get completion ratio percentiles and histogram, the overrun rate against the
+    110% overdue rule, the pause count histogram and pause rate per hour of day.
+    """
+    return crud.get_session_distributions(dbs=dbs)
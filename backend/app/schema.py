@@ -0,0 +1,106 @@
+"""
+Schema version checks against the Alembic migrations in backend/alembic.
+
+The app does not create tables itself: at startup it verifies that the
+database is at the head revision and refuses to start otherwise. Creating
+or upgrading the schema is an explicit step:
+    cd backend && alembic upgrade head
+    python -m app.schema upgrade        (same, from backend/)
+    DEEPWORK_CREATE_SCHEMA=1 uvicorn app.main:app
+
+A database created by an older release (create_all(), no version table)
+has the baseline schema of revision 001, without the later tables and
+columns: `alembic stamp 001 && alembic upgrade head` records that and
+migrates it.
+"""
+
+import argparse
+import os
+import sys
+
+ALEMBIC_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "alembic")
+
+
+class SchemaVersionError(RuntimeError):
+    pass
+
+
+def _config(database_url=None):
+    # Alembic is imported here so that importing the app does not load it
+    from alembic.config import Config
+
+    config = Config()
+    config.set_main_option("script_location", ALEMBIC_DIR)
+    if database_url:
+        config.set_main_option("sqlalchemy.url", database_url.replace("%", "%%"))
+    return config
+
+
+def _url(engine):
+    return engine.url.render_as_string(hide_password=False)
+
+
+def head_revision():
+    from alembic.script import ScriptDirectory
+
+    return ScriptDirectory.from_config(_config()).get_current_head()
+
+
+def current_revision(engine):
+    """Revision stamped in the database, or None when it has no version table"""
+    from alembic.runtime.migration import MigrationContext
+
+    with engine.connect() as connection:
+        return MigrationContext.configure(connection).get_current_revision()
+
+
+def verify(engine):
+    """Raise SchemaVersionError unless the database is at the head revision"""
+    head, current = head_revision(), current_revision(engine)
+    if current == head:
+        return
+    if current is None:
+        raise SchemaVersionError(
+            f"Database {engine.url.database} has no schema version (expected {head}). "
+            "Run `alembic upgrade head` from backend/, or `alembic stamp 001 && alembic upgrade head` "
+            "if its tables were created by an older release."
+        )
+    raise SchemaVersionError(
+        f"Database {engine.url.database} is at revision {current}, expected {head}. "
+        "Run `alembic upgrade head` from backend/."
+    )
+
+
+def upgrade(engine):
+    """Create or migrate the schema to the head revision"""
+    from alembic import command
+
+    command.upgrade(_config(_url(engine)), "head")
+
+
+def main(argv=None):
+    from sqlalchemy import create_engine
+
+    from app.models.database import SQLALCHEMY_DATABASE_URL
+
+    parser = argparse.ArgumentParser(description="Check or upgrade the database schema")
+    parser.add_argument("command", choices=["check", "upgrade"])
+    parser.add_argument("--database-url", default=SQLALCHEMY_DATABASE_URL)
+    args = parser.parse_args(argv)
+
+    engine = create_engine(args.database_url)
+    try:
+        if args.command == "upgrade":
+            upgrade(engine)
+        verify(engine)
+    except SchemaVersionError as e:
+        print(e, file=sys.stderr)
+        return 1
+    finally:
+        engine.dispose()
+    print(f"Database {engine.url.database} is at revision {head_revision()}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,6 +1,6 @@
 from pydantic import BaseModel, Field
-from typing import Optional, List
-from datetime import datetime
+from typing import Optional, List, Dict
+from datetime import date, datetime
 from enum import Enum
 
 class SessionStatus(str, Enum):
@@ -25,6 +25,7 @@ class InterruptionResponse(BaseModel):
     session_id: int
     reason: str
     pause_time: datetime
+    resume_time: Optional[datetime] = None
 
     class Config:
         orm_mode = True
@@ -38,6 +39,7 @@ class SessionResponse(BaseModel):
     start_time: Optional[datetime]
     end_time: Optional[datetime]
     created_at: datetime
+    user_id: Optional[str] = None
     interruptions: List[InterruptionResponse] = []
 
     class Config:
@@ -50,6 +52,9 @@ class SessionHistoryResponse(BaseModel):
     status: str
     pause_count: int
     completion_ratio: float
+    focused_minutes: float = 0
+    longest_stretch_minutes: float = 0
+    idle_minutes: float = 0
 
     class Config:
         orm_mode = True
@@ -58,3 +63,40 @@ class StatusUpdateResponse(BaseModel):
     id: int
     status: str
     message: str
+
+class DailyFocusResponse(BaseModel):
+    day: date
+    status: str
+    focused_minutes: float
+    scheduled_minutes: int
+    pause_count: int
+    session_count: int
+
+    class Config:
+        orm_mode = True
+
+class Histogram(BaseModel):
+    bin_edges: List[float]
+    counts: List[int]
+
+class CompletionRatioStats(BaseModel):
+    p50: Optional[float]
+    p90: Optional[float]
+    p99: Optional[float]
+    mean: Optional[float]
+    histogram: Histogram
+
+class PauseStats(BaseModel):
+    mean: float
+    histogram: Histogram
+
+class SessionDistributions(BaseModel):
+    session_count: int
+    finished_count: int
+    status_counts: Dict[str, int]
+    completion_ratio: CompletionRatioStats
+    overrun_threshold: float
+    overrun_rate: float
+    pauses: PauseStats
+    sessions_by_hour: List[int]
+    pause_rate_by_hour: List[float]
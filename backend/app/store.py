@@ -0,0 +1,273 @@
+from sqlalchemy.orm import Session
+from sqlalchemy import desc, text
+from datetime import datetime
+import json
+from typing import Dict, List, Optional, Sequence
+from .models.models import Session as DbSession, Event, Interruption
+from deepwork import intervals, rollup
+from deepwork.tracing import span
+from deepwork.store import (
+    ANY_USER, HISTORY_STATUSES, SessionNotFound, check_transition, focused_minutes,
+    history_record, project, status_after_completion, status_after_pause,
+)
+
+# Variables per IN (...) list, well under SQLite's limit
+_CHUNK = 500
+
+# Record keys read straight from a sessions column; the others are derived
+# from the session's interruptions
+COLUMN_FIELDS = (
+    "id", "title", "goal", "status", "scheduled_duration", "created_at", "start_time", "end_time", "user_id",
+)
+
+def _summary(session: DbSession, interruptions: List[Interruption]):
+    # Net focused time with pauses (until resumed, or until the end) excluded
+    return intervals.summarize(
+        intervals.to_seconds(session.start_time),
+        intervals.to_seconds(session.end_time),
+        [(intervals.to_seconds(i.pause_time), intervals.to_seconds(i.resume_time)) for i in interruptions]
+    )
+
+class SQLAlchemySessionStore:
+    """
+    SessionStore (see deepwork.store) over the app's SQLAlchemy models.
+
+    The models keep no actual_duration or paused_at columns, so records
+    derive them from the session's interruptions. Interruptions for a list
+    of sessions are loaded with one IN query rather than one lazy load each,
+    and not at all when the fields asked for are plain columns.
+    Every write appends its event to the log (see deepwork.events) in the
+    same transaction.
+    """
+
+    def __init__(self, db: Session):
+        self.db = db
+
+    def _find(self, session_id, *columns, user_id=ANY_USER):
+        """
+        The session (or the given columns of its row); SessionNotFound if
+        missing or owned by someone other than user_id
+        """
+        try:
+            key = int(session_id)
+        except (TypeError, ValueError):
+            raise SessionNotFound(session_id)
+        query = self.db.query(*(columns or (DbSession,))).filter(DbSession.id == key)
+        if user_id is None:
+            query = query.filter(DbSession.user_id.is_(None))
+        elif user_id is not ANY_USER:
+            query = query.filter(DbSession.user_id == user_id)
+        session = query.first()
+        if not session:
+            raise SessionNotFound(session_id)
+        return session
+
+    def _interruptions(self, session_ids) -> Dict[int, List[Interruption]]:
+        found = {}
+        session_ids = list(session_ids)
+        for start in range(0, len(session_ids), _CHUNK):
+            rows = (
+                self.db.query(Interruption)
+                .filter(Interruption.session_id.in_(session_ids[start:start + _CHUNK]))
+                .order_by(Interruption.id)
+                .all()
+            )
+            for interruption in rows:
+                found.setdefault(interruption.session_id, []).append(interruption)
+        return found
+
+    def _session(self, session: DbSession, interruptions: List[Interruption]) -> Dict:
+        actual_duration = None
+        if session.end_time is not None:
+            actual_duration = focused_minutes(_summary(session, interruptions)) if session.start_time else 0
+        paused_at = None
+        if session.status in ("paused", "interrupted") and interruptions and interruptions[-1].resume_time is None:
+            paused_at = interruptions[-1].pause_time
+        return {
+            "id": session.id,
+            "title": session.title,
+            "goal": session.goal,
+            "status": session.status,
+            "scheduled_duration": session.scheduled_duration,
+            "created_at": session.created_at,
+            "start_time": session.start_time,
+            "paused_at": paused_at,
+            "end_time": session.end_time,
+            "actual_duration": actual_duration,
+            "interruption_count": len(interruptions),
+            "user_id": session.user_id,
+        }
+
+    def _interruption(self, interruption: Interruption) -> Dict:
+        return {
+            "id": interruption.id,
+            "session_id": interruption.session_id,
+            "reason": interruption.reason,
+            "pause_time": interruption.pause_time,
+            "resume_time": interruption.resume_time,
+        }
+
+    def _event(self, session_id: int, type: str, at: datetime, **data) -> None:
+        self.db.add(Event(session_id=session_id, type=type, at=at, data=json.dumps(data) if data else None))
+
+    def _commit(self, session: DbSession) -> Dict:
+        try:
+            with span("db.commit"):
+                self.db.commit()
+        except Exception:
+            self.db.rollback()
+            raise
+        with span("db.refresh"):
+            self.db.refresh(session)
+        return self._session(session, self._interruptions([session.id]).get(session.id, []))
+
+    def create_session(self, title: str, goal: Optional[str] = None, scheduled_duration: int = 30,
+                       user_id: Optional[str] = None) -> Dict:
+        session = DbSession(
+            title=title, goal=goal, scheduled_duration=scheduled_duration, status="scheduled", user_id=user_id
+        )
+        self.db.add(session)
+        try:
+            # The event copies the server-side created_at as stored
+            self.db.flush()
+            self.db.execute(
+                text("INSERT INTO events (session_id, type, at, data) "
+                     "SELECT id, 'created', created_at, :data FROM sessions WHERE id = :id"),
+                {"id": session.id, "data": json.dumps(
+                    {"title": title, "goal": goal, "scheduled_duration": scheduled_duration, "user_id": user_id}
+                )}
+            )
+            with span("db.commit"):
+                self.db.commit()
+        except Exception:
+            self.db.rollback()
+            raise
+        with span("db.refresh"):
+            self.db.refresh(session)
+        return self._session(session, [])
+
+    def _columns(self, fields: Optional[Sequence[str]]):
+        """The columns to select for fields, or None when a field is derived"""
+        if fields is None or not set(fields).issubset(COLUMN_FIELDS):
+            return None
+        return [getattr(DbSession, key) for key in fields]
+
+    def get_session(self, session_id, fields: Optional[Sequence[str]] = None, user_id=ANY_USER) -> Dict:
+        columns = self._columns(fields)
+        if columns is not None:
+            return self._find(session_id, *columns, user_id=user_id)._asdict()
+        session = self._find(session_id, user_id=user_id)
+        return project(self._session(session, self._interruptions([session.id]).get(session.id, [])), fields)
+
+    def list_sessions(self, skip: int = 0, limit: Optional[int] = None, user_id: Optional[str] = None,
+                      fields: Optional[Sequence[str]] = None) -> List[Dict]:
+        columns = self._columns(fields)
+        query = self.db.query(*columns) if columns is not None else self.db.query(DbSession)
+        if user_id is not None:
+            query = query.filter(DbSession.user_id == user_id)
+        query = query.order_by(desc(DbSession.created_at), desc(DbSession.id)).offset(skip)
+        if limit is not None:
+            query = query.limit(limit)
+        if columns is not None:
+            return [row._asdict() for row in query.all()]
+        sessions = query.all()
+        interruptions = self._interruptions(s.id for s in sessions)
+        return [project(self._session(s, interruptions.get(s.id, [])), fields) for s in sessions]
+
+    def start_session(self, session_id, user_id=ANY_USER) -> Dict:
+        session = self._find(session_id, user_id=user_id)
+        check_transition("start", session.status)
+        session.status = "active"
+        session.start_time = datetime.now()
+        self._event(session.id, "started", session.start_time)
+        return self._commit(session)
+
+    def pause_session(self, session_id, reason: str, user_id=ANY_USER) -> Dict:
+        session = self._find(session_id, user_id=user_id)
+        check_transition("pause", session.status)
+        # Counted before the add so autoflush settings don't matter
+        count = self.db.query(Interruption).filter(Interruption.session_id == session.id).count() + 1
+        interruption = Interruption(session_id=session.id, reason=reason, pause_time=datetime.now())
+        self.db.add(interruption)
+        self.db.flush()
+        session.status = status_after_pause(count)
+        self._event(
+            session.id, "paused", interruption.pause_time, reason=reason, status=session.status,
+            pause_count=count, interruption_id=interruption.id
+        )
+        return self._commit(session)
+
+    def resume_session(self, session_id, user_id=ANY_USER) -> Dict:
+        session = self._find(session_id, user_id=user_id)
+        check_transition("resume", session.status)
+        # Close the open interruption so its length is known
+        open_interruption = (
+            self.db.query(Interruption)
+            .filter(Interruption.session_id == session.id, Interruption.resume_time.is_(None))
+            .order_by(desc(Interruption.pause_time))
+            .first()
+        )
+        now = datetime.now()
+        if open_interruption:
+            open_interruption.resume_time = now
+        session.status = "active"
+        self._event(session.id, "resumed", now)
+        return self._commit(session)
+
+    def complete_session(self, session_id, user_id=ANY_USER) -> Dict:
+        session = self._find(session_id, user_id=user_id)
+        check_transition("complete", session.status)
+        session.end_time = datetime.now()
+        interruptions = self._interruptions([session.id]).get(session.id, [])
+        summary = _summary(session, interruptions)
+        session.status = status_after_completion(
+            session.status, session.start_time is not None, summary.focus_seconds / 60, session.scheduled_duration
+        )
+        # Roll the session into today's totals as part of the same transaction
+        self.db.execute(
+            text(rollup.UPSERT_SQL),
+            rollup.completion_params(
+                session.end_time.date(),
+                session.status,
+                summary.focus_seconds / 60,
+                session.scheduled_duration,
+                len(interruptions)
+            )
+        )
+        self._event(
+            session.id, "completed", session.end_time, status=session.status,
+            focused_minutes=summary.focus_seconds / 60
+        )
+        return self._commit(session)
+
+    def list_interruptions(self, session_id, user_id=ANY_USER) -> List[Dict]:
+        session = self._find(session_id, user_id=user_id)
+        return [self._interruption(i) for i in self._interruptions([session.id]).get(session.id, [])]
+
+    def interruptions_for_sessions(self, session_ids) -> Dict[int, List[Dict]]:
+        return {
+            session_id: [self._interruption(i) for i in interruptions]
+            for session_id, interruptions in self._interruptions(int(s) for s in session_ids).items()
+        }
+
+    def session_history(self, user_id: Optional[str] = None) -> List[Dict]:
+        query = self.db.query(DbSession).filter(DbSession.status.in_(HISTORY_STATUSES))
+        if user_id is not None:
+            query = query.filter(DbSession.user_id == user_id)
+        sessions = query.order_by(desc(DbSession.end_time)).all()
+        # Load the interruptions of all of them at once and summarize in bulk
+        interruptions = self._interruptions(s.id for s in sessions)
+        summaries = intervals.summarize_many(
+            [(s.id, intervals.to_seconds(s.start_time), intervals.to_seconds(s.end_time)) for s in sessions],
+            [
+                (session_id, intervals.to_seconds(i.pause_time), intervals.to_seconds(i.resume_time))
+                for session_id, rows in interruptions.items() for i in rows
+            ]
+        )
+        return [
+            history_record(self._session(s, interruptions.get(s.id, [])), summaries[s.id])
+            for s in sessions
+        ]
+
+    def close(self) -> None:
+        self.db.close()
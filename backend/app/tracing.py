@@ -0,0 +1,112 @@
+import asyncio
+import functools
+
+from fastapi.routing import APIRoute
+
+from deepwork import tracing
+from .metrics import route_template
+
+
+class TracingMiddleware:
+    """
+    Pure ASGI middleware opening the root span of sampled requests (see
+    deepwork.tracing) and returning their X-Trace-Id.
+    """
+
+    def __init__(self, app, tracer):
+        self.app = app
+        self.tracer = tracer
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or scope["path"] == "/debug/traces":
+            await self.app(scope, receive, send)
+            return
+
+        traceparent = next(
+            (value.decode("latin-1") for name, value in scope["headers"] if name == b"traceparent"), None
+        )
+        method = scope["method"]
+        started = self.tracer.start_request(
+            f"{method} {scope['path']}", traceparent,
+            **{"http.method": method, "http.target": scope["path"]},
+        )
+        if started is None:
+            await self.app(scope, receive, send)
+            return
+
+        trace_id = started[0].trace.trace_id.encode("latin-1")
+        status = [500]
+
+        async def send_with_trace_id(message):
+            if message["type"] == "http.response.start":
+                status[0] = message["status"]
+                message = dict(message, headers=[*message.get("headers", []), (b"x-trace-id", trace_id)])
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_trace_id)
+        finally:
+            self.tracer.finish_request(
+                started, f"{method} {route_template(scope)}", **{"http.status_code": status[0]}
+            )
+
+
+def _traced_endpoint(endpoint):
+    """The endpoint run in an "endpoint <name>" span (sync endpoints stay sync)"""
+    # include_router() builds the app's routes again from already wrapped endpoints
+    if hasattr(endpoint, "span_name"):
+        return endpoint
+    name = f"endpoint {endpoint.__name__}"
+    if asyncio.iscoroutinefunction(endpoint):
+        @functools.wraps(endpoint)
+        async def traced_endpoint(*args, **kwargs):
+            with tracing.span(name):
+                return await endpoint(*args, **kwargs)
+    else:
+        @functools.wraps(endpoint)
+        def traced_endpoint(*args, **kwargs):
+            with tracing.span(name):
+                return endpoint(*args, **kwargs)
+    traced_endpoint.span_name = name
+    return traced_endpoint
+
+
+class TracedRoute(APIRoute):
+    """
+    APIRoute traced as a "route" span, split into request validation (body
+    parsing and dependencies), the endpoint and response serialization.
+    """
+
+    def __init__(self, path, endpoint, **kwargs):
+        super().__init__(path, _traced_endpoint(endpoint), **kwargs)
+
+    def get_route_handler(self):
+        handler = super().get_route_handler()
+        endpoint_span_name = self.endpoint.span_name
+
+        async def traced_handler(request):
+            with tracing.span(f"route {self.path}") as route_span:
+                response = await handler(request)
+            if isinstance(route_span, tracing.Span):
+                _add_phases(route_span, endpoint_span_name)
+            return response
+
+        return traced_handler
+
+
+def _add_phases(route_span, endpoint_span_name):
+    """Spans for the parts of a route before and after its endpoint ran"""
+    trace = route_span.trace
+    with trace.lock:
+        endpoint_span = next(
+            (s for s in trace.spans
+             if s.parent_id == route_span.span_id and s.name == endpoint_span_name), None
+        )
+    if endpoint_span is None:
+        return
+    phases = (
+        ("validate request", route_span.start_ns, endpoint_span.start_ns),
+        ("serialize response", endpoint_span.end_ns, route_span.end_ns),
+    )
+    for name, start_ns, end_ns in phases:
+        tracing.Span(trace, route_span.span_id, name, start_ns=start_ns).end(end_ns)
@@ -0,0 +1,4 @@
+"""
+DeepWork engine - storage and analytics code shared by the FastAPI app
+and the stdlib SQLite servers.
+"""
@@ -0,0 +1,280 @@
+"""
+Admission control and load shedding for the stdlib servers.
+
+Without it a server takes every connection into the listen backlog and
+works through them one by one, so under overload every request waits
+longer until clients time out (the frontend gives up after 5 s) and their
+retries add more load. An AdmissionController bounds the requests being
+handled at once; a request arriving when all slots are busy waits in a
+short queue for its lane, and one that finds its lane's queue full, or is
+not admitted within the wait limit, is answered at once with 503 and a
+Retry-After header instead of queueing behind the rest.
+
+Requests are sorted into lanes, served in priority order whenever a slot
+frees up:
+- transition: session writes (create, start, pause, resume, complete), so
+  users' sessions keep moving however busy the read side is
+- read: single sessions, the session list, interruptions
+- report: history and the stats endpoints, whole-table scans that can wait
+
+Each lane has its own queue, so a burst of reports fills the report queue
+and is shed without taking the places of transitions. Some slots are
+reserved on each side: transitions are never all stuck behind slow reads,
+and a burst of writes (which SQLite runs one at a time anyway) cannot shut
+reads out. Slot use, queue depth, admissions, rejections and time spent
+queueing are exported with the request metrics at /metrics.
+
+Usage (stdlib servers):
+    APIHandler = admission.instrument_handler(APIHandler, ADMISSION, metrics.SESSION_ROUTES)
+
+Enable it with environment variables when starting a server, which then
+handles requests on threads:
+    DEEPWORK_MAX_IN_FLIGHT=8          (requests handled at once; off by default)
+    DEEPWORK_ADMISSION_RESERVED=1     (slots kept for transitions, and as many for reads)
+    DEEPWORK_ADMISSION_QUEUE=16       (requests waiting per lane)
+    DEEPWORK_ADMISSION_WAIT_MS=250    (longest wait for a slot)
+    DEEPWORK_RETRY_AFTER=1            (seconds, sent in Retry-After)
+"""
+
+import collections
+import json
+import os
+import socketserver
+import threading
+import time
+
+# In priority order
+LANES = ("transition", "read", "report")
+
+# Route templates of the report lane; other GETs are reads
+REPORT_ROUTES = frozenset({"/sessions/history", "/stats/daily-focus", "/stats/distributions"})
+
+DEFAULT_QUEUE_DEPTH = 16
+DEFAULT_MAX_WAIT = 0.25
+DEFAULT_RETRY_AFTER = 1
+
+QUEUE_FULL = "queue_full"
+TIMED_OUT = "timeout"
+
+
+class _Ticket:
+    """A queued request; granted once a finishing request hands it its slot"""
+
+    __slots__ = ("event", "granted")
+
+    def __init__(self):
+        self.event = threading.Event()
+        self.granted = False
+
+
+class AdmissionController:
+    """
+    At most max_in_flight requests at once, the rest queued per lane or
+    rejected. reserved slots are kept for transitions and as many for reads
+    and reports (by default one each, unless there is only one slot); the
+    rest go to whichever lane comes first in priority.
+    """
+
+    def __init__(self, max_in_flight, queue_depth=DEFAULT_QUEUE_DEPTH, max_wait=DEFAULT_MAX_WAIT,
+                 retry_after=DEFAULT_RETRY_AFTER, reserved=None):
+        if max_in_flight < 1:
+            raise ValueError("max_in_flight must be at least 1")
+        if reserved is None:
+            reserved = 1 if max_in_flight > 1 else 0
+        if not 0 <= reserved * 2 <= max_in_flight:
+            raise ValueError("reserved slots for both sides must fit in max_in_flight")
+        self.max_in_flight = max_in_flight
+        self.reserved = reserved
+        self.queue_depth = queue_depth
+        self.max_wait = max_wait
+        self.retry_after = retry_after
+        self._busy = dict.fromkeys(LANES, 0)
+        self._queues = {lane: collections.deque() for lane in LANES}
+        self._admitted = dict.fromkeys(LANES, 0)
+        self._rejected = {(lane, reason): 0 for lane in LANES for reason in (QUEUE_FULL, TIMED_OUT)}
+        self._waited = {lane: [0, 0.0] for lane in LANES}
+        self._lock = threading.Lock()
+
+    @classmethod
+    def from_environ(cls, environ=os.environ):
+        """The controller configured by DEEPWORK_MAX_IN_FLIGHT, or None when it is not set"""
+        max_in_flight = int(environ.get("DEEPWORK_MAX_IN_FLIGHT", 0))
+        if max_in_flight <= 0:
+            return None
+        return cls(
+            max_in_flight,
+            int(environ.get("DEEPWORK_ADMISSION_QUEUE", DEFAULT_QUEUE_DEPTH)),
+            float(environ.get("DEEPWORK_ADMISSION_WAIT_MS", DEFAULT_MAX_WAIT * 1000)) / 1000,
+            int(environ.get("DEEPWORK_RETRY_AFTER", DEFAULT_RETRY_AFTER)),
+            int(environ["DEEPWORK_ADMISSION_RESERVED"]) if "DEEPWORK_ADMISSION_RESERVED" in environ else None,
+        )
+
+    @property
+    def in_flight(self):
+        return sum(self._busy.values())
+
+    def _has_slot(self, lane):
+        # Either side may use every slot but those reserved for the other
+        in_flight = self.in_flight
+        transitions = self._busy["transition"]
+        side = transitions if lane == "transition" else in_flight - transitions
+        return in_flight < self.max_in_flight and side < self.max_in_flight - self.reserved
+
+    def _ahead(self, lane):
+        # Requests queued in this lane or one of higher priority go first, if
+        # they could take a free slot (a lane held back by the other side's
+        # reservation does not hold back a lane that may still use it)
+        return any(
+            self._queues[other] and self._has_slot(other) for other in LANES[:LANES.index(lane) + 1]
+        )
+
+    def acquire(self, lane):
+        """Take a slot for a request in lane, waiting up to max_wait; False if rejected"""
+        with self._lock:
+            if self._has_slot(lane) and not self._ahead(lane):
+                self._busy[lane] += 1
+                self._admitted[lane] += 1
+                return True
+            queue = self._queues[lane]
+            if len(queue) >= self.queue_depth:
+                self._rejected[lane, QUEUE_FULL] += 1
+                return False
+            ticket = _Ticket()
+            queue.append(ticket)
+        started = time.perf_counter()
+        ticket.event.wait(self.max_wait)
+        with self._lock:
+            waited = self._waited[lane]
+            waited[0] += 1
+            waited[1] += time.perf_counter() - started
+            # Granted between the wait timing out and taking the lock counts as admitted
+            if ticket.granted:
+                self._admitted[lane] += 1
+                return True
+            queue.remove(ticket)
+            self._rejected[lane, TIMED_OUT] += 1
+            return False
+
+    def release(self, lane):
+        """
+        Free the slot of a request in lane: free slots go to the oldest
+        waiters of the highest-priority lanes that may use them
+        """
+        with self._lock:
+            self._busy[lane] -= 1
+            while self._grant():
+                pass
+
+    def _grant(self):
+        # One free slot to the first waiter that may use it; False if none could
+        for waiting in LANES:
+            queue = self._queues[waiting]
+            if queue and self._has_slot(waiting):
+                ticket = queue.popleft()
+                ticket.granted = True
+                ticket.event.set()
+                self._busy[waiting] += 1
+                return True
+        return False
+
+    def render(self, prefix):
+        """Prometheus exposition lines of the admission metrics"""
+        with self._lock:
+            in_flight = self.in_flight
+            depths = {lane: len(queue) for lane, queue in self._queues.items()}
+            admitted = dict(self._admitted)
+            rejected = dict(self._rejected)
+            waited = {lane: tuple(values) for lane, values in self._waited.items()}
+
+        p = prefix
+        lines = [
+            f"# HELP {p}_admission_slots_in_use Request slots taken, out of {p}_admission_slots.",
+            f"# TYPE {p}_admission_slots_in_use gauge",
+            f"{p}_admission_slots_in_use {in_flight}",
+            f"# HELP {p}_admission_slots Requests handled at once (DEEPWORK_MAX_IN_FLIGHT).",
+            f"# TYPE {p}_admission_slots gauge",
+            f"{p}_admission_slots {self.max_in_flight}",
+            f"# HELP {p}_admission_queue_depth Requests waiting for a slot, by lane.",
+            f"# TYPE {p}_admission_queue_depth gauge",
+        ]
+        lines += [f'{p}_admission_queue_depth{{lane="{lane}"}} {depths[lane]}' for lane in LANES]
+        lines += [
+            f"# HELP {p}_admission_admitted_total Requests given a slot, by lane.",
+            f"# TYPE {p}_admission_admitted_total counter",
+        ]
+        lines += [f'{p}_admission_admitted_total{{lane="{lane}"}} {admitted[lane]}' for lane in LANES]
+        lines += [
+            f"# HELP {p}_admission_rejected_total Requests answered with 503, by lane and reason.",
+            f"# TYPE {p}_admission_rejected_total counter",
+        ]
+        lines += [
+            f'{p}_admission_rejected_total{{lane="{lane}",reason="{reason}"}} {count}'
+            for (lane, reason), count in rejected.items()
+        ]
+        lines += [
+            f"# HELP {p}_admission_wait_seconds Time queued requests waited for a slot, by lane.",
+            f"# TYPE {p}_admission_wait_seconds summary",
+        ]
+        for lane in LANES:
+            count, total = waited[lane]
+            lines.append(f'{p}_admission_wait_seconds_sum{{lane="{lane}"}} {float(total)!r}')
+            lines.append(f'{p}_admission_wait_seconds_count{{lane="{lane}"}} {count}')
+        return lines
+
+
+def lane_for(method, route):
+    """Lane of a request, from its method and route template"""
+    if method not in ("GET", "HEAD"):
+        return "transition"
+    return "report" if route in REPORT_ROUTES else "read"
+
+
+class ThreadingServer(socketserver.ThreadingMixIn, socketserver.TCPServer):
+    """TCPServer handling each connection on its own thread, as admission control and keep-alive need"""
+
+    daemon_threads = True
+    allow_reuse_address = True
+    # Connections are accepted promptly and shed by the controller, not left
+    # to overflow the kernel's backlog (the default of 5 costs a 1 s SYN retry)
+    request_queue_size = 128
+
+
+def instrument_handler(handler_class, controller, routes):
+    """
+    Subclass of an http.server handler that admits each request through the
+    controller, answering the ones it rejects with 503 and Retry-After.
+    CORS preflights are always answered.
+    """
+    from .metrics import route_matcher
+
+    match = route_matcher(routes)
+
+    class AdmittedHandler(handler_class):
+        def _send_busy(self):
+            body = json.dumps({"error": "Server busy, retry later"}).encode()
+            self.send_response(503)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Retry-After", str(controller.retry_after))
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+    def admitted(method, handle):
+        def do_method(self):
+            if method == "OPTIONS":
+                return handle(self)
+            lane = lane_for(method, match(self.path))
+            if not controller.acquire(lane):
+                return self._send_busy()
+            try:
+                handle(self)
+            finally:
+                controller.release(lane)
+        do_method.__name__ = handle.__name__
+        return do_method
+
+    for name in dir(handler_class):
+        if name.startswith("do_"):
+            setattr(AdmittedHandler, name, admitted(name[3:], getattr(handler_class, name)))
+    AdmittedHandler.__name__ = AdmittedHandler.__qualname__ = handler_class.__name__
+    return AdmittedHandler
@@ -0,0 +1,237 @@
+"""
+Vectorized session analytics.
+
+Session and interruption columns are pulled out of SQLite in one query each
+and turned into NumPy arrays, so every statistic below is computed with array
+operations instead of a Python loop per row.
+"""
+
+import itertools
+
+import numpy as np
+
+from . import archive, timestamps
+from .schema import is_stdlib_schema
+from .store import OVERRUN_FACTOR, STATUSES
+
+PERCENTILES = (50, 90, 99)
+
+RATIO_BIN_EDGES = np.round(np.arange(0.0, 2.05, 0.1), 2)
+
+PAUSE_BIN_EDGES = np.arange(0, 7)
+
+# NULL timestamps come back as this sentinel so rows convert straight to float64
+MISSING = -1.0
+
+_STATUS_CASE = "CASE status " + " ".join(
+    f"WHEN '{status}' THEN {code}" for code, status in enumerate(STATUSES)
+) + " ELSE -1 END"
+
+# How each backend's tables map onto the analytics columns
+ORM_SOURCE = {
+    "sessions": f"""
+        SELECT id,
+               scheduled_duration,
+               IFNULL(julianday(start_time), {MISSING}),
+               IFNULL(julianday(end_time), {MISSING}),
+               {_STATUS_CASE}
+        FROM sessions
+        ORDER BY id
+    """,
+    "interruptions": f"""
+        SELECT session_id,
+               IFNULL(julianday(pause_time), {MISSING}),
+               IFNULL(julianday(resume_time), {MISSING})
+        FROM interruptions
+    """,
+}
+
+def stdlib_source(codec, archived=False):
+    """
+    Query set for the stdlib tables in the given timestamp storage mode,
+    including the attached archive's rows when archived (see deepwork.archive)
+    """
+    sessions = archive.source("sessions", archived)
+    interruptions = archive.source("interruptions", archived)
+    return {
+        "sessions": f"""
+            SELECT id,
+                   scheduled_duration,
+                   IFNULL({codec.julianday_sql('started_at')}, {MISSING}),
+                   IFNULL({codec.julianday_sql('completed_at')}, {MISSING}),
+                   {_STATUS_CASE}
+            FROM {sessions} AS sessions
+            ORDER BY id
+        """,
+        "interruptions": f"""
+            SELECT sessions.id,
+                   IFNULL({codec.julianday_sql('interruptions.start_time')}, {MISSING}),
+                   IFNULL({codec.julianday_sql('interruptions.end_time')}, {MISSING})
+            FROM {interruptions} AS interruptions
+            JOIN {sessions} AS sessions ON sessions.id = interruptions.session_id
+        """,
+    }
+
+
+STDLIB_SOURCE = stdlib_source(timestamps.for_mode(timestamps.ISO))
+
+
+class SessionColumns:
+    """Column arrays for every session, aligned by position"""
+
+    __slots__ = ("ids", "scheduled", "start", "end", "idle", "status", "pauses")
+
+    def __init__(self, ids, scheduled, start, end, idle, status, pauses):
+        self.ids = ids
+        self.scheduled = scheduled
+        self.start = start      # julian day, NaN when never started
+        self.end = end          # julian day, NaN when never completed
+        self.idle = idle        # paused time in days, excluded from focus
+        self.status = status    # index into STATUSES, -1 if unknown
+        self.pauses = pauses    # interruption count per session
+
+    def __len__(self):
+        return len(self.ids)
+
+    @classmethod
+    def concat(cls, parts):
+        """
+        The columns of several databases (e.g. shards, see deepwork.shards)
+        as one set; ids repeat across parts, so only positions are meaningful
+        """
+        parts = list(parts)
+        return cls(*(np.concatenate([getattr(part, name) for part in parts]) for name in cls.__slots__))
+
+
+def detect_source(conn):
+    """Pick the query set matching the sessions table in this database"""
+    if is_stdlib_schema(conn):
+        return stdlib_source(timestamps.for_connection(conn), archive.is_attached(conn))
+    return ORM_SOURCE
+
+
+def load_columns(conn, source=None):
+    """
+    Load session and interruption columns in bulk.
+
+    conn is a DB-API connection to the SQLite database (sqlite3 or the raw
+    connection behind a SQLAlchemy session).
+    """
+    source = source or detect_source(conn)
+    cursor = conn.cursor()
+    # Plain tuples whatever row factory the connection was given
+    cursor.row_factory = None
+
+    cursor.execute(source["sessions"])
+    rows = cursor.fetchall()
+    # fromiter over the flattened rows avoids building a nested-list array
+    table = np.fromiter(
+        itertools.chain.from_iterable(rows), dtype=np.float64, count=len(rows) * 5
+    ).reshape(-1, 5)
+    del rows
+    ids = table[:, 0].astype(np.int64)
+    start = table[:, 2]
+    end = table[:, 3]
+    start[start == MISSING] = np.nan
+    end[end == MISSING] = np.nan
+
+    cursor.execute(source["interruptions"])
+    rows = cursor.fetchall()
+    pause_table = np.fromiter(
+        itertools.chain.from_iterable(rows), dtype=np.float64, count=len(rows) * 3
+    ).reshape(-1, 3)
+    del rows
+    owners = pause_table[:, 0].astype(np.int64)
+    # ids are sorted by the query, so searchsorted maps owner id -> position
+    if len(ids):
+        positions = np.minimum(np.searchsorted(ids, owners), len(ids) - 1)
+        known = ids[positions] == owners
+        positions = positions[known]
+        pause_table = pause_table[known]
+    else:
+        positions = owners[:0]
+    pauses = np.bincount(positions, minlength=len(ids)).astype(np.int64)
+
+    # Idle time: each pause clipped to its session, unresumed pauses running
+    # to the session end. Pauses of one session never overlap (a session is
+    # only paused while active), so summing them equals the merged total.
+    session_start = start[positions]
+    session_end = end[positions]
+    pause_start = np.maximum(pause_table[:, 1], session_start)
+    resumed = pause_table[:, 2] != MISSING
+    pause_end = np.where(resumed, np.minimum(pause_table[:, 2], session_end), session_end)
+    with np.errstate(invalid="ignore"):
+        lengths = np.nan_to_num(np.maximum(pause_end - pause_start, 0.0))
+    idle = np.bincount(positions, weights=lengths, minlength=len(ids))
+
+    return SessionColumns(
+        ids=ids,
+        scheduled=table[:, 1],
+        start=start,
+        end=end,
+        idle=idle,
+        status=table[:, 4].astype(np.int8),
+        pauses=pauses,
+    )
+
+
+def _histogram(values, edges):
+    # Last bin is open-ended so outliers are counted rather than dropped
+    clipped = np.clip(values, edges[0], edges[-1])
+    counts, _ = np.histogram(clipped, bins=edges)
+    return {"bin_edges": edges.tolist(), "counts": counts.tolist()}
+
+
+def _percentiles(values):
+    if not len(values):
+        return {f"p{p}": None for p in PERCENTILES}
+    points = np.percentile(values, PERCENTILES)
+    return {f"p{p}": float(v) for p, v in zip(PERCENTILES, points)}
+
+
+def distributions(columns):
+    """
+    Compute completion-ratio, overrun and pause distributions.
+
+    Completion ratio is focused minutes (end - start minus pauses) over
+    scheduled minutes for every session that was both started and completed.
+    """
+    finished = ~np.isnan(columns.start) & ~np.isnan(columns.end) & (columns.scheduled > 0)
+    actual = (columns.end[finished] - columns.start[finished] - columns.idle[finished]) * 1440.0
+    ratio = actual / columns.scheduled[finished]
+
+    # Hour of day from the fractional julian day (julian days start at noon);
+    # round to the millisecond julianday() keeps so 10:00:00 is not 09:59:59.99
+    started = ~np.isnan(columns.start)
+    seconds_of_day = np.round(((columns.start[started] + 0.5) % 1.0) * 86400.0, 3)
+    hours = (seconds_of_day // 3600).astype(np.int64) % 24
+    sessions_by_hour = np.bincount(hours, minlength=24)
+    pauses_by_hour = np.bincount(hours, weights=columns.pauses[started], minlength=24)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        pause_rate = np.where(sessions_by_hour > 0, pauses_by_hour / sessions_by_hour, 0.0)
+
+    status_counts = np.bincount(columns.status[columns.status >= 0], minlength=len(STATUSES))
+
+    return {
+        "session_count": int(len(columns)),
+        "finished_count": int(finished.sum()),
+        "status_counts": {status: int(n) for status, n in zip(STATUSES, status_counts)},
+        "completion_ratio": {
+            **_percentiles(ratio),
+            "mean": float(ratio.mean()) if len(ratio) else None,
+            "histogram": _histogram(ratio, RATIO_BIN_EDGES),
+        },
+        "overrun_threshold": OVERRUN_FACTOR,
+        "overrun_rate": float((ratio > OVERRUN_FACTOR).mean()) if len(ratio) else 0.0,
+        "pauses": {
+            "mean": float(columns.pauses.mean()) if len(columns) else 0.0,
+            "histogram": _histogram(columns.pauses, PAUSE_BIN_EDGES),
+        },
+        "sessions_by_hour": sessions_by_hour.tolist(),
+        "pause_rate_by_hour": pause_rate.tolist(),
+    }
+
+
+def session_distributions(conn, source=None):
+    """Load columns from conn and return distributions() for them"""
+    return distributions(load_columns(conn, source))
@@ -0,0 +1,237 @@
+"""
+Hot/cold partitioning of the stdlib tables: old finished sessions move to an
+archive database.
+
+Every session stays in ``sessions`` forever otherwise, so its indexes, the
+list queries and VACUUM grow with all of history while the app only works
+on recent weeks. The archive is a second SQLite file, ATTACHed to the
+store's connection as ``archive``, with tables of the same definition.
+
+run() moves sessions in a terminal status (see store.HISTORY_STATUSES) that
+ended more than N days ago, with their interruptions, in batches: each batch
+is one transaction that copies the rows, appends an ``archived`` event per
+session (see deepwork.events) and deletes them from the hot tables. Row ids
+are kept, and the sessions and interruptions with the highest ids stay hot
+so SQLite never hands their ids out again. The daily_focus rollup and the
+event log stay whole in the hot file.
+
+Reads through a store with the archive attached union it in only when the
+request needs it: a session lookup falls back to it on a miss, a page of
+the session list reads it only when the page reaches past the newest
+archived session, and history and distributions (all finished sessions)
+always include it.
+
+Usage:
+    python -m deepwork.archive run --db deepwork.db --archive deepwork-archive.db --days 90
+    python -m deepwork.archive run --db deepwork.db --archive deepwork-archive.db --days 90 --vacuum
+    python -m deepwork.archive stats --db deepwork.db --archive deepwork-archive.db
+
+A server reads the archive when started with:
+    DEEPWORK_ARCHIVE=deepwork-archive.db
+"""
+
+import argparse
+import datetime
+import json
+import sqlite3
+import statistics
+import sys
+import time
+
+from . import events, timestamps
+from .schema import column_types, create_sql
+from .store import HISTORY_STATUSES
+
+SCHEMA = "archive"
+TABLES = ("sessions", "interruptions")
+DEFAULT_BATCH_SIZE = 500
+
+_TERMINAL = ", ".join(f"'{status}'" for status in HISTORY_STATUSES)
+
+# Interrupted sessions never complete; they ended at their last pause
+ELIGIBLE_SQL = f"""
+SELECT id FROM main.sessions
+WHERE id > :after
+  AND id < (SELECT MAX(id) FROM main.sessions)
+  AND status IN ({_TERMINAL})
+  AND COALESCE(completed_at, paused_at) < :cutoff
+  AND NOT EXISTS (
+      SELECT 1 FROM main.interruptions
+      WHERE session_id = sessions.id AND id = (SELECT MAX(id) FROM main.interruptions)
+  )
+ORDER BY id
+LIMIT :limit
+"""
+
+
+def is_attached(conn):
+    """True if the connection has the archive attached"""
+    cursor = conn.cursor()
+    # Plain tuples whatever row factory the connection was given
+    cursor.row_factory = None
+    return any(row[1] == SCHEMA for row in cursor.execute("PRAGMA database_list"))
+
+
+def attach(conn, path):
+    """
+    ATTACH the archive at path (created if missing) with tables matching the
+    hot ones, adding columns the hot tables gained since it was created. The
+    hot tables must exist; attaching twice is a no-op.
+    """
+    if is_attached(conn):
+        return
+    conn.execute(f"ATTACH DATABASE ? AS {SCHEMA}", (path,))
+    with conn:
+        for table in TABLES:
+            conn.execute(create_sql(conn, table, f"IF NOT EXISTS {SCHEMA}.{table}"))
+            archived = {row[1] for row in conn.execute(f"PRAGMA {SCHEMA}.table_info({table})")}
+            for column, type in column_types(conn, table).items():
+                if column not in archived:
+                    conn.execute(f"ALTER TABLE {SCHEMA}.{table} ADD COLUMN {column} {type}")
+        conn.execute(
+            f"CREATE INDEX IF NOT EXISTS {SCHEMA}.idx_interruptions_session_id "
+            "ON interruptions (session_id)"
+        )
+        # History reads in completion order, the session list in creation order
+        conn.execute(f"CREATE INDEX IF NOT EXISTS {SCHEMA}.idx_sessions_completed_at ON sessions (completed_at)")
+        conn.execute(f"CREATE INDEX IF NOT EXISTS {SCHEMA}.idx_sessions_created_at ON sessions (created_at)")
+
+
+def source(table, archived):
+    """FROM clause for all rows of a stdlib table: hot only, or hot and archived"""
+    if not archived:
+        return table
+    return f"(SELECT * FROM main.{table} UNION ALL SELECT * FROM {SCHEMA}.{table})"
+
+
+def newest_created_at(conn):
+    """created_at of the newest archived session, or None when the archive is empty"""
+    return conn.execute(f"SELECT MAX(created_at) FROM {SCHEMA}.sessions").fetchone()[0]
+
+
+def run(conn, days, batch_size=DEFAULT_BATCH_SIZE, now=None):
+    """
+    Move finished sessions that ended more than days ago, with their
+    interruptions, into the attached archive. Returns the number moved.
+    """
+    codec = timestamps.for_connection(conn)
+    now = now or datetime.datetime.now()
+    cutoff = codec.from_datetime(now - datetime.timedelta(days=days))
+    moved, after = 0, 0
+    while True:
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            keys = [row[0] for row in conn.execute(
+                ELIGIBLE_SQL, {"after": after, "cutoff": cutoff, "limit": batch_size}
+            )]
+            if keys:
+                _move(conn, codec, keys)
+            conn.commit()
+        except BaseException:
+            conn.rollback()
+            raise
+        if not keys:
+            return moved
+        moved += len(keys)
+        after = keys[-1]
+
+
+def _move(conn, codec, keys):
+    marks = ", ".join("?" * len(keys))
+    conn.execute(
+        f"INSERT INTO {SCHEMA}.sessions SELECT * FROM main.sessions WHERE id IN ({marks})", keys
+    )
+    conn.execute(
+        f"INSERT INTO {SCHEMA}.interruptions SELECT * FROM main.interruptions "
+        f"WHERE session_id IN ({marks})", keys
+    )
+    cursor = conn.cursor()
+    at = codec.now()
+    for key in keys:
+        events.append(cursor, key, "archived", at)
+    conn.execute(f"DELETE FROM main.interruptions WHERE session_id IN ({marks})", keys)
+    conn.execute(f"DELETE FROM main.sessions WHERE id IN ({marks})", keys)
+
+
+def table_sizes(conn):
+    """Rows per table and file bytes (used and free) of the hot and archive databases"""
+    sizes = {}
+    for schema in ("main", SCHEMA) if is_attached(conn) else ("main",):
+        page_size = conn.execute(f"PRAGMA {schema}.page_size").fetchone()[0]
+        sizes[schema] = {
+            **{table: conn.execute(f"SELECT COUNT(*) FROM {schema}.{table}").fetchone()[0] for table in TABLES},
+            "bytes": conn.execute(f"PRAGMA {schema}.page_count").fetchone()[0] * page_size,
+            "free_bytes": conn.execute(f"PRAGMA {schema}.freelist_count").fetchone()[0] * page_size,
+        }
+    return sizes
+
+
+def query_latency(store, repeat=5):
+    """Median milliseconds of the store's common reads: a session, the first list page, history"""
+    recent = store.list_sessions(0, 1)
+    reads = {
+        "list_first_page": lambda: store.list_sessions(0, 100),
+        "session_history": store.session_history,
+    }
+    if recent:
+        reads["get_session"] = lambda: store.get_session(recent[0]["id"])
+    latency = {}
+    for name, read in reads.items():
+        samples = []
+        for _ in range(repeat):
+            started = time.perf_counter()
+            read()
+            samples.append((time.perf_counter() - started) * 1000)
+        latency[name] = round(statistics.median(samples), 3)
+    return latency
+
+
+def _report(label, sizes, latency):
+    print(label)
+    for schema, size in sizes.items():
+        print(f"  {schema:<8} {size['sessions']:>9} sessions {size['interruptions']:>9} interruptions "
+              f"{size['bytes'] / 1e6:>9.1f} MB ({size['free_bytes'] / 1e6:.1f} MB free)")
+    for name, ms in latency.items():
+        print(f"  {name:<16} {ms:>9.2f} ms")
+
+
+def main(argv=None):
+    from .sqlite_store import SQLiteSessionStore
+
+    parser = argparse.ArgumentParser(description="Archive old finished sessions into a second database")
+    parser.add_argument("command", choices=["run", "stats"])
+    parser.add_argument("--db", default="deepwork.db", help="SQLite database file")
+    parser.add_argument("--archive", default="deepwork-archive.db", help="Archive database file")
+    parser.add_argument("--days", type=int, default=90, help="Archive sessions that ended this many days ago")
+    parser.add_argument("--batch-size", type=int, default=DEFAULT_BATCH_SIZE, help="Sessions moved per transaction")
+    parser.add_argument("--vacuum", action="store_true", help="VACUUM the hot database afterwards")
+    parser.add_argument("--output", help="Write the before/after measurements to this JSON file")
+    args = parser.parse_args(argv)
+
+    store = SQLiteSessionStore(args.db, archive_path=args.archive)
+    conn = sqlite3.connect(args.db)
+    try:
+        attach(conn, args.archive)
+        before = {"sizes": table_sizes(conn), "latency_ms": query_latency(store)}
+        _report("before" if args.command == "run" else args.db, before["sizes"], before["latency_ms"])
+        results = {"before": before}
+        if args.command == "run":
+            started = time.perf_counter()
+            moved = run(conn, args.days, args.batch_size)
+            if args.vacuum:
+                conn.execute("VACUUM main")
+            print(f"Archived {moved} sessions in {time.perf_counter() - started:.1f}s")
+            after = {"sizes": table_sizes(conn), "latency_ms": query_latency(store)}
+            _report("after", after["sizes"], after["latency_ms"])
+            results.update(archived=moved, after=after)
+        if args.output:
+            with open(args.output, "w") as f:
+                json.dump(results, f, indent=2)
+        return 0
+    finally:
+        conn.close()
+        store.close()
+
+
+if __name__ == "__main__":
+    sys.exit(main())
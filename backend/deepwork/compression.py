@@ -0,0 +1,260 @@
+"""
+Response compression negotiated with Accept-Encoding.
+
+The session list and history are JSON that grows with every finished
+session, and the dashboard and SDK scripts fetch them over and over. A
+Compression policy picks the best encoding both sides support (zstd, then
+brotli, then gzip; zstd and brotli only when the zstandard and brotli
+packages are installed) and compresses JSON and text bodies of at least
+min_size bytes. Smaller bodies are sent as they are: compressing them
+costs more time than the bytes save.
+
+Front ends apply it to whole bodies (the stdlib servers, see
+instrument_handler) or chunk by chunk as a streamed body is sent (the
+FastAPI middleware in app/compression.py), via the same compressor objects.
+Compressed responses carry Content-Encoding and every negotiable response
+carries Vary: Accept-Encoding, so caches keep the variants apart.
+
+Usage (stdlib servers):
+    APIHandler = compression.instrument_handler(APIHandler, COMPRESSION)
+
+On by default; set when starting a server:
+    DEEPWORK_COMPRESSION=off             (send every body uncompressed)
+    DEEPWORK_COMPRESS_MIN_BYTES=1024     (smallest body worth compressing)
+"""
+
+import io
+import os
+import zlib
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+DEFAULT_MIN_SIZE = 1024
+GZIP_LEVEL = 6
+BROTLI_QUALITY = 4
+ZSTD_LEVEL = 3
+
+COMPRESSIBLE_TYPES = ("application/json", "text/")
+
+
+class _Gzip:
+    def __init__(self):
+        # wbits 31: a gzip header and trailer around the deflate stream
+        self._compressor = zlib.compressobj(GZIP_LEVEL, zlib.DEFLATED, 31)
+
+    def compress(self, data):
+        return self._compressor.compress(data)
+
+    def flush(self):
+        """Everything compressed so far, decodable by the client before the end"""
+        return self._compressor.flush(zlib.Z_SYNC_FLUSH)
+
+    def finish(self):
+        return self._compressor.flush()
+
+
+class _Brotli:
+    def __init__(self):
+        self._compressor = brotli.Compressor(quality=BROTLI_QUALITY)
+
+    def compress(self, data):
+        return self._compressor.process(data)
+
+    def flush(self):
+        return self._compressor.flush()
+
+    def finish(self):
+        return self._compressor.finish()
+
+
+class _Zstd:
+    def __init__(self):
+        self._compressor = zstandard.ZstdCompressor(level=ZSTD_LEVEL).compressobj()
+
+    def compress(self, data):
+        return self._compressor.compress(data)
+
+    def flush(self):
+        return self._compressor.flush(zstandard.COMPRESSOBJ_FLUSH_BLOCK)
+
+    def finish(self):
+        return self._compressor.flush()
+
+
+# Preferred first; only the encodings this interpreter can produce
+ENCODINGS = {
+    name: factory
+    for name, factory, available in (
+        ("zstd", _Zstd, zstandard is not None),
+        ("br", _Brotli, brotli is not None),
+        ("gzip", _Gzip, True),
+    )
+    if available
+}
+
+
+def accepted(accept_encoding):
+    """{coding: q} from an Accept-Encoding header value"""
+    codings = {}
+    for item in (accept_encoding or "").split(","):
+        coding, _, params = item.partition(";")
+        coding = coding.strip().lower()
+        if not coding:
+            continue
+        q = 1.0
+        for param in params.split(";"):
+            name, _, value = param.partition("=")
+            if name.strip().lower() == "q":
+                try:
+                    q = float(value)
+                except ValueError:
+                    q = 0.0
+        codings[coding] = q
+    return codings
+
+
+def negotiate(accept_encoding):
+    """The preferred encoding the client accepts, or None for identity"""
+    codings = accepted(accept_encoding)
+    wildcard = codings.get("*", 0.0)
+    best, best_q = None, 0.0
+    for name in ENCODINGS:
+        q = codings.get(name, wildcard)
+        # Ties keep the server's order of preference
+        if q > best_q:
+            best, best_q = name, q
+    return best
+
+
+def compressor(encoding):
+    """A fresh streaming compressor for encoding: compress(), flush(), finish()"""
+    return ENCODINGS[encoding]()
+
+
+def compress(encoding, data):
+    """data compressed in one go"""
+    stream = compressor(encoding)
+    return stream.compress(data) + stream.finish()
+
+
+def is_compressible(content_type):
+    return content_type is not None and content_type.lower().startswith(COMPRESSIBLE_TYPES)
+
+
+class Compression:
+    """When to compress: bodies of compressible types and at least min_size bytes"""
+
+    def __init__(self, min_size=DEFAULT_MIN_SIZE):
+        self.min_size = min_size
+
+    @classmethod
+    def from_environ(cls, environ=os.environ):
+        """The policy configured by the environment, or None when DEEPWORK_COMPRESSION=off"""
+        if environ.get("DEEPWORK_COMPRESSION", "on").lower() in ("off", "0", "false"):
+            return None
+        return cls(int(environ.get("DEEPWORK_COMPRESS_MIN_BYTES", DEFAULT_MIN_SIZE)))
+
+    def encoding_for(self, accept_encoding, content_type, size=None):
+        """
+        The encoding for a body of this type and size, or None to send it as
+        it is. A size of None (a streamed body, not complete yet) is not
+        held to the threshold.
+        """
+        if not is_compressible(content_type) or (size is not None and size < self.min_size):
+            return None
+        return negotiate(accept_encoding)
+
+
+class _HeldWriter:
+    """A handler's wfile that holds the body back while a response may be compressed"""
+
+    def __init__(self, stream):
+        self._stream = stream
+        self.held = None
+
+    def write(self, data):
+        if self.held is None:
+            return self._stream.write(data)
+        self.held.write(data)
+        return len(data)
+
+    def __getattr__(self, name):
+        return getattr(self._stream, name)
+
+
+def instrument_handler(handler_class, policy):
+    """
+    Subclass of an http.server handler that compresses response bodies the
+    client accepts. Headers are held until the body is complete, then sent
+    with Content-Encoding and the compressed Content-Length.
+    """
+
+    class CompressingHandler(handler_class):
+        _accept_encoding = None
+        _content_type = None
+
+        def setup(self):
+            super().setup()
+            self.wfile = self._held = _HeldWriter(self.wfile)
+
+        def send_header(self, keyword, value):
+            if keyword.lower() == "content-type":
+                self._content_type = value
+            super().send_header(keyword, value)
+
+        def end_headers(self):
+            if self._accept_encoding is not None and is_compressible(self._content_type):
+                self.send_header("Vary", "Accept-Encoding")
+                if policy.encoding_for(self._accept_encoding, self._content_type):
+                    # Headers and body are held until the body is complete
+                    self._held.held = io.BytesIO()
+            super().end_headers()
+
+        def flush_headers(self):
+            if self._held.held is None:
+                super().flush_headers()
+
+        def _send_held(self):
+            body = self._held.held.getvalue()
+            self._held.held = None
+            encoding = policy.encoding_for(self._accept_encoding, self._content_type, len(body))
+            # The response's own Content-Length (if any) is replaced
+            headers = [
+                line for line in self._headers_buffer if not line.lower().startswith(b"content-length:")
+            ]
+            if encoding is not None:
+                body = compress(encoding, body)
+                headers.insert(-1, f"Content-Encoding: {encoding}\r\n".encode("latin-1"))
+            headers.insert(-1, f"Content-Length: {len(body)}\r\n".encode("latin-1"))
+            self._headers_buffer = []
+            # Straight to the socket: the body was already counted as written
+            self._held.write(b"".join(headers) + body)
+
+    def compressing(handle):
+        def do_method(self):
+            self._accept_encoding = self.headers.get("Accept-Encoding", "")
+            self._content_type = None
+            try:
+                handle(self)
+                if self._held.held is not None:
+                    self._send_held()
+            finally:
+                self._accept_encoding = None
+                self._held.held = None
+        do_method.__name__ = handle.__name__
+        return do_method
+
+    # HEAD has no body to compress
+    for name in dir(handler_class):
+        if name.startswith("do_") and name != "do_HEAD":
+            setattr(CompressingHandler, name, compressing(getattr(handler_class, name)))
+    CompressingHandler.__name__ = CompressingHandler.__qualname__ = handler_class.__name__
+    return CompressingHandler
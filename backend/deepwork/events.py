@@ -0,0 +1,332 @@
+"""
+Append-only log of session transitions and the projections built from it.
+
+Every lifecycle write appends an event to the ``events`` table in the same
+transaction as the rows it changes:
+
+    created     title, goal, scheduled_duration, user_id (and the public_id)
+    started
+    paused      reason, status (paused or interrupted), pause_count,
+                interruption_id (and the interruption's public_id)
+    resumed
+    completed   status (completed, overdue or abandoned), actual_duration,
+                focused_minutes
+    archived    (moved with its interruptions to the archive database, see
+                deepwork.archive; it still counts in daily_focus)
+
+Decisions the lifecycle rules made (the status after a pause or a
+completion, the focused time) are recorded with the event, so replaying the
+log never re-runs the rules and always reproduces the rows that were
+written. The sessions and interruptions tables and the daily_focus rollup
+are projections of the log: rebuild() replays it in one pass and rewrites
+any of them from scratch in a single transaction, and check() reports
+where the stored rows differ from a replay.
+
+Both table layouts (see deepwork.schema) keep the same events table; the
+stdlib store creates and backfills it when it opens a database, the
+SQLAlchemy app through an Alembic migration. Backfilled history is ordered
+per session rather than globally.
+
+Usage:
+    python -m deepwork.events rebuild --db deepwork.db
+    python -m deepwork.events rebuild --db deepwork.db --projection daily_focus
+    python -m deepwork.events check --db deepwork.db
+"""
+
+import argparse
+import json
+import sqlite3
+import sys
+
+from . import timestamps
+from .rollup import FOCUS_TOLERANCE_MINUTES, create_table as create_rollup_table
+from .schema import is_stdlib_schema, rebuild_transaction
+
+PROJECTIONS = ("sessions", "interruptions", "daily_focus")
+
+# "at" holds a timestamp in the database's storage mode (see deepwork.timestamps)
+EVENTS_DDL = """
+CREATE TABLE IF NOT EXISTS events (
+    seq INTEGER PRIMARY KEY,
+    session_id INTEGER NOT NULL,
+    type TEXT NOT NULL,
+    at {timestamp_type} NOT NULL,
+    data TEXT
+)
+"""
+
+INSERT_SQL = "INSERT INTO events (session_id, type, at, data) VALUES (?, ?, ?, ?)"
+
+# Events synthesized from the stdlib tables of a database that predates the
+# log, in lifecycle order per session: created, started, each pause and its
+# resume, completed
+STDLIB_BACKFILL_SQL = """
+INSERT INTO events (session_id, type, at, data)
+SELECT session_id, type, at, data FROM (
+    SELECT id AS session_id, 'created' AS type, created_at AS at, 0 AS step,
+           json_object('public_id', lower(hex(public_id)), 'title', title, 'goal', goal,
+                       'scheduled_duration', scheduled_duration, 'user_id', user_id) AS data
+    FROM sessions
+    UNION ALL
+    SELECT id, 'started', started_at, 1, NULL FROM sessions WHERE started_at IS NOT NULL
+    UNION ALL
+    SELECT session_id, 'paused', start_time, 2 * n,
+           json_object('reason', reason, 'status', CASE WHEN n >= 4 THEN 'interrupted' ELSE 'paused' END,
+                       'pause_count', n, 'interruption_id', id, 'public_id', lower(hex(public_id)))
+    FROM (SELECT *, row_number() OVER (PARTITION BY session_id ORDER BY id) AS n FROM interruptions)
+    UNION ALL
+    SELECT session_id, 'resumed', end_time, 2 * n + 1, NULL
+    FROM (SELECT *, row_number() OVER (PARTITION BY session_id ORDER BY id) AS n FROM interruptions)
+    WHERE end_time IS NOT NULL
+    UNION ALL
+    SELECT id, 'completed', completed_at, 1000000,
+           json_object('status', status, 'actual_duration', actual_duration,
+                       'focused_minutes', COALESCE(actual_duration, 0))
+    FROM sessions WHERE completed_at IS NOT NULL
+)
+ORDER BY session_id, step
+"""
+
+
+def create_table(cursor, timestamp_type="INTEGER"):
+    """Create the events table (and its per-session index) if missing"""
+    cursor.execute(EVENTS_DDL.format(timestamp_type=timestamp_type))
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_events_session_id ON events (session_id)")
+
+
+def _log_is_empty(conn):
+    return conn.execute("SELECT 1 FROM events LIMIT 1").fetchone() is None
+
+
+def create_stdlib_table(conn):
+    """
+    Create the events table of a stdlib database if missing, and backfill it
+    from the existing rows while it is empty (rows written before the log
+    existed, or by bulk loaders). Returns the number of events backfilled.
+    """
+    mode = timestamps.detect_mode(conn)
+    with conn:
+        create_table(conn, "INTEGER" if mode == timestamps.EPOCH_MS else "TEXT")
+        if not _log_is_empty(conn):
+            return 0
+        return conn.execute(STDLIB_BACKFILL_SQL).rowcount
+
+
+def append(cursor, session_id, type, at, **data):
+    """
+    Append one event. The caller owns the transaction, so the event commits
+    (or rolls back) together with the rows it describes.
+    """
+    cursor.execute(INSERT_SQL, (session_id, type, at, json.dumps(data) if data else None))
+
+
+class _Replay:
+    """Projection rows folded from the log in one pass"""
+
+    def __init__(self, day):
+        self.day = day
+        self.sessions = {}
+        self.interruptions = {}
+        self.open_pauses = {}
+        self.session_interruptions = {}
+        self.rollup = {}
+
+    def apply(self, session_id, type, at, data):
+        if type == "created":
+            self.sessions[session_id] = {
+                "id": session_id, "public_id": data.get("public_id"), "title": data["title"],
+                "goal": data.get("goal"), "status": "scheduled",
+                "scheduled_duration": data["scheduled_duration"], "created_at": at,
+                "start_time": None, "paused_at": None, "end_time": None,
+                "actual_duration": None, "interruption_count": 0, "user_id": data.get("user_id"),
+            }
+            return
+        session = self.sessions[session_id]
+        if type == "started":
+            session.update(status="active", start_time=at)
+        elif type == "paused":
+            interruption_id = data["interruption_id"]
+            self.interruptions[interruption_id] = {
+                "id": interruption_id, "public_id": data.get("public_id"), "session_id": session_id,
+                "reason": data["reason"], "pause_time": at, "resume_time": None,
+            }
+            self.open_pauses.setdefault(session_id, []).append(interruption_id)
+            self.session_interruptions.setdefault(session_id, []).append(interruption_id)
+            session.update(status=data["status"], paused_at=at, interruption_count=data["pause_count"])
+        elif type == "resumed":
+            # The latest open pause is the one resumed
+            open_pauses = self.open_pauses.get(session_id)
+            if open_pauses:
+                self.interruptions[open_pauses.pop()]["resume_time"] = at
+            session.update(status="active", paused_at=None)
+        elif type == "completed":
+            session.update(status=data["status"], end_time=at, actual_duration=data.get("actual_duration"))
+            totals = self.rollup.setdefault((self.day(at), data["status"]), [0.0, 0, 0, 0])
+            totals[0] += max(0.0, float(data.get("focused_minutes") or 0))
+            totals[1] += session["scheduled_duration"]
+            totals[2] += session["interruption_count"]
+            totals[3] += 1
+        elif type == "archived":
+            # Gone from the hot tables; its rollup totals stay
+            del self.sessions[session_id]
+            self.open_pauses.pop(session_id, None)
+            for interruption_id in self.session_interruptions.pop(session_id, ()):
+                del self.interruptions[interruption_id]
+        else:
+            raise ValueError(f"Unknown event type {type!r} for session {session_id}")
+
+
+def _blob(hex_id):
+    return bytes.fromhex(hex_id) if hex_id else None
+
+
+# Per layout: the projection columns and each replayed record as a row of them
+LAYOUTS = {
+    "stdlib": {
+        "sessions": (
+            "id, public_id, title, goal, status, scheduled_duration, created_at, "
+            "started_at, paused_at, completed_at, actual_duration, interruption_count, user_id",
+            lambda s: (s["id"], _blob(s["public_id"]), s["title"], s["goal"], s["status"],
+                       s["scheduled_duration"], s["created_at"], s["start_time"], s["paused_at"],
+                       s["end_time"], s["actual_duration"], s["interruption_count"], s["user_id"]),
+        ),
+        "interruptions": (
+            "id, public_id, session_id, reason, start_time, end_time",
+            lambda i: (i["id"], _blob(i["public_id"]), i["session_id"], i["reason"],
+                       i["pause_time"], i["resume_time"]),
+        ),
+    },
+    "orm": {
+        "sessions": (
+            "id, title, goal, scheduled_duration, start_time, end_time, status, created_at, user_id",
+            lambda s: (s["id"], s["title"], s["goal"], s["scheduled_duration"], s["start_time"],
+                       s["end_time"], s["status"], s["created_at"], s["user_id"]),
+        ),
+        "interruptions": (
+            "id, session_id, reason, pause_time, resume_time",
+            lambda i: (i["id"], i["session_id"], i["reason"], i["pause_time"], i["resume_time"]),
+        ),
+    },
+}
+
+
+def _layout(conn):
+    if is_stdlib_schema(conn):
+        return "stdlib", timestamps.for_connection(conn).day
+    # SQLAlchemy stores DateTime as 'YYYY-MM-DD HH:MM:SS[.ffffff]' text
+    return "orm", lambda at: str(at)[:10]
+
+
+def replay(conn):
+    """Fold the whole log into projection rows"""
+    layout, day = _layout(conn)
+    state = _Replay(day)
+    cursor = conn.cursor()
+    cursor.row_factory = None
+    cursor.execute("SELECT session_id, type, at, data FROM events ORDER BY seq")
+    apply = state.apply
+    for session_id, type, at, data in cursor:
+        apply(session_id, type, at, json.loads(data) if data else {})
+    return layout, state
+
+
+def _projection_rows(layout, state, projection):
+    if projection == "daily_focus":
+        return [(day, status, *totals) for (day, status), totals in sorted(state.rollup.items())]
+    _, to_row = LAYOUTS[layout][projection]
+    records = state.sessions if projection == "sessions" else state.interruptions
+    return [to_row(record) for record in records.values()]
+
+
+def _columns(layout, projection):
+    if projection == "daily_focus":
+        return "day, status, focused_minutes, scheduled_minutes, pause_count, session_count"
+    return LAYOUTS[layout][projection][0]
+
+
+def rebuild(conn, projections=PROJECTIONS):
+    """
+    Rewrite the given projections from the log in one transaction.
+
+    Returns {projection: rows written}.
+    """
+    unknown = set(projections) - set(PROJECTIONS)
+    if unknown:
+        raise ValueError(f"Unknown projections: {', '.join(sorted(unknown))}")
+    if _log_is_empty(conn) and conn.execute("SELECT 1 FROM sessions LIMIT 1").fetchone():
+        raise ValueError("The event log is empty but sessions exist; refusing to rebuild from it")
+    layout, state = replay(conn)
+    create_rollup_table(conn)
+    written = {}
+    with rebuild_transaction(conn):
+        for projection in projections:
+            columns = _columns(layout, projection)
+            placeholders = ", ".join("?" * len(columns.split(", ")))
+            rows = _projection_rows(layout, state, projection)
+            conn.execute(f"DELETE FROM {projection}")
+            conn.executemany(f"INSERT INTO {projection} ({columns}) VALUES ({placeholders})", rows)
+            written[projection] = len(rows)
+    return written
+
+
+def _same(projection, replayed, stored):
+    if projection != "daily_focus":
+        return replayed == stored
+    # Focused minutes are summed as floats in a different order
+    return (abs(replayed[2] - stored[2]) <= FOCUS_TOLERANCE_MINUTES * max(1, replayed[5])
+            and replayed[3:] == stored[3:])
+
+
+def check(conn, projections=PROJECTIONS):
+    """
+    Compare the stored projections against a replay of the log.
+
+    Returns {projection: keys of mismatching rows}, where a key is a row id
+    (or (day, status) for daily_focus) missing or different on either side.
+    """
+    layout, state = replay(conn)
+    create_rollup_table(conn)
+    cursor = conn.cursor()
+    cursor.row_factory = None
+    mismatches = {}
+    for projection in projections:
+        key = (lambda row: row[:2]) if projection == "daily_focus" else (lambda row: row[0])
+        replayed = {key(row): row for row in _projection_rows(layout, state, projection)}
+        stored = {
+            key(row): row
+            for row in cursor.execute(f"SELECT {_columns(layout, projection)} FROM {projection}")
+        }
+        mismatches[projection] = [
+            k for k in sorted(set(replayed) | set(stored))
+            if k not in replayed or k not in stored or not _same(projection, replayed[k], stored[k])
+        ]
+    return mismatches
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Rebuild or check the projections of the session event log")
+    parser.add_argument("command", choices=["rebuild", "check"])
+    parser.add_argument("--db", default="deepwork.db", help="SQLite database file")
+    parser.add_argument("--projection", action="append", choices=PROJECTIONS,
+                        help="Projection to rebuild or check (repeatable; default all)")
+    args = parser.parse_args(argv)
+    projections = args.projection or PROJECTIONS
+
+    conn = sqlite3.connect(args.db)
+    try:
+        if args.command == "rebuild":
+            for projection, rows in rebuild(conn, projections).items():
+                print(f"Rebuilt {rows} {projection} rows")
+            return 0
+
+        mismatches = check(conn, projections)
+        for projection, keys in mismatches.items():
+            print(f"{projection}: {len(keys)} mismatching rows"
+                  + (f" (e.g. {', '.join(map(str, keys[:5]))})" if keys else ""))
+        return 1 if any(mismatches.values()) else 0
+    finally:
+        conn.close()
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,159 @@
+"""
+Compact keys for the stdlib servers' schema.
+
+Rows are keyed by an INTEGER PRIMARY KEY (SQLite's rowid), so tables are
+clustered by insert order and interruptions.session_id is a varint instead
+of a 36-byte string. Each row also carries a 16-byte public_id BLOB; the API
+only ever shows that, formatted as a canonical UUID string, so URLs and
+clients from the TEXT uuid4 layout keep working after migration.
+
+Usage:
+    python -m deepwork.ids migrate --db deepwork.db
+    python -m deepwork.ids layout --db deepwork.db
+"""
+
+import argparse
+import re
+import sqlite3
+import sys
+import uuid
+
+from .schema import column_types, create_sql, index_sql, rebuild_transaction
+
+COMPACT = "integer"
+LEGACY = "text_uuid"
+
+# Namespace for legacy TEXT ids that are not UUIDs
+_LEGACY_NAMESPACE = uuid.UUID("6f1c2c1e-4a55-4f0e-9a58-6b0d1d2f4e11")
+
+
+def new_public_id():
+    """Random 16-byte public id for a new row"""
+    return uuid.uuid4().bytes
+
+
+def parse(value):
+    """
+    Public id for an id taken from a URL or an old TEXT key.
+
+    UUID strings map to their 16 bytes; anything else maps to a stable
+    name-based UUID, so a legacy non-UUID key still finds its migrated row.
+    """
+    if isinstance(value, bytes):
+        return value
+    try:
+        return uuid.UUID(value).bytes
+    except (ValueError, TypeError, AttributeError):
+        return uuid.uuid5(_LEGACY_NAMESPACE, str(value)).bytes
+
+
+def to_text(public_id):
+    """Canonical UUID string of a public id"""
+    return str(uuid.UUID(bytes=public_id)) if public_id is not None else None
+
+
+def encode(row):
+    """
+    Swap internal keys for public ids in a row dict (in place).
+
+    Rows select ``public_id`` (and ``session_public_id`` for interruptions);
+    they become the ``id`` and ``session_id`` fields the API returns.
+    """
+    if "public_id" in row:
+        row["id"] = to_text(row.pop("public_id"))
+    if "session_public_id" in row:
+        row["session_id"] = to_text(row.pop("session_public_id"))
+    return row
+
+
+def detect_layout(conn):
+    """Key layout of the stdlib schema in this database"""
+    types = column_types(conn, "sessions")
+    if not types:
+        raise ValueError("Database has no sessions table")
+    return COMPACT if types.get("id") == "INTEGER" else LEGACY
+
+
+def _compact_sql(sql, foreign_key=None):
+    sql = re.sub(
+        r"^([ \t]*)id\s+TEXT\s+PRIMARY\s+KEY",
+        r"\1id INTEGER PRIMARY KEY,\n\1public_id BLOB NOT NULL UNIQUE",
+        sql,
+        count=1,
+        flags=re.IGNORECASE | re.MULTILINE,
+    )
+    if foreign_key:
+        sql = re.sub(rf"\b{foreign_key}\s+TEXT\b", f"{foreign_key} INTEGER", sql, flags=re.IGNORECASE)
+    return sql
+
+
+def migrate(conn):
+    """
+    Rebuild sessions and interruptions with integer keys and public ids.
+
+    Sessions are copied in created_at order and interruptions in start_time
+    order, so the new rowids follow insert order. Old TEXT ids become public
+    ids via parse(). Interruptions whose session no longer exists are
+    dropped. Returns False if the database already uses integer keys.
+    """
+    if detect_layout(conn) == COMPACT:
+        return False
+
+    conn.create_function("legacy_public_id", 1, parse, deterministic=True)
+    session_columns = [c for c in column_types(conn, "sessions") if c != "id"]
+    interruption_columns = [
+        c for c in column_types(conn, "interruptions") if c not in ("id", "session_id")
+    ]
+
+    with rebuild_transaction(conn):
+        indexes = index_sql(conn, "sessions") + index_sql(conn, "interruptions")
+        conn.execute(_compact_sql(create_sql(conn, "sessions", "sessions_migrating")))
+        conn.execute(_compact_sql(
+            create_sql(conn, "interruptions", "interruptions_migrating"), "session_id"
+        ))
+
+        conn.execute(f"""
+            INSERT INTO sessions_migrating (public_id, {', '.join(session_columns)})
+            SELECT legacy_public_id(id), {', '.join(session_columns)}
+            FROM sessions
+            ORDER BY created_at, rowid
+        """)
+        conn.execute(f"""
+            INSERT INTO interruptions_migrating (public_id, session_id, {', '.join(interruption_columns)})
+            SELECT legacy_public_id(i.id), s.id, {', '.join('i.' + c for c in interruption_columns)}
+            FROM interruptions AS i
+            JOIN sessions_migrating AS s ON s.public_id = legacy_public_id(i.session_id)
+            ORDER BY i.start_time, i.rowid
+        """)
+
+        conn.execute("DROP TABLE interruptions")
+        conn.execute("DROP TABLE sessions")
+        conn.execute("ALTER TABLE sessions_migrating RENAME TO sessions")
+        conn.execute("ALTER TABLE interruptions_migrating RENAME TO interruptions")
+        for sql in indexes:
+            conn.execute(sql)
+    return True
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Migrate stdlib tables to integer keys")
+    parser.add_argument("command", choices=["migrate", "layout"])
+    parser.add_argument("--db", default="deepwork.db", help="SQLite database file")
+    args = parser.parse_args(argv)
+
+    conn = sqlite3.connect(args.db)
+    try:
+        if args.command == "layout":
+            print(detect_layout(conn))
+        elif migrate(conn):
+            conn.execute("VACUUM")
+            print(f"Migrated {args.db} to integer keys")
+        else:
+            print(f"{args.db} already uses integer keys")
+        return 0
+    finally:
+        conn.close()
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,114 @@
+"""
+Interval algebra for focused time.
+
+A session runs from its start to its end; every interruption is an idle
+interval from its pause time to its resume time (or to the session end if it
+was never resumed). Idle intervals are clipped to the session, sorted and
+merged, so overlapping or duplicate pauses are only counted once. Everything
+here works on plain seconds; to_seconds() converts the timestamp types the
+backends store.
+"""
+
+import datetime
+from collections import defaultdict, namedtuple
+
+FocusSummary = namedtuple(
+    "FocusSummary",
+    ["focus_seconds", "idle_seconds", "longest_stretch_seconds", "idle_gaps"]
+)
+
+_NAIVE_EPOCH = datetime.datetime(1970, 1, 1)
+_AWARE_EPOCH = datetime.datetime(1970, 1, 1, tzinfo=datetime.timezone.utc)
+
+EMPTY_SUMMARY = FocusSummary(0.0, 0.0, 0.0, ())
+
+
+def to_seconds(value):
+    """
+    Convert a stored timestamp to seconds since the epoch.
+
+    Accepts datetimes (naive ones are taken as-is, without a local-time
+    conversion), ISO-8601 strings, numbers already in seconds, or None.
+    """
+    if value is None or value == "":
+        return None
+    if isinstance(value, (int, float)):
+        return float(value)
+    if isinstance(value, str):
+        value = datetime.datetime.fromisoformat(value)
+    epoch = _NAIVE_EPOCH if value.tzinfo is None else _AWARE_EPOCH
+    return (value - epoch).total_seconds()
+
+
+def merge(intervals):
+    """
+    Sort and merge (start, end) intervals, dropping empty ones.
+
+    O(n log n) in the number of intervals. Touching intervals are merged.
+    """
+    merged = []
+    for start, end in sorted(i for i in intervals if i[1] > i[0]):
+        if merged and start <= merged[-1][1]:
+            if end > merged[-1][1]:
+                merged[-1][1] = end
+        else:
+            merged.append([start, end])
+    return [(start, end) for start, end in merged]
+
+
+def summarize(start, end, pauses):
+    """
+    Summarize one session.
+
+    start/end are the session bounds in seconds; pauses is an iterable of
+    (pause_start, pause_end) where pause_end may be None for a pause that was
+    never resumed. Returns a FocusSummary with net focused time, total idle
+    time, the longest uninterrupted stretch and the merged idle gaps.
+    """
+    if start is None or end is None or end <= start:
+        return EMPTY_SUMMARY
+
+    clipped = []
+    for pause_start, pause_end in pauses:
+        if pause_start is None:
+            continue
+        if pause_end is None or pause_end > end:
+            pause_end = end
+        if pause_start < start:
+            pause_start = start
+        clipped.append((pause_start, pause_end))
+
+    gaps = merge(clipped)
+    idle = 0.0
+    longest = 0.0
+    cursor = start
+    for gap_start, gap_end in gaps:
+        idle += gap_end - gap_start
+        longest = max(longest, gap_start - cursor)
+        cursor = gap_end
+    longest = max(longest, end - cursor)
+
+    return FocusSummary(
+        focus_seconds=(end - start) - idle,
+        idle_seconds=idle,
+        longest_stretch_seconds=longest,
+        idle_gaps=tuple(gaps),
+    )
+
+
+def summarize_many(sessions, pauses):
+    """
+    Summarize many sessions at once.
+
+    sessions is an iterable of (key, start, end) and pauses an iterable of
+    (key, pause_start, pause_end), all in seconds. Pauses are grouped by key
+    in one pass, so the whole batch costs O(n log n) in the number of pauses.
+    Returns {key: FocusSummary}.
+    """
+    by_session = defaultdict(list)
+    for key, pause_start, pause_end in pauses:
+        by_session[key].append((pause_start, pause_end))
+    return {
+        key: summarize(start, end, by_session.get(key, ()))
+        for key, start, end in sessions
+    }
@@ -0,0 +1,155 @@
+"""
+HTTP/1.1 persistent connections for the stdlib servers.
+
+http.server speaks HTTP/1.0 unless told otherwise and closes the connection
+after every response, so each request pays a new TCP handshake, even from
+clients that would reuse their connection (the SDK's requests.Session, the
+browser). With KeepAlive a handler speaks HTTP/1.1 and serves request after
+request on one connection:
+
+- every response must say where its body ends: the handlers send a
+  Content-Length, and a response without one is sent with Connection: close
+  (its end is the end of the connection)
+- a request body the handler did not read (a rejected or unknown request)
+  is drained, so it is not parsed as the next request; requests with large
+  or chunked bodies get Connection: close instead
+- a connection idle for idle_timeout seconds between requests is closed, so
+  idle clients do not hold on to server threads
+- after max_requests responses on one connection the last one carries
+  Connection: close, and the client reconnects; so does the response to a
+  client that asked to close
+
+An open connection holds its thread while it waits for the next request, so
+the servers handle connections on threads whenever keep-alive is on.
+
+Usage (stdlib servers):
+    APIHandler = keepalive.instrument_handler(APIHandler, KEEPALIVE)
+
+On by default; set when starting a server:
+    DEEPWORK_KEEPALIVE=off                 (HTTP/1.0, one request per connection)
+    DEEPWORK_KEEPALIVE_TIMEOUT=5           (seconds an idle connection stays open)
+    DEEPWORK_KEEPALIVE_MAX_REQUESTS=100    (requests served on one connection)
+"""
+
+import os
+
+DEFAULT_IDLE_TIMEOUT = 5.0
+DEFAULT_MAX_REQUESTS = 100
+
+# Requests with larger bodies (or chunked ones) close the connection after
+# the response, so a body the handler leaves unread is never parsed as a request
+MAX_DRAIN_BYTES = 64 * 1024
+
+
+class KeepAlive:
+    """How long and for how many requests a connection is kept open"""
+
+    def __init__(self, idle_timeout=DEFAULT_IDLE_TIMEOUT, max_requests=DEFAULT_MAX_REQUESTS):
+        if max_requests < 1:
+            raise ValueError("max_requests must be at least 1")
+        self.idle_timeout = idle_timeout
+        self.max_requests = max_requests
+
+    @classmethod
+    def from_environ(cls, environ=os.environ):
+        """The policy configured by the environment, or None when DEEPWORK_KEEPALIVE=off"""
+        if environ.get("DEEPWORK_KEEPALIVE", "on").lower() in ("off", "0", "false"):
+            return None
+        return cls(
+            float(environ.get("DEEPWORK_KEEPALIVE_TIMEOUT", DEFAULT_IDLE_TIMEOUT)),
+            int(environ.get("DEEPWORK_KEEPALIVE_MAX_REQUESTS", DEFAULT_MAX_REQUESTS)),
+        )
+
+
+class _CountingReader:
+    """Wraps a handler's rfile, counting the bytes read through it"""
+
+    def __init__(self, stream):
+        self._stream = stream
+        self.read_bytes = 0
+
+    def read(self, size=-1):
+        data = self._stream.read(size)
+        self.read_bytes += len(data)
+        return data
+
+    def readline(self, size=-1):
+        line = self._stream.readline(size)
+        self.read_bytes += len(line)
+        return line
+
+    def __getattr__(self, name):
+        return getattr(self._stream, name)
+
+
+def instrument_handler(handler_class, policy):
+    """
+    Subclass of an http.server handler that keeps connections open between
+    requests (HTTP/1.1) within the policy's idle timeout and request limit.
+    """
+
+    class KeepAliveHandler(handler_class):
+        protocol_version = "HTTP/1.1"
+        # Socket timeout: also bounds the wait for the next request
+        timeout = policy.idle_timeout
+        # Headers and body are separate writes; on a reused connection Nagle's
+        # algorithm holds the body back until the client's delayed ACK (~40 ms)
+        disable_nagle_algorithm = True
+
+        def setup(self):
+            super().setup()
+            self.rfile = _CountingReader(self.rfile)
+            self._keepalive_responses = 0
+            self._keepalive_framed = False
+
+        def send_response(self, code, message=None):
+            self._keepalive_framed = False
+            super().send_response(code, message)
+
+        def send_header(self, keyword, value):
+            if keyword.lower() == "content-length":
+                self._keepalive_framed = True
+            super().send_header(keyword, value)
+
+        def end_headers(self):
+            self._keepalive_responses += 1
+            # Said out loud, also when the client asked for it: HTTP/1.1
+            # clients otherwise expect to reuse the connection
+            if (self.close_connection or not self._keepalive_framed
+                    or self._keepalive_responses >= policy.max_requests):
+                self.send_header("Connection", "close")
+            elif self.request_version == "HTTP/1.0":
+                # An HTTP/1.0 client that asked for keep-alive
+                self.send_header("Connection", "keep-alive")
+            super().end_headers()
+
+        def _request_body_size(self):
+            """Bytes of request body, or None when it cannot be drained"""
+            if "chunked" in self.headers.get("Transfer-Encoding", "").lower():
+                return None
+            size = int(self.headers.get("Content-Length") or 0)
+            return size if size <= MAX_DRAIN_BYTES else None
+
+    def kept_alive(handle):
+        def do_method(self):
+            body_size = self._request_body_size()
+            # Decided up front, so the response says the connection closes
+            if body_size is None:
+                self.close_connection = True
+            body_start = self.rfile.read_bytes
+            responses = self._keepalive_responses
+            handle(self)
+            # A request left without a response ends the connection
+            if self._keepalive_responses == responses:
+                self.close_connection = True
+            unread = (body_size or 0) - (self.rfile.read_bytes - body_start)
+            if not self.close_connection and unread > 0:
+                self.rfile.read(unread)
+        do_method.__name__ = handle.__name__
+        return do_method
+
+    for name in dir(handler_class):
+        if name.startswith("do_"):
+            setattr(KeepAliveHandler, name, kept_alive(getattr(handler_class, name)))
+    KeepAliveHandler.__name__ = KeepAliveHandler.__qualname__ = handler_class.__name__
+    return KeepAliveHandler
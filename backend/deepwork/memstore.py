@@ -0,0 +1,469 @@
+"""
+Indexed in-memory session store with snapshot + journal persistence.
+
+Records live in dicts keyed by id, with per-status and per-user secondary
+indexes and a session_id -> interruptions map, so every lookup and update is
+O(1) and every listing is O(k) in the rows it returns (plus the skipped ones).
+
+Durability follows the usual snapshot-plus-log scheme: each mutation is
+appended to a JSON-lines journal as a full-record upsert, and after every
+``snapshot_every`` mutations (or on the first mutation ``snapshot_interval``
+seconds after the last snapshot) the whole store is written to a temporary
+file and atomically renamed over the snapshot, after which the journal is
+truncated. Snapshots are only taken by writes: there is no timer, so an idle
+store keeps its journal until the next write or close(). Loading reads the snapshot
+and replays the journal on top; replay is idempotent, so a crash between
+the rename and the truncation only replays records already in the snapshot.
+A torn last journal line from a crash mid-write is ignored.
+"""
+
+import datetime
+import itertools
+import json
+import os
+import threading
+import time
+
+from . import intervals
+from .store import (
+    ANY_USER, HISTORY_STATUSES, SessionNotFound, check_transition, focused_minutes,
+    history_record, owned_by, project, status_after_completion, status_after_pause,
+)
+
+
+class _Record:
+    __slots__ = ()
+
+    def to_dict(self):
+        return {name: getattr(self, name) for name in self.__slots__}
+
+    @classmethod
+    def from_dict(cls, data):
+        return cls(**{name: data.get(name) for name in cls.__slots__})
+
+
+class SessionRecord(_Record):
+    __slots__ = ("id", "title", "goal", "status", "scheduled_duration",
+                 "start_time", "end_time", "created_at", "paused_at", "actual_duration", "user_id")
+
+    def __init__(self, id, title, goal="", status="scheduled", scheduled_duration=30,
+                 start_time=None, end_time=None, created_at=None, paused_at=None,
+                 actual_duration=None, user_id=None):
+        self.id = id
+        self.title = title
+        self.goal = goal
+        self.status = status
+        self.scheduled_duration = scheduled_duration
+        self.start_time = start_time
+        self.end_time = end_time
+        self.created_at = created_at
+        self.paused_at = paused_at
+        self.actual_duration = actual_duration
+        self.user_id = user_id
+
+
+class InterruptionRecord(_Record):
+    __slots__ = ("id", "session_id", "reason", "pause_time", "resume_time")
+
+    def __init__(self, id, session_id, reason, pause_time=None, resume_time=None):
+        self.id = id
+        self.session_id = session_id
+        self.reason = reason
+        self.pause_time = pause_time
+        self.resume_time = resume_time
+
+
+class InMemoryStore:
+    """
+    Sessions and interruptions held in memory.
+
+    snapshot_path/journal_path are optional; without them nothing is
+    persisted. Set fsync=True to survive power loss as well as process
+    crashes, at the cost of one fsync per mutation.
+    """
+
+    def __init__(self, snapshot_path=None, journal_path=None,
+                 snapshot_every=1000, snapshot_interval=60.0, fsync=False):
+        self.snapshot_path = snapshot_path
+        self.journal_path = journal_path
+        self.snapshot_every = snapshot_every
+        self.snapshot_interval = snapshot_interval
+        self.fsync = fsync
+
+        # Held by every write, and by readers for as long as they walk the
+        # dicts (or read several records that must agree), since servers
+        # read on one thread while another writes
+        self.lock = threading.RLock()
+        self._sessions = {}
+        self._by_status = {}
+        # user_id -> {session id: session} in creation order; owners never change
+        self._by_user = {}
+        self._interruptions = {}
+        self._by_session = {}
+        self._next_session_id = 1
+        self._next_interruption_id = 1
+
+        self._journal = None
+        self._pending = 0
+        self._last_snapshot = time.monotonic()
+        self._load()
+
+    # Sessions
+
+    def create_session(self, title, goal="", scheduled_duration=30, created_at=None, **fields):
+        """Add a session with the next id and return it"""
+        with self.lock:
+            session = SessionRecord(
+                id=self._next_session_id, title=title, goal=goal,
+                scheduled_duration=scheduled_duration, created_at=created_at, **fields
+            )
+            self._put_session(session)
+            self._log("session", session)
+            return session
+
+    def get_session(self, session_id):
+        """Session by id, or None"""
+        return self._sessions.get(session_id)
+
+    def update_session(self, session_id, **changes):
+        """Set fields on a session, keeping the status index in step"""
+        with self.lock:
+            session = self._sessions[session_id]
+            old_status = session.status
+            for name, value in changes.items():
+                setattr(session, name, value)
+            if session.status != old_status:
+                self._unindex_status(session, old_status)
+                self._by_status.setdefault(session.status, {})[session.id] = session
+            self._log("session", session)
+            return session
+
+    def sessions(self):
+        """All sessions in creation order"""
+        with self.lock:
+            return list(self._sessions.values())
+
+    def sessions_with_status(self, *statuses):
+        """Sessions in any of the given statuses, in creation order"""
+        found = []
+        with self.lock:
+            for status in statuses:
+                found.extend(self._by_status.get(status, {}).values())
+        if len(statuses) > 1:
+            found.sort(key=lambda session: session.id)
+        return found
+
+    def sessions_newest_first(self, user_id=None):
+        """
+        Iterate sessions from the most recently created, only user_id's when
+        given (hold lock while iterating)
+        """
+        if user_id is None:
+            return reversed(self._sessions.values())
+        return reversed(self._by_user.get(user_id, {}).values())
+
+    def count_by_status(self):
+        with self.lock:
+            return {status: len(ids) for status, ids in self._by_status.items() if ids}
+
+    # Interruptions
+
+    def add_interruption(self, session_id, reason, pause_time):
+        """Record a pause of a session and return it"""
+        with self.lock:
+            if session_id not in self._sessions:
+                raise KeyError(session_id)
+            interruption = InterruptionRecord(
+                id=self._next_interruption_id, session_id=session_id,
+                reason=reason, pause_time=pause_time
+            )
+            self._put_interruption(interruption)
+            self._log("interruption", interruption)
+            return interruption
+
+    def resume_interruption(self, session_id, resume_time):
+        """Close the latest open pause of a session; None if there is none"""
+        with self.lock:
+            pauses = self._by_session.get(session_id)
+            if not pauses or pauses[-1].resume_time is not None:
+                return None
+            interruption = pauses[-1]
+            interruption.resume_time = resume_time
+            self._log("interruption", interruption)
+            return interruption
+
+    def interruptions_for(self, session_id):
+        """Interruptions of one session in the order they happened"""
+        with self.lock:
+            return list(self._by_session.get(session_id, ()))
+
+    def interruption_count(self, session_id):
+        return len(self._by_session.get(session_id, ()))
+
+    # Persistence
+
+    def snapshot(self):
+        """Atomically write the whole store to snapshot_path and reset the journal"""
+        if not self.snapshot_path:
+            return
+        with self.lock:
+            state = {
+                "next_session_id": self._next_session_id,
+                "next_interruption_id": self._next_interruption_id,
+                "sessions": [s.to_dict() for s in self._sessions.values()],
+                "interruptions": [i.to_dict() for i in self._interruptions.values()],
+            }
+            temp_path = f"{self.snapshot_path}.tmp"
+            with open(temp_path, "w") as f:
+                json.dump(state, f, separators=(",", ":"))
+                f.flush()
+                os.fsync(f.fileno())
+            os.replace(temp_path, self.snapshot_path)
+
+            if self._journal is not None:
+                self._journal.seek(0)
+                self._journal.truncate()
+                self._journal.flush()
+            self._pending = 0
+            self._last_snapshot = time.monotonic()
+
+    def close(self):
+        """Snapshot (if persistent) and close the journal"""
+        with self.lock:
+            if self._pending:
+                self.snapshot()
+            if self._journal is not None:
+                self._journal.close()
+                self._journal = None
+
+    def _load(self):
+        if self.snapshot_path and os.path.exists(self.snapshot_path):
+            with open(self.snapshot_path) as f:
+                state = json.load(f)
+            for data in state["sessions"]:
+                self._put_session(SessionRecord.from_dict(data))
+            for data in state["interruptions"]:
+                self._put_interruption(InterruptionRecord.from_dict(data))
+            self._next_session_id = max(self._next_session_id, state["next_session_id"])
+            self._next_interruption_id = max(self._next_interruption_id, state["next_interruption_id"])
+
+        if self.journal_path:
+            if os.path.exists(self.journal_path):
+                good_bytes = 0
+                with open(self.journal_path, "rb") as f:
+                    for line in f:
+                        try:
+                            entry = json.loads(line)
+                        except ValueError:
+                            # Torn write from a crash; everything before it is intact
+                            break
+                        if not line.endswith(b"\n"):
+                            break
+                        self._replay(entry)
+                        self._pending += 1
+                        good_bytes += len(line)
+                # Cut the torn tail so new entries are not appended after it
+                with open(self.journal_path, "r+b") as f:
+                    f.truncate(good_bytes)
+            self._journal = open(self.journal_path, "a")
+
+    def _replay(self, entry):
+        if "session" in entry:
+            data = entry["session"]
+            existing = self._sessions.get(data["id"])
+            if existing is not None:
+                self._unindex_status(existing, existing.status)
+            self._put_session(SessionRecord.from_dict(data))
+        else:
+            data = entry["interruption"]
+            existing = self._interruptions.get(data["id"])
+            if existing is not None:
+                existing.resume_time = data.get("resume_time")
+            else:
+                self._put_interruption(InterruptionRecord.from_dict(data))
+
+    def _put_session(self, session):
+        self._sessions[session.id] = session
+        self._by_status.setdefault(session.status, {})[session.id] = session
+        if session.user_id is not None:
+            self._by_user.setdefault(session.user_id, {})[session.id] = session
+        self._next_session_id = max(self._next_session_id, session.id + 1)
+
+    def _put_interruption(self, interruption):
+        self._interruptions[interruption.id] = interruption
+        self._by_session.setdefault(interruption.session_id, []).append(interruption)
+        self._next_interruption_id = max(self._next_interruption_id, interruption.id + 1)
+
+    def _unindex_status(self, session, status):
+        members = self._by_status.get(status)
+        if members is not None:
+            members.pop(session.id, None)
+
+    def _log(self, kind, record):
+        if self._journal is None:
+            return
+        self._journal.write(json.dumps({kind: record.to_dict()}, separators=(",", ":")) + "\n")
+        self._journal.flush()
+        if self.fsync:
+            os.fsync(self._journal.fileno())
+        self._pending += 1
+        if (self._pending >= self.snapshot_every
+                or time.monotonic() - self._last_snapshot >= self.snapshot_interval):
+            self.snapshot()
+
+
+def _parse_time(value):
+    return datetime.datetime.fromisoformat(value) if value else None
+
+
+class MemorySessionStore:
+    """
+    SessionStore (see deepwork.store) over an InMemoryStore.
+
+    Timestamps are kept as naive local-time ISO strings, like the records
+    minimal_server has always served. Ids are integers; string ids from a
+    URL are accepted. Reads hold the records' lock like writes do, so a
+    threaded server can read while other threads write.
+    """
+
+    def __init__(self, records=None, **options):
+        self.records = records if records is not None else InMemoryStore(**options)
+
+    def _find(self, session_id, user_id=ANY_USER):
+        try:
+            session = self.records.get_session(int(session_id))
+        except (TypeError, ValueError):
+            session = None
+        if session is None or not owned_by(session.user_id, user_id):
+            raise SessionNotFound(session_id)
+        return session
+
+    def _session(self, record):
+        return {
+            "id": record.id,
+            "title": record.title,
+            "goal": record.goal,
+            "status": record.status,
+            "scheduled_duration": record.scheduled_duration,
+            "created_at": _parse_time(record.created_at),
+            "start_time": _parse_time(record.start_time),
+            "paused_at": _parse_time(record.paused_at),
+            "end_time": _parse_time(record.end_time),
+            "actual_duration": record.actual_duration,
+            "interruption_count": self.records.interruption_count(record.id),
+            "user_id": record.user_id,
+        }
+
+    def _interruption(self, record):
+        return {
+            "id": record.id,
+            "session_id": record.session_id,
+            "reason": record.reason,
+            "pause_time": _parse_time(record.pause_time),
+            "resume_time": _parse_time(record.resume_time),
+        }
+
+    def _now(self):
+        return datetime.datetime.now().isoformat()
+
+    def create_session(self, title, goal=None, scheduled_duration=30, user_id=None):
+        record = self.records.create_session(
+            title=title, goal=goal, scheduled_duration=scheduled_duration, created_at=self._now(),
+            user_id=user_id
+        )
+        return self._session(record)
+
+    def get_session(self, session_id, fields=None, user_id=ANY_USER):
+        with self.records.lock:
+            return project(self._session(self._find(session_id, user_id)), fields)
+
+    def list_sessions(self, skip=0, limit=None, user_id=None, fields=None):
+        stop = None if limit is None else skip + limit
+        with self.records.lock:
+            records = self.records.sessions_newest_first(user_id)
+            return [project(self._session(record), fields) for record in itertools.islice(records, skip, stop)]
+
+    def start_session(self, session_id, user_id=ANY_USER):
+        with self.records.lock:
+            session = self._find(session_id, user_id)
+            check_transition("start", session.status)
+            self.records.update_session(session.id, status="active", start_time=self._now())
+            return self._session(session)
+
+    def pause_session(self, session_id, reason, user_id=ANY_USER):
+        with self.records.lock:
+            session = self._find(session_id, user_id)
+            check_transition("pause", session.status)
+            now = self._now()
+            self.records.add_interruption(session.id, reason, now)
+            status = status_after_pause(self.records.interruption_count(session.id))
+            self.records.update_session(session.id, status=status, paused_at=now)
+            return self._session(session)
+
+    def resume_session(self, session_id, user_id=ANY_USER):
+        with self.records.lock:
+            session = self._find(session_id, user_id)
+            check_transition("resume", session.status)
+            self.records.resume_interruption(session.id, self._now())
+            self.records.update_session(session.id, status="active", paused_at=None)
+            return self._session(session)
+
+    def complete_session(self, session_id, user_id=ANY_USER):
+        with self.records.lock:
+            session = self._find(session_id, user_id)
+            check_transition("complete", session.status)
+            now = self._now()
+            # Net focused time, excluding pauses (open ones run until now)
+            summary = intervals.summarize(
+                intervals.to_seconds(session.start_time),
+                intervals.to_seconds(now),
+                [
+                    (intervals.to_seconds(i.pause_time), intervals.to_seconds(i.resume_time))
+                    for i in self.records.interruptions_for(session.id)
+                ]
+            )
+            started = session.start_time is not None
+            status = status_after_completion(
+                session.status, started, summary.focus_seconds / 60, session.scheduled_duration
+            )
+            self.records.update_session(
+                session.id, status=status, end_time=now,
+                actual_duration=focused_minutes(summary) if started else 0
+            )
+            return self._session(session)
+
+    def list_interruptions(self, session_id, user_id=ANY_USER):
+        with self.records.lock:
+            session = self._find(session_id, user_id)
+            return [self._interruption(i) for i in self.records.interruptions_for(session.id)]
+
+    def interruptions_for_sessions(self, session_ids):
+        found = {}
+        with self.records.lock:
+            for session_id in session_ids:
+                interruptions = self.records.interruptions_for(int(session_id))
+                if interruptions:
+                    found[int(session_id)] = [self._interruption(i) for i in interruptions]
+        return found
+
+    def session_history(self, user_id=None):
+        history = []
+        with self.records.lock:
+            for record in self.records.sessions_with_status(*HISTORY_STATUSES):
+                if user_id is not None and record.user_id != user_id:
+                    continue
+                summary = intervals.summarize(
+                    intervals.to_seconds(record.start_time),
+                    intervals.to_seconds(record.end_time),
+                    [
+                        (intervals.to_seconds(i.pause_time), intervals.to_seconds(i.resume_time))
+                        for i in self.records.interruptions_for(record.id)
+                    ]
+                )
+                history.append(history_record(self._session(record), summary))
+        # Most recently ended first; ISO strings of one format sort by time
+        history.sort(key=lambda h: h["end_time"] or datetime.datetime.min, reverse=True)
+        return history
+
+    def close(self):
+        self.records.close()
@@ -0,0 +1,343 @@
+"""
+Per-route request metrics in Prometheus text format.
+
+Every server records into a Metrics registry: per route template, requests
+by status, a latency histogram, a response size histogram and the number
+and time of database queries made while handling the request, plus a gauge
+of requests in flight. Recording is a few dict lookups and bisects under a
+lock (low microseconds); the text exposition is only built when /metrics is
+scraped.
+
+Database queries are attributed to the current request through a context
+variable, so they follow it into worker threads and coroutines. The FastAPI
+app feeds it from SQLAlchemy engine events (see app/metrics.py); the stdlib
+servers open their connections with TimedConnection. Query time covers
+executing the statement, not fetching its rows.
+
+Usage (stdlib servers):
+    APIHandler = metrics.instrument_handler(APIHandler, metrics.SESSION_ROUTES, METRICS)
+"""
+
+import bisect
+import contextvars
+import os
+import sqlite3
+import threading
+import time
+
+from .profiler import record_statement
+from .tracing import record_statement as trace_statement
+
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+# Route templates served by every backend, in FastAPI's spelling; literal
+# segments take precedence, so more specific templates come first
+SESSION_ROUTES = (
+    "/",
+    "/sessions/",
+    "/sessions/history",
+    "/sessions/{session_id}",
+    "/sessions/{session_id}/start",
+    "/sessions/{session_id}/pause",
+    "/sessions/{session_id}/resume",
+    "/sessions/{session_id}/complete",
+    "/sessions/{session_id}/interruptions",
+    "/stats/daily-focus",
+    "/stats/distributions",
+    "/openapi.json",
+)
+
+# Label for paths outside the route table, so ids never become labels
+UNMATCHED = "unmatched"
+
+LATENCY_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0)
+SIZE_BUCKETS = (64, 256, 1024, 4096, 16384, 65536, 262144, 1048576)
+QUERY_COUNT_BUCKETS = (0, 1, 2, 3, 5, 10, 20, 50, 100)
+QUERY_TIME_BUCKETS = (0.0001, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.5, 1.0)
+
+# [query count, query seconds] for the request handled in this context
+_request_queries = contextvars.ContextVar("request_queries", default=None)
+
+
+def record_query(seconds):
+    """Attribute one database query to the current request, if there is one"""
+    tally = _request_queries.get()
+    if tally is not None:
+        tally[0] += 1
+        tally[1] += seconds
+
+
+class Histogram:
+    """Fixed buckets; counts are per bucket and made cumulative when rendered"""
+
+    __slots__ = ("bounds", "counts", "sum")
+
+    def __init__(self, bounds):
+        self.bounds = bounds
+        self.counts = [0] * (len(bounds) + 1)
+        self.sum = 0
+
+    def observe(self, value):
+        # Buckets are inclusive upper bounds (le), the last one is +Inf
+        self.counts[bisect.bisect_left(self.bounds, value)] += 1
+        self.sum += value
+
+
+class _RouteStats:
+    __slots__ = ("statuses", "latency", "size", "query_count", "query_time")
+
+    def __init__(self):
+        self.statuses = {}
+        self.latency = Histogram(LATENCY_BUCKETS)
+        self.size = Histogram(SIZE_BUCKETS)
+        self.query_count = Histogram(QUERY_COUNT_BUCKETS)
+        self.query_time = Histogram(QUERY_TIME_BUCKETS)
+
+
+class Metrics:
+    """Registry of per-route request metrics"""
+
+    def __init__(self, prefix="deepwork"):
+        self.prefix = prefix
+        self.in_flight = 0
+        self._routes = {}
+        self._collectors = []
+        self._lock = threading.Lock()
+
+    def register(self, collector):
+        """
+        Export another source of metrics at /metrics: collector.render(prefix)
+        returns its exposition lines (e.g. deepwork.admission.AdmissionController)
+        """
+        self._collectors.append(collector)
+
+    def start(self):
+        """Mark a request in flight; pass the result to finish()"""
+        with self._lock:
+            self.in_flight += 1
+        tally = [0, 0.0]
+        return time.perf_counter(), tally, _request_queries.set(tally)
+
+    def finish(self, started, method, route, status, size):
+        """Record a request begun with start(), once its response is sent"""
+        started_at, tally, token = started
+        elapsed = time.perf_counter() - started_at
+        _request_queries.reset(token)
+        key = (method, route)
+        with self._lock:
+            self.in_flight -= 1
+            stats = self._routes.get(key)
+            if stats is None:
+                stats = self._routes[key] = _RouteStats()
+            stats.statuses[status] = stats.statuses.get(status, 0) + 1
+            stats.latency.observe(elapsed)
+            stats.size.observe(size)
+            stats.query_count.observe(tally[0])
+            stats.query_time.observe(tally[1])
+
+    def render(self):
+        """The registry in Prometheus text exposition format"""
+        with self._lock:
+            in_flight = self.in_flight
+            routes = [
+                (key, dict(stats.statuses), [
+                    (histogram.bounds, list(histogram.counts), histogram.sum)
+                    for histogram in (stats.latency, stats.size, stats.query_count, stats.query_time)
+                ])
+                for key, stats in sorted(self._routes.items())
+            ]
+
+        p = self.prefix
+        lines = [
+            f"# HELP {p}_http_requests_in_flight Requests currently being handled.",
+            f"# TYPE {p}_http_requests_in_flight gauge",
+            f"{p}_http_requests_in_flight {in_flight}",
+            f"# HELP {p}_http_requests_total Requests handled, by route template and status.",
+            f"# TYPE {p}_http_requests_total counter",
+        ]
+        for (method, route), statuses, _ in routes:
+            for status, count in sorted(statuses.items()):
+                lines.append(
+                    f'{p}_http_requests_total{{{_labels(method, route)},status="{status}"}} {count}'
+                )
+
+        families = (
+            ("http_request_duration_seconds", "Request latency in seconds."),
+            ("http_response_size_bytes", "Response body size in bytes."),
+            ("http_request_db_queries", "Database queries made per request."),
+            ("http_request_db_seconds", "Database query time per request in seconds."),
+        )
+        for index, (name, help_text) in enumerate(families):
+            lines.append(f"# HELP {p}_{name} {help_text}")
+            lines.append(f"# TYPE {p}_{name} histogram")
+            for (method, route), _, histograms in routes:
+                bounds, counts, total = histograms[index]
+                labels = _labels(method, route)
+                cumulative = 0
+                for bound, count in zip(bounds, counts):
+                    cumulative += count
+                    lines.append(f'{p}_{name}_bucket{{{labels},le="{_number(bound)}"}} {cumulative}')
+                cumulative += counts[-1]
+                lines.append(f'{p}_{name}_bucket{{{labels},le="+Inf"}} {cumulative}')
+                lines.append(f"{p}_{name}_sum{{{labels}}} {_number(total)}")
+                lines.append(f"{p}_{name}_count{{{labels}}} {cumulative}")
+        for collector in self._collectors:
+            lines.extend(collector.render(p))
+        return "\n".join(lines) + "\n"
+
+
+def _escape(value):
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _labels(method, route):
+    return f'method="{_escape(method)}",route="{_escape(route)}"'
+
+
+def _number(value):
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+def route_matcher(templates):
+    """
+    Function mapping a request path to its route template, or UNMATCHED.
+
+    Templates match segment by segment ({name} matches any one segment) in
+    the order given; trailing slashes are ignored.
+    """
+    by_length = {}
+    for template in templates:
+        segments = template.strip("/").split("/")
+        literals = tuple(
+            (index, segment) for index, segment in enumerate(segments) if not segment.startswith("{")
+        )
+        by_length.setdefault(len(segments), []).append((template, literals))
+
+    def match(path):
+        segments = path.split("?", 1)[0].strip("/").split("/")
+        for template, literals in by_length.get(len(segments), ()):
+            for index, literal in literals:
+                if segments[index] != literal:
+                    break
+            else:
+                return template
+        return UNMATCHED
+
+    return match
+
+
+class TimedCursor(sqlite3.Cursor):
+    """
+    Cursor that attributes its statements to the current request (its
+    metrics, profile and trace), and hands slow ones to the connection's
+    slow-query log.
+    """
+
+    def execute(self, sql, parameters=()):
+        started = time.perf_counter()
+        try:
+            return super().execute(sql, parameters)
+        finally:
+            self._record(sql, parameters, time.perf_counter() - started, False)
+
+    def executemany(self, sql, parameters):
+        started = time.perf_counter()
+        try:
+            return super().executemany(sql, parameters)
+        finally:
+            self._record(sql, parameters, time.perf_counter() - started, True)
+
+    def _record(self, sql, parameters, elapsed, executemany):
+        record_query(elapsed)
+        slow_queries = self.connection.slow_queries
+        if slow_queries is not None:
+            slow_queries.observe(self.connection.database, sql, parameters, elapsed, executemany)
+        trace_statement(sql, elapsed)
+        record_statement(sql, elapsed)
+
+
+class TimedConnection(sqlite3.Connection):
+    """sqlite3 connection factory whose statements are timed by TimedCursor"""
+
+    # Set on the subclass from SlowQueryLog.connection_factory()
+    slow_queries = None
+
+    def __init__(self, database, *args, **kwargs):
+        super().__init__(database, *args, **kwargs)
+        self.database = os.fsdecode(database)
+
+    def cursor(self, factory=TimedCursor):
+        return super().cursor(factory)
+
+    def execute(self, sql, parameters=()):
+        return self.cursor().execute(sql, parameters)
+
+    def executemany(self, sql, parameters):
+        return self.cursor().executemany(sql, parameters)
+
+
+class _CountingWriter:
+    """Wraps a handler's wfile, counting the bytes written through it"""
+
+    def __init__(self, stream):
+        self._stream = stream
+        self.written = 0
+
+    def write(self, data):
+        self.written += len(data)
+        return self._stream.write(data)
+
+    def __getattr__(self, name):
+        return getattr(self._stream, name)
+
+
+def instrument_handler(handler_class, routes, registry):
+    """
+    Subclass of an http.server handler that records every request in the
+    registry and serves it at GET /metrics.
+    """
+    match = route_matcher(routes)
+
+    class InstrumentedHandler(handler_class):
+        def setup(self):
+            super().setup()
+            self.wfile = _CountingWriter(self.wfile)
+
+        def send_response(self, code, message=None):
+            self._metrics_status = code
+            super().send_response(code, message)
+
+        def end_headers(self):
+            super().end_headers()
+            # Everything written after this is body
+            self._metrics_body_start = self.wfile.written
+
+        def _send_metrics(self):
+            body = registry.render().encode()
+            self.send_response(200)
+            self.send_header("Content-Type", CONTENT_TYPE)
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+    def timed(method, handle):
+        def do_method(self):
+            if method == "GET" and self.path.split("?", 1)[0] == "/metrics":
+                return self._send_metrics()
+            self._metrics_status = 500
+            self._metrics_body_start = None
+            started = registry.start()
+            try:
+                handle(self)
+            finally:
+                body_start = self._metrics_body_start
+                size = self.wfile.written - body_start if body_start is not None else 0
+                registry.finish(started, method, match(self.path), self._metrics_status, size)
+        do_method.__name__ = handle.__name__
+        return do_method
+
+    for name in dir(handler_class):
+        if name.startswith("do_"):
+            setattr(InstrumentedHandler, name, timed(name[3:], getattr(handler_class, name)))
+    InstrumentedHandler.__name__ = InstrumentedHandler.__qualname__ = handler_class.__name__
+    return InstrumentedHandler
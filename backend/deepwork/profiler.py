@@ -0,0 +1,169 @@
+"""
+Opt-in SQL statement profiler with N+1 detection.
+
+While a request is profiled, every statement it runs is recorded under its
+fingerprint (literals and parameters replaced by ?, IN lists collapsed), so
+the same query issued once per row shows up as one fingerprint with a high
+count. Responses carry X-DB-Queries (statement count) and X-DB-Time
+(milliseconds spent executing them). A fingerprint repeated more than the
+repeat limit within one request is logged as a warning, or in "fail" mode
+raises RepeatedQueryError from the offending query.
+
+Statements reach the profiler through the same hooks as the request
+metrics (see deepwork.metrics): SQLAlchemy cursor events in the FastAPI app
+and TimedConnection in the stdlib servers.
+
+Enable it with environment variables when starting a server:
+    DEEPWORK_SQL_PROFILE=warn|fail   (off by default)
+    DEEPWORK_SQL_REPEAT_LIMIT=5      (K, the allowed repeats per request)
+"""
+
+import contextvars
+import functools
+import logging
+import os
+import re
+
+MODES = ("warn", "fail")
+DEFAULT_REPEAT_LIMIT = 5
+
+logger = logging.getLogger("deepwork.profiler")
+
+# Profile of the request handled in this context, if it is being profiled
+_current = contextvars.ContextVar("query_profile", default=None)
+
+_STRING = re.compile(r"'(?:[^']|'')*'")
+_NUMBER = re.compile(r"\b\d+(?:\.\d+)?\b")
+_PARAMETER = re.compile(r"%\(\w+\)s|:\w+|\$\d+|\?\d*")
+_IN_LIST = re.compile(r"\bIN\s*\(\s*\?(?:\s*,\s*\?)*\s*\)", re.IGNORECASE)
+_SPACE = re.compile(r"\s+")
+
+
+class RepeatedQueryError(RuntimeError):
+    """A statement fingerprint repeated more often than allowed in one request"""
+
+    def __init__(self, fingerprint, count, limit):
+        super().__init__(f"Query repeated {count} times in one request (limit {limit}): {fingerprint}")
+        self.fingerprint = fingerprint
+        self.count = count
+
+
+@functools.lru_cache(maxsize=1024)
+def fingerprint(statement):
+    """Statement with literals and parameters as ?, IN lists as IN (?...), whitespace collapsed"""
+    text = _STRING.sub("?", statement)
+    text = _NUMBER.sub("?", text)
+    text = _PARAMETER.sub("?", text)
+    text = _IN_LIST.sub("IN (?...)", text)
+    return _SPACE.sub(" ", text).strip()
+
+
+def record_statement(statement, seconds):
+    """Attribute one executed statement to the current profile, if any"""
+    profile = _current.get()
+    if profile is not None:
+        profile.record(statement, seconds)
+
+
+class QueryProfile:
+    """Statements run while handling one request, by fingerprint"""
+
+    __slots__ = ("statements", "queries", "seconds", "repeat_limit", "fail")
+
+    def __init__(self, repeat_limit=DEFAULT_REPEAT_LIMIT, fail=False):
+        # fingerprint -> [count, seconds]
+        self.statements = {}
+        self.queries = 0
+        self.seconds = 0.0
+        self.repeat_limit = repeat_limit
+        self.fail = fail
+
+    def record(self, statement, seconds):
+        key = fingerprint(statement)
+        entry = self.statements.get(key)
+        if entry is None:
+            entry = self.statements[key] = [0, 0.0]
+        entry[0] += 1
+        entry[1] += seconds
+        self.queries += 1
+        self.seconds += seconds
+        if self.fail and entry[0] > self.repeat_limit:
+            raise RepeatedQueryError(key, entry[0], self.repeat_limit)
+
+    def repeated(self):
+        """(fingerprint, count, seconds) over the repeat limit, most repeated first"""
+        return sorted(
+            ((key, count, seconds) for key, (count, seconds) in self.statements.items()
+             if count > self.repeat_limit),
+            key=lambda item: -item[1],
+        )
+
+    def headers(self):
+        return {
+            "X-DB-Queries": str(self.queries),
+            "X-DB-Time": f"{self.seconds * 1000:.3f}",
+        }
+
+
+class Profiler:
+    """Starts and checks a QueryProfile per request"""
+
+    def __init__(self, repeat_limit=DEFAULT_REPEAT_LIMIT, mode="warn"):
+        if mode not in MODES:
+            raise ValueError(f"Profiler mode must be one of {', '.join(MODES)}")
+        self.repeat_limit = repeat_limit
+        self.mode = mode
+
+    @classmethod
+    def from_environ(cls, environ=os.environ):
+        """A Profiler configured by DEEPWORK_SQL_PROFILE, or None when it is off"""
+        mode = environ.get("DEEPWORK_SQL_PROFILE", "").lower()
+        if mode in ("", "0", "off"):
+            return None
+        if mode in ("1", "on"):
+            mode = "warn"
+        return cls(int(environ.get("DEEPWORK_SQL_REPEAT_LIMIT", DEFAULT_REPEAT_LIMIT)), mode)
+
+    def start(self):
+        """Profile the current context until finish(); returns its token"""
+        profile = QueryProfile(self.repeat_limit, fail=self.mode == "fail")
+        return profile, _current.set(profile)
+
+    def finish(self, started, label):
+        """Stop profiling, log repeated fingerprints and return the profile"""
+        profile, token = started
+        _current.reset(token)
+        for key, count, seconds in profile.repeated():
+            logger.warning("%s ran %d times in %s (%.1f ms)", key, count, label, seconds * 1000)
+        return profile
+
+
+def instrument_handler(handler_class, profiler):
+    """
+    Subclass of an http.server handler that profiles every request and adds
+    X-DB-Queries/X-DB-Time to its responses.
+    """
+
+    class ProfiledHandler(handler_class):
+        def end_headers(self):
+            profile = _current.get()
+            if profile is not None:
+                for name, value in profile.headers().items():
+                    self.send_header(name, value)
+            super().end_headers()
+
+    def profiled(method, handle):
+        def do_method(self):
+            started = profiler.start()
+            try:
+                handle(self)
+            finally:
+                profiler.finish(started, f"{method} {self.path}")
+        do_method.__name__ = handle.__name__
+        return do_method
+
+    for name in dir(handler_class):
+        if name.startswith("do_"):
+            setattr(ProfiledHandler, name, profiled(name[3:], getattr(handler_class, name)))
+    ProfiledHandler.__name__ = ProfiledHandler.__qualname__ = handler_class.__name__
+    return ProfiledHandler
@@ -0,0 +1,54 @@
+"""
+Sparse fieldsets and opt-in nested data for the session endpoints.
+
+The session list and detail endpoints of every front end take:
+    ?fields=id,status,title     only these fields of each session
+    ?include=interruptions      each session's interruptions, embedded
+
+Without ?fields= every field is returned; id always is, so a client can
+follow up on a session. Interruptions are left out unless included. The
+front ends pass the requested fields on to the store as record keys (see
+deepwork.store.SESSION_FIELDS), whose SELECT then reads only those columns,
+and load included interruptions for a whole page with one IN query, so
+neither the unneeded columns nor the interruptions are read at all.
+minimal_server's JSON names are the record keys themselves.
+
+Usage (front ends):
+    fields = projection.parse_fields(query.get("fields"), SESSION_JSON_FIELDS)
+    include = projection.parse_include(query.get("include"))
+"""
+
+INCLUDES = ("interruptions",)
+
+
+class InvalidProjection(ValueError):
+    """A ?fields= or ?include= name the endpoint does not serve"""
+
+
+def _names(value):
+    return [name.strip() for name in (value or "").split(",") if name.strip()]
+
+
+def parse_fields(value, allowed):
+    """
+    The fields named in a ?fields= value, in the order of allowed and with
+    "id" first; None (every field) when value is empty. Raises
+    InvalidProjection for names not in allowed.
+    """
+    names = set(_names(value))
+    if not names:
+        return None
+    unknown = names.difference(allowed)
+    if unknown:
+        raise InvalidProjection(f"Unknown fields: {', '.join(sorted(unknown))}")
+    names.add("id")
+    return tuple(name for name in allowed if name in names)
+
+
+def parse_include(value, allowed=INCLUDES):
+    """The related data named in an ?include= value, as a frozenset"""
+    names = frozenset(_names(value))
+    unknown = names.difference(allowed)
+    if unknown:
+        raise InvalidProjection(f"Unknown include: {', '.join(sorted(unknown))}")
+    return names
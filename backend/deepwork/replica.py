@@ -0,0 +1,242 @@
+"""
+Read-only snapshot replica for history and stats queries.
+
+History and the stats endpoints scan whole tables. On the primary those
+scans share the connection (or the file) with session writes, so a large
+history read delays the next start/pause/complete. A SnapshotReplica copies
+the primary with SQLite's online backup API into a separate database, in
+memory or in a file, and those reads run against the copy instead.
+
+A snapshot is taken before any read that would otherwise see data older
+than max_staleness seconds, and a background thread refreshes it every
+max_staleness / 2 so reads rarely wait for one. A snapshot in memory is
+replaced, never modified: readers that started on the previous one finish
+on it, and it is closed when the last of them is done. A snapshot file is
+overwritten in place, the copy waiting for statements still reading it. The
+copy reads the primary in one pass, so in WAL mode (see deepwork.writer) it
+does not hold up writers; in rollback-journal mode writers wait for it.
+
+Responses served from a snapshot carry its age in seconds in the
+X-Snapshot-Age header. Enable it when starting a server:
+    DEEPWORK_REPLICA=memory             (or the path of a snapshot file)
+    DEEPWORK_REPLICA_MAX_STALENESS=5    (seconds; 0 snapshots on every read)
+"""
+
+import contextlib
+import os
+import sqlite3
+import threading
+import time
+
+from . import archive
+from .shards import shard_path
+
+DEFAULT_MAX_STALENESS = 5.0
+
+FRESHNESS_HEADER = "X-Snapshot-Age"
+
+
+def oldest_freshness(snapshots):
+    """X-Snapshot-Age of a response read from several snapshots: the oldest one's age"""
+    return f"{max(snapshot.age() for snapshot in snapshots):.3f}"
+
+
+class Snapshot:
+    """
+    One copy of the primary. Its connection is read-only and may be shared
+    by several readers at once (SQLite serializes their statements).
+    """
+
+    def __init__(self, connection, taken_at):
+        self.connection = connection
+        self.taken_at = taken_at
+        self._readers = 0
+        self._retired = False
+        self._lock = threading.Lock()
+        self._store = None
+        self._engine = None
+
+    def age(self):
+        """Seconds since the copy started: no row is older than this"""
+        return time.monotonic() - self.taken_at
+
+    def freshness(self):
+        """X-Snapshot-Age header value"""
+        return f"{self.age():.3f}"
+
+    def store(self):
+        """SQLiteSessionStore reading this snapshot"""
+        with self._lock:
+            if self._store is None:
+                from .sqlite_store import SQLiteSessionStore
+                self._store = SQLiteSessionStore(None, connection=self.connection)
+            return self._store
+
+    def engine(self):
+        """SQLAlchemy engine over this snapshot's connection"""
+        with self._lock:
+            if self._engine is None:
+                from sqlalchemy import create_engine
+                from sqlalchemy.pool import StaticPool
+                self._engine = create_engine(
+                    "sqlite://", creator=lambda: self.connection, poolclass=StaticPool
+                )
+            return self._engine
+
+    def _acquire(self):
+        with self._lock:
+            if self._retired:
+                return False
+            self._readers += 1
+            return True
+
+    def _release(self):
+        with self._lock:
+            self._readers -= 1
+            close = self._retired and self._readers == 0
+        if close:
+            self._close()
+
+    def _retire(self):
+        with self._lock:
+            self._retired = True
+            close = self._readers == 0
+        if close:
+            self._close()
+
+    def _close(self):
+        if self._engine is not None:
+            self._engine.dispose()
+        self.connection.close()
+
+
+class SnapshotReplica:
+    """
+    Copies of the SQLite database at source, taken into target (":memory:"
+    or a file path) at most max_staleness seconds apart.
+
+    connection_factory is passed to sqlite3.connect for the snapshot's
+    connection (e.g. metrics.TimedConnection), so its reads are counted.
+    The archive at archive_path (see deepwork.archive) is attached to each
+    snapshot as it is rather than copied: it only changes when archiving.
+    """
+
+    def __init__(self, source, target=":memory:", max_staleness=DEFAULT_MAX_STALENESS,
+                 connection_factory=sqlite3.Connection, archive_path=None):
+        self.source = source
+        self.target = target
+        self.max_staleness = max_staleness
+        self.connection_factory = connection_factory
+        self.archive_path = archive_path
+        self.refreshes = 0
+        self._snapshot = None
+        self._refresh_lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread = None
+
+    @classmethod
+    def from_environ(cls, source, environ=os.environ, connection_factory=sqlite3.Connection,
+                     archive_path=None, shard=0, shards=1):
+        """
+        The replica configured by DEEPWORK_REPLICA, or None when it is not
+        set. Of a sharded database (see deepwork.shards) each shard has its
+        own replica, in its own snapshot file.
+        """
+        target = environ.get("DEEPWORK_REPLICA")
+        if not target:
+            return None
+        return cls(
+            source,
+            ":memory:" if target == "memory" else shard_path(target, shard, shards),
+            float(environ.get("DEEPWORK_REPLICA_MAX_STALENESS", DEFAULT_MAX_STALENESS)),
+            connection_factory,
+            archive_path,
+        )
+
+    def start(self):
+        """Take the first snapshot and refresh in the background; returns self"""
+        self.refresh()
+        if self.max_staleness > 0 and self._thread is None:
+            self._thread = threading.Thread(target=self._run, name="snapshot-replica", daemon=True)
+            self._thread.start()
+        return self
+
+    def _run(self):
+        while not self._stop.wait(self.max_staleness / 2):
+            try:
+                self.refresh()
+            except Exception as e:
+                # Reads fall back to refreshing themselves once it is stale
+                print(f"Snapshot refresh failed: {e}")
+
+    def refresh(self):
+        """Take a new snapshot and retire the current one"""
+        with self._refresh_lock:
+            self._take()
+
+    def _take(self):
+        taken_at = time.monotonic()
+        connection = self._copy()
+        previous, self._snapshot = self._snapshot, Snapshot(connection, taken_at)
+        self.refreshes += 1
+        if previous is not None:
+            previous._retire()
+
+    def _copy(self):
+        source = sqlite3.connect(self.source)
+        try:
+            if self.target == ":memory:":
+                connection = sqlite3.connect(
+                    ":memory:", check_same_thread=False, factory=self.connection_factory
+                )
+                source.backup(connection)
+            else:
+                # Readers of the previous snapshot keep their own connection
+                # to the file; SQLite makes the copy wait for their statements
+                with contextlib.closing(sqlite3.connect(self.target)) as destination:
+                    source.backup(destination)
+                connection = sqlite3.connect(
+                    self.target, check_same_thread=False, factory=self.connection_factory
+                )
+        finally:
+            source.close()
+        if self.archive_path:
+            archive.attach(connection, self.archive_path)
+        # Snapshots are read-only; a stray write fails instead of diverging
+        connection.execute("PRAGMA query_only = 1")
+        return connection
+
+    def current(self):
+        """The snapshot reads should use: refreshed first if it is too stale"""
+        snapshot = self._snapshot
+        if snapshot is None or snapshot.age() > self.max_staleness:
+            with self._refresh_lock:
+                # Another reader may have refreshed it while this one waited
+                snapshot = self._snapshot
+                if snapshot is None or snapshot.age() > self.max_staleness:
+                    self._take()
+                snapshot = self._snapshot
+        return snapshot
+
+    @contextlib.contextmanager
+    def read(self):
+        """Context manager for a Snapshot no older than max_staleness, kept open inside"""
+        snapshot = self.current()
+        while not snapshot._acquire():
+            # Retired between current() and here: use its replacement
+            snapshot = self.current()
+        try:
+            yield snapshot
+        finally:
+            snapshot._release()
+
+    def close(self):
+        """Stop refreshing and close the current snapshot once its readers finish"""
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+        with self._refresh_lock:
+            if self._snapshot is not None:
+                self._snapshot._retire()
+                self._snapshot = None
@@ -0,0 +1,259 @@
+"""
+Daily focus rollup.
+
+The ``daily_focus`` table keeps one row per (day, status) with the focused
+minutes, scheduled minutes, pause count and session count of every session
+completed on that day. Completion handlers update it in the same transaction
+as the session row, so dashboards read at most one row per day and status
+no matter how many sessions exist.
+
+Usage:
+    python -m deepwork.rollup rebuild --db deepwork.db --from 2025-05-01 --to 2025-05-31
+    python -m deepwork.rollup check --db deepwork.db
+"""
+
+import argparse
+import datetime
+import sqlite3
+import sys
+
+from . import timestamps
+from .schema import ORM_IDLE_DAYS_SQL, is_stdlib_schema
+
+DAILY_FOCUS_DDL = """
+CREATE TABLE IF NOT EXISTS daily_focus (
+    day TEXT NOT NULL,
+    status TEXT NOT NULL,
+    focused_minutes REAL NOT NULL DEFAULT 0,
+    scheduled_minutes INTEGER NOT NULL DEFAULT 0,
+    pause_count INTEGER NOT NULL DEFAULT 0,
+    session_count INTEGER NOT NULL DEFAULT 0,
+    PRIMARY KEY (day, status)
+) WITHOUT ROWID
+"""
+
+# Named parameters so the same statement runs on sqlite3 and SQLAlchemy text()
+UPSERT_SQL = """
+INSERT INTO daily_focus (day, status, focused_minutes, scheduled_minutes, pause_count, session_count)
+VALUES (:day, :status, :focused_minutes, :scheduled_minutes, :pause_count, 1)
+ON CONFLICT (day, status) DO UPDATE SET
+    focused_minutes = focused_minutes + excluded.focused_minutes,
+    scheduled_minutes = scheduled_minutes + excluded.scheduled_minutes,
+    pause_count = pause_count + excluded.pause_count,
+    session_count = session_count + 1
+"""
+
+SELECT_RANGE_SQL = """
+SELECT day, status, focused_minutes, scheduled_minutes, pause_count, session_count
+FROM daily_focus
+WHERE day >= :start_day AND day <= :end_day
+ORDER BY day, status
+"""
+
+# How each backend's tables map onto the rollup columns. "bound" turns a
+# YYYY-MM-DD day into a value comparable with the end column.
+ORM_SOURCE = {
+    "end": "end_time",
+    "day": "date(end_time)",
+    "bound": str,
+    "focused": f"(julianday(end_time) - julianday(start_time) - {ORM_IDLE_DAYS_SQL}) * 1440",
+    "pauses": "(SELECT COUNT(*) FROM interruptions WHERE interruptions.session_id = sessions.id)",
+}
+
+
+def stdlib_source(codec):
+    """Column mapping for the stdlib tables in the given timestamp storage mode"""
+    return {
+        "end": "completed_at",
+        "day": codec.day_sql("completed_at"),
+        "bound": codec.bound,
+        "focused": "COALESCE(actual_duration, 0)",
+        "pauses": "COALESCE(interruption_count, 0)",
+    }
+
+
+STDLIB_SOURCE = stdlib_source(timestamps.for_mode(timestamps.ISO))
+
+# julianday() only keeps millisecond precision, so allow a little drift per session
+FOCUS_TOLERANCE_MINUTES = 1e-4
+
+
+def create_table(cursor):
+    """Create the daily_focus table if it does not exist"""
+    cursor.execute(DAILY_FOCUS_DDL)
+
+
+def completion_params(day, status, focused_minutes, scheduled_minutes, pause_count):
+    """Build the parameters for UPSERT_SQL from one completed session"""
+    return {
+        "day": day.isoformat() if isinstance(day, (datetime.date, datetime.datetime)) else str(day)[:10],
+        "status": status,
+        "focused_minutes": max(0.0, float(focused_minutes or 0)),
+        "scheduled_minutes": int(scheduled_minutes or 0),
+        "pause_count": int(pause_count or 0),
+    }
+
+
+def record_completion(cursor, day, status, focused_minutes, scheduled_minutes, pause_count):
+    """
+    Add one completed session to the rollup.
+
+    The caller owns the transaction; this only issues the upsert so it
+    commits (or rolls back) together with the session update.
+    """
+    cursor.execute(
+        UPSERT_SQL,
+        completion_params(day, status, focused_minutes, scheduled_minutes, pause_count)
+    )
+
+
+ROLLUP_TOTALS = ("focused_minutes", "scheduled_minutes", "pause_count", "session_count")
+
+
+def merge(shard_rows):
+    """
+    Combine SELECT_RANGE_SQL results from several shards (see deepwork.shards)
+    into one row per (day, status), summing the totals, ordered by day and status
+    """
+    merged = {}
+    for rows in shard_rows:
+        for row in rows:
+            key = (row["day"], row["status"])
+            if key in merged:
+                total = merged[key]
+                for column in ROLLUP_TOTALS:
+                    total[column] += row[column]
+            else:
+                merged[key] = {"day": row["day"], "status": row["status"],
+                               **{column: row[column] for column in ROLLUP_TOTALS}}
+    return [merged[key] for key in sorted(merged)]
+
+
+def detect_source(conn):
+    """Pick the column mapping matching the sessions table in this database"""
+    if is_stdlib_schema(conn):
+        return stdlib_source(timestamps.for_connection(conn))
+    return ORM_SOURCE
+
+
+def _day_bounds(source, start_day, end_day):
+    """Half-open timestamp range covering start_day..end_day inclusive"""
+    upper = datetime.date.fromisoformat(end_day) + datetime.timedelta(days=1)
+    return source["bound"](start_day), source["bound"](upper.isoformat())
+
+
+def _aggregate_sql(source):
+    # Range on the raw end column (not date(end)) so an index on it can be used
+    return f"""
+    SELECT {source['day']} AS day,
+           status,
+           SUM(MAX({source['focused']}, 0)) AS focused_minutes,
+           SUM(scheduled_duration) AS scheduled_minutes,
+           SUM({source['pauses']}) AS pause_count,
+           COUNT(*) AS session_count
+    FROM sessions
+    WHERE {source['end']} IS NOT NULL
+      AND {source['end']} >= ? AND {source['end']} < ?
+    GROUP BY 1, 2
+    """
+
+
+def _resolve_range(conn, source, start_day, end_day):
+    """Fill in missing range ends from the data in both tables"""
+    if start_day is not None and end_day is not None:
+        return start_day, end_day
+    row = conn.execute(
+        f"SELECT MIN({source['day']}), MAX({source['day']}) FROM sessions"
+    ).fetchone()
+    stored = conn.execute("SELECT MIN(day), MAX(day) FROM daily_focus").fetchone()
+    days = [d for d in (row[0], row[1], stored[0], stored[1]) if d]
+    if not days:
+        days = [datetime.date.today().isoformat()]
+    return start_day or min(days), end_day or max(days)
+
+
+def rebuild(conn, start_day=None, end_day=None, source=None):
+    """
+    Recompute the rollup for start_day..end_day (inclusive, YYYY-MM-DD)
+    from the raw session rows. Runs in a single transaction.
+
+    Returns the number of rollup rows written.
+    """
+    source = source or detect_source(conn)
+    create_table(conn)
+    start_day, end_day = _resolve_range(conn, source, start_day, end_day)
+    lower, upper = _day_bounds(source, start_day, end_day)
+    with conn:
+        conn.execute(
+            "DELETE FROM daily_focus WHERE day >= ? AND day <= ?",
+            (start_day, end_day)
+        )
+        cursor = conn.execute(
+            "INSERT INTO daily_focus "
+            "(day, status, focused_minutes, scheduled_minutes, pause_count, session_count) "
+            + _aggregate_sql(source),
+            (lower, upper)
+        )
+        return cursor.rowcount
+
+
+def check(conn, start_day=None, end_day=None, source=None):
+    """
+    Compare the rollup against the raw session rows.
+
+    Returns a list of mismatches as (day, status, expected, actual) tuples,
+    where expected/actual are (focused, scheduled, pauses, sessions) or None
+    when the row is missing on that side.
+    """
+    source = source or detect_source(conn)
+    create_table(conn)
+    start_day, end_day = _resolve_range(conn, source, start_day, end_day)
+    lower, upper = _day_bounds(source, start_day, end_day)
+    expected = {
+        (row[0], row[1]): tuple(row[2:])
+        for row in conn.execute(_aggregate_sql(source), (lower, upper))
+    }
+    actual = {
+        (row[0], row[1]): tuple(row[2:])
+        for row in conn.execute(
+            SELECT_RANGE_SQL, {"start_day": start_day, "end_day": end_day}
+        )
+    }
+
+    mismatches = []
+    for key in sorted(set(expected) | set(actual)):
+        want, have = expected.get(key), actual.get(key)
+        if want is None or have is None:
+            mismatches.append((key[0], key[1], want, have))
+        elif (abs(want[0] - have[0]) > FOCUS_TOLERANCE_MINUTES * max(1, want[3])
+              or tuple(want[1:]) != tuple(have[1:])):
+            mismatches.append((key[0], key[1], want, have))
+    return mismatches
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Maintain the daily_focus rollup table")
+    parser.add_argument("command", choices=["rebuild", "check"])
+    parser.add_argument("--db", default="deepwork.db", help="SQLite database file")
+    parser.add_argument("--from", dest="start_day", help="First day (YYYY-MM-DD)")
+    parser.add_argument("--to", dest="end_day", help="Last day (YYYY-MM-DD)")
+    args = parser.parse_args(argv)
+
+    conn = sqlite3.connect(args.db)
+    try:
+        if args.command == "rebuild":
+            rows = rebuild(conn, args.start_day, args.end_day)
+            print(f"Rebuilt {rows} daily_focus rows")
+            return 0
+
+        mismatches = check(conn, args.start_day, args.end_day)
+        for day, status, want, have in mismatches:
+            print(f"{day} {status}: expected {want}, rollup has {have}")
+        print(f"{len(mismatches)} mismatching rows")
+        return 1 if mismatches else 0
+    finally:
+        conn.close()
+
+
+if __name__ == "__main__":
+    sys.exit(main())
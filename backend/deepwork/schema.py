@@ -0,0 +1,106 @@
+"""
+Schema introspection shared by the engine modules.
+
+Two table layouts exist: the SQLAlchemy models in backend/app/models
+(start_time/end_time, integer ids) and the stdlib servers' tables
+(started_at/completed_at, actual_duration, interruption_count).
+"""
+
+import contextlib
+import re
+
+# Idle time of a SQLAlchemy-layout session in julian days: the sum of its
+# pauses clipped to the session bounds, with unresumed pauses running to the
+# session end. A session can only be paused while active, so its pauses never
+# overlap and the plain sum equals the merged total from deepwork.intervals.
+ORM_IDLE_DAYS_SQL = """IFNULL((
+    SELECT SUM(MAX(
+        julianday(MIN(IFNULL(i.resume_time, sessions.end_time), sessions.end_time))
+        - julianday(MAX(i.pause_time, sessions.start_time)),
+        0))
+    FROM interruptions AS i
+    WHERE i.session_id = sessions.id
+), 0)"""
+
+
+def table_columns(conn, table):
+    """Return the set of column names of a table (empty if it does not exist)"""
+    cursor = conn.cursor()
+    # Plain tuples whatever row factory the connection was given
+    cursor.row_factory = None
+    cursor.execute(f"PRAGMA table_info({table})")
+    return {row[1] for row in cursor.fetchall()}
+
+
+def column_types(conn, table):
+    """Return {column: declared type (upper case)} for a table"""
+    cursor = conn.cursor()
+    cursor.row_factory = None
+    cursor.execute(f"PRAGMA table_info({table})")
+    return {row[1]: (row[2] or "").upper() for row in cursor.fetchall()}
+
+
+def create_sql(conn, table, new_name=None):
+    """
+    The CREATE TABLE statement of a table, optionally renamed to new_name
+    (the first step of rebuilding it with a changed definition)
+    """
+    row = conn.execute(
+        "SELECT sql FROM sqlite_master WHERE type = 'table' AND name = ?", (table,)
+    ).fetchone()
+    if row is None:
+        raise ValueError(f"Database has no {table} table")
+    sql = row[0]
+    if new_name:
+        sql = re.sub(
+            rf"CREATE TABLE\s+(IF NOT EXISTS\s+)?[\"']?{table}[\"']?",
+            f"CREATE TABLE {new_name}",
+            sql,
+            count=1,
+            flags=re.IGNORECASE,
+        )
+    return sql
+
+
+def index_sql(conn, table):
+    """CREATE INDEX statements of a table's explicit indexes"""
+    return [
+        row[0] for row in conn.execute(
+            "SELECT sql FROM sqlite_master WHERE type = 'index' AND tbl_name = ? AND sql IS NOT NULL",
+            (table,)
+        )
+    ]
+
+
+@contextlib.contextmanager
+def rebuild_transaction(conn):
+    """
+    Run a table rebuild (create, copy, drop, rename) in one write transaction.
+
+    Foreign keys are switched off for the duration, since tables are dropped
+    and renamed underneath them, and the connection is put in autocommit mode
+    so the explicit BEGIN IMMEDIATE / COMMIT are the only transaction.
+    """
+    isolation_level = conn.isolation_level
+    conn.isolation_level = None
+    foreign_keys = conn.execute("PRAGMA foreign_keys").fetchone()[0]
+    conn.execute("PRAGMA foreign_keys = OFF")
+    try:
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            yield conn
+            conn.execute("COMMIT")
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+    finally:
+        conn.execute(f"PRAGMA foreign_keys = {foreign_keys}")
+        conn.isolation_level = isolation_level
+
+
+def is_stdlib_schema(conn):
+    """True for the stdlib servers' layout, False for the SQLAlchemy models"""
+    columns = table_columns(conn, "sessions")
+    if not columns:
+        raise ValueError("Database has no sessions table")
+    return "completed_at" in columns
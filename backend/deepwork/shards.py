@@ -0,0 +1,88 @@
+"""
+Per-user sharding across SQLite files.
+
+Sessions belong to the user in the request's X-User-Id header. With one
+database file every user's writes queue behind the same SQLite lock; with
+N shards each user's sessions live in one of N files, picked by a stable
+hash of the user id, so users on different shards write in parallel. The
+hash (BLAKE2b, not Python's per-process hash()) gives every process the
+same answer. Requests without a user go to shard 0.
+
+A ShardRouter only maps users to shard numbers; front ends keep one store,
+engine, writer or replica per shard, indexed by that number. Reads and
+writes of one user touch one shard. Admin aggregates over everyone (daily
+focus, distributions) go through fan_out(), which runs a function on every
+shard at once and returns the per-shard results for the caller to merge.
+
+Shard files sit next to the configured database: with 4 shards deepwork.db
+becomes deepwork.shard0.db ... deepwork.shard3.db; with 1 (the default) it
+is deepwork.db itself. Changing the count moves users between shards, so it
+is chosen once, when a deployment starts:
+    DEEPWORK_SHARDS=4
+"""
+
+import concurrent.futures
+import contextvars
+import hashlib
+import os
+
+USER_HEADER = "X-User-Id"
+
+
+def shard_path(path, shard, count):
+    """File of one shard of the database at path"""
+    if count == 1:
+        return path
+    root, ext = os.path.splitext(path)
+    return f"{root}.shard{shard}{ext}"
+
+
+class ShardRouter:
+    """Maps user ids onto count shards"""
+
+    def __init__(self, count=1):
+        if count < 1:
+            raise ValueError("A deployment needs at least one shard")
+        self.count = count
+        self._pool = None
+
+    @classmethod
+    def from_environ(cls, environ=os.environ):
+        return cls(int(environ.get("DEEPWORK_SHARDS", 1)))
+
+    def __len__(self):
+        return self.count
+
+    def __iter__(self):
+        return iter(range(self.count))
+
+    def shard_for(self, user_id):
+        """Shard number holding the user's sessions"""
+        if self.count == 1 or not user_id:
+            return 0
+        digest = hashlib.blake2b(str(user_id).encode(), digest_size=8).digest()
+        return int.from_bytes(digest, "big") % self.count
+
+    def paths(self, path):
+        """The file of every shard of the database at path"""
+        return [shard_path(path, shard, self.count) for shard in self]
+
+    def fan_out(self, fn):
+        """
+        fn(shard) for every shard, run in parallel; results in shard order.
+        Each call runs in a copy of the caller's context, so its SQL is
+        counted and traced as part of the request.
+        """
+        if self.count == 1:
+            return [fn(0)]
+        if self._pool is None:
+            self._pool = concurrent.futures.ThreadPoolExecutor(self.count, thread_name_prefix="shard")
+        futures = [
+            self._pool.submit(contextvars.copy_context().run, fn, shard) for shard in self
+        ]
+        return [future.result() for future in futures]
+
+    def close(self):
+        if self._pool is not None:
+            self._pool.shutdown()
+            self._pool = None
@@ -0,0 +1,229 @@
+"""
+Slow-query log with EXPLAIN QUERY PLAN capture.
+
+Statements slower than the threshold are written as JSON lines to a
+rotating log: the statement and its fingerprint (see deepwork.profiler),
+the shape of its bind parameters (types only, never values), its duration
+and the query plan. Plans are captured on a separate read-only connection
+by a background thread, so a slow request is not slowed down further.
+
+The FastAPI app watches the engine in models/database.py; the stdlib
+servers open their connections with SlowQueryLog.connection_factory().
+Enable it with environment variables when starting a server:
+    DEEPWORK_SLOW_QUERY_MS=50                      (threshold; off when unset)
+    DEEPWORK_SLOW_QUERY_LOG=slow_queries.jsonl     (rotated at 10 MB, 5 backups)
+
+Usage:
+    python -m deepwork.slowlog summary slow_queries.jsonl
+    python -m deepwork.slowlog summary slow_queries.jsonl --sort max --top 5
+"""
+
+import argparse
+import datetime
+import glob
+import json
+import logging
+import logging.handlers
+import os
+import pathlib
+import queue
+import sqlite3
+import sys
+import threading
+
+from .metrics import TimedConnection
+from .profiler import fingerprint
+
+DEFAULT_LOG_PATH = "slow_queries.jsonl"
+MAX_LOG_BYTES = 10 * 1024 * 1024
+LOG_BACKUPS = 5
+
+# One log per file, however many engines or servers in the process use it
+_logs = {}
+_logs_lock = threading.Lock()
+
+
+def bind_shape(parameters, executemany=False):
+    """Types of the bind parameters: a list, a dict by name, or rows of one shape"""
+    if executemany:
+        if not isinstance(parameters, (list, tuple)):
+            return {"rows": None, "shape": None}
+        return {"rows": len(parameters), "shape": bind_shape(parameters[0]) if parameters else None}
+    if parameters is None:
+        return []
+    if isinstance(parameters, dict):
+        return {name: type(value).__name__ for name, value in parameters.items()}
+    return [type(value).__name__ for value in parameters]
+
+
+class SlowQueryLog:
+    """Rotating JSON-lines log of statements slower than threshold_ms"""
+
+    def __init__(self, path=DEFAULT_LOG_PATH, threshold_ms=50, max_bytes=MAX_LOG_BYTES, backups=LOG_BACKUPS):
+        self.path = path
+        self.threshold = threshold_ms / 1000
+        handler = logging.handlers.RotatingFileHandler(path, maxBytes=max_bytes, backupCount=backups)
+        handler.setFormatter(logging.Formatter("%(message)s"))
+        self._logger = logging.getLogger(f"deepwork.slowlog.{os.path.abspath(path)}")
+        self._logger.propagate = False
+        self._logger.setLevel(logging.INFO)
+        self._logger.addHandler(handler)
+        self._handler = handler
+        self._queue = queue.Queue()
+        self._worker = None
+        self._side_connections = {}
+        self._factory = None
+
+    @classmethod
+    def from_environ(cls, environ=os.environ):
+        """The process-wide log configured by DEEPWORK_SLOW_QUERY_MS, or None when it is off"""
+        threshold = environ.get("DEEPWORK_SLOW_QUERY_MS")
+        if not threshold:
+            return None
+        path = os.path.abspath(environ.get("DEEPWORK_SLOW_QUERY_LOG", DEFAULT_LOG_PATH))
+        with _logs_lock:
+            if path not in _logs:
+                _logs[path] = cls(path, float(threshold))
+            return _logs[path]
+
+    def observe(self, database, statement, parameters, seconds, executemany=False, source="sqlite3"):
+        """Queue a statement for logging if it took at least the threshold"""
+        if seconds < self.threshold:
+            return
+        entry = {
+            "time": datetime.datetime.now(datetime.timezone.utc).isoformat(timespec="milliseconds"),
+            "source": source,
+            "database": database,
+            "duration_ms": round(seconds * 1000, 3),
+            "fingerprint": fingerprint(statement),
+            "statement": statement,
+            "binds": bind_shape(parameters, executemany),
+        }
+        # Parameters only travel to the plan; the log keeps their shape
+        if executemany:
+            parameters = parameters[0] if isinstance(parameters, (list, tuple)) and parameters else None
+        if self._worker is None:
+            self._start_worker()
+        self._queue.put((entry, parameters))
+
+    def _start_worker(self):
+        with _logs_lock:
+            if self._worker is None:
+                self._worker = threading.Thread(target=self._run, name="slow-query-log", daemon=True)
+                self._worker.start()
+
+    def _run(self):
+        while True:
+            item = self._queue.get()
+            try:
+                if item is None:
+                    # Side connections belong to this thread
+                    for conn in self._side_connections.values():
+                        conn.close()
+                    self._side_connections.clear()
+                    return
+                entry, parameters = item
+                entry["plan"], entry["plan_error"] = self._explain(entry["database"], entry["statement"], parameters)
+                self._logger.info(json.dumps(entry, default=str))
+            except Exception as e:
+                print(f"Slow query log error: {e}", file=sys.stderr)
+            finally:
+                self._queue.task_done()
+
+    def _explain(self, database, statement, parameters):
+        """(plan rows, None) from a read-only side connection, or (None, error)"""
+        if not database or database == ":memory:":
+            return None, "no side connection for an in-memory database"
+        try:
+            conn = self._side_connections.get(database)
+            if conn is None:
+                uri = pathlib.Path(database).resolve().as_uri() + "?mode=ro"
+                conn = self._side_connections[database] = sqlite3.connect(uri, uri=True)
+            rows = conn.execute(f"EXPLAIN QUERY PLAN {statement}", parameters or ()).fetchall()
+            return [{"id": row[0], "parent": row[1], "detail": row[3]} for row in rows], None
+        except sqlite3.Error as e:
+            return None, str(e)
+
+    def connection_factory(self):
+        """sqlite3 connection factory that times statements and logs the slow ones"""
+        if self._factory is None:
+            self._factory = type("SlowQueryConnection", (TimedConnection,), {"slow_queries": self})
+        return self._factory
+
+    def flush(self):
+        """Wait until every queued statement is written"""
+        self._queue.join()
+
+    def close(self):
+        if self._worker is not None:
+            self._queue.put(None)
+            self._worker.join()
+            self._worker = None
+        self._logger.removeHandler(self._handler)
+        self._handler.close()
+        with _logs_lock:
+            if _logs.get(os.path.abspath(self.path)) is self:
+                del _logs[os.path.abspath(self.path)]
+
+
+def read_entries(path):
+    """Entries of a log and its rotated backups, oldest file first"""
+    backups = sorted(glob.glob(f"{glob.escape(path)}.[0-9]*"),
+                     key=lambda name: int(name.rsplit(".", 1)[1]), reverse=True)
+    for name in backups + [path]:
+        if not os.path.exists(name):
+            continue
+        with open(name) as f:
+            for line in f:
+                if line.strip():
+                    yield json.loads(line)
+
+
+def summarize(entries):
+    """Per fingerprint: count, total/mean/max ms, last plan and an example statement"""
+    groups = {}
+    for entry in entries:
+        group = groups.setdefault(entry["fingerprint"], {
+            "fingerprint": entry["fingerprint"], "count": 0, "total_ms": 0.0, "max_ms": 0.0,
+            "example": entry["statement"], "plan": None, "last_seen": None,
+        })
+        group["count"] += 1
+        group["total_ms"] += entry["duration_ms"]
+        group["max_ms"] = max(group["max_ms"], entry["duration_ms"])
+        group["last_seen"] = entry["time"]
+        if entry.get("plan"):
+            group["plan"] = entry["plan"]
+    for group in groups.values():
+        group["mean_ms"] = group["total_ms"] / group["count"]
+    return list(groups.values())
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Aggregate the slow-query log by statement fingerprint")
+    parser.add_argument("command", choices=["summary"])
+    parser.add_argument("log", nargs="?", default=DEFAULT_LOG_PATH, help="Log file (rotated backups included)")
+    parser.add_argument("--sort", choices=["total", "count", "max", "mean"], default="total")
+    parser.add_argument("--top", type=int, default=10, help="Fingerprints to show")
+    parser.add_argument("--json", action="store_true", help="Print the summary as JSON")
+    args = parser.parse_args(argv)
+
+    groups = summarize(read_entries(args.log))
+    key = {"total": "total_ms", "count": "count", "max": "max_ms", "mean": "mean_ms"}[args.sort]
+    groups = sorted(groups, key=lambda group: group[key], reverse=True)[:args.top]
+    if args.json:
+        print(json.dumps(groups, indent=2))
+        return 0
+    if not groups:
+        print("No slow queries logged")
+        return 0
+    for group in groups:
+        print(f"{group['count']:>6}x  total {group['total_ms']:10.1f} ms  "
+              f"mean {group['mean_ms']:8.1f} ms  max {group['max_ms']:8.1f} ms")
+        print(f"        {group['fingerprint']}")
+        for step in group["plan"] or ():
+            print(f"          {step['detail']}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
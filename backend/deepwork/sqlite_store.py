@@ -0,0 +1,465 @@
+"""
+SessionStore over the stdlib servers' SQLite schema.
+
+Rows are keyed by rowid and exposed by their 16-byte public_id (see
+deepwork.ids); timestamps are stored in whichever mode the database uses
+(see deepwork.timestamps). One connection is shared behind a lock, and
+every operation is a single transaction, with the daily_focus rollup
+updated in the same transaction as a completion. Each write also appends
+its event to the log the tables are projections of (see deepwork.events).
+"""
+
+import contextlib
+import sqlite3
+import threading
+
+from . import archive, events, ids, intervals, rollup, timestamps
+from .schema import table_columns
+from .store import (
+    ANY_USER, HISTORY_STATUSES, SessionNotFound, check_transition,
+    focused_minutes, history_record, status_after_completion, status_after_pause,
+)
+
+# Timestamps are UTC epoch milliseconds; rows are keyed by rowid and
+# exposed through the 16-byte public_id
+SESSIONS_DDL = """
+CREATE TABLE IF NOT EXISTS sessions (
+    id INTEGER PRIMARY KEY,
+    public_id BLOB NOT NULL UNIQUE,
+    title TEXT NOT NULL,
+    goal TEXT,
+    status TEXT NOT NULL,
+    scheduled_duration INTEGER NOT NULL,
+    created_at INTEGER NOT NULL,
+    started_at INTEGER,
+    paused_at INTEGER,
+    completed_at INTEGER,
+    actual_duration INTEGER,
+    interruption_count INTEGER DEFAULT 0,
+    user_id TEXT
+)
+"""
+
+INTERRUPTIONS_DDL = """
+CREATE TABLE IF NOT EXISTS interruptions (
+    id INTEGER PRIMARY KEY,
+    public_id BLOB NOT NULL UNIQUE,
+    session_id INTEGER NOT NULL,
+    reason TEXT NOT NULL,
+    start_time INTEGER NOT NULL,
+    end_time INTEGER,
+    FOREIGN KEY (session_id) REFERENCES sessions (id)
+)
+"""
+
+SESSION_COLUMNS = (
+    "id, public_id, title, goal, status, scheduled_duration, created_at, "
+    "started_at, paused_at, completed_at, actual_duration, interruption_count, user_id"
+)
+
+# Session record key -> the column it is read from
+RECORD_COLUMNS = {
+    "id": "public_id", "title": "title", "goal": "goal", "status": "status",
+    "scheduled_duration": "scheduled_duration", "created_at": "created_at",
+    "start_time": "started_at", "paused_at": "paused_at", "end_time": "completed_at",
+    "actual_duration": "actual_duration", "interruption_count": "interruption_count",
+    "user_id": "user_id",
+}
+
+# Variables per IN (...) list, well under SQLite's limit
+_CHUNK = 500
+
+
+def create_schema(conn):
+    """
+    Create the stdlib tables if missing and bring older layouts up to date.
+
+    Returns True if a TEXT-keyed database was migrated to integer keys.
+    Databases with ISO timestamps keep them until migrated explicitly. The
+    event log is backfilled from the existing rows when it is first created.
+    Sessions from before users existed have no user_id.
+    """
+    cursor = conn.cursor()
+    cursor.execute(SESSIONS_DDL)
+    cursor.execute(INTERRUPTIONS_DDL)
+    # Interruptions are always looked up per session
+    cursor.execute(
+        "CREATE INDEX IF NOT EXISTS idx_interruptions_session_id ON interruptions (session_id)"
+    )
+    rollup.create_table(cursor)
+    conn.commit()
+    migrated = ids.migrate(conn)
+    if "user_id" not in table_columns(conn, "sessions"):
+        conn.execute("ALTER TABLE sessions ADD COLUMN user_id TEXT")
+    # A user's sessions are listed newest first
+    conn.execute(
+        "CREATE INDEX IF NOT EXISTS idx_sessions_user_id ON sessions (user_id, created_at)"
+    )
+    conn.commit()
+    events.create_stdlib_table(conn)
+    return migrated
+
+
+class SQLiteSessionStore:
+    """
+    SessionStore backed by a SQLite file in the stdlib servers' layout.
+
+    connection_factory is passed to sqlite3.connect (e.g. metrics.TimedConnection).
+    With wal=True the database is switched to write-ahead logging, so reads
+    on other connections do not wait for a writer (see deepwork.writer).
+    Inside group_commit() writes share one transaction. Given an open
+    connection instead (a replica snapshot), the store only reads through
+    it and leaves its schema as it is. With an archive path, old finished
+    sessions are also read from that database (see deepwork.archive).
+    """
+
+    def __init__(self, path, connection_factory=sqlite3.Connection, wal=False, connection=None,
+                 archive_path=None):
+        self.path = path
+        self._lock = threading.RLock()
+        if connection is not None:
+            self._conn = connection
+            self.migrated_keys = False
+        else:
+            self._conn = sqlite3.connect(path, check_same_thread=False, factory=connection_factory)
+            if wal:
+                self._conn.execute("PRAGMA journal_mode=WAL")
+            self.migrated_keys = create_schema(self._conn)
+        if archive_path:
+            archive.attach(self._conn, archive_path)
+        self.archived = archive.is_attached(self._conn)
+        self.timestamps = timestamps.for_connection(self._conn)
+        self._grouped = False
+
+    @contextlib.contextmanager
+    def group_commit(self):
+        """
+        Run the writes made inside in one transaction, committed on exit.
+
+        Each write is a savepoint, so one that fails is undone on its own and
+        the rest still commit together: one commit (and fsync) for the group.
+        """
+        with self._lock:
+            self._conn.execute("BEGIN IMMEDIATE")
+            self._grouped = True
+            try:
+                yield self
+                self._conn.commit()
+            except BaseException:
+                self._conn.rollback()
+                raise
+            finally:
+                self._grouped = False
+
+    def _begin(self):
+        if self._grouped:
+            self._conn.execute("SAVEPOINT write")
+
+    def _commit(self):
+        if self._grouped:
+            self._conn.execute("RELEASE write")
+        else:
+            self._conn.commit()
+
+    def _rollback(self):
+        if self._grouped:
+            self._conn.execute("ROLLBACK TO write")
+            self._conn.execute("RELEASE write")
+        else:
+            self._conn.rollback()
+
+    def _session(self, row):
+        to_datetime = self.timestamps.to_datetime
+        return {
+            "id": ids.to_text(row[1]),
+            "title": row[2],
+            "goal": row[3],
+            "status": row[4],
+            "scheduled_duration": row[5],
+            "created_at": to_datetime(row[6]),
+            "start_time": to_datetime(row[7]),
+            "paused_at": to_datetime(row[8]),
+            "end_time": to_datetime(row[9]),
+            "actual_duration": row[10],
+            "interruption_count": row[11] or 0,
+            "user_id": row[12],
+        }
+
+    def _projected(self, row, fields):
+        """Record of a row selected by _columns(fields)"""
+        to_datetime = self.timestamps.to_datetime
+        convert = {
+            "id": ids.to_text, "created_at": to_datetime, "start_time": to_datetime,
+            "paused_at": to_datetime, "end_time": to_datetime, "interruption_count": lambda n: n or 0,
+        }
+        return {key: convert[key](value) if key in convert else value for key, value in zip(fields, row)}
+
+    def _reader(self, fields):
+        """
+        SELECT column list, row -> record function and the index of created_at
+        (read for every page, see _page_reaches_archive) for the given fields
+        """
+        if fields is None:
+            return SESSION_COLUMNS, self._session, 6
+        columns = ", ".join(RECORD_COLUMNS[key] for key in fields) + ", created_at"
+        return columns, lambda row: self._projected(row, fields), len(fields)
+
+    def _interruption(self, row, session_public_id):
+        to_datetime = self.timestamps.to_datetime
+        return {
+            "id": ids.to_text(row[0]),
+            "session_id": ids.to_text(session_public_id),
+            "reason": row[1],
+            "pause_time": to_datetime(row[2]),
+            "resume_time": to_datetime(row[3]),
+        }
+
+    def _schemas(self):
+        return ("main", archive.SCHEMA) if self.archived else ("main",)
+
+    def _locate(self, cursor, session_id, columns=SESSION_COLUMNS, user_id=ANY_USER):
+        """
+        The session's row and the schema holding it, the archive only on a
+        miss; SessionNotFound when it belongs to someone other than user_id
+        """
+        where, params = "public_id = ?", (ids.parse(session_id),)
+        if user_id is not ANY_USER:
+            # IS matches the NULL owner of anonymous sessions too
+            where, params = where + " AND user_id IS ?", params + (user_id,)
+        for schema in self._schemas():
+            cursor.execute(f"SELECT {columns} FROM {schema}.sessions WHERE {where}", params)
+            row = cursor.fetchone()
+            if row is not None:
+                return row, schema
+        raise SessionNotFound(session_id)
+
+    def _find(self, cursor, session_id, user_id):
+        # Archived sessions are finished, so any transition on one is refused
+        return self._locate(cursor, session_id, user_id=user_id)[0]
+
+    def _transition(self, session_id, user_id, action, apply):
+        """Run apply(cursor, row, now, session) for a valid transition in one transaction"""
+        with self._lock:
+            cursor = self._conn.cursor()
+            self._begin()
+            try:
+                row = self._find(cursor, session_id, user_id)
+                check_transition(action, row[4])
+                now = self.timestamps.now()
+                session = self._session(row)
+                apply(cursor, row, now, session)
+                self._commit()
+            except Exception:
+                self._rollback()
+                raise
+            return session
+
+    def create_session(self, title, goal=None, scheduled_duration=30, user_id=None):
+        with self._lock:
+            cursor = self._conn.cursor()
+            public_id, now = ids.new_public_id(), self.timestamps.now()
+            self._begin()
+            try:
+                cursor.execute(
+                    """
+                    INSERT INTO sessions (public_id, title, goal, status, scheduled_duration, created_at, user_id)
+                    VALUES (?, ?, ?, 'scheduled', ?, ?, ?)
+                    """,
+                    (public_id, title, goal, scheduled_duration, now, user_id)
+                )
+                session_key = cursor.lastrowid
+                events.append(
+                    cursor, session_key, "created", now, public_id=public_id.hex(),
+                    title=title, goal=goal, scheduled_duration=scheduled_duration, user_id=user_id
+                )
+                cursor.execute(f"SELECT {SESSION_COLUMNS} FROM sessions WHERE id = ?", (session_key,))
+                row = cursor.fetchone()
+                self._commit()
+            except Exception:
+                self._rollback()
+                raise
+            return self._session(row)
+
+    def get_session(self, session_id, fields=None, user_id=ANY_USER):
+        columns, record, _ = self._reader(fields)
+        with self._lock:
+            return record(self._locate(self._conn.cursor(), session_id, columns, user_id)[0])
+
+    def list_sessions(self, skip=0, limit=None, user_id=None, fields=None):
+        columns, record, created_at = self._reader(fields)
+        where, params = ("WHERE user_id = ?", (user_id,)) if user_id is not None else ("", ())
+        params += (-1 if limit is None else limit, skip)
+        with self._lock:
+            rows = self._conn.execute(
+                f"SELECT {columns} FROM sessions {where} "
+                "ORDER BY created_at DESC, id DESC LIMIT ? OFFSET ?",
+                params
+            ).fetchall()
+            if self.archived and self._page_reaches_archive(rows, limit, created_at):
+                rows = self._conn.execute(
+                    f"SELECT {columns} FROM {archive.source('sessions', True)} {where} "
+                    "ORDER BY created_at DESC, id DESC LIMIT ? OFFSET ?",
+                    params
+                ).fetchall()
+        return [record(row) for row in rows]
+
+    def _page_reaches_archive(self, rows, limit, created_at):
+        # A full page of hot rows all newer than every archived session is complete
+        newest = archive.newest_created_at(self._conn)
+        if newest is None:
+            return False
+        return limit is None or len(rows) < limit or rows[-1][created_at] <= newest
+
+    def start_session(self, session_id, user_id=ANY_USER):
+        def apply(cursor, row, now, session):
+            cursor.execute(
+                "UPDATE sessions SET status = 'active', started_at = ? WHERE id = ?", (now, row[0])
+            )
+            events.append(cursor, row[0], "started", now)
+            session.update(status="active", start_time=self.timestamps.to_datetime(now))
+        return self._transition(session_id, user_id, "start", apply)
+
+    def pause_session(self, session_id, reason, user_id=ANY_USER):
+        def apply(cursor, row, now, session):
+            public_id = ids.new_public_id()
+            cursor.execute(
+                "INSERT INTO interruptions (public_id, session_id, reason, start_time) VALUES (?, ?, ?, ?)",
+                (public_id, row[0], reason, now)
+            )
+            interruption_key = cursor.lastrowid
+            count = (row[11] or 0) + 1
+            status = status_after_pause(count)
+            cursor.execute(
+                "UPDATE sessions SET status = ?, paused_at = ?, interruption_count = ? WHERE id = ?",
+                (status, now, count, row[0])
+            )
+            events.append(
+                cursor, row[0], "paused", now, reason=reason, status=status, pause_count=count,
+                interruption_id=interruption_key, public_id=public_id.hex()
+            )
+            session.update(
+                status=status, paused_at=self.timestamps.to_datetime(now), interruption_count=count
+            )
+        return self._transition(session_id, user_id, "pause", apply)
+
+    def resume_session(self, session_id, user_id=ANY_USER):
+        def apply(cursor, row, now, session):
+            # Close the latest open pause so its length is known
+            cursor.execute(
+                """
+                UPDATE interruptions SET end_time = ?
+                WHERE id = (
+                    SELECT id FROM interruptions
+                    WHERE session_id = ? AND end_time IS NULL
+                    ORDER BY start_time DESC LIMIT 1
+                )
+                """,
+                (now, row[0])
+            )
+            cursor.execute(
+                "UPDATE sessions SET status = 'active', paused_at = NULL WHERE id = ?", (row[0],)
+            )
+            events.append(cursor, row[0], "resumed", now)
+            session.update(status="active", paused_at=None)
+        return self._transition(session_id, user_id, "resume", apply)
+
+    def complete_session(self, session_id, user_id=ANY_USER):
+        def apply(cursor, row, now, session):
+            to_seconds = self.timestamps.to_seconds
+            # Net focused time, excluding pauses (open ones run until now)
+            cursor.execute(
+                "SELECT start_time, end_time FROM interruptions WHERE session_id = ?", (row[0],)
+            )
+            summary = intervals.summarize(
+                to_seconds(row[7]),
+                to_seconds(now),
+                [(to_seconds(start), to_seconds(end)) for start, end in cursor.fetchall()]
+            )
+            started = row[7] is not None
+            actual_duration = focused_minutes(summary) if started else 0
+            status = status_after_completion(
+                row[4], started, summary.focus_seconds / 60, row[5]
+            )
+            cursor.execute(
+                """
+                UPDATE sessions SET status = ?, completed_at = ?, actual_duration = ?
+                WHERE id = ?
+                """,
+                (status, now, actual_duration, row[0])
+            )
+            events.append(
+                cursor, row[0], "completed", now, status=status,
+                actual_duration=actual_duration, focused_minutes=actual_duration
+            )
+            # Roll into the day's totals in the same transaction
+            rollup.record_completion(
+                cursor, self.timestamps.day(now), status, actual_duration, row[5], row[11]
+            )
+            session.update(
+                status=status, end_time=self.timestamps.to_datetime(now),
+                actual_duration=actual_duration
+            )
+        return self._transition(session_id, user_id, "complete", apply)
+
+    def list_interruptions(self, session_id, user_id=ANY_USER):
+        with self._lock:
+            cursor = self._conn.cursor()
+            row, schema = self._locate(cursor, session_id, user_id=user_id)
+            cursor.execute(
+                f"SELECT public_id, reason, start_time, end_time FROM {schema}.interruptions "
+                "WHERE session_id = ? ORDER BY id",
+                (row[0],)
+            )
+            return [self._interruption(i, row[1]) for i in cursor.fetchall()]
+
+    def interruptions_for_sessions(self, session_ids):
+        public_ids = [ids.parse(session_id) for session_id in session_ids]
+        found = {}
+        with self._lock:
+            for schema in self._schemas():
+                for start in range(0, len(public_ids), _CHUNK):
+                    chunk = public_ids[start:start + _CHUNK]
+                    rows = self._conn.execute(
+                        f"""
+                        SELECT i.public_id, i.reason, i.start_time, i.end_time, s.public_id
+                        FROM {schema}.interruptions i JOIN {schema}.sessions s ON s.id = i.session_id
+                        WHERE s.public_id IN ({', '.join('?' * len(chunk))})
+                        ORDER BY i.id
+                        """,
+                        chunk
+                    ).fetchall()
+                    for row in rows:
+                        found.setdefault(ids.to_text(row[4]), []).append(self._interruption(row, row[4]))
+        return found
+
+    def session_history(self, user_id=None):
+        statuses = ", ".join(f"'{status}'" for status in HISTORY_STATUSES)
+        mine, params = ("AND s.user_id = ?", (user_id,)) if user_id is not None else ("", ())
+        # Every finished session, so archived ones too
+        sessions = archive.source("sessions", self.archived)
+        interruptions = archive.source("interruptions", self.archived)
+        with self._lock:
+            rows = self._conn.execute(
+                f"SELECT {SESSION_COLUMNS} FROM {sessions} s WHERE status IN ({statuses}) {mine} "
+                "ORDER BY completed_at DESC",
+                params
+            ).fetchall()
+            # Focus breakdown for all of them from a single interruptions query
+            pauses = self._conn.execute(
+                f"""
+                SELECT i.session_id, i.start_time, i.end_time
+                FROM {interruptions} i JOIN {sessions} s ON s.id = i.session_id
+                WHERE s.status IN ({statuses}) {mine}
+                """,
+                params
+            ).fetchall()
+        to_seconds = self.timestamps.to_seconds
+        summaries = intervals.summarize_many(
+            [(row[0], to_seconds(row[7]), to_seconds(row[9])) for row in rows],
+            [(owner, to_seconds(start), to_seconds(end)) for owner, start, end in pauses]
+        )
+        return [history_record(self._session(row), summaries[row[0]]) for row in rows]
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
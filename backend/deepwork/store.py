@@ -0,0 +1,195 @@
+"""
+Session storage interface shared by every HTTP front end.
+
+A SessionStore owns the session lifecycle (create, start, pause, resume,
+complete) and the reads the front ends serve. Implementations:
+
+- deepwork.sqlite_store.SQLiteSessionStore - raw sqlite3 over the stdlib schema
+- deepwork.memstore.MemorySessionStore - indexed in-memory records
+- app.store.SQLAlchemySessionStore - the FastAPI app's SQLAlchemy models
+
+Every store returns the same plain dicts, so the lifecycle rules below are
+applied identically everywhere and each front end only maps these records
+onto its own JSON field names.
+
+Session record keys:
+    id, title, goal, status, scheduled_duration, created_at, start_time,
+    end_time, paused_at, actual_duration, interruption_count, user_id
+
+Interruption record keys:
+    id, session_id, reason, pause_time, resume_time
+
+History record keys (finished sessions, most recently ended first):
+    id, title, goal, status, scheduled_duration, start_time, end_time,
+    actual_duration, interruption_count, completion_ratio, focused_minutes,
+    longest_stretch_minutes, idle_minutes
+
+Timestamps are datetime objects (naive local time for stores that keep
+local time, UTC-aware otherwise) and durations are minutes. Ids are opaque:
+pass back whatever a record's ``id`` holds, or its string form from a URL.
+
+Sessions belong to the user_id they were created for (None when the front
+end has no user). Listing and history take a user_id to return only that
+user's sessions; None returns everyone's. The by-id operations (get_session,
+the transitions and list_interruptions) take the caller's user_id and raise
+SessionNotFound for a session owned by anyone else, so an anonymous caller
+reaches only sessions without an owner. Leaving user_id out (ANY_USER)
+skips the check, for tools that work across users.
+
+get_session and list_sessions take fields, the record keys to return (id
+among them), and read only what those need; None returns every key (see
+deepwork.projection).
+"""
+
+import datetime
+from typing import Dict, List, Optional, Protocol, Sequence
+
+STATUSES = ("scheduled", "active", "paused", "completed", "interrupted", "abandoned", "overdue")
+
+HISTORY_STATUSES = ("completed", "interrupted", "abandoned", "overdue")
+
+# A session that runs more than 10% over its scheduled duration is overdue
+OVERRUN_FACTOR = 1.1
+
+# The 4th pause ends the session as interrupted
+MAX_PAUSES = 4
+
+# Statuses each action may start from
+ALLOWED_FROM = {
+    "start": ("scheduled",),
+    "pause": ("active",),
+    "resume": ("paused",),
+    "complete": ("active", "paused"),
+}
+
+SESSION_FIELDS = (
+    "id", "title", "goal", "status", "scheduled_duration", "created_at", "start_time",
+    "end_time", "paused_at", "actual_duration", "interruption_count", "user_id",
+)
+
+INTERRUPTION_FIELDS = ("id", "session_id", "reason", "pause_time", "resume_time")
+
+# user_id of by-id operations that skip the ownership check
+ANY_USER = object()
+
+
+class SessionNotFound(LookupError):
+    """No session has the given id"""
+
+    def __init__(self, session_id):
+        super().__init__(f"Session with id {session_id} not found")
+        self.session_id = session_id
+
+
+class InvalidTransition(ValueError):
+    """The action is not allowed from the session's current status"""
+
+    def __init__(self, action, status):
+        allowed = " or ".join(f"'{s}'" for s in ALLOWED_FROM[action])
+        super().__init__(
+            f"Cannot {action} session: Session must be in {allowed} state, current state: {status}"
+        )
+        self.action = action
+        self.status = status
+
+
+def owned_by(owner, user_id):
+    """Whether a session owned by owner is visible to the caller user_id"""
+    return user_id is ANY_USER or owner == user_id
+
+
+def check_transition(action, status):
+    """Raise InvalidTransition unless action is allowed from status"""
+    if status not in ALLOWED_FROM[action]:
+        raise InvalidTransition(action, status)
+
+
+def status_after_pause(pause_count):
+    """Status of a session that now has pause_count pauses"""
+    return "interrupted" if pause_count >= MAX_PAUSES else "paused"
+
+
+def status_after_completion(status, started, focused_minutes, scheduled_duration):
+    """Final status of a session completed from status"""
+    if status == "paused":
+        # Paused and never resumed
+        return "abandoned"
+    if started and focused_minutes > scheduled_duration * OVERRUN_FACTOR:
+        return "overdue"
+    return "completed"
+
+
+def focused_minutes(summary):
+    """Whole focused minutes stored as actual_duration"""
+    return max(0, round(summary.focus_seconds / 60))
+
+
+def history_record(session, summary):
+    """History entry for a session record and its intervals.FocusSummary"""
+    focused = summary.focus_seconds / 60
+    scheduled = session["scheduled_duration"]
+    ratio = 0.0
+    if session["status"] in ("completed", "overdue") and session["start_time"] and session["end_time"]:
+        ratio = focused / scheduled if scheduled > 0 else 0.0
+    return {
+        "id": session["id"],
+        "title": session["title"],
+        "goal": session["goal"],
+        "status": session["status"],
+        "scheduled_duration": scheduled,
+        "start_time": session["start_time"],
+        "end_time": session["end_time"],
+        "actual_duration": session["actual_duration"],
+        "interruption_count": session["interruption_count"],
+        "completion_ratio": ratio,
+        "focused_minutes": focused,
+        "longest_stretch_minutes": summary.longest_stretch_seconds / 60,
+        "idle_minutes": summary.idle_seconds / 60,
+    }
+
+
+def project(record, fields):
+    """The record with only the given keys (all of them when fields is None)"""
+    if fields is None:
+        return record
+    return {key: record[key] for key in fields}
+
+
+def isoformat(value):
+    """JSON form of a record timestamp (milliseconds when timezone-aware)"""
+    if not isinstance(value, datetime.datetime):
+        return value
+    if value.tzinfo is not None:
+        return value.isoformat(timespec="milliseconds")
+    return value.isoformat()
+
+
+class SessionStore(Protocol):
+    """The storage operations every front end is built on"""
+
+    def create_session(self, title: str, goal: Optional[str] = None,
+                       scheduled_duration: int = 30, user_id: Optional[str] = None) -> Dict: ...
+
+    def get_session(self, session_id, fields: Optional[Sequence[str]] = None, user_id=ANY_USER) -> Dict: ...
+
+    def list_sessions(self, skip: int = 0, limit: Optional[int] = None, user_id: Optional[str] = None,
+                      fields: Optional[Sequence[str]] = None) -> List[Dict]:
+        """Sessions, most recently created first"""
+
+    def start_session(self, session_id, user_id=ANY_USER) -> Dict: ...
+
+    def pause_session(self, session_id, reason: str, user_id=ANY_USER) -> Dict: ...
+
+    def resume_session(self, session_id, user_id=ANY_USER) -> Dict: ...
+
+    def complete_session(self, session_id, user_id=ANY_USER) -> Dict: ...
+
+    def list_interruptions(self, session_id, user_id=ANY_USER) -> List[Dict]:
+        """Interruptions of one session in the order they happened"""
+
+    def interruptions_for_sessions(self, session_ids) -> Dict[object, List[Dict]]:
+        """Interruptions of many sessions at once, keyed by session id"""
+
+    def session_history(self, user_id: Optional[str] = None) -> List[Dict]: ...
+
+    def close(self) -> None: ...
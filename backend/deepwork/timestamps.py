@@ -0,0 +1,247 @@
+"""
+Timestamp storage for the stdlib servers' schema.
+
+Two storage modes exist:
+
+- iso: TEXT columns holding local-time ISO-8601 strings (the original layout)
+- epoch_ms: INTEGER columns holding UTC milliseconds since the epoch
+
+The mode is read from the declared type of sessions.created_at, so a server
+keeps working on an old database until it is migrated. In epoch_ms mode
+values stay integers everywhere except the JSON edge, where encode() turns
+them into ISO-8601 strings with a UTC offset.
+
+Usage:
+    python -m deepwork.timestamps migrate --db deepwork.db
+    python -m deepwork.timestamps migrate --db deepwork.db --to iso
+"""
+
+import argparse
+import datetime
+import re
+import sqlite3
+import sys
+import time
+
+from .intervals import to_seconds
+from .schema import column_types, create_sql, index_sql, rebuild_transaction, table_columns
+
+ISO = "iso"
+EPOCH_MS = "epoch_ms"
+
+# Timestamp columns of the stdlib tables
+TIMESTAMP_COLUMNS = {
+    "sessions": ("created_at", "started_at", "paused_at", "completed_at"),
+    "interruptions": ("start_time", "end_time"),
+    "events": ("at",),
+}
+
+# Keys converted to ISO strings when rows are written as JSON
+JSON_TIMESTAMP_FIELDS = frozenset(
+    TIMESTAMP_COLUMNS["sessions"] + TIMESTAMP_COLUMNS["interruptions"] + ("completion_date",)
+)
+
+
+def iso_to_ms(value):
+    """ISO-8601 string (naive means local time) to UTC epoch milliseconds"""
+    if value is None or value == "":
+        return None
+    parsed = datetime.datetime.fromisoformat(value)
+    if parsed.tzinfo is None:
+        parsed = parsed.astimezone()
+    return int(round(parsed.timestamp() * 1000))
+
+
+def ms_to_iso(value):
+    """UTC epoch milliseconds to a naive local-time ISO-8601 string (the iso layout)"""
+    if value is None or value == "":
+        return None
+    return datetime.datetime.fromtimestamp(value / 1000).isoformat()
+
+
+def ms_to_json(value):
+    """UTC epoch milliseconds to an ISO-8601 string with a UTC offset"""
+    if value is None or value == "":
+        return value
+    return datetime.datetime.fromtimestamp(
+        value / 1000, datetime.timezone.utc
+    ).isoformat(timespec="milliseconds")
+
+
+def day_start_ms(day):
+    """Epoch milliseconds of local midnight at the start of a YYYY-MM-DD day"""
+    midnight = datetime.datetime.combine(datetime.date.fromisoformat(day), datetime.time())
+    return int(midnight.astimezone().timestamp() * 1000)
+
+
+class IsoTimestamps:
+    """Local-time ISO-8601 TEXT timestamps"""
+
+    mode = ISO
+
+    def now(self):
+        return datetime.datetime.now().isoformat()
+
+    def from_datetime(self, value):
+        return value.isoformat() if value is not None else None
+
+    def to_seconds(self, value):
+        return to_seconds(value)
+
+    def to_datetime(self, value):
+        return datetime.datetime.fromisoformat(value) if value else None
+
+    def day(self, value):
+        return value[:10]
+
+    def day_sql(self, column):
+        return f"date({column})"
+
+    def julianday_sql(self, column):
+        return f"julianday({column})"
+
+    def bound(self, day):
+        return day
+
+    def encode(self, row):
+        return row
+
+
+class EpochMsTimestamps:
+    """UTC epoch-millisecond INTEGER timestamps"""
+
+    mode = EPOCH_MS
+
+    def now(self):
+        return time.time_ns() // 1_000_000
+
+    def from_datetime(self, value):
+        if value is None:
+            return None
+        if value.tzinfo is None:
+            value = value.astimezone()
+        return int(round(value.timestamp() * 1000))
+
+    def to_seconds(self, value):
+        if value is None or value == "":
+            return None
+        return value / 1000
+
+    def to_datetime(self, value):
+        if value is None or value == "":
+            return None
+        return datetime.datetime.fromtimestamp(value / 1000, datetime.timezone.utc)
+
+    def day(self, value):
+        return datetime.date.fromtimestamp(value / 1000).isoformat()
+
+    def day_sql(self, column):
+        return f"date({column} / 1000, 'unixepoch', 'localtime')"
+
+    def julianday_sql(self, column):
+        return f"julianday({column} / 1000.0, 'unixepoch', 'localtime')"
+
+    def bound(self, day):
+        return day_start_ms(day)
+
+    def encode(self, row):
+        """Convert the timestamp fields of a row dict for JSON (in place)"""
+        for key in JSON_TIMESTAMP_FIELDS.intersection(row):
+            if isinstance(row[key], int):
+                row[key] = ms_to_json(row[key])
+        return row
+
+
+_CODECS = {ISO: IsoTimestamps(), EPOCH_MS: EpochMsTimestamps()}
+
+
+def detect_mode(conn):
+    """Storage mode of the stdlib schema in this database"""
+    types = column_types(conn, "sessions")
+    return EPOCH_MS if types.get("created_at") == "INTEGER" else ISO
+
+
+def for_connection(conn):
+    """Timestamp codec matching this database"""
+    return _CODECS[detect_mode(conn)]
+
+
+def for_mode(mode):
+    return _CODECS[mode]
+
+
+def encode_all(codec, rows):
+    """encode() every row of a list for JSON"""
+    for row in rows:
+        codec.encode(row)
+    return rows
+
+
+def migrate(conn, target=EPOCH_MS):
+    """
+    Rewrite the timestamp columns of sessions, interruptions and events in place.
+
+    Each table is rebuilt with the new column types in a single transaction
+    (create, copy with conversion, drop, rename, recreate indexes), following
+    SQLite's recommended procedure for changing column types. Returns False
+    if the database is already in the target mode.
+    """
+    if not table_columns(conn, "sessions"):
+        raise ValueError("Database has no sessions table")
+    if detect_mode(conn) == target:
+        return False
+
+    convert = iso_to_ms if target == EPOCH_MS else ms_to_iso
+    old_type, new_type = ("TEXT", "INTEGER") if target == EPOCH_MS else ("INTEGER", "TEXT")
+    conn.create_function("convert_timestamp", 1, convert, deterministic=True)
+
+    with rebuild_transaction(conn):
+        for table, ts_columns in TIMESTAMP_COLUMNS.items():
+            if not table_columns(conn, table):
+                # Databases from before the event log
+                continue
+            indexes = index_sql(conn, table)
+            columns = [row[1] for row in conn.execute(f"PRAGMA table_info({table})")]
+
+            new_sql = create_sql(conn, table, f"{table}_migrating")
+            for column in ts_columns:
+                new_sql = re.sub(
+                    rf"(\b{column}\s+){old_type}\b", rf"\g<1>{new_type}", new_sql, flags=re.IGNORECASE
+                )
+
+            select = ", ".join(
+                f"convert_timestamp({c})" if c in ts_columns else c for c in columns
+            )
+            conn.execute(new_sql)
+            conn.execute(
+                f"INSERT INTO {table}_migrating ({', '.join(columns)}) SELECT {select} FROM {table}"
+            )
+            conn.execute(f"DROP TABLE {table}")
+            conn.execute(f"ALTER TABLE {table}_migrating RENAME TO {table}")
+            for sql in indexes:
+                conn.execute(sql)
+    return True
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Migrate stdlib timestamp storage")
+    parser.add_argument("command", choices=["migrate", "mode"])
+    parser.add_argument("--db", default="deepwork.db", help="SQLite database file")
+    parser.add_argument("--to", dest="target", choices=[EPOCH_MS, ISO], default=EPOCH_MS)
+    args = parser.parse_args(argv)
+
+    conn = sqlite3.connect(args.db)
+    try:
+        if args.command == "mode":
+            print(detect_mode(conn))
+        elif migrate(conn, args.target):
+            print(f"Migrated {args.db} to {args.target}")
+        else:
+            print(f"{args.db} already uses {args.target}")
+        return 0
+    finally:
+        conn.close()
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,361 @@
+"""
+Lightweight request tracing with nested spans.
+
+A sampled request gets a root span; code below it opens child spans with
+span() or @traced, and measured operations (SQL statements) are added with
+record_span(). The current span lives in a context variable, so spans nest
+across worker threads and coroutines. When a request is not sampled every
+call is a single context variable lookup, cheap enough to leave in place
+and sample 1% of production traffic.
+
+Trace ids come from an incoming W3C traceparent header when there is one
+(a sampled parent forces sampling). Finished traces go to an in-memory ring
+buffer, served at /debug/traces, and optionally to a file of OTLP/JSON
+ExportTraceServiceRequest lines, one per trace, which an OpenTelemetry
+collector can ingest.
+
+Configured with environment variables when starting a server:
+    DEEPWORK_TRACE_SAMPLE=0.01          (fraction of requests traced)
+    DEEPWORK_TRACE_FILE=traces.jsonl    (OTLP/JSON export; off when unset)
+    DEEPWORK_TRACE_BUFFER=100           (traces kept for /debug/traces)
+"""
+
+import collections
+import contextvars
+import functools
+import json
+import os
+import random
+import re
+import threading
+import time
+
+DEFAULT_SAMPLE_RATE = 0.01
+DEFAULT_BUFFER_SIZE = 100
+
+# OTLP span kinds
+INTERNAL, SERVER, CLIENT = 1, 2, 3
+
+_TRACEPARENT = re.compile(r"^[0-9a-f]{2}-([0-9a-f]{32})-([0-9a-f]{16})-([0-9a-f]{2})$")
+
+# Innermost open span of the sampled request handled in this context
+_current = contextvars.ContextVar("span", default=None)
+
+
+class Trace:
+    """The spans of one request; exported when its root span ends"""
+
+    __slots__ = ("trace_id", "spans", "lock")
+
+    def __init__(self, trace_id):
+        self.trace_id = trace_id
+        self.spans = []
+        self.lock = threading.Lock()
+
+
+class Span:
+    __slots__ = ("trace", "span_id", "parent_id", "name", "kind", "start_ns", "end_ns", "attributes", "error")
+
+    def __init__(self, trace, parent_id, name, kind=INTERNAL, start_ns=None, attributes=None):
+        self.trace = trace
+        self.span_id = random.getrandbits(64).to_bytes(8, "big").hex()
+        self.parent_id = parent_id
+        self.name = name
+        self.kind = kind
+        self.start_ns = time.time_ns() if start_ns is None else start_ns
+        self.end_ns = None
+        self.attributes = attributes or {}
+        self.error = None
+
+    def set_attribute(self, key, value):
+        self.attributes[key] = value
+
+    def end(self, end_ns=None):
+        self.end_ns = time.time_ns() if end_ns is None else end_ns
+        with self.trace.lock:
+            self.trace.spans.append(self)
+
+
+class _NoopSpan:
+    """Stands in for a span when the request is not sampled"""
+
+    def set_attribute(self, key, value):
+        pass
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        return False
+
+
+_NOOP = _NoopSpan()
+
+
+class _SpanContext:
+    __slots__ = ("span", "token")
+
+    def __init__(self, span):
+        self.span = span
+
+    def __enter__(self):
+        self.token = _current.set(self.span)
+        return self.span
+
+    def __exit__(self, exc_type, exc, traceback):
+        if exc is not None:
+            self.span.error = f"{exc_type.__name__}: {exc}"
+        _current.reset(self.token)
+        self.span.end()
+        return False
+
+
+def span(name, kind=INTERNAL, **attributes):
+    """Context manager for a child of the current span (a no-op when not sampled)"""
+    parent = _current.get()
+    if parent is None:
+        return _NOOP
+    return _SpanContext(Span(parent.trace, parent.span_id, name, kind, attributes=attributes))
+
+
+def traced(name=None):
+    """Decorator running the function in a span named name (its qualified name by default)"""
+    def decorate(fn):
+        span_name = name or f"{fn.__module__}.{fn.__qualname__}"
+
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            if _current.get() is None:
+                return fn(*args, **kwargs)
+            with span(span_name):
+                return fn(*args, **kwargs)
+        return wrapper
+    return decorate
+
+
+def record_span(name, seconds, kind=INTERNAL, end_ns=None, **attributes):
+    """Add an already-measured operation that ended now (or at end_ns) as a child span"""
+    parent = _current.get()
+    if parent is None:
+        return
+    end_ns = time.time_ns() if end_ns is None else end_ns
+    child = Span(parent.trace, parent.span_id, name, kind, end_ns - int(seconds * 1e9), attributes)
+    child.end(end_ns)
+
+
+def record_statement(statement, seconds):
+    """SQL statement span, named by its first keyword"""
+    if _current.get() is None:
+        return
+    operation = statement.lstrip().split(None, 1)[0].upper() if statement.strip() else "SQL"
+    record_span(f"db {operation}", seconds, CLIENT, **{"db.system": "sqlite", "db.statement": statement})
+
+
+def current_trace_id():
+    """Trace id of the sampled request handled in this context, or None"""
+    current = _current.get()
+    return current.trace.trace_id if current is not None else None
+
+
+class RingBuffer:
+    """The most recent traces, for /debug/traces"""
+
+    def __init__(self, capacity=DEFAULT_BUFFER_SIZE):
+        self._traces = collections.deque(maxlen=capacity)
+
+    def export(self, trace):
+        self._traces.append(trace)
+
+    def view(self):
+        """Newest traces first, each with its spans as offsets from the root span"""
+        views = []
+        for trace in reversed(list(self._traces)):
+            with trace.lock:
+                spans = sorted(trace.spans, key=lambda s: s.start_ns)
+            started = spans[0].start_ns if spans else 0
+            root = next((s for s in spans if s.kind == SERVER), spans[0] if spans else None)
+            views.append({
+                "trace_id": trace.trace_id,
+                "name": root.name if root else None,
+                "duration_ms": (root.end_ns - root.start_ns) / 1e6 if root else None,
+                "spans": [
+                    {
+                        "span_id": s.span_id,
+                        "parent_id": s.parent_id,
+                        "name": s.name,
+                        "start_ms": round((s.start_ns - started) / 1e6, 3),
+                        "duration_ms": round((s.end_ns - s.start_ns) / 1e6, 3),
+                        "attributes": s.attributes,
+                        "error": s.error,
+                    }
+                    for s in spans
+                ],
+            })
+        return {"traces": views}
+
+
+def _otlp_value(value):
+    if isinstance(value, bool):
+        return {"boolValue": value}
+    if isinstance(value, int):
+        return {"intValue": str(value)}
+    if isinstance(value, float):
+        return {"doubleValue": value}
+    return {"stringValue": str(value)}
+
+
+def _otlp_attributes(attributes):
+    return [{"key": key, "value": _otlp_value(value)} for key, value in attributes.items()]
+
+
+def otlp_request(trace, service_name):
+    """The trace as an OTLP/JSON ExportTraceServiceRequest"""
+    with trace.lock:
+        spans = list(trace.spans)
+    return {"resourceSpans": [{
+        "resource": {"attributes": _otlp_attributes({"service.name": service_name})},
+        "scopeSpans": [{
+            "scope": {"name": "deepwork.tracing"},
+            "spans": [
+                {
+                    "traceId": trace.trace_id,
+                    "spanId": s.span_id,
+                    **({"parentSpanId": s.parent_id} if s.parent_id else {}),
+                    "name": s.name,
+                    "kind": s.kind,
+                    "startTimeUnixNano": str(s.start_ns),
+                    "endTimeUnixNano": str(s.end_ns),
+                    "attributes": _otlp_attributes(s.attributes),
+                    "status": {"code": 2, "message": s.error} if s.error else {},
+                }
+                for s in spans
+            ],
+        }],
+    }]}
+
+
+class OTLPFileExporter:
+    """Appends each trace to a file as one OTLP/JSON line"""
+
+    def __init__(self, path, service_name="deepwork"):
+        self.path = path
+        self.service_name = service_name
+        self._lock = threading.Lock()
+
+    def export(self, trace):
+        line = json.dumps(otlp_request(trace, self.service_name), default=str)
+        with self._lock:
+            with open(self.path, "a") as f:
+                f.write(line + "\n")
+
+
+class Tracer:
+    """Samples requests and hands their finished traces to the exporters"""
+
+    def __init__(self, sample_rate=DEFAULT_SAMPLE_RATE, buffer_size=DEFAULT_BUFFER_SIZE, exporters=(),
+                 service_name="deepwork"):
+        self.sample_rate = sample_rate
+        self.buffer = RingBuffer(buffer_size)
+        self.exporters = [self.buffer, *exporters]
+        self.service_name = service_name
+
+    @classmethod
+    def from_environ(cls, environ=os.environ, service_name="deepwork"):
+        exporters = []
+        if environ.get("DEEPWORK_TRACE_FILE"):
+            exporters.append(OTLPFileExporter(environ["DEEPWORK_TRACE_FILE"], service_name))
+        return cls(
+            float(environ.get("DEEPWORK_TRACE_SAMPLE", DEFAULT_SAMPLE_RATE)),
+            int(environ.get("DEEPWORK_TRACE_BUFFER", DEFAULT_BUFFER_SIZE)),
+            exporters, service_name,
+        )
+
+    def start_request(self, name, traceparent=None, **attributes):
+        """
+        Root span for a request, or None when it is not sampled; pass the
+        result to finish_request().
+        """
+        match = _TRACEPARENT.match(traceparent.strip().lower()) if traceparent else None
+        if match:
+            trace_id, parent_id, flags = match.groups()
+            if not int(flags, 16) & 1 and random.random() >= self.sample_rate:
+                return None
+        elif random.random() < self.sample_rate:
+            trace_id, parent_id = random.getrandbits(128).to_bytes(16, "big").hex(), None
+        else:
+            return None
+        root = Span(Trace(trace_id), parent_id, name, SERVER, attributes=attributes)
+        return root, _current.set(root)
+
+    def finish_request(self, started, name=None, **attributes):
+        """End the root span and export its trace"""
+        root, token = started
+        _current.reset(token)
+        if name:
+            root.name = name
+        root.attributes.update(attributes)
+        root.end()
+        for exporter in self.exporters:
+            try:
+                exporter.export(root.trace)
+            except Exception as e:
+                print(f"Trace export failed: {e}")
+
+
+def traceparent(trace_id, span_id):
+    """W3C traceparent header value for a sampled span"""
+    return f"00-{trace_id}-{span_id}-01"
+
+
+def instrument_handler(handler_class, tracer, routes):
+    """
+    Subclass of an http.server handler that traces sampled requests, returns
+    their X-Trace-Id and serves the ring buffer at GET /debug/traces.
+    """
+    from .metrics import route_matcher
+
+    match = route_matcher(routes)
+
+    class TracedHandler(handler_class):
+        def end_headers(self):
+            trace_id = current_trace_id()
+            if trace_id is not None:
+                self.send_header("X-Trace-Id", trace_id)
+            super().end_headers()
+
+        def send_response(self, code, message=None):
+            self._trace_status = code
+            super().send_response(code, message)
+
+        def _send_traces(self):
+            body = json.dumps(tracer.buffer.view(), default=str).encode()
+            self.send_response(200)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+    def traced_method(method, handle):
+        def do_method(self):
+            path = self.path.split("?", 1)[0]
+            if method == "GET" and path == "/debug/traces":
+                return self._send_traces()
+            started = tracer.start_request(
+                f"{method} {match(path)}", self.headers.get("traceparent"),
+                **{"http.method": method, "http.target": self.path},
+            )
+            if started is None:
+                return handle(self)
+            self._trace_status = 500
+            try:
+                handle(self)
+            finally:
+                tracer.finish_request(started, **{"http.status_code": self._trace_status})
+        do_method.__name__ = handle.__name__
+        return do_method
+
+    for name in dir(handler_class):
+        if name.startswith("do_"):
+            setattr(TracedHandler, name, traced_method(name[3:], getattr(handler_class, name)))
+    TracedHandler.__name__ = TracedHandler.__qualname__ = handler_class.__name__
+    return TracedHandler
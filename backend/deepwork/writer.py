@@ -0,0 +1,207 @@
+"""
+Single-writer queue for session stores.
+
+SQLite lets one connection write at a time. When several threads commit
+through their own connections they queue on the file lock, fail with
+"database is locked" once the busy timeout runs out, and the survivors see
+latency spikes. A SingleWriter applies every write on one dedicated thread
+instead: callers put a command on a queue and wait on a Future for its
+result, commands run in the order they arrived, and reads stay on the
+callers' own connections (in WAL mode they never wait for the writer).
+
+Commands run in a copy of the caller's context, so the writer's SQL is
+counted, traced and profiled as part of the request that submitted it.
+
+Group commit (opt-in) goes further: the writer takes every command that
+arrives within a short window, up to a number of commands, and applies them
+in one transaction through the store's group_commit(), so the group pays for
+one commit and fsync instead of one each. Every caller's Future resolves
+only once that shared commit is durable. A window of 0 groups only what is
+already queued, which adds no latency when writes are sparse. Stores without
+group_commit() (the SQLAlchemy store) commit each command on its own.
+
+There is one writer per process; separate processes on the same file still
+meet at SQLite's lock (with its busy timeout). Enable it when starting a
+server:
+    DEEPWORK_SINGLE_WRITER=1
+    DEEPWORK_GROUP_COMMIT_MS=2      (group commit window; implies the writer)
+    DEEPWORK_GROUP_COMMIT_OPS=64    (most commands per group)
+"""
+
+import concurrent.futures
+import contextvars
+import os
+import queue
+import threading
+import time
+
+from .store import ANY_USER
+
+DEFAULT_GROUP_SIZE = 64
+
+class WriterClosed(RuntimeError):
+    """A command was submitted after the writer was closed"""
+
+
+class SingleWriter:
+    """
+    Runs store writes on one thread. open_store is called on that thread
+    and the store it returns is used for every command, then closed.
+
+    With group_window (seconds) set, commands arriving within the window,
+    up to group_size of them, are committed together.
+    """
+
+    def __init__(self, open_store, max_pending=0, name="session-writer",
+                 group_window=None, group_size=DEFAULT_GROUP_SIZE):
+        self._queue = queue.Queue(max_pending)
+        self._closed = False
+        self._lock = threading.Lock()
+        self.group_window = group_window
+        self.group_size = group_size
+        ready = concurrent.futures.Future()
+        self._thread = threading.Thread(target=self._run, args=(open_store, ready), name=name, daemon=True)
+        self._thread.start()
+        # Surface errors opening the store here rather than on the first write
+        ready.result()
+
+    @classmethod
+    def from_environ(cls, open_store, environ=os.environ):
+        """A writer when DEEPWORK_SINGLE_WRITER=1 or group commit is configured, else None"""
+        window = environ.get("DEEPWORK_GROUP_COMMIT_MS")
+        if environ.get("DEEPWORK_SINGLE_WRITER") != "1" and not window:
+            return None
+        return cls(
+            open_store,
+            group_window=float(window) / 1000 if window else None,
+            group_size=int(environ.get("DEEPWORK_GROUP_COMMIT_OPS", DEFAULT_GROUP_SIZE)),
+        )
+
+    def submit(self, method, *args):
+        """Queue store.method(*args); the Future resolves once it has committed"""
+        future = concurrent.futures.Future()
+        with self._lock:
+            if self._closed:
+                raise WriterClosed("The session writer is closed")
+            self._queue.put((method, args, future, contextvars.copy_context()))
+        return future
+
+    def call(self, method, *args):
+        """Run store.method(*args) on the writer and wait for its result"""
+        return self.submit(method, *args).result()
+
+    def _run(self, open_store, ready):
+        try:
+            store = open_store()
+        except BaseException as e:
+            ready.set_exception(e)
+            return
+        ready.set_result(None)
+        grouped = self.group_window is not None and hasattr(store, "group_commit")
+        try:
+            while True:
+                item = self._queue.get()
+                if item is None:
+                    return
+                if not grouped:
+                    self._apply(store, item)
+                    continue
+                group, stopping = self._gather(item)
+                self._apply_group(store, group)
+                if stopping:
+                    return
+        finally:
+            store.close()
+
+    @staticmethod
+    def _apply(store, item):
+        method, args, future, context = item
+        if not future.set_running_or_notify_cancel():
+            return
+        try:
+            result = context.run(getattr(store, method), *args)
+        except BaseException as e:
+            future.set_exception(e)
+        else:
+            future.set_result(result)
+
+    def _gather(self, first):
+        """The commands of one group (first plus those arriving within the window) and whether to stop"""
+        group = [first]
+        deadline = time.monotonic() + self.group_window
+        while len(group) < self.group_size:
+            try:
+                remaining = deadline - time.monotonic()
+                item = self._queue.get(timeout=remaining) if remaining > 0 else self._queue.get_nowait()
+            except queue.Empty:
+                break
+            if item is None:
+                return group, True
+            group.append(item)
+        return group, False
+
+    @staticmethod
+    def _apply_group(store, group):
+        """Apply a group in one transaction; futures resolve after its commit"""
+        group = [item for item in group if item[2].set_running_or_notify_cancel()]
+        outcomes = []
+        try:
+            with store.group_commit():
+                for method, args, future, context in group:
+                    try:
+                        outcomes.append((future, context.run(getattr(store, method), *args), None))
+                    except Exception as e:
+                        # Undone on its own (a savepoint); the others still commit
+                        outcomes.append((future, None, e))
+        except BaseException as e:
+            # The shared transaction failed, so nothing in the group is durable
+            for _, _, future, _ in group:
+                future.set_exception(e)
+            return
+        for future, result, error in outcomes:
+            if error is not None:
+                future.set_exception(error)
+            else:
+                future.set_result(result)
+
+    def close(self):
+        """Apply the commands already queued, then stop the thread and close its store"""
+        with self._lock:
+            if self._closed:
+                return
+            self._closed = True
+            self._queue.put(None)
+        self._thread.join()
+
+
+class WriterStore:
+    """
+    SessionStore whose writes go through a SingleWriter while every read is
+    served by reads (a store with its own connection).
+    """
+
+    def __init__(self, reads, writer):
+        self.reads = reads
+        self.writer = writer
+
+    def __getattr__(self, name):
+        return getattr(self.reads, name)
+
+    def create_session(self, title, goal=None, scheduled_duration=30, user_id=None):
+        return self.writer.call("create_session", title, goal, scheduled_duration, user_id)
+
+    def start_session(self, session_id, user_id=ANY_USER):
+        return self.writer.call("start_session", session_id, user_id)
+
+    def pause_session(self, session_id, reason, user_id=ANY_USER):
+        return self.writer.call("pause_session", session_id, reason, user_id)
+
+    def resume_session(self, session_id, user_id=ANY_USER):
+        return self.writer.call("resume_session", session_id, user_id)
+
+    def complete_session(self, session_id, user_id=ANY_USER):
+        return self.writer.call("complete_session", session_id, user_id)
+
+    def close(self):
+        self.writer.close()
+        self.reads.close()
@@ -0,0 +1,17 @@
+import os
+import sys
+
+# Tests import the shared engine (deepwork) and the FastAPI package (app)
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+
+# Options of the crud microbenchmarks (tests/perf). Registered here rather
+# than in tests/perf/conftest.py: pytest only takes options from conftests
+# it loads at startup, and that one it loads only for runs started inside
+# tests/perf, so `pytest backend/tests --crud-bench` rejected them.
+def pytest_addoption(parser):
+    group = parser.getgroup("crud-bench", "crud microbenchmarks")
+    group.addoption("--crud-bench", action="store_true", help="Run the crud microbenchmarks")
+    group.addoption("--crud-bench-json", metavar="PATH", help="Save benchmark results as JSON")
+    group.addoption("--crud-bench-sizes", default="1000,20000", metavar="N,N",
+                    help="Database sizes in sessions (default 1000,20000)")
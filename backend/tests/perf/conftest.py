@@ -0,0 +1,176 @@
+"""
+Fixtures for the crud microbenchmarks.
+
+The ``benchmark`` fixture follows pytest-benchmark's interface
+(``benchmark(fn, *args)`` and ``benchmark.pedantic(fn, setup=..., rounds=...)``)
+and its JSON layout, so results can be compared with bench/compare.py.
+Benchmarks are skipped unless --crud-bench is given:
+
+    python -m pytest backend/tests/perf --crud-bench --crud-bench-json results.json
+    python -m pytest backend/tests/perf --crud-bench --crud-bench-sizes 1000,100000
+"""
+
+import datetime
+import json
+import os
+import platform
+import statistics
+import sys
+import time
+
+import pytest
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import StaticPool
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', '..', '..', 'bench'))
+import datagen
+from app.models.models import Base
+
+# The --crud-bench options themselves are registered in tests/conftest.py
+DEFAULT_SIZES = "1000,20000"
+STORAGES = ("file", "memory")
+
+# Auto-calibrated runs: at least MIN_ROUNDS, stopping after MAX_TIME seconds
+MIN_ROUNDS = 5
+MAX_ROUNDS = 1000
+MAX_TIME = 0.5
+
+
+def pytest_generate_tests(metafunc):
+    if "crud_db" in metafunc.fixturenames:
+        sizes = [int(n) for n in metafunc.config.getoption("--crud-bench-sizes", DEFAULT_SIZES).split(",")]
+        metafunc.parametrize(
+            "crud_db", [(storage, size) for storage in STORAGES for size in sizes],
+            ids=[f"{storage}-{size}" for storage in STORAGES for size in sizes],
+            indirect=True,
+        )
+
+
+def pytest_collection_modifyitems(config, items):
+    if config.getoption("--crud-bench", False):
+        return
+    skip = pytest.mark.skip(reason="crud microbenchmarks run with --crud-bench")
+    for item in items:
+        if "benchmark" in getattr(item, "fixturenames", ()):
+            item.add_marker(skip)
+
+
+class BenchmarkFixture:
+    def __init__(self, name, group, params):
+        self.name = name
+        self.group = group
+        self.params = params
+        self.times = []
+
+    def __call__(self, fn, *args, **kwargs):
+        """Call fn repeatedly, calibrating the number of rounds"""
+        fn(*args, **kwargs)  # warm-up
+        started = time.perf_counter()
+        result = None
+        while len(self.times) < MAX_ROUNDS and (
+            len(self.times) < MIN_ROUNDS or time.perf_counter() - started < MAX_TIME
+        ):
+            result = self._timed(fn, args, kwargs)
+        return result
+
+    def pedantic(self, fn, setup=None, rounds=MIN_ROUNDS):
+        """Call fn `rounds` times, each with fresh (args, kwargs) from setup()"""
+        result = None
+        for _ in range(rounds):
+            args, kwargs = setup() if setup else ((), {})
+            result = self._timed(fn, args, kwargs)
+        return result
+
+    def _timed(self, fn, args, kwargs):
+        started = time.perf_counter()
+        result = fn(*args, **kwargs)
+        self.times.append(time.perf_counter() - started)
+        return result
+
+    def as_dict(self):
+        times = self.times
+        mean = statistics.fmean(times)
+        return {
+            "name": self.name,
+            "group": self.group,
+            "params": self.params,
+            "stats": {
+                "min": min(times),
+                "max": max(times),
+                "mean": mean,
+                "median": statistics.median(times),
+                "stddev": statistics.stdev(times) if len(times) > 1 else 0.0,
+                "rounds": len(times),
+                "ops": 1 / mean if mean else 0.0,
+            },
+        }
+
+
+_RESULTS = []
+
+
+@pytest.fixture
+def benchmark(request):
+    params = {}
+    if hasattr(request.node, "callspec"):
+        params = {key: str(value) for key, value in request.node.callspec.params.items()}
+    fixture = BenchmarkFixture(request.node.name, request.node.originalname, params)
+    yield fixture
+    if fixture.times:
+        _RESULTS.append(fixture.as_dict())
+
+
+_DATABASES = {}
+
+
+@pytest.fixture
+def crud_db(request, tmp_path_factory):
+    """A SQLAlchemy session on a populated database, shared per (storage, size)"""
+    storage, size = request.param
+    key = (storage, size)
+    if key not in _DATABASES:
+        if storage == "file":
+            path = tmp_path_factory.mktemp("crud_bench") / f"{size}.db"
+            engine = create_engine(f"sqlite:///{path}", connect_args={"check_same_thread": False})
+        else:
+            # One shared connection, or every checkout would see a new empty database
+            engine = create_engine("sqlite://", connect_args={"check_same_thread": False},
+                                   poolclass=StaticPool)
+        Base.metadata.create_all(bind=engine)
+        raw = engine.raw_connection()
+        datagen.write_orm(raw.driver_connection, datagen.generate(size, seed=size))
+        raw.close()
+        _DATABASES[key] = engine
+    db = sessionmaker(autocommit=False, autoflush=False, bind=_DATABASES[key])()
+    yield db
+    db.close()
+
+
+def pytest_terminal_summary(terminalreporter, config):
+    if not _RESULTS:
+        return
+    terminalreporter.section("crud benchmarks")
+    terminalreporter.write_line(f"{'name':<60}{'median ms':>12}{'mean ms':>12}{'rounds':>8}")
+    for result in sorted(_RESULTS, key=lambda r: r["name"]):
+        stats = result["stats"]
+        terminalreporter.write_line(
+            f"{result['name']:<60}{stats['median'] * 1000:>12.3f}{stats['mean'] * 1000:>12.3f}{stats['rounds']:>8}"
+        )
+
+
+def pytest_sessionfinish(session, exitstatus):
+    path = session.config.getoption("--crud-bench-json", None)
+    if not path or not _RESULTS:
+        return
+    report = {
+        "machine_info": {
+            "python_version": platform.python_version(),
+            "platform": platform.platform(),
+            "processor": platform.processor(),
+        },
+        "datetime": datetime.datetime.now(datetime.timezone.utc).isoformat(),
+        "benchmarks": sorted(_RESULTS, key=lambda r: r["name"]),
+    }
+    with open(path, "w") as f:
+        json.dump(report, f, indent=2)
@@ -0,0 +1,105 @@
+"""
+Microbenchmarks for every crud function, per database size and storage.
+
+Run with --crud-bench (see conftest.py); compare saved results with
+    python bench/compare.py old.json new.json --threshold 0.1
+"""
+
+from app import crud, schemas
+
+# Rounds for the benchmarks that need a fresh session per call
+TRANSITION_ROUNDS = 50
+
+
+def _new_session(db, *transitions):
+    session = crud.create_session(db, schemas.SessionCreate(title="Benchmark", scheduled_duration=30))
+    for transition in transitions:
+        if transition == "pause":
+            crud.pause_session(db, session["id"], schemas.InterruptionCreate(reason="Benchmark"))
+        else:
+            getattr(crud, f"{transition}_session")(db, session["id"])
+    return session["id"]
+
+
+def test_create_session(benchmark, crud_db):
+    data = schemas.SessionCreate(title="Benchmark", goal="Measure", scheduled_duration=30)
+    session = benchmark(crud.create_session, crud_db, data)
+    assert session["status"] == "scheduled"
+
+
+def test_get_session(benchmark, crud_db):
+    session_id = _new_session(crud_db, "start", "pause")
+    session = benchmark(crud.get_session, crud_db, session_id, None, "interruptions")
+    assert len(session["interruptions"]) == 1
+
+
+def test_start_session(benchmark, crud_db):
+    session = benchmark.pedantic(
+        crud.start_session,
+        setup=lambda: ((crud_db, _new_session(crud_db)), {}),
+        rounds=TRANSITION_ROUNDS,
+    )
+    assert session["status"] == "active"
+
+
+def test_pause_session(benchmark, crud_db):
+    reason = schemas.InterruptionCreate(reason="Benchmark")
+    session = benchmark.pedantic(
+        crud.pause_session,
+        setup=lambda: ((crud_db, _new_session(crud_db, "start"), reason), {}),
+        rounds=TRANSITION_ROUNDS,
+    )
+    assert session["status"] == "paused"
+
+
+def test_resume_session(benchmark, crud_db):
+    session = benchmark.pedantic(
+        crud.resume_session,
+        setup=lambda: ((crud_db, _new_session(crud_db, "start", "pause")), {}),
+        rounds=TRANSITION_ROUNDS,
+    )
+    assert session["status"] == "active"
+
+
+def test_complete_session(benchmark, crud_db):
+    session = benchmark.pedantic(
+        crud.complete_session,
+        setup=lambda: ((crud_db, _new_session(crud_db, "start")), {}),
+        rounds=TRANSITION_ROUNDS,
+    )
+    assert session["status"] == "completed"
+
+
+def test_get_sessions(benchmark, crud_db):
+    sessions = benchmark(crud.get_sessions, crud_db, 0, 100)
+    assert len(sessions) == 100
+
+
+def test_get_sessions_projected(benchmark, crud_db):
+    sessions = benchmark(crud.get_sessions, crud_db, 0, 100, "status,title")
+    assert set(sessions[0]) == {"id", "status", "title"}
+
+
+def test_get_sessions_with_interruptions(benchmark, crud_db):
+    sessions = benchmark(crud.get_sessions, crud_db, 0, 100, None, "interruptions")
+    assert all("interruptions" in session for session in sessions)
+
+
+def test_get_session_history(benchmark, crud_db):
+    history = benchmark(crud.get_session_history, crud_db)
+    assert history
+
+
+def test_get_session_interruptions(benchmark, crud_db):
+    session_id = _new_session(crud_db, "start", "pause", "resume", "pause")
+    interruptions = benchmark(crud.get_session_interruptions, crud_db, session_id)
+    assert len(interruptions) == 2
+
+
+def test_get_daily_focus(benchmark, crud_db):
+    benchmark(crud.get_daily_focus, [crud_db], 366)
+
+
+def test_get_session_distributions(benchmark, crud_db):
+    distributions = benchmark(crud.get_session_distributions, [crud_db])
+    assert distributions["session_count"] > 0
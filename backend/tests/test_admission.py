@@ -0,0 +1,139 @@
+import http.server
+import json
+import threading
+import time
+import urllib.error
+import urllib.request
+
+import pytest
+
+from deepwork import admission, metrics
+from deepwork.admission import AdmissionController
+
+
+def _waiter(controller, lane, results):
+    thread = threading.Thread(target=lambda: results.append((lane, controller.acquire(lane))))
+    thread.start()
+    return thread
+
+
+def _wait_for_queue(controller, lane, depth):
+    while len(controller._queues[lane]) < depth:
+        time.sleep(0.001)
+
+
+def test_freed_slots_go_to_transitions_first():
+    controller = AdmissionController(1, queue_depth=2, max_wait=5)
+    assert controller.acquire("read")
+    results = []
+    report = _waiter(controller, "report", results)
+    _wait_for_queue(controller, "report", 1)
+    transition = _waiter(controller, "transition", results)
+    _wait_for_queue(controller, "transition", 1)
+
+    controller.release("read")
+    transition.join()
+    assert results == [("transition", True)]
+    controller.release("transition")
+    report.join()
+    assert results[1] == ("report", True)
+    controller.release("report")
+    assert controller.in_flight == 0
+
+
+def test_each_side_keeps_its_reserved_slot():
+    controller = AdmissionController(3, queue_depth=0)
+    assert controller.acquire("report") and controller.acquire("read")
+    assert not controller.acquire("read")
+    assert controller.acquire("transition")
+    controller.release("report")
+    controller.release("read")
+    assert controller.acquire("transition")
+    assert not controller.acquire("transition")
+    assert controller.acquire("read")
+    assert controller.in_flight == 3
+
+
+def test_reads_use_their_reserved_slot_while_transitions_queue():
+    controller = AdmissionController(4, queue_depth=2, max_wait=5, reserved=1)
+    assert all(controller.acquire("transition") for _ in range(3))
+    results = []
+    transition = _waiter(controller, "transition", results)
+    _wait_for_queue(controller, "transition", 1)
+
+    # The queued transition cannot take the slot kept for reads, so it does
+    # not hold back a read that can
+    assert controller.acquire("read")
+    controller.release("read")
+    assert results == []
+    controller.release("transition")
+    transition.join()
+    assert results == [("transition", True)]
+
+
+def test_release_hands_out_every_slot_it_can():
+    controller = AdmissionController(2, queue_depth=2, max_wait=5, reserved=0)
+    # Waiters left queued while slots were free
+    tickets = [admission._Ticket() for _ in range(2)]
+    controller._queues["read"].extend(tickets)
+    assert controller.acquire("transition")
+    controller.release("transition")
+    assert all(ticket.granted for ticket in tickets)
+    assert controller.in_flight == 2 and not controller._queues["read"]
+
+
+def test_full_queue_and_timeout_are_rejected():
+    controller = AdmissionController(1, queue_depth=1, max_wait=0.05)
+    assert controller.acquire("transition")
+    results = []
+    waiter = _waiter(controller, "read", results)
+    _wait_for_queue(controller, "read", 1)
+    assert not controller.acquire("read")
+    waiter.join()
+    assert results == [("read", False)]
+    assert controller._rejected["read", admission.QUEUE_FULL] == 1
+    assert controller._rejected["read", admission.TIMED_OUT] == 1
+
+    registry = metrics.Metrics()
+    registry.register(controller)
+    text = registry.render()
+    assert 'deepwork_admission_rejected_total{lane="read",reason="queue_full"} 1' in text
+    assert 'deepwork_admission_queue_depth{lane="read"} 0' in text
+    assert "deepwork_admission_slots_in_use 1" in text
+
+
+def test_rejected_requests_get_503_with_retry_after():
+    controller = AdmissionController(1, queue_depth=0, retry_after=2)
+    entered, finish = threading.Event(), threading.Event()
+
+    class Handler(http.server.BaseHTTPRequestHandler):
+        def do_GET(self):
+            entered.set()
+            finish.wait(5)
+            self.send_response(200)
+            self.end_headers()
+
+        def log_message(self, *args):
+            pass
+
+    server = admission.ThreadingServer(
+        ("127.0.0.1", 0), admission.instrument_handler(Handler, controller, metrics.SESSION_ROUTES)
+    )
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    url = f"http://127.0.0.1:{server.server_address[1]}"
+    try:
+        slow = threading.Thread(target=lambda: urllib.request.urlopen(url + "/stats/distributions").read())
+        slow.start()
+        entered.wait(5)
+        with pytest.raises(urllib.error.HTTPError) as rejected:
+            urllib.request.urlopen(url + "/sessions/")
+        assert rejected.value.code == 503
+        assert rejected.value.headers["Retry-After"] == "2"
+        assert json.loads(rejected.value.read()) == {"error": "Server busy, retry later"}
+        finish.set()
+        slow.join()
+        assert controller._admitted == {"transition": 0, "read": 0, "report": 1}
+    finally:
+        finish.set()
+        server.shutdown()
+        server.server_close()
@@ -0,0 +1,60 @@
+import datetime
+import sqlite3
+
+import pytest
+
+from deepwork import analytics, archive, events
+from deepwork.sqlite_store import SQLiteSessionStore
+from deepwork.store import InvalidTransition
+
+
+def _sessions(store):
+    """Three finished sessions (the first paused once) and an active one with the latest pause"""
+    created = [store.create_session(f"Block {n}", None, 30)["id"] for n in range(4)]
+    for n, session_id in enumerate(created):
+        store.start_session(session_id)
+        if n in (0, 3):
+            store.pause_session(session_id, "Call")
+            store.resume_session(session_id)
+        if n < 3:
+            store.complete_session(session_id)
+    return created
+
+
+def _archive_everything_finished(path, archive_path):
+    conn = sqlite3.connect(path)
+    archive.attach(conn, archive_path)
+    tomorrow = datetime.datetime.now() + datetime.timedelta(days=1)
+    moved = archive.run(conn, days=0, batch_size=2, now=tomorrow)
+    return conn, moved
+
+
+def test_archived_sessions_are_still_read(tmp_path):
+    path, archive_path = str(tmp_path / "hot.db"), str(tmp_path / "cold.db")
+    created = _sessions(SQLiteSessionStore(path))
+    conn, moved = _archive_everything_finished(path, archive_path)
+    assert moved == 3
+    assert archive.table_sizes(conn)["main"]["sessions"] == 1
+
+    store = SQLiteSessionStore(path, archive_path=archive_path)
+    assert store.get_session(created[0])["status"] == "completed"
+    assert [i["reason"] for i in store.list_interruptions(created[0])] == ["Call"]
+    assert set(store.interruptions_for_sessions(created)) == {created[0], created[3]}
+    assert [s["id"] for s in store.list_sessions()] == created[::-1]
+    assert [s["id"] for s in store.list_sessions(0, 1)] == [created[3]]
+    assert {s["id"] for s in store.session_history()} == set(created[:3])
+    assert analytics.session_distributions(store._conn)["session_count"] == 4
+    with pytest.raises(InvalidTransition):
+        store.complete_session(created[1])
+
+    # Without the archive only the hot session is left
+    assert [s["id"] for s in SQLiteSessionStore(path).list_sessions()] == [created[3]]
+
+
+def test_rebuild_keeps_archived_sessions_out_of_the_hot_tables(tmp_path):
+    path = str(tmp_path / "hot.db")
+    _sessions(SQLiteSessionStore(path))
+    conn, _ = _archive_everything_finished(path, str(tmp_path / "cold.db"))
+    assert events.check(conn) == {"sessions": [], "interruptions": [], "daily_focus": []}
+    assert events.rebuild(conn)["sessions"] == 1
+    assert conn.execute("SELECT SUM(session_count) FROM daily_focus").fetchone() == (3,)
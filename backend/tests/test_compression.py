@@ -0,0 +1,133 @@
+import asyncio
+import gzip
+import http.server
+import json
+import threading
+import urllib.request
+import zlib
+
+from starlette.applications import Starlette
+from starlette.responses import JSONResponse
+from starlette.routing import Route
+from starlette.testclient import TestClient
+
+from app.compression import CompressionMiddleware
+from deepwork import compression, metrics
+from deepwork.compression import Compression
+
+BIG = [{"id": n, "title": f"Session {n}", "status": "completed"} for n in range(100)]
+
+
+def test_negotiation_follows_q_values_and_server_preference():
+    assert compression.accepted("gzip;q=0.5, br, *;q=0") == {"gzip": 0.5, "br": 1.0, "*": 0.0}
+    assert compression.negotiate("gzip, deflate") == "gzip"
+    assert compression.negotiate("deflate, identity") is None
+    assert compression.negotiate("gzip;q=0") is None
+    assert compression.negotiate("*") == next(iter(compression.ENCODINGS))
+    assert compression.negotiate("") is None
+
+    policy = Compression(min_size=100)
+    assert policy.encoding_for("gzip", "application/json", 100) == "gzip"
+    assert policy.encoding_for("gzip", "application/json", 99) is None
+    assert policy.encoding_for("gzip", "image/png", 10000) is None
+    assert Compression.from_environ({"DEEPWORK_COMPRESSION": "off"}) is None
+    assert Compression.from_environ({"DEEPWORK_COMPRESS_MIN_BYTES": "10"}).min_size == 10
+
+
+def test_stdlib_handler_compresses_large_bodies():
+    class Handler(http.server.BaseHTTPRequestHandler):
+        def do_GET(self):
+            body = json.dumps(BIG if self.path == "/sessions/" else {"id": 1}).encode()
+            self.send_response(200)
+            self.send_header("Content-Type", "application/json")
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, *args):
+            pass
+
+    registry = metrics.Metrics()
+    handler = compression.instrument_handler(Handler, Compression())
+    handler = metrics.instrument_handler(handler, metrics.SESSION_ROUTES, registry)
+    server = http.server.HTTPServer(("127.0.0.1", 0), handler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    url = f"http://127.0.0.1:{server.server_address[1]}"
+
+    def get(path, accept_encoding):
+        request = urllib.request.Request(url + path, headers={"Accept-Encoding": accept_encoding})
+        with urllib.request.urlopen(request) as response:
+            return response.headers, response.read()
+
+    try:
+        headers, body = get("/sessions/", "gzip")
+        assert headers["Content-Encoding"] == "gzip"
+        assert headers["Vary"] == "Accept-Encoding"
+        assert int(headers["Content-Length"]) == len(body)
+        assert json.loads(gzip.decompress(body)) == BIG
+
+        headers, body = get("/sessions/1", "gzip")
+        assert headers["Content-Encoding"] is None
+        assert int(headers["Content-Length"]) == len(body)
+        assert json.loads(body) == {"id": 1}
+
+        headers, body = get("/sessions/", "identity")
+        assert headers["Content-Encoding"] is None
+        assert json.loads(body) == BIG
+    finally:
+        server.shutdown()
+        server.server_close()
+
+    # Body sizes are recorded before compression
+    text = registry.render()
+    size = 2 * len(json.dumps(BIG))
+    assert f'deepwork_http_response_size_bytes_sum{{method="GET",route="/sessions/"}} {size}' in text
+
+
+def test_middleware_compresses_whole_bodies():
+    async def sessions(request):
+        return JSONResponse(BIG)
+
+    async def small(request):
+        return JSONResponse({"id": 1})
+
+    app = Starlette(routes=[Route("/sessions/", sessions), Route("/small", small)])
+    app.add_middleware(CompressionMiddleware, policy=Compression())
+    client = TestClient(app)
+
+    response = client.get("/sessions/", headers={"Accept-Encoding": "gzip"})
+    assert response.headers["content-encoding"] == "gzip"
+    assert response.headers["vary"] == "Accept-Encoding"
+    assert int(response.headers["content-length"]) < len(json.dumps(BIG))
+    assert response.json() == BIG
+
+    response = client.get("/small", headers={"Accept-Encoding": "gzip"})
+    assert "content-encoding" not in response.headers
+    assert response.json() == {"id": 1}
+
+
+def test_middleware_flushes_each_streamed_chunk():
+    chunks = [json.dumps(row).encode() + b"\n" for row in BIG[:3]]
+
+    async def export(scope, receive, send):
+        await send({"type": "http.response.start", "status": 200, "headers": [
+            (b"content-type", b"text/plain"), (b"content-length", b"999"),
+        ]})
+        for chunk in chunks:
+            await send({"type": "http.response.body", "body": chunk, "more_body": True})
+        await send({"type": "http.response.body", "body": b""})
+
+    sent = []
+
+    async def send(message):
+        sent.append(message)
+
+    scope = {"type": "http", "method": "GET", "path": "/export", "headers": [(b"accept-encoding", b"gzip")]}
+    asyncio.run(CompressionMiddleware(export, Compression())(scope, None, send))
+
+    headers = dict(sent[0]["headers"])
+    assert headers[b"content-encoding"] == b"gzip"
+    assert b"content-length" not in headers
+    # Every chunk decodes as soon as it arrives
+    decoder = zlib.decompressobj(31)
+    assert [decoder.decompress(message["body"]) for message in sent[1:-1]] == chunks
+    assert decoder.decompress(sent[-1]["body"]) == b"" and decoder.eof
@@ -0,0 +1,125 @@
+import sqlite3
+
+import pytest
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+
+from app import schema
+from app.store import SQLAlchemySessionStore
+from deepwork import events, rollup
+from deepwork.sqlite_store import SQLiteSessionStore
+
+
+def _open(backend, path):
+    if backend == "sqlite":
+        return SQLiteSessionStore(str(path))
+    engine = create_engine(f"sqlite:///{path}")
+    schema.upgrade(engine)
+    return SQLAlchemySessionStore(sessionmaker(bind=engine)())
+
+
+def _lifecycles(store):
+    # Never started, completed after 0-2 pauses, abandoned while paused, interrupted
+    for pauses in (None, 0, 1, 2, "abandon", "interrupt"):
+        session_id = store.create_session(f"pauses {pauses}", "goal", 30)["id"]
+        if pauses is None:
+            continue
+        store.start_session(session_id)
+        for _ in range(pauses if isinstance(pauses, int) else 3 if pauses == "interrupt" else 0):
+            store.pause_session(session_id, "call")
+            store.resume_session(session_id)
+        if isinstance(pauses, str):
+            store.pause_session(session_id, "left")
+        if pauses != "interrupt":
+            store.complete_session(session_id)
+
+
+def _tables(conn):
+    return {
+        table: sorted(conn.execute(f"SELECT * FROM {table}").fetchall(), key=repr)
+        for table in events.PROJECTIONS
+    }
+
+
+@pytest.mark.parametrize("backend", ["sqlite", "sqlalchemy"])
+def test_projections_rebuild_from_the_log(tmp_path, backend):
+    path = tmp_path / "events.db"
+    store = _open(backend, path)
+    _lifecycles(store)
+    store.close()
+
+    conn = sqlite3.connect(path)
+    types = [row[0] for row in conn.execute("SELECT type FROM events WHERE session_id = 6 ORDER BY seq")]
+    assert types == ["created", "started"] + ["paused", "resumed"] * 3 + ["paused"]
+    before = _tables(conn)
+    assert events.check(conn) == {projection: [] for projection in events.PROJECTIONS}
+
+    with conn:
+        for table in events.PROJECTIONS:
+            conn.execute(f"DELETE FROM {table}")
+    assert events.rebuild(conn)["sessions"] == 6
+    after = _tables(conn)
+    assert after["sessions"] == before["sessions"]
+    assert after["interruptions"] == before["interruptions"]
+    assert [row[:2] + row[3:] for row in after["daily_focus"]] == [
+        row[:2] + row[3:] for row in before["daily_focus"]
+    ]
+    assert rollup.check(conn) == []
+    conn.close()
+
+
+def test_check_reports_projections_that_drifted(tmp_path):
+    store = SQLiteSessionStore(str(tmp_path / "events.db"))
+    _lifecycles(store)
+    store.close()
+    conn = sqlite3.connect(tmp_path / "events.db")
+    with conn:
+        conn.execute("UPDATE sessions SET status = 'active' WHERE id = 2")
+        conn.execute("DELETE FROM daily_focus")
+    mismatches = events.check(conn)
+    assert mismatches["sessions"] == [2]
+    assert mismatches["interruptions"] == []
+    assert mismatches["daily_focus"]
+    events.rebuild(conn, ["sessions", "daily_focus"])
+    assert not any(events.check(conn).values())
+    conn.close()
+
+
+def test_stdlib_log_is_backfilled_for_older_databases(tmp_path):
+    path = str(tmp_path / "old.db")
+    store = SQLiteSessionStore(path)
+    _lifecycles(store)
+    store.close()
+    conn = sqlite3.connect(path)
+    logged = conn.execute("SELECT session_id, type, at FROM events ORDER BY session_id, seq").fetchall()
+    with conn:
+        conn.execute("DROP TABLE events")
+    conn.close()
+
+    SQLiteSessionStore(path).close()
+    conn = sqlite3.connect(path)
+    assert conn.execute("SELECT session_id, type, at FROM events ORDER BY seq").fetchall() == logged
+    assert not any(events.check(conn).values())
+    conn.close()
+
+
+def test_orm_log_is_backfilled_by_the_migration(tmp_path):
+    path = tmp_path / "orm.db"
+    store = _open("sqlalchemy", path)
+    _lifecycles(store)
+    store.close()
+    conn = sqlite3.connect(path)
+    logged = conn.execute("SELECT session_id, type, at FROM events ORDER BY session_id, seq").fetchall()
+    with conn:
+        # Back to revision 003: no event log and no session owners
+        conn.execute("DROP TABLE events")
+        conn.execute("DROP INDEX ix_sessions_user_id")
+        conn.execute("ALTER TABLE sessions DROP COLUMN user_id")
+        conn.execute("UPDATE alembic_version SET version_num = '003'")
+    conn.close()
+
+    schema.upgrade(create_engine(f"sqlite:///{path}"))
+    conn = sqlite3.connect(path)
+    assert conn.execute("SELECT session_id, type, at FROM events ORDER BY seq").fetchall() == logged
+    assert not any(events.check(conn).values())
+    conn.close()
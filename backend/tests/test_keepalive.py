@@ -0,0 +1,91 @@
+import http.client
+import http.server
+import json
+import socket
+import threading
+import time
+
+import pytest
+
+from deepwork import admission, keepalive
+from deepwork.keepalive import KeepAlive
+
+
+class Handler(http.server.BaseHTTPRequestHandler):
+    def do_GET(self):
+        body = json.dumps({"port": self.client_address[1]}).encode()
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        if self.path != "/unframed":
+            self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_POST(self):
+        # Never reads the request body
+        self.send_response(204)
+        self.send_header("Content-Length", "0")
+        self.end_headers()
+
+    def log_message(self, *args):
+        pass
+
+
+@pytest.fixture
+def serve():
+    servers = []
+
+    def serve(policy):
+        server = admission.ThreadingServer(("127.0.0.1", 0), keepalive.instrument_handler(Handler, policy))
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        servers.append(server)
+        return server.server_address
+
+    yield serve
+    for server in servers:
+        server.shutdown()
+        server.server_close()
+
+
+def _get(conn, path):
+    conn.request("GET", path)
+    response = conn.getresponse()
+    return response, json.loads(response.read())
+
+
+def test_connections_are_reused_up_to_the_request_limit(serve):
+    conn = http.client.HTTPConnection(*serve(KeepAlive(max_requests=3)))
+    ports = []
+    for n in range(5):
+        response, body = _get(conn, "/")
+        assert response.version == 11
+        assert response.getheader("Connection") == ("close" if n == 2 else None)
+        ports.append(body["port"])
+    # A new connection after the third response
+    assert len(set(ports[:3])) == 1 and len(set(ports)) == 2
+
+
+def test_unframed_responses_and_unread_bodies_do_not_break_the_connection(serve):
+    conn = http.client.HTTPConnection(*serve(KeepAlive()))
+    response, first = _get(conn, "/unframed")
+    assert response.getheader("Connection") == "close"
+
+    conn.request("POST", "/", body=b"x" * 1000)
+    response = conn.getresponse()
+    assert response.status == 204 and response.read() == b""
+    _, second = _get(conn, "/")
+    _, third = _get(conn, "/")
+    # The unread POST body was drained, not parsed as a request
+    assert second == third != first
+
+
+def test_idle_connections_are_closed(serve):
+    sock = socket.create_connection(serve(KeepAlive(idle_timeout=0.2)))
+    sock.sendall(b"GET / HTTP/1.1\r\nHost: test\r\n\r\n")
+    response = b""
+    while not response.endswith(b"}"):
+        response += sock.recv(4096)
+    assert response.startswith(b"HTTP/1.1 200 OK")
+    time.sleep(0.5)
+    assert sock.recv(4096) == b""
+    sock.close()
@@ -0,0 +1,77 @@
+import sys
+import threading
+
+from deepwork.memstore import InMemoryStore, MemorySessionStore
+
+
+def test_reads_run_alongside_writes_on_other_threads():
+    store = MemorySessionStore()
+    session_id = store.create_session("paused")["id"]
+    store.start_session(session_id)
+    store.pause_session(session_id, "x")
+    writing = threading.Event()
+    writing.set()
+    errors = []
+
+    def write():
+        for n in range(2000):
+            store.create_session(f"s{n}")
+
+    def read():
+        while writing.is_set():
+            try:
+                sessions = store.list_sessions()
+                store.session_history()
+                store.interruptions_for_sessions([s["id"] for s in sessions[-50:]])
+                store.get_session(session_id)
+                store.list_interruptions(session_id)
+            except Exception as e:
+                errors.append(e)
+
+    readers = [threading.Thread(target=read) for _ in range(4)]
+    writers = [threading.Thread(target=write) for _ in range(2)]
+    # Switch threads often, so reads are interrupted mid-iteration
+    interval = sys.getswitchinterval()
+    sys.setswitchinterval(1e-6)
+    try:
+        for thread in readers + writers:
+            thread.start()
+        for thread in writers:
+            thread.join()
+        writing.clear()
+        for thread in readers:
+            thread.join()
+    finally:
+        sys.setswitchinterval(interval)
+    assert errors == []
+    assert len(store.list_sessions()) == 4001
+
+
+def test_user_listing_pages_from_the_user_index(tmp_path):
+    paths = {"snapshot_path": str(tmp_path / "store.json"), "journal_path": str(tmp_path / "store.journal")}
+    store = MemorySessionStore(InMemoryStore(snapshot_every=4, **paths))
+    created = {"alice": [], "bob": []}
+    for n in range(10):
+        user_id = "alice" if n % 3 else "bob"
+        created[user_id].append(store.create_session(f"s{n}", user_id=user_id)["id"])
+    store.start_session(created["alice"][0])
+
+    def listed(store, user_id, skip=0, limit=None):
+        return [s["id"] for s in store.list_sessions(skip, limit, user_id=user_id)]
+
+    assert listed(store, "alice") == created["alice"][::-1]
+    assert listed(store, "alice", 2, 3) == created["alice"][::-1][2:5]
+    assert listed(store, "bob") == created["bob"][::-1]
+    assert listed(store, "carol") == []
+    assert len(listed(store, None)) == 10
+    # Walks only the user's own sessions
+    assert list(store.records.sessions_newest_first("bob")) == [store.records.get_session(i) for i in created["bob"][::-1]]
+
+    # Rebuilt from the snapshot and the journal replayed on top of it (no
+    # close(), which would snapshot the journal away)
+    store.records._journal.close()
+    restored = MemorySessionStore(InMemoryStore(**paths))
+    assert listed(restored, "alice") == created["alice"][::-1]
+    assert listed(restored, "bob", 1) == created["bob"][::-1][1:]
+    assert restored.get_session(created["alice"][0])["status"] == "active"
+    restored.close()
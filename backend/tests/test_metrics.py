@@ -0,0 +1,53 @@
+import sqlite3
+import time
+
+from deepwork import metrics
+
+
+def test_route_matcher_prefers_literal_segments():
+    match = metrics.route_matcher(metrics.SESSION_ROUTES)
+    assert match("/sessions") == "/sessions/"
+    assert match("/sessions/history") == "/sessions/history"
+    assert match("/sessions/42") == "/sessions/{session_id}"
+    assert match("/sessions/42/pause?reason=x") == "/sessions/{session_id}/pause"
+    assert match("/sessions/42/interruptions") == "/sessions/{session_id}/interruptions"
+    assert match("/sessions/42/unknown") == metrics.UNMATCHED
+
+
+def test_histograms_render_cumulative_buckets():
+    registry = metrics.Metrics()
+    for size in (10, 100, 5000):
+        registry.finish(registry.start(), "GET", "/sessions/", 200, size)
+    text = registry.render()
+
+    labels = 'method="GET",route="/sessions/"'
+    assert f'deepwork_http_requests_total{{{labels},status="200"}} 3' in text
+    assert f'deepwork_http_response_size_bytes_bucket{{{labels},le="64"}} 1' in text
+    assert f'deepwork_http_response_size_bytes_bucket{{{labels},le="256"}} 2' in text
+    assert f'deepwork_http_response_size_bytes_bucket{{{labels},le="+Inf"}} 3' in text
+    assert f"deepwork_http_response_size_bytes_sum{{{labels}}} 5110" in text
+    assert "deepwork_http_requests_in_flight 0" in text
+
+
+def test_timed_connection_counts_queries_of_current_request():
+    conn = sqlite3.connect(":memory:", factory=metrics.TimedConnection)
+    registry = metrics.Metrics()
+
+    conn.execute("SELECT 1")  # outside a request: not recorded
+    started = registry.start()
+    conn.execute("CREATE TABLE t (x)")
+    conn.cursor().executemany("INSERT INTO t VALUES (?)", [(1,), (2,)])
+    registry.finish(started, "POST", "/sessions/", 201, 0)
+
+    assert 'deepwork_http_request_db_queries_sum{method="POST",route="/sessions/"} 2' in registry.render()
+
+
+def test_recording_overhead_is_a_few_microseconds():
+    registry = metrics.Metrics()
+    match = metrics.route_matcher(metrics.SESSION_ROUTES)
+    n = 20000
+    started = time.perf_counter()
+    for _ in range(n):
+        registry.finish(registry.start(), "PATCH", match("/sessions/42/pause"), 200, 300)
+    # Generous bound so slow CI machines do not flake
+    assert (time.perf_counter() - started) / n < 20e-6
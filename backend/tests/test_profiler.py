@@ -0,0 +1,85 @@
+import logging
+import sqlite3
+
+import pytest
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+
+from app import crud, schemas
+from app.metrics import instrument_engines
+from app.models.models import Base
+from deepwork import metrics, profiler
+
+
+def test_fingerprint_normalizes_literals_and_lists():
+    assert profiler.fingerprint(
+        "SELECT *  FROM sessions\n WHERE id = 42 AND title = 'it''s'"
+    ) == "SELECT * FROM sessions WHERE id = ? AND title = ?"
+    assert profiler.fingerprint(
+        "SELECT * FROM interruptions WHERE session_id IN (?, ?, ?)"
+    ) == profiler.fingerprint("SELECT * FROM interruptions WHERE session_id in (:a)")
+    assert profiler.fingerprint("SELECT t1.id FROM t1") == "SELECT t1.id FROM t1"
+
+
+def test_headers_count_statements():
+    conn = sqlite3.connect(":memory:", factory=metrics.TimedConnection)
+    started = profiler.Profiler().start()
+    conn.execute("SELECT 1")
+    conn.execute("SELECT 2")
+    profile = profiler.Profiler().finish(started, "GET /")
+    assert profile.headers()["X-DB-Queries"] == "2"
+    assert profile.statements == {"SELECT ?": [2, profile.seconds]}
+
+
+def test_warn_mode_logs_repeated_fingerprint(caplog):
+    conn = sqlite3.connect(":memory:", factory=metrics.TimedConnection)
+    warn = profiler.Profiler(repeat_limit=2)
+    started = warn.start()
+    for n in range(3):
+        conn.execute("SELECT ?", (n,))
+    with caplog.at_level(logging.WARNING, logger="deepwork.profiler"):
+        warn.finish(started, "GET /sessions/")
+    assert "SELECT ? ran 3 times in GET /sessions/" in caplog.text
+
+
+def test_fail_mode_raises_on_repeat():
+    conn = sqlite3.connect(":memory:", factory=metrics.TimedConnection)
+    fail = profiler.Profiler(repeat_limit=2, mode="fail")
+    started = fail.start()
+    try:
+        conn.execute("SELECT 1")
+        conn.execute("SELECT 2")
+        with pytest.raises(profiler.RepeatedQueryError):
+            conn.execute("SELECT 3")
+    finally:
+        fail.finish(started, "test")
+
+
+def test_from_environ():
+    assert profiler.Profiler.from_environ({}) is None
+    configured = profiler.Profiler.from_environ(
+        {"DEEPWORK_SQL_PROFILE": "fail", "DEEPWORK_SQL_REPEAT_LIMIT": "3"}
+    )
+    assert (configured.mode, configured.repeat_limit) == ("fail", 3)
+
+
+def test_crud_list_endpoints_have_no_n_plus_one(tmp_path):
+    instrument_engines()
+    engine = create_engine(f"sqlite:///{tmp_path / 'orm.db'}")
+    Base.metadata.create_all(bind=engine)
+    db = sessionmaker(bind=engine)()
+    for _ in range(20):
+        session_id = crud.create_session(db, schemas.SessionCreate(title="a", scheduled_duration=30))["id"]
+        crud.start_session(db, session_id)
+        crud.pause_session(db, session_id, schemas.InterruptionCreate(reason="x"))
+        crud.complete_session(db, session_id)
+
+    # Each call is one request's worth of queries
+    fail = profiler.Profiler(repeat_limit=2, mode="fail")
+    for call in (crud.get_sessions, crud.get_session_history):
+        started = fail.start()
+        try:
+            assert len(call(db)) == 20
+        finally:
+            fail.finish(started, call.__name__)
+    db.close()
@@ -0,0 +1,139 @@
+import importlib
+import json
+import os
+import sys
+import threading
+import urllib.error
+import urllib.request
+
+import pytest
+from fastapi.testclient import TestClient
+from sqlalchemy import create_engine, event
+from sqlalchemy.orm import sessionmaker
+
+from app.models.models import Base
+from app.store import SQLAlchemySessionStore
+from deepwork import projection
+from deepwork.admission import ThreadingServer
+from deepwork.sqlite_store import SQLiteSessionStore
+
+
+def test_parse_fields_and_include():
+    allowed = ("id", "title", "status", "goal")
+    assert projection.parse_fields("status, title", allowed) == ("id", "title", "status")
+    assert projection.parse_fields("id", allowed) == ("id",)
+    assert projection.parse_fields("", allowed) is None
+    assert projection.parse_fields(None, allowed) is None
+    with pytest.raises(projection.InvalidProjection, match="Unknown fields: nope"):
+        projection.parse_fields("title,nope", allowed)
+
+    assert projection.parse_include("interruptions") == {"interruptions"}
+    assert projection.parse_include(None) == frozenset()
+    with pytest.raises(projection.InvalidProjection, match="Unknown include: events"):
+        projection.parse_include("events")
+
+
+def test_sqlite_store_selects_only_the_fields_asked_for(tmp_path):
+    store = SQLiteSessionStore(str(tmp_path / "stdlib.db"))
+    session_id = store.create_session("a", "goal")["id"]
+    statements = []
+    store._conn.set_trace_callback(statements.append)
+
+    store.list_sessions(fields=("id", "status"))
+    store.get_session(session_id, fields=("id", "status"))
+    assert len(statements) == 2
+    for sql in statements:
+        columns = sql[len("SELECT "):sql.index(" FROM ")]
+        assert columns == "public_id, status, created_at"
+    store.close()
+
+
+def test_sqlalchemy_store_reads_interruptions_only_for_derived_fields(tmp_path):
+    engine = create_engine(f"sqlite:///{tmp_path / 'orm.db'}")
+    Base.metadata.create_all(bind=engine)
+    store = SQLAlchemySessionStore(sessionmaker(bind=engine)())
+    session_id = store.create_session("a", "goal")["id"]
+    statements = []
+    event.listen(engine, "before_cursor_execute", lambda conn, cursor, sql, *args: statements.append(sql))
+
+    store.list_sessions(fields=("id", "status"))
+    store.get_session(session_id, fields=("id", "status"))
+    assert len(statements) == 2
+    assert not any("interruptions" in sql or "goal" in sql for sql in statements)
+
+    statements.clear()
+    store.list_sessions(fields=("id", "interruption_count"))
+    assert any("FROM interruptions" in sql for sql in statements)
+    store.close()
+
+
+@pytest.fixture
+def client(tmp_path):
+    from app.main import create_app
+    from app.models import database
+
+    with TestClient(create_app(create_schema=True, database_url=f"sqlite:///{tmp_path / 'app.db'}")) as client:
+        yield client
+    database.configure(database.SQLALCHEMY_DATABASE_URL)
+
+
+def test_session_endpoints_take_fields_and_include(client):
+    session_id = client.post("/sessions/", json={"title": "t", "scheduled_duration": 30}).json()["id"]
+    client.patch(f"/sessions/{session_id}/start")
+    client.patch(f"/sessions/{session_id}/pause", params={"reason": "x"})
+
+    # Interruptions only when included
+    full = client.get(f"/sessions/{session_id}").json()
+    assert "interruptions" not in full and full["status"] == "paused"
+    assert client.get("/sessions/").json() == [full]
+
+    projected = {"id": session_id, "title": "t", "status": "paused"}
+    assert client.get("/sessions/", params={"fields": "status,title"}).json() == [projected]
+    assert client.get(f"/sessions/{session_id}", params={"fields": "title,status"}).json() == projected
+
+    included = client.get(f"/sessions/{session_id}", params={"fields": "status", "include": "interruptions"}).json()
+    assert set(included) == {"id", "status", "interruptions"}
+    assert [i["reason"] for i in included["interruptions"]] == ["x"]
+    listed = client.get("/sessions/", params={"include": "interruptions"}).json()
+    assert listed == [dict(full, interruptions=included["interruptions"])]
+
+    assert client.get("/sessions/", params={"fields": "nope"}).status_code == 400
+    assert client.get(f"/sessions/{session_id}", params={"include": "events"}).status_code == 400
+
+
+@pytest.fixture
+def minimal_server(tmp_path, monkeypatch):
+    # It keeps its snapshot and journal in the working directory
+    monkeypatch.chdir(tmp_path)
+    monkeypatch.syspath_prepend(os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", ".."))
+    sys.modules.pop("minimal_server", None)
+    module = importlib.import_module("minimal_server")
+    httpd = ThreadingServer(("127.0.0.1", 0), module.APIHandler)
+    threading.Thread(target=httpd.serve_forever, daemon=True).start()
+    yield f"http://127.0.0.1:{httpd.server_address[1]}"
+    httpd.shutdown()
+    httpd.server_close()
+    module.STORE.close()
+    sys.modules.pop("minimal_server", None)
+
+
+def test_minimal_server_takes_fields_and_include(minimal_server):
+    def get(path):
+        with urllib.request.urlopen(minimal_server + path) as response:
+            return json.loads(response.read())
+
+    # The sample data: the research session was interrupted once
+    research = next(s for s in get("/sessions/") if s["title"] == "Research Session")
+    assert "interruptions" not in research
+    assert {"id": research["id"], "title": "Research Session", "status": "completed"} in get("/sessions/?fields=status,title")
+    assert get(f"/sessions/{research['id']}?fields=title") == {"id": research["id"], "title": "Research Session"}
+
+    included = get(f"/sessions/{research['id']}?include=interruptions")
+    assert [i["reason"] for i in included["interruptions"]] == ["Phone call"]
+    assert dict(id=research["id"], status="completed", interruptions=included["interruptions"]) in get(
+        "/sessions/?fields=status&include=interruptions"
+    )
+
+    with pytest.raises(urllib.error.HTTPError) as error:
+        get("/sessions/?fields=nope")
+    assert error.value.code == 400
@@ -0,0 +1,63 @@
+import sqlite3
+import time
+
+import pytest
+
+from deepwork.replica import SnapshotReplica
+from deepwork.sqlite_store import SQLiteSessionStore
+
+
+def _primary(tmp_path):
+    store = SQLiteSessionStore(str(tmp_path / "primary.db"), wal=True)
+    session = store.create_session("Quarterly plan", "Draft", 1)
+    store.start_session(session["id"])
+    store.complete_session(session["id"])
+    return store
+
+
+def test_reads_see_the_primary_within_the_staleness_bound(tmp_path):
+    primary = _primary(tmp_path)
+    replica = SnapshotReplica(primary.path, max_staleness=0.2)
+    with replica.read() as snapshot:
+        assert len(snapshot.store().session_history()) == 1
+        with pytest.raises(sqlite3.OperationalError):
+            snapshot.connection.execute("DELETE FROM sessions")
+
+    session = primary.create_session("Inbox zero", None, 1)
+    primary.start_session(session["id"])
+    primary.complete_session(session["id"])
+    with replica.read() as snapshot:
+        assert len(snapshot.store().session_history()) == 1
+    time.sleep(0.25)
+    with replica.read() as snapshot:
+        assert len(snapshot.store().session_history()) == 2
+        assert snapshot.age() < 0.2
+    assert replica.refreshes == 2
+    replica.close()
+    primary.close()
+
+
+def test_refresh_keeps_the_previous_snapshot_open_for_its_readers(tmp_path):
+    primary = _primary(tmp_path)
+    replica = SnapshotReplica(primary.path, max_staleness=60)
+    with replica.read() as old:
+        replica.refresh()
+        assert old.connection.execute("SELECT COUNT(*) FROM sessions").fetchone() == (1,)
+    with pytest.raises(sqlite3.ProgrammingError):
+        old.connection.execute("SELECT 1")
+    with replica.read() as snapshot:
+        assert snapshot is not old
+    replica.close()
+    primary.close()
+
+
+def test_file_snapshot(tmp_path):
+    primary = _primary(tmp_path)
+    replica = SnapshotReplica(primary.path, str(tmp_path / "snapshot.db"), max_staleness=60).start()
+    with replica.read() as snapshot:
+        assert snapshot.store().session_history()[0]["title"] == "Quarterly plan"
+        assert float(snapshot.freshness()) < 60
+    replica.close()
+    with sqlite3.connect(tmp_path / "snapshot.db") as copy:
+        assert copy.execute("SELECT COUNT(*) FROM events").fetchone() == (3,)
+    primary.close()
@@ -0,0 +1,67 @@
+import sqlite3
+
+import pytest
+from fastapi.testclient import TestClient
+
+from deepwork import analytics, rollup
+from deepwork.shards import ShardRouter, shard_path
+from deepwork.sqlite_store import SQLiteSessionStore
+
+
+def test_users_map_to_the_same_shard_every_time():
+    router = ShardRouter(4)
+    users = [f"user-{n}" for n in range(200)]
+    shards = [router.shard_for(user) for user in users]
+    assert shards == [ShardRouter(4).shard_for(user) for user in users]
+    assert set(shards) == {0, 1, 2, 3}
+    assert router.shard_for(None) == 0
+    assert ShardRouter(1).shard_for("user-1") == 0
+    assert router.paths("data/deepwork.db") == [f"data/deepwork.shard{n}.db" for n in range(4)]
+    assert shard_path("deepwork.db", 0, 1) == "deepwork.db"
+    with pytest.raises(ValueError):
+        ShardRouter(0)
+
+
+def test_fan_out_merges_stats_across_shards(tmp_path):
+    router = ShardRouter(3)
+    paths = router.paths(str(tmp_path / "deepwork.db"))
+    stores = [SQLiteSessionStore(path) for path in paths]
+    users = [f"user-{n}" for n in range(12)]
+    for user in users:
+        store = stores[router.shard_for(user)]
+        session = store.create_session("Focus", None, 25, user_id=user)
+        store.start_session(session["id"])
+        store.complete_session(session["id"])
+
+    def daily_focus(shard):
+        cursor = stores[shard]._conn.cursor()
+        cursor.row_factory = sqlite3.Row
+        return cursor.execute(rollup.SELECT_RANGE_SQL, {"start_day": "2000-01-01", "end_day": "9999-12-31"}).fetchall()
+
+    merged = rollup.merge(router.fan_out(daily_focus))
+    assert [(row["session_count"], row["scheduled_minutes"]) for row in merged] == [(12, 300)]
+
+    columns = router.fan_out(lambda shard: analytics.load_columns(stores[shard]._conn))
+    assert analytics.distributions(analytics.SessionColumns.concat(columns))["finished_count"] == 12
+    for user in users:
+        assert [s["user_id"] for s in stores[router.shard_for(user)].list_sessions(user_id=user)] == [user]
+    router.close()
+    for store in stores:
+        store.close()
+
+
+def test_users_on_one_shard_cannot_reach_each_others_sessions(tmp_path):
+    from app.main import create_app
+    from app.models import database
+
+    alice, bob = {"X-User-Id": "alice"}, {"X-User-Id": "bob"}
+    with TestClient(create_app(create_schema=True, database_url=f"sqlite:///{tmp_path / 'app.db'}")) as client:
+        assert database.get_router().shard_for("alice") == database.get_router().shard_for("bob")
+        session_id = client.post("/sessions/", json={"title": "t", "scheduled_duration": 30}, headers=alice).json()["id"]
+
+        for headers in (bob, {}):
+            assert client.get(f"/sessions/{session_id}", headers=headers).status_code == 404
+            assert client.patch(f"/sessions/{session_id}/start", headers=headers).status_code == 404
+            assert client.get(f"/sessions/{session_id}/interruptions", headers=headers).status_code == 404
+        assert client.patch(f"/sessions/{session_id}/start", headers=alice).json()["status"] == "active"
+    database.configure(database.SQLALCHEMY_DATABASE_URL)
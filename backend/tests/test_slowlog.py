@@ -0,0 +1,53 @@
+import sqlite3
+
+from deepwork import slowlog
+
+
+def _logged_connection(tmp_path, **options):
+    db_path = tmp_path / "slow.db"
+    log = slowlog.SlowQueryLog(str(tmp_path / "slow.jsonl"), threshold_ms=0, **options)
+    conn = sqlite3.connect(db_path, factory=log.connection_factory())
+    conn.execute("CREATE TABLE sessions (id INTEGER PRIMARY KEY, title TEXT, status TEXT)")
+    conn.commit()
+    return log, conn
+
+
+def test_slow_statements_are_logged_with_plan_and_bind_shapes(tmp_path):
+    log, conn = _logged_connection(tmp_path)
+    conn.execute("SELECT * FROM sessions WHERE status = ? AND id > ?", ("active", 3)).fetchall()
+    conn.executemany("INSERT INTO sessions (title) VALUES (:title)", [{"title": "Quarterly plan"}, {"title": "Inbox zero"}])
+    log.flush()
+
+    entries = list(slowlog.read_entries(log.path))
+    select = next(e for e in entries if e["statement"].startswith("SELECT"))
+    assert select["binds"] == ["str", "int"]
+    assert select["fingerprint"] == "SELECT * FROM sessions WHERE status = ? AND id > ?"
+    assert select["plan"] and "sessions" in select["plan"][0]["detail"]
+    insert = next(e for e in entries if e["statement"].startswith("INSERT"))
+    assert insert["binds"] == {"rows": 2, "shape": {"title": "str"}}
+    assert "Quarterly plan" not in open(log.path).read()
+    conn.close()
+    log.close()
+
+
+def test_fast_statements_are_not_logged(tmp_path):
+    log = slowlog.SlowQueryLog(str(tmp_path / "slow.jsonl"), threshold_ms=1000)
+    conn = sqlite3.connect(tmp_path / "fast.db", factory=log.connection_factory())
+    conn.execute("SELECT 1")
+    log.flush()
+    assert list(slowlog.read_entries(log.path)) == []
+    conn.close()
+    log.close()
+
+
+def test_summary_reads_rotated_backups(tmp_path):
+    log, conn = _logged_connection(tmp_path, max_bytes=2000, backups=3)
+    for n in range(10):
+        conn.execute("SELECT title FROM sessions WHERE id = ?", (n,)).fetchall()
+    log.flush()
+    log.close()
+    conn.close()
+
+    assert list(tmp_path.glob("slow.jsonl.*"))
+    groups = {g["fingerprint"]: g for g in slowlog.summarize(slowlog.read_entries(log.path))}
+    assert groups["SELECT title FROM sessions WHERE id = ?"]["count"] >= 5
@@ -0,0 +1,48 @@
+import importlib
+import json
+import os
+import sys
+import threading
+import urllib.request
+
+import pytest
+
+from deepwork.admission import ThreadingServer
+
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "..")
+
+
+@pytest.fixture(params=["sqlite_server", "fixed_sqlite_server"])
+def server(request, tmp_path, monkeypatch):
+    """Base URL of a stdlib server on a fresh database in tmp_path"""
+    # Both servers open deepwork.db in the working directory when imported
+    monkeypatch.chdir(tmp_path)
+    monkeypatch.syspath_prepend(ROOT)
+    sys.modules.pop(request.param, None)
+    module = importlib.import_module(request.param)
+    httpd = ThreadingServer(("127.0.0.1", 0), module.APIHandler)
+    threading.Thread(target=httpd.serve_forever, daemon=True).start()
+    yield f"http://127.0.0.1:{httpd.server_address[1]}"
+    httpd.shutdown()
+    httpd.server_close()
+    for store in module.STORES:
+        store.close()
+    sys.modules.pop(request.param, None)
+
+
+def call(url, method="GET", body=None):
+    data = json.dumps(body).encode() if body is not None else None
+    request = urllib.request.Request(url, data=data, method=method, headers={"Content-Type": "application/json"})
+    with urllib.request.urlopen(request) as response:
+        return response.status, json.loads(response.read())
+
+
+def test_history_is_not_read_as_a_session_id(server):
+    _, session = call(f"{server}/sessions/", "POST", {"title": "Focus", "scheduled_duration": 25})
+    call(f"{server}/sessions/{session['id']}/start", "PATCH")
+    call(f"{server}/sessions/{session['id']}/complete", "PATCH")
+
+    status, history = call(f"{server}/sessions/history")
+    assert status == 200
+    assert [item["id"] for item in history] == [session["id"]]
+    assert call(f"{server}/sessions/{session['id']}")[1]["title"] == "Focus"
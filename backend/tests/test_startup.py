@@ -0,0 +1,101 @@
+import os
+import subprocess
+import sys
+
+import pytest
+from fastapi.testclient import TestClient
+
+BACKEND = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..')
+
+# Cold import of the app plus create_app(), in seconds (about 0.7 s today,
+# most of it FastAPI and pydantic); generous so slow CI machines do not flake
+IMPORT_BUDGET = 2.0
+
+COLD_START = """
+import sys
+path = list(sys.path)
+from app.main import create_app
+create_app()
+assert sys.path == path, "importing the app changed sys.path"
+print(",".join(name for name in ("numpy", "alembic") if name in sys.modules))
+"""
+
+
+def test_cold_start_is_fast_and_side_effect_free(tmp_path):
+    env = {**os.environ, "PYTHONPATH": os.path.abspath(BACKEND), "PYTHONDONTWRITEBYTECODE": "1"}
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", COLD_START],
+        cwd=tmp_path, env=env, capture_output=True, text=True, check=True,
+    )
+    assert result.stdout.strip() == ""
+    assert list(tmp_path.iterdir()) == []
+
+    # Cumulative microseconds of the top-level imports
+    total = sum(
+        int(line.split("|")[1])
+        for line in result.stderr.splitlines()
+        if line.startswith("import time:") and not line.split("|")[2].startswith("  ")
+        and line.split("|")[1].strip().isdigit()
+    )
+    assert total / 1e6 < IMPORT_BUDGET
+
+
+@pytest.fixture
+def restore_database_url():
+    from app.models import database
+
+    yield
+    database.configure(database.SQLALCHEMY_DATABASE_URL)
+
+
+def test_startup_verifies_the_schema_version(tmp_path, restore_database_url):
+    from app import schema
+    from app.main import create_app
+
+    url = f"sqlite:///{tmp_path / 'app.db'}"
+    with pytest.raises(schema.SchemaVersionError, match="alembic upgrade head"):
+        with TestClient(create_app(database_url=url)):
+            pass
+
+    with TestClient(create_app(create_schema=True, database_url=url)) as client:
+        assert client.post("/sessions/", json={"title": "t", "scheduled_duration": 30}).status_code == 201
+    with TestClient(create_app(database_url=url)) as client:
+        assert len(client.get("/sessions/").json()) == 1
+
+
+def test_baseline_database_is_stamped_and_upgraded(tmp_path, restore_database_url):
+    import sqlite3
+
+    from alembic import command
+    from sqlalchemy import create_engine
+
+    from app import schema
+    from app.main import create_app
+
+    # The layout an older release's create_all() left: revision 001's tables,
+    # no version table, and no user_id, resume_time, daily_focus or events
+    path = tmp_path / "old.db"
+    url = f"sqlite:///{path}"
+    command.upgrade(schema._config(url), "001")
+    conn = sqlite3.connect(path)
+    with conn:
+        conn.execute("DROP TABLE alembic_version")
+        conn.execute(
+            "INSERT INTO sessions (title, scheduled_duration, status, start_time, end_time, created_at) "
+            "VALUES ('old', 30, 'completed', '2025-01-01 09:00:00', '2025-01-01 09:30:00', '2025-01-01 08:55:00')"
+        )
+    conn.close()
+
+    engine = create_engine(url)
+    with pytest.raises(schema.SchemaVersionError, match="alembic stamp 001 && alembic upgrade head"):
+        schema.verify(engine)
+    command.stamp(schema._config(url), "001")
+    schema.upgrade(engine)
+    schema.verify(engine)
+    engine.dispose()
+
+    with TestClient(create_app(database_url=url)) as client:
+        response = client.get("/sessions/")
+        assert response.status_code == 200 and [s["title"] for s in response.json()] == ["old"]
+        response = client.get("/sessions/history")
+        assert response.status_code == 200 and [s["title"] for s in response.json()] == ["old"]
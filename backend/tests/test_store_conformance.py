@@ -0,0 +1,262 @@
+"""
+Conformance suite for every SessionStore implementation.
+
+Each test runs once per backend, so a behaviour difference between the
+SQLAlchemy, raw sqlite3 and in-memory stores shows up as a failure here.
+"""
+
+import datetime
+
+import pytest
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+
+from app.models.models import Base
+from app.store import SQLAlchemySessionStore
+from deepwork.memstore import MemorySessionStore
+from deepwork.sqlite_store import SQLiteSessionStore
+from deepwork.store import (
+    HISTORY_STATUSES, INTERRUPTION_FIELDS, SESSION_FIELDS, InvalidTransition, SessionNotFound,
+)
+
+BACKENDS = ["memory", "sqlite", "sqlalchemy"]
+
+
+@pytest.fixture(params=BACKENDS)
+def store(request, tmp_path):
+    if request.param == "memory":
+        store = MemorySessionStore()
+    elif request.param == "sqlite":
+        store = SQLiteSessionStore(str(tmp_path / "stdlib.db"))
+    else:
+        engine = create_engine(f"sqlite:///{tmp_path / 'orm.db'}")
+        Base.metadata.create_all(bind=engine)
+        store = SQLAlchemySessionStore(sessionmaker(bind=engine)())
+    yield store
+    store.close()
+
+
+def test_create_session(store):
+    session = store.create_session("Write report", "First draft", 45)
+    assert set(session) == set(SESSION_FIELDS)
+    assert session["title"] == "Write report"
+    assert session["goal"] == "First draft"
+    assert session["scheduled_duration"] == 45
+    assert session["status"] == "scheduled"
+    assert session["interruption_count"] == 0
+    assert isinstance(session["created_at"], datetime.datetime)
+    assert session["start_time"] is None and session["end_time"] is None
+
+
+def test_get_session_by_id_and_string_id(store):
+    session = store.create_session("a")
+    assert store.get_session(session["id"])["id"] == session["id"]
+    assert store.get_session(str(session["id"]))["id"] == session["id"]
+
+
+def test_unknown_session(store):
+    store.create_session("a")
+    for operation in (store.get_session, store.start_session, store.resume_session,
+                      store.complete_session, store.list_interruptions):
+        with pytest.raises(SessionNotFound):
+            operation("999999")
+    with pytest.raises(SessionNotFound):
+        store.pause_session("not-an-id", "x")
+
+
+def test_lifecycle(store):
+    session_id = store.create_session("a", scheduled_duration=30)["id"]
+
+    session = store.start_session(session_id)
+    assert session["status"] == "active"
+    assert isinstance(session["start_time"], datetime.datetime)
+
+    session = store.pause_session(session_id, "Phone call")
+    assert session["status"] == "paused"
+    assert session["paused_at"] is not None
+    assert session["interruption_count"] == 1
+
+    session = store.resume_session(session_id)
+    assert session["status"] == "active"
+    assert session["paused_at"] is None
+
+    session = store.complete_session(session_id)
+    assert session["status"] == "completed"
+    assert isinstance(session["end_time"], datetime.datetime)
+    assert session["actual_duration"] == 0
+
+    # Reads see the same state as the transition returned
+    assert store.get_session(session_id)["status"] == "completed"
+
+    interruptions = store.list_interruptions(session_id)
+    assert len(interruptions) == 1
+    assert set(interruptions[0]) == set(INTERRUPTION_FIELDS)
+    assert interruptions[0]["session_id"] == session_id
+    assert interruptions[0]["reason"] == "Phone call"
+    assert interruptions[0]["resume_time"] >= interruptions[0]["pause_time"]
+
+
+@pytest.mark.parametrize("action, setup", [
+    ("pause", []),
+    ("resume", []),
+    ("complete", []),
+    ("start", ["start"]),
+    ("resume", ["start"]),
+    ("pause", ["start", "pause"]),
+    ("start", ["start", "complete"]),
+    ("complete", ["start", "complete"]),
+])
+def test_invalid_transitions(store, action, setup):
+    session_id = store.create_session("a")["id"]
+    for step in setup:
+        if step == "pause":
+            store.pause_session(session_id, "x")
+        else:
+            getattr(store, f"{step}_session")(session_id)
+    status = store.get_session(session_id)["status"]
+
+    with pytest.raises(InvalidTransition) as raised:
+        if action == "pause":
+            store.pause_session(session_id, "x")
+        else:
+            getattr(store, f"{action}_session")(session_id)
+    assert str(raised.value).startswith(f"Cannot {action} session:")
+    assert raised.value.status == status
+    # A rejected transition changes nothing
+    assert store.get_session(session_id)["status"] == status
+
+
+def test_fourth_pause_interrupts(store):
+    session_id = store.create_session("a")["id"]
+    store.start_session(session_id)
+    for _ in range(3):
+        assert store.pause_session(session_id, "x")["status"] == "paused"
+        store.resume_session(session_id)
+    session = store.pause_session(session_id, "x")
+    assert session["status"] == "interrupted"
+    assert session["interruption_count"] == 4
+    with pytest.raises(InvalidTransition):
+        store.resume_session(session_id)
+
+
+def test_complete_while_paused_is_abandoned(store):
+    session_id = store.create_session("a")["id"]
+    store.start_session(session_id)
+    store.pause_session(session_id, "x")
+    session = store.complete_session(session_id)
+    assert session["status"] == "abandoned"
+    # The open pause is not closed by completing
+    assert store.list_interruptions(session_id)[0]["resume_time"] is None
+
+
+def test_list_sessions_newest_first_with_paging(store):
+    created = [store.create_session(f"s{i}")["id"] for i in range(5)]
+    listed = [s["id"] for s in store.list_sessions()]
+    assert listed == created[::-1]
+    assert [s["id"] for s in store.list_sessions(skip=1, limit=2)] == created[::-1][1:3]
+
+
+@pytest.mark.parametrize("fields", [
+    ("id", "status", "title"),
+    ("id", "start_time", "end_time", "user_id"),
+    ("id", "paused_at", "actual_duration", "interruption_count"),
+])
+def test_fields_select_part_of_each_record(store, fields):
+    session_id = store.create_session("a", "goal", 30)["id"]
+    store.start_session(session_id)
+    store.pause_session(session_id, "x")
+    store.create_session("b")
+
+    full = store.list_sessions()
+    assert store.list_sessions(fields=fields) == [{key: s[key] for key in fields} for s in full]
+    assert store.list_sessions(skip=1, limit=1, fields=fields) == [{key: full[1][key] for key in fields}]
+    assert store.get_session(session_id, fields=fields) == {key: full[1][key] for key in fields}
+    with pytest.raises(SessionNotFound):
+        store.get_session("999999", fields=fields)
+
+
+def test_interruptions_for_sessions(store):
+    first = store.create_session("a")["id"]
+    second = store.create_session("b")["id"]
+    untouched = store.create_session("c")["id"]
+    for session_id, pauses in ((first, 2), (second, 1)):
+        store.start_session(session_id)
+        for _ in range(pauses):
+            store.pause_session(session_id, "x")
+            store.resume_session(session_id)
+
+    found = store.interruptions_for_sessions([first, second, untouched])
+    assert len(found[first]) == 2 and len(found[second]) == 1
+    assert untouched not in found
+    assert found[first] == store.list_interruptions(first)
+
+
+def test_session_history(store):
+    finished = store.create_session("done", scheduled_duration=10)["id"]
+    store.start_session(finished)
+    store.pause_session(finished, "x")
+    store.resume_session(finished)
+    store.complete_session(finished)
+    abandoned = store.create_session("abandoned")["id"]
+    store.start_session(abandoned)
+    store.pause_session(abandoned, "x")
+    store.complete_session(abandoned)
+    store.create_session("still scheduled")
+
+    history = store.session_history()
+    assert [h["id"] for h in history] == [abandoned, finished]
+    assert all(h["status"] in HISTORY_STATUSES for h in history)
+    done = history[1]
+    assert done["interruption_count"] == 1
+    assert done["focused_minutes"] >= 0
+    assert done["idle_minutes"] >= 0
+    assert 0 <= done["completion_ratio"] < 1
+    assert history[0]["completion_ratio"] == 0.0
+
+
+def test_sessions_are_scoped_to_their_user(store):
+    mine = store.create_session("mine", user_id="alice")["id"]
+    theirs = store.create_session("theirs", user_id="bob")["id"]
+    anonymous = store.create_session("anonymous")["id"]
+    for session_id in (mine, theirs):
+        store.start_session(session_id)
+        store.complete_session(session_id)
+
+    assert store.get_session(mine)["user_id"] == "alice"
+    assert store.get_session(anonymous)["user_id"] is None
+    assert [s["id"] for s in store.list_sessions(user_id="alice")] == [mine]
+    assert [s["id"] for s in store.list_sessions()] == [anonymous, theirs, mine]
+    assert [h["id"] for h in store.session_history(user_id="bob")] == [theirs]
+    assert len(store.session_history()) == 2
+
+
+def test_by_id_operations_only_find_the_callers_sessions(store):
+    # Both users share this store, as users on the same shard do
+    mine = store.create_session("mine", user_id="alice")["id"]
+    anonymous = store.create_session("anonymous")["id"]
+    store.start_session(mine, user_id="alice")
+    store.pause_session(mine, "call", user_id="alice")
+
+    for user_id in ("bob", None):
+        with pytest.raises(SessionNotFound):
+            store.get_session(mine, user_id=user_id)
+        with pytest.raises(SessionNotFound):
+            store.get_session(mine, fields=("id", "status"), user_id=user_id)
+        with pytest.raises(SessionNotFound):
+            store.list_interruptions(mine, user_id=user_id)
+        with pytest.raises(SessionNotFound):
+            store.resume_session(mine, user_id=user_id)
+        with pytest.raises(SessionNotFound):
+            store.complete_session(mine, user_id=user_id)
+    with pytest.raises(SessionNotFound):
+        store.start_session(anonymous, user_id="bob")
+    with pytest.raises(SessionNotFound):
+        store.pause_session(mine, "call", user_id="bob")
+
+    # The refused calls changed nothing
+    assert store.get_session(mine, user_id="alice")["status"] == "paused"
+    assert len(store.list_interruptions(mine, user_id="alice")) == 1
+    assert store.start_session(anonymous, user_id=None)["status"] == "active"
+    assert store.resume_session(mine, user_id="alice")["status"] == "active"
+    # Without a user_id there is no check
+    assert store.get_session(mine)["user_id"] == "alice"
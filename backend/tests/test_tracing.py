@@ -0,0 +1,68 @@
+import json
+import sqlite3
+import time
+
+from deepwork import metrics, tracing
+
+PARENT = "00-0af7651916cd43dd8448eb211c80319c-b7ad6b7169203331-01"
+
+
+def test_unsampled_requests_record_nothing():
+    tracer = tracing.Tracer(sample_rate=0)
+    assert tracer.start_request("GET /") is None
+    with tracing.span("work") as span:
+        span.set_attribute("ignored", 1)
+    assert tracing.current_trace_id() is None
+    assert tracer.buffer.view() == {"traces": []}
+
+
+def test_traceparent_sets_trace_id_and_forces_sampling():
+    tracer = tracing.Tracer(sample_rate=0)
+    started = tracer.start_request("GET /", PARENT)
+    assert tracing.current_trace_id() == "0af7651916cd43dd8448eb211c80319c"
+    tracer.finish_request(started)
+    assert started[0].parent_id == "b7ad6b7169203331"
+    assert tracer.start_request("GET /", PARENT[:-2] + "00") is None
+
+
+def test_spans_nest_and_export(tmp_path):
+    path = tmp_path / "traces.jsonl"
+    tracer = tracing.Tracer(sample_rate=1, exporters=[tracing.OTLPFileExporter(str(path))])
+    conn = sqlite3.connect(":memory:", factory=metrics.TimedConnection)
+
+    @tracing.traced("crud.work")
+    def work():
+        conn.execute("SELECT 1")
+
+    started = tracer.start_request("PATCH /sessions/{session_id}/complete", **{"http.method": "PATCH"})
+    with tracing.span("route"):
+        work()
+    tracer.finish_request(started, **{"http.status_code": 200})
+
+    spans = {s["name"]: s for s in tracer.buffer.view()["traces"][0]["spans"]}
+    root = spans["PATCH /sessions/{session_id}/complete"]
+    assert spans["route"]["parent_id"] == root["span_id"]
+    assert spans["crud.work"]["parent_id"] == spans["route"]["span_id"]
+    assert spans["db SELECT"]["parent_id"] == spans["crud.work"]["span_id"]
+    assert root["attributes"]["http.status_code"] == 200
+
+    request = json.loads(path.read_text())
+    exported = request["resourceSpans"][0]["scopeSpans"][0]["spans"]
+    assert {s["traceId"] for s in exported} == {started[0].trace.trace_id}
+    assert {"key": "http.status_code", "value": {"intValue": "200"}} in next(
+        s for s in exported if s["kind"] == tracing.SERVER
+    )["attributes"]
+
+
+def test_unsampled_overhead_is_small():
+    @tracing.traced()
+    def noop():
+        pass
+
+    n = 20000
+    started = time.perf_counter()
+    for _ in range(n):
+        noop()
+        tracing.record_statement("SELECT 1", 0.0)
+    # Generous bound so slow CI machines do not flake
+    assert (time.perf_counter() - started) / n < 5e-6
@@ -0,0 +1,109 @@
+import contextvars
+import threading
+
+import pytest
+
+from deepwork.sqlite_store import SQLiteSessionStore
+from deepwork.store import InvalidTransition, SessionNotFound
+from deepwork.writer import SingleWriter, WriterClosed, WriterStore
+
+
+@pytest.fixture
+def store(tmp_path):
+    path = str(tmp_path / "writer.db")
+    store = WriterStore(SQLiteSessionStore(path), SingleWriter(lambda: SQLiteSessionStore(path, wal=True)))
+    yield store
+    store.close()
+
+
+def test_writes_run_on_one_thread_and_reads_see_them(store):
+    session_id = store.create_session("a")["id"]
+    assert store.start_session(session_id)["status"] == "active"
+    assert store.get_session(session_id)["status"] == "active"
+    assert store.writer._thread.name == "session-writer"
+
+
+def test_errors_reach_the_caller(store):
+    with pytest.raises(SessionNotFound):
+        store.start_session("999999")
+    session_id = store.create_session("a")["id"]
+    with pytest.raises(InvalidTransition):
+        store.resume_session(session_id)
+    # The writer keeps going after a failed command
+    assert store.start_session(session_id)["status"] == "active"
+
+
+def test_concurrent_writes_are_applied_in_order(store):
+    session_ids = [store.create_session(f"s{n}")["id"] for n in range(16)]
+
+    def lifecycle(session_id):
+        store.start_session(session_id)
+        store.pause_session(session_id, "x")
+        store.resume_session(session_id)
+        store.complete_session(session_id)
+
+    threads = [threading.Thread(target=lifecycle, args=(i,)) for i in session_ids]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert {store.get_session(i)["status"] for i in session_ids} == {"completed"}
+    assert all(store.get_session(i)["interruption_count"] == 1 for i in session_ids)
+
+
+def test_commands_run_in_the_callers_context(tmp_path):
+    request = contextvars.ContextVar("request", default=None)
+
+    class Recorder:
+        def seen(self):
+            return request.get()
+
+        def close(self):
+            pass
+
+    writer = SingleWriter(Recorder)
+    request.set("GET /")
+    assert writer.call("seen") == "GET /"
+    writer.close()
+    with pytest.raises(WriterClosed):
+        writer.submit("seen")
+
+
+def test_group_commit_shares_a_transaction_and_isolates_failures(tmp_path):
+    path = str(tmp_path / "group.db")
+    store = SQLiteSessionStore(path, wal=True)
+    session_id = store.create_session("a")["id"]
+    with store.group_commit():
+        store.start_session(session_id)
+        with pytest.raises(InvalidTransition):
+            store.resume_session(session_id)
+        store.pause_session(session_id, "x")
+    other = SQLiteSessionStore(path)
+    assert other.get_session(session_id)["status"] == "paused"
+    assert other.get_session(session_id)["interruption_count"] == 1
+    other.close()
+    store.close()
+
+
+def test_grouped_writer_resolves_futures_after_the_shared_commit(tmp_path):
+    path = str(tmp_path / "group.db")
+    writer = SingleWriter(lambda: SQLiteSessionStore(path, wal=True), group_window=0.05, group_size=8)
+    reads = SQLiteSessionStore(path)
+    futures = [writer.submit("create_session", f"s{n}") for n in range(8)]
+    futures.append(writer.submit("start_session", "999999"))
+    created = [future.result() for future in futures[:8]]
+    # Each result is durable once its future resolves
+    assert {s["title"] for s in reads.list_sessions()} == {s["title"] for s in created}
+    with pytest.raises(SessionNotFound):
+        futures[8].result()
+    writer.close()
+    reads.close()
+
+
+def test_from_environ():
+    assert SingleWriter.from_environ(None, {}) is None
+    writer = SingleWriter.from_environ(
+        lambda: SQLiteSessionStore(":memory:"), {"DEEPWORK_GROUP_COMMIT_MS": "2", "DEEPWORK_GROUP_COMMIT_OPS": "16"}
+    )
+    assert (writer.group_window, writer.group_size) == (0.002, 16)
+    writer.close()
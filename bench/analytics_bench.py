@@ -0,0 +1,184 @@
+"""
+Benchmark the vectorized analytics module against the per-row Python loop
+approach used by crud.get_session_history and models.Session.completion_ratio.
+
+Usage:
+    python bench/analytics_bench.py --sessions 1000000
+"""
+
+import argparse
+import datetime
+import os
+import sqlite3
+import sys
+import time
+
+import numpy as np
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'backend'))
+from deepwork import analytics, intervals
+
+STATUSES = ["completed", "overdue", "abandoned", "interrupted", "active", "paused", "scheduled"]
+STATUS_WEIGHTS = [0.55, 0.15, 0.08, 0.07, 0.05, 0.05, 0.05]
+
+SCHEMA = """
+CREATE TABLE sessions (
+    id INTEGER PRIMARY KEY,
+    title VARCHAR NOT NULL,
+    goal TEXT,
+    scheduled_duration INTEGER NOT NULL,
+    start_time DATETIME,
+    end_time DATETIME,
+    status VARCHAR,
+    created_at DATETIME
+);
+CREATE TABLE interruptions (
+    id INTEGER PRIMARY KEY,
+    session_id INTEGER NOT NULL REFERENCES sessions (id),
+    reason VARCHAR NOT NULL,
+    pause_time DATETIME,
+    resume_time DATETIME
+);
+CREATE INDEX ix_interruptions_session_id ON interruptions (session_id);
+"""
+
+
+def populate(conn, n, seed=7):
+    """Insert n sessions (SQLAlchemy model layout) with random durations and pauses"""
+    rng = np.random.default_rng(seed)
+    base = datetime.datetime(2025, 1, 1)
+    offsets = rng.integers(0, 365 * 24 * 3600, n)
+    scheduled = rng.choice([25, 30, 45, 60, 90], n)
+    ratios = rng.lognormal(0.0, 0.25, n)
+    statuses = rng.choice(STATUSES, n, p=STATUS_WEIGHTS)
+    pauses = rng.poisson(1.2, n)
+
+    def fmt(ts):
+        return ts.strftime("%Y-%m-%d %H:%M:%S.%f")
+
+    sessions = []
+    interruptions = []
+    for i in range(n):
+        status = statuses[i]
+        start = end = None
+        if status != "scheduled":
+            start_dt = base + datetime.timedelta(seconds=int(offsets[i]))
+            start = fmt(start_dt)
+            if status in ("completed", "overdue", "abandoned"):
+                end = fmt(start_dt + datetime.timedelta(minutes=float(scheduled[i] * ratios[i])))
+            for k in range(pauses[i]):
+                pause_dt = start_dt + datetime.timedelta(minutes=5 * (k + 1))
+                interruptions.append(
+                    (i + 1, "bench", fmt(pause_dt), fmt(pause_dt + datetime.timedelta(minutes=2)))
+                )
+        sessions.append((i + 1, "bench", None, int(scheduled[i]), start, end, status, start))
+
+    conn.executemany("INSERT INTO sessions VALUES (?, ?, ?, ?, ?, ?, ?, ?)", sessions)
+    conn.executemany(
+        "INSERT INTO interruptions (session_id, reason, pause_time, resume_time) VALUES (?, ?, ?, ?)",
+        interruptions
+    )
+    conn.commit()
+
+
+def crud_loop(conn):
+    """The original crud.get_session_history pattern: one interruptions query per session"""
+    def pauses_for(session_id):
+        return conn.execute(
+            "SELECT pause_time, resume_time FROM interruptions WHERE session_id = ?", (session_id,)
+        ).fetchall()
+    return _loop(conn, pauses_for)
+
+
+def row_loop(conn):
+    """Single pass over both tables, but one Python iteration (and datetime parse) per row"""
+    pauses = {}
+    for session_id, pause_time, resume_time in conn.execute(
+        "SELECT session_id, pause_time, resume_time FROM interruptions"
+    ):
+        pauses.setdefault(session_id, []).append((pause_time, resume_time))
+    return _loop(conn, lambda session_id: pauses.get(session_id, []))
+
+
+def _loop(conn, pauses_for):
+
+    ratios = []
+    overruns = 0
+    sessions_by_hour = [0] * 24
+    pauses_by_hour = [0] * 24
+    for session_id, scheduled, start, end, status in conn.execute(
+        "SELECT id, scheduled_duration, start_time, end_time, status FROM sessions"
+    ):
+        if start:
+            start_dt = datetime.datetime.fromisoformat(start)
+            pauses = pauses_for(session_id)
+            sessions_by_hour[start_dt.hour] += 1
+            pauses_by_hour[start_dt.hour] += len(pauses)
+            if end and scheduled > 0:
+                summary = intervals.summarize(
+                    intervals.to_seconds(start_dt),
+                    intervals.to_seconds(end),
+                    [(intervals.to_seconds(p), intervals.to_seconds(r)) for p, r in pauses]
+                )
+                ratio = summary.focus_seconds / 60 / scheduled
+                ratios.append(ratio)
+                if ratio > analytics.OVERRUN_FACTOR:
+                    overruns += 1
+
+    ratios.sort()
+    percentiles = {}
+    for p in analytics.PERCENTILES:
+        k = (len(ratios) - 1) * p / 100
+        lo = int(k)
+        hi = min(lo + 1, len(ratios) - 1)
+        percentiles[f"p{p}"] = ratios[lo] + (ratios[hi] - ratios[lo]) * (k - lo)
+    pause_rate = [p / s if s else 0.0 for p, s in zip(pauses_by_hour, sessions_by_hour)]
+    return {
+        "completion_ratio": percentiles,
+        "overrun_rate": overruns / len(ratios) if ratios else 0.0,
+        "pause_rate_by_hour": pause_rate,
+    }
+
+
+def timed(fn, *args, repeat=3):
+    best = float("inf")
+    result = None
+    for _ in range(repeat):
+        started = time.perf_counter()
+        result = fn(*args)
+        best = min(best, time.perf_counter() - started)
+    return best, result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--sessions", type=int, default=1_000_000)
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    conn = sqlite3.connect(":memory:")
+    conn.executescript(SCHEMA)
+    started = time.perf_counter()
+    populate(conn, args.sessions)
+    print(f"Generated {args.sessions} sessions in {time.perf_counter() - started:.1f}s")
+
+    load_time, columns = timed(analytics.load_columns, conn, repeat=args.repeat)
+    compute_time, _ = timed(analytics.distributions, columns, repeat=args.repeat)
+    vec_time, vec_result = timed(analytics.session_distributions, conn, repeat=args.repeat)
+    print(f"vectorized:          {vec_time:8.3f}s  (bulk load {load_time:.3f}s, compute {compute_time:.3f}s)")
+    for name, fn in (("row loop", row_loop), ("crud loop (N+1)", crud_loop)):
+        loop_time, loop_result = timed(fn, conn, repeat=args.repeat)
+        for p in analytics.PERCENTILES:
+            key = f"p{p}"
+            assert abs(loop_result["completion_ratio"][key] - vec_result["completion_ratio"][key]) < 1e-3, key
+        assert abs(loop_result["overrun_rate"] - vec_result["overrun_rate"]) < 1e-3
+        assert np.allclose(loop_result["pause_rate_by_hour"], vec_result["pause_rate_by_hour"])
+        print(f"{name + ':':20} {loop_time:8.3f}s  (vectorized is {loop_time / vec_time:.1f}x faster)")
+
+    print("p50/p90/p99 completion ratio:",
+          ", ".join(f"{vec_result['completion_ratio'][f'p{p}']:.3f}" for p in analytics.PERCENTILES))
+    print(f"overrun rate: {vec_result['overrun_rate']:.3f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,71 @@
+"""
+Compare two benchmark result files and flag regressions.
+
+Reads the JSON written by the crud microbenchmarks (pytest-benchmark's
+layout: a "benchmarks" list with per-benchmark "stats"). A benchmark has
+regressed when the chosen statistic grew by more than --threshold; the exit
+status is then 1.
+
+Usage:
+    python bench/compare.py baseline.json current.json
+    python bench/compare.py baseline.json current.json --threshold 0.05 --stat mean
+"""
+
+import argparse
+import json
+import sys
+
+
+def load(path):
+    with open(path) as f:
+        return {b["name"]: b["stats"] for b in json.load(f)["benchmarks"]}
+
+
+def compare(baseline, current, stat="median", threshold=0.1):
+    """(name, old, new, change, status) rows; status is ok/REGRESSION/faster/new/missing"""
+    rows = []
+    for name in sorted(set(baseline) | set(current)):
+        if name not in current:
+            rows.append((name, baseline[name][stat], None, None, "missing"))
+            continue
+        if name not in baseline:
+            rows.append((name, None, current[name][stat], None, "new"))
+            continue
+        old, new = baseline[name][stat], current[name][stat]
+        change = (new - old) / old if old else 0.0
+        if change > threshold:
+            status = "REGRESSION"
+        elif change < -threshold:
+            status = "faster"
+        else:
+            status = "ok"
+        rows.append((name, old, new, change, status))
+    return rows
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("baseline")
+    parser.add_argument("current")
+    parser.add_argument("--stat", default="median", choices=["min", "median", "mean", "max"])
+    parser.add_argument("--threshold", type=float, default=0.1,
+                        help="Relative slowdown that counts as a regression (default 0.1)")
+    args = parser.parse_args(argv)
+
+    rows = compare(load(args.baseline), load(args.current), args.stat, args.threshold)
+    print(f"{'benchmark':<60}{'baseline ms':>13}{'current ms':>13}{'change':>9}  status")
+    for name, old, new, change, status in rows:
+        old_text = f"{old * 1000:.3f}" if old is not None else "-"
+        new_text = f"{new * 1000:.3f}" if new is not None else "-"
+        change_text = f"{change:+.1%}" if change is not None else "-"
+        print(f"{name:<60}{old_text:>13}{new_text:>13}{change_text:>9}  {status}")
+
+    regressions = [row for row in rows if row[4] == "REGRESSION"]
+    if regressions:
+        print(f"\n{len(regressions)} benchmark(s) regressed by more than {args.threshold:.0%} ({args.stat})")
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,199 @@
+"""
+Response bytes and latency per Accept-Encoding on a simulated slow link.
+
+Starts fixed_sqlite_server in-process on a scratch database seeded with
+--sessions finished sessions, behind a local proxy that plays a slow link:
+each new connection and each request are held for the round trip (--rtt-ms)
+and responses are paced at --kbps. Every endpoint is then fetched --repeat times per encoding
+(identity, gzip, and br and zstd when the brotli and zstandard packages are
+installed), and the body is decoded and checked against the identity one.
+
+Results are the bytes on the wire and median and p95 latency per endpoint
+and encoding, with the server's compression on (DEEPWORK_COMPRESSION and
+DEEPWORK_COMPRESS_MIN_BYTES apply as they do to a real server).
+
+Usage:
+    python bench/compression_bench.py
+    python bench/compression_bench.py --sessions 5000 --kbps 1000 --rtt-ms 50 --output compression.json
+    python bench/compression_bench.py --kbps 0 --rtt-ms 0      (no throttling: the CPU cost alone)
+"""
+
+import argparse
+import gzip
+import importlib
+import json
+import os
+import socket
+import statistics
+import sys
+import tempfile
+import threading
+import time
+import urllib.request
+
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..")
+sys.path.insert(0, os.path.join(ROOT, "backend"))
+sys.path.insert(0, ROOT)
+from deepwork import compression
+
+ENDPOINTS = ("/sessions/", "/sessions/history", "/stats/distributions", "/stats/daily-focus?days=30")
+
+DECODERS = {"identity": lambda body: body, "gzip": gzip.decompress}
+if compression.brotli is not None:
+    DECODERS["br"] = compression.brotli.decompress
+if compression.zstandard is not None:
+    DECODERS["zstd"] = lambda body: compression.zstandard.ZstdDecompressor().decompressobj().decompress(body)
+
+CHUNK = 4096
+
+
+class SlowLink:
+    """
+    A local TCP proxy: each new connection (the TCP handshake) and each
+    request are held for the round trip, responses are paced at
+    bytes_per_second (0: unthrottled). connections counts those opened.
+    """
+
+    def __init__(self, upstream, bytes_per_second, rtt):
+        self.upstream = upstream
+        self.bytes_per_second = bytes_per_second
+        self.rtt = rtt
+        self.connections = 0
+        self.listener = socket.create_server(("127.0.0.1", 0), backlog=128)
+        self.address = self.listener.getsockname()
+        threading.Thread(target=self._accept, daemon=True).start()
+
+    def _accept(self):
+        while True:
+            try:
+                client, _ = self.listener.accept()
+            except OSError:
+                return
+            self.connections += 1
+            threading.Thread(target=self._connect, args=(client,), daemon=True).start()
+
+    def _connect(self, client):
+        time.sleep(self.rtt)
+        server = socket.create_connection(self.upstream)
+        for sock in (client, server):
+            sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+        threading.Thread(target=self._pipe, args=(client, server, True), daemon=True).start()
+        self._pipe(server, client, False)
+
+    def _pipe(self, source, target, upstream):
+        try:
+            while True:
+                data = source.recv(CHUNK)
+                if not data:
+                    break
+                if upstream:
+                    time.sleep(self.rtt)
+                elif self.bytes_per_second:
+                    time.sleep(len(data) / self.bytes_per_second)
+                target.sendall(data)
+        except OSError:
+            pass
+        finally:
+            for sock in (source, target):
+                try:
+                    sock.shutdown(socket.SHUT_RDWR)
+                except OSError:
+                    pass
+
+    def close(self):
+        self.listener.close()
+
+
+def seed(store, sessions):
+    for n in range(sessions):
+        session = store.create_session(f"Session {n}", "Benchmark the response encodings", 30)
+        store.start_session(session["id"])
+        if n % 3 == 0:
+            store.pause_session(session["id"], "Slack message")
+            store.resume_session(session["id"])
+        store.complete_session(session["id"])
+
+
+def fetch(url, encoding):
+    request = urllib.request.Request(url, headers={"Accept-Encoding": encoding})
+    started = time.perf_counter()
+    with urllib.request.urlopen(request) as response:
+        body = response.read()
+        sent = response.headers.get("Content-Encoding") or "identity"
+    return time.perf_counter() - started, sent, body
+
+
+def measure(base, endpoint, encoding, repeat):
+    latencies = []
+    for _ in range(repeat):
+        seconds, sent, body = fetch(base + endpoint, encoding)
+        latencies.append(seconds * 1000)
+    latencies.sort()
+    return {
+        "content_encoding": sent,
+        "bytes": len(body),
+        "p50_ms": round(statistics.median(latencies), 2),
+        "p95_ms": round(latencies[min(len(latencies) - 1, int(0.95 * len(latencies)))], 2),
+    }, json.loads(DECODERS[sent](body))
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--sessions", type=int, default=2000, help="Finished sessions in the database")
+    parser.add_argument("--kbps", type=float, default=2000, help="Link bandwidth in kilobits per second (0: unthrottled)")
+    parser.add_argument("--rtt-ms", type=float, default=40, help="Round trip added to every request")
+    parser.add_argument("--repeat", type=int, default=10, help="Fetches per endpoint and encoding")
+    parser.add_argument("--output", help="Write the JSON report here as well")
+    args = parser.parse_args(argv)
+
+    output = os.path.abspath(args.output) if args.output else None
+    # The server opens its database in the working directory
+    os.chdir(tempfile.mkdtemp(prefix="compression-bench-"))
+    server_module = importlib.import_module("fixed_sqlite_server")
+    from deepwork.admission import ThreadingServer
+
+    seed(server_module.STORES[0], args.sessions)
+
+    class QuietHandler(server_module.APIHandler):
+        def log_message(self, *args):
+            pass
+
+    httpd = ThreadingServer(("127.0.0.1", 0), QuietHandler)
+    threading.Thread(target=httpd.serve_forever, daemon=True).start()
+    link = SlowLink(httpd.server_address, args.kbps * 1000 / 8, args.rtt_ms / 1000)
+    base = f"http://{link.address[0]}:{link.address[1]}"
+
+    results = {}
+    try:
+        for endpoint in ENDPOINTS:
+            results[endpoint] = {}
+            expected = None
+            for encoding in DECODERS:
+                result, decoded = measure(base, endpoint, encoding, args.repeat)
+                if expected is None:
+                    expected = decoded
+                elif decoded != expected:
+                    raise SystemExit(f"{endpoint}: the {encoding} body does not decode to the identity one")
+                results[endpoint][encoding] = result
+                print(f"{endpoint:<28} {encoding:<9} -> {result['content_encoding']:<9} "
+                      f"{result['bytes']:>10} B {result['p50_ms']:>9.1f} ms p50 {result['p95_ms']:>9.1f} ms p95")
+    finally:
+        link.close()
+        httpd.shutdown()
+        httpd.server_close()
+
+    report = {
+        "sessions": args.sessions,
+        "kbps": args.kbps,
+        "rtt_ms": args.rtt_ms,
+        "min_bytes": server_module.COMPRESSION.min_size if server_module.COMPRESSION else None,
+        "endpoints": results,
+    }
+    if output:
+        with open(output, "w") as f:
+            json.dump(report, f, indent=2)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
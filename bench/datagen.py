@@ -0,0 +1,351 @@
+"""
+Deterministic synthetic session data at capacity-testing scale.
+
+Sessions are generated column-wise with NumPy from one seed, with
+realistic shapes:
+- created_at: weekday-heavy days and a morning/afternoon peak
+- scheduled durations: the usual 25-90 minute blocks
+- focus ratios: log-normal around the plan, so about 15% overrun into
+  overdue
+- pause counts: Poisson, higher in the afternoon, with exponential pause
+  lengths
+- statuses: all seven, each in a consistent state. Interrupted sessions
+  have their 4th pause open; abandoned ones were completed while paused;
+  active/paused ones have no end.
+
+Rows are written with executemany in large chunks inside one transaction,
+into either the SQLAlchemy models' tables or the stdlib servers' tables
+(integer keys, epoch-millisecond timestamps). The daily_focus rollup is then
+rebuilt from the rows. Wall-clock times are generated as UTC.
+
+Usage:
+    python bench/datagen.py --schema stdlib --sessions 1000000 --db bench.db
+    python bench/datagen.py --schema orm --sessions 1000000 --db deepwork.db --seed 7 --replace
+"""
+
+import argparse
+import os
+import sqlite3
+import sys
+import time
+
+import numpy as np
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'backend'))
+from deepwork import rollup
+from deepwork.sqlite_store import create_schema
+from deepwork.store import OVERRUN_FACTOR
+
+STATUS_WEIGHTS = {
+    "completed": 0.55,
+    "overdue": 0.12,
+    "abandoned": 0.07,
+    "interrupted": 0.06,
+    "active": 0.04,
+    "paused": 0.03,
+    "scheduled": 0.13,
+}
+
+DURATIONS = [25, 30, 45, 50, 60, 90]
+DURATION_WEIGHTS = [0.2, 0.15, 0.2, 0.1, 0.25, 0.1]
+
+# Sessions started per hour of the day (relative): a morning and an
+# afternoon peak with a lunch dip
+HOUR_WEIGHTS = [
+    0.2, 0.1, 0.05, 0.05, 0.05, 0.1, 0.4, 1.2, 3.0, 4.5, 4.8, 3.8,
+    2.0, 2.8, 4.0, 4.2, 3.5, 2.4, 1.4, 1.1, 1.0, 0.9, 0.6, 0.4,
+]
+
+# Relative volume Monday..Sunday
+WEEKDAY_WEIGHTS = [1.0, 1.05, 1.05, 1.0, 0.85, 0.25, 0.2]
+
+# Mean pauses per session by hour, rising through the afternoon
+PAUSE_RATE_BY_HOUR = np.array([0.6] * 12 + [0.9, 1.1, 1.3, 1.4, 1.5, 1.4] + [1.0] * 6)
+
+MEAN_PAUSE_MINUTES = 4.0
+MEAN_START_DELAY_MINUTES = 20.0
+
+TITLES = ["Deep work", "Write report", "Code review", "Research", "Study", "Design doc",
+          "Refactoring", "Planning", "Reading", "Bug triage"]
+GOALS = ["Finish first draft", "Close open issues", "Outline chapter", "Ship feature", None]
+REASONS = ["Phone call", "Slack message", "Meeting", "Colleague question", "Coffee break",
+           "Email", "Notification", "Other"]
+
+# Rows per executemany call
+CHUNK = 200_000
+
+MS_PER_MINUTE = 60_000
+
+
+def generate(n, seed=42, start_day="2025-01-01", days=365):
+    """
+    Column arrays for n sessions and their interruptions.
+
+    Times are int64 UTC epoch milliseconds; -1 marks a missing value.
+    Sessions are sorted by created_at.
+    """
+    rng = np.random.default_rng(seed)
+    first_day = np.datetime64(start_day, "D")
+
+    # Days weighted by weekday, then hour of day, then a uniform offset
+    day_offsets = np.arange(days)
+    # 1970-01-01 was a Thursday
+    weekday = (day_offsets + first_day.astype("int64") + 3) % 7
+    day_p = np.array(WEEKDAY_WEIGHTS)[weekday]
+    day = rng.choice(days, n, p=day_p / day_p.sum())
+    hour_p = np.array(HOUR_WEIGHTS) / sum(HOUR_WEIGHTS)
+    hour = rng.choice(24, n, p=hour_p)
+    first_ms = first_day.astype("datetime64[ms]").view("int64")
+    created = (first_ms + day * 86_400_000 + hour * 3_600_000
+               + rng.integers(0, 3_600_000, n)).astype(np.int64)
+    order = np.argsort(created, kind="stable")
+    created, hour = created[order], hour[order]
+
+    status_names = list(STATUS_WEIGHTS)
+    status_p = np.array(list(STATUS_WEIGHTS.values()))
+    status = np.array(status_names)[rng.choice(len(status_names), n, p=status_p / status_p.sum())]
+    scheduled = np.array(DURATIONS)[rng.choice(len(DURATIONS), n, p=DURATION_WEIGHTS)]
+
+    started_mask = status != "scheduled"
+    start = np.where(
+        started_mask,
+        created + (rng.exponential(MEAN_START_DELAY_MINUTES, n) * MS_PER_MINUTE).astype(np.int64),
+        -1,
+    )
+
+    # Focused minutes: within the overrun threshold for completed, beyond it
+    # for overdue, partial for sessions that did not finish normally
+    ratio = np.clip(rng.lognormal(-0.05, 0.12, n), 0.3, OVERRUN_FACTOR - 0.001)
+    ratio = np.where(status == "overdue", rng.uniform(OVERRUN_FACTOR + 0.01, 1.8, n), ratio)
+    unfinished = np.isin(status, ["abandoned", "interrupted", "active", "paused"])
+    ratio = np.where(unfinished, rng.uniform(0.05, 0.9, n), ratio)
+    focus_ms = np.where(started_mask, ratio * scheduled * MS_PER_MINUTE, 0).astype(np.int64)
+
+    # Pause counts consistent with the status
+    pauses = rng.poisson(PAUSE_RATE_BY_HOUR[hour])
+    pauses = np.where(status == "interrupted", 4, np.minimum(pauses, 3))
+    pauses = np.where(np.isin(status, ["paused", "abandoned"]), np.maximum(pauses, 1), pauses)
+    pauses = np.where(started_mask, pauses, 0)
+    open_last = np.isin(status, ["paused", "interrupted", "abandoned"])
+
+    # One row per pause: owner session and index within the session
+    total = int(pauses.sum())
+    owner = np.repeat(np.arange(n), pauses)
+    first = np.cumsum(pauses) - pauses
+    k = np.arange(total) - first[owner]
+    count = pauses[owner]
+    pause_len = np.maximum(rng.exponential(MEAN_PAUSE_MINUTES, total), 0.25) * MS_PER_MINUTE
+    pause_len = pause_len.astype(np.int64)
+    # Focus before pause k is evenly spread with jitter; an open last pause
+    # comes after all of the session's focus
+    slots = np.where(open_last[owner], count, count + 1)
+    fraction = (k + 1 + rng.uniform(-0.4, 0.4, total)) / slots
+    fraction = np.where(open_last[owner] & (k == count - 1), 1.0, np.minimum(fraction, 1.0))
+    paused_before = np.cumsum(pause_len) - pause_len - (np.cumsum(pause_len) - pause_len)[first[owner]]
+    pause_start = start[owner] + (focus_ms[owner] * fraction).astype(np.int64) + paused_before
+    is_open = open_last[owner] & (k == count - 1)
+    pause_end = np.where(is_open, -1, pause_start + pause_len)
+
+    # Ends: focus plus closed pauses, or the moment an abandoned session was
+    # completed while its last pause was open
+    pause_total = np.bincount(owner, weights=np.where(is_open, 0, pause_len), minlength=n).astype(np.int64)
+    last_pause_start = np.full(n, -1, dtype=np.int64)
+    last_pause_start[owner[is_open]] = pause_start[is_open]
+    open_len = np.zeros(n, dtype=np.int64)
+    open_len[owner[is_open]] = pause_len[is_open]
+    end = np.full(n, -1, dtype=np.int64)
+    done = np.isin(status, ["completed", "overdue"])
+    end = np.where(done, start + focus_ms + pause_total, end)
+    end = np.where(status == "abandoned", last_pause_start + open_len, end)
+    paused_at = np.where(np.isin(status, ["paused", "interrupted"]), last_pause_start, -1)
+    actual = np.where(end >= 0, np.maximum(0, np.round(focus_ms / MS_PER_MINUTE)), -1).astype(np.int64)
+
+    return {
+        "sessions": {
+            "title": np.array(TITLES, dtype=object)[rng.integers(0, len(TITLES), n)],
+            "goal": np.array(GOALS, dtype=object)[rng.integers(0, len(GOALS), n)],
+            "status": status,
+            "scheduled_duration": scheduled,
+            "created_at": created,
+            "start_time": start,
+            "paused_at": paused_at,
+            "end_time": end,
+            "actual_duration": actual,
+            "interruption_count": pauses,
+        },
+        "interruptions": {
+            "session_index": owner,
+            "reason": np.array(REASONS, dtype=object)[rng.integers(0, len(REASONS), total)],
+            "pause_time": pause_start,
+            "resume_time": pause_end,
+        },
+        "seed": seed,
+    }
+
+
+def public_ids(rng, n):
+    """n random UUID4s as 16-byte values"""
+    raw = rng.integers(0, 256, (n, 16), dtype=np.uint8)
+    raw[:, 6] = (raw[:, 6] & 0x0F) | 0x40
+    raw[:, 8] = (raw[:, 8] & 0x3F) | 0x80
+    flat = raw.tobytes()
+    return [flat[i * 16:(i + 1) * 16] for i in range(n)]
+
+
+def orm_times(ms):
+    """Epoch milliseconds as SQLAlchemy's SQLite DateTime text ('' for missing)"""
+    text = np.datetime_as_string(ms.astype("datetime64[ms]"), unit="us")
+    text = np.char.replace(text.astype(str), "T", " ")
+    return np.where(ms >= 0, text, "")
+
+
+def _chunks(columns, size=CHUNK):
+    n = len(columns[0])
+    for begin in range(0, n, size):
+        yield zip(*(column[begin:begin + size] for column in columns))
+
+
+def _bulk_session(conn):
+    # Durable enough for generated data, and several times faster to load
+    conn.execute("PRAGMA journal_mode = MEMORY")
+    conn.execute("PRAGMA synchronous = OFF")
+
+
+def write_stdlib(conn, data):
+    """Insert generated rows into the stdlib servers' tables"""
+    create_schema(conn)
+    _bulk_session(conn)
+    s, i = data["sessions"], data["interruptions"]
+    n = len(s["status"])
+    rng = np.random.default_rng(data["seed"] + 1)
+    with conn:
+        first_id = (conn.execute("SELECT COALESCE(MAX(id), 0) FROM sessions").fetchone()[0]) + 1
+        session_ids = np.arange(first_id, first_id + n)
+        columns = [
+            session_ids.tolist(), public_ids(rng, n), s["title"].tolist(), s["goal"].tolist(),
+            s["status"].tolist(), s["scheduled_duration"].tolist(), s["created_at"].tolist(),
+            s["start_time"].tolist(), s["paused_at"].tolist(), s["end_time"].tolist(),
+            s["actual_duration"].tolist(), s["interruption_count"].tolist(),
+        ]
+        for rows in _chunks(columns):
+            conn.executemany(
+                "INSERT INTO sessions (id, public_id, title, goal, status, scheduled_duration, "
+                "created_at, started_at, paused_at, completed_at, actual_duration, interruption_count) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?, NULLIF(?, -1), NULLIF(?, -1), NULLIF(?, -1), "
+                "NULLIF(?, -1), ?)",
+                rows
+            )
+        total = len(i["reason"])
+        columns = [
+            public_ids(rng, total), session_ids[i["session_index"]].tolist(), i["reason"].tolist(),
+            i["pause_time"].tolist(), i["resume_time"].tolist(),
+        ]
+        for rows in _chunks(columns):
+            conn.executemany(
+                "INSERT INTO interruptions (public_id, session_id, reason, start_time, end_time) "
+                "VALUES (?, ?, ?, ?, NULLIF(?, -1))",
+                rows
+            )
+    return n, total
+
+
+def write_orm(conn, data):
+    """
+    Insert generated rows into the SQLAlchemy models' tables.
+
+    Missing tables are created by the models; an in-memory database must
+    already have them.
+    """
+    from app.models.models import Base
+    from sqlalchemy import create_engine
+
+    # Let the models create their own tables (constraints and indexes included)
+    path = conn.execute("PRAGMA database_list").fetchone()[2]
+    if path:
+        engine = create_engine(f"sqlite:///{path}")
+        Base.metadata.create_all(bind=engine)
+        engine.dispose()
+    _bulk_session(conn)
+    s, i = data["sessions"], data["interruptions"]
+    n = len(s["status"])
+    with conn:
+        first_id = (conn.execute("SELECT COALESCE(MAX(id), 0) FROM sessions").fetchone()[0]) + 1
+        session_ids = np.arange(first_id, first_id + n)
+        columns = [
+            session_ids.tolist(), s["title"].tolist(), s["goal"].tolist(),
+            s["scheduled_duration"].tolist(), orm_times(s["start_time"]).tolist(),
+            orm_times(s["end_time"]).tolist(), s["status"].tolist(), orm_times(s["created_at"]).tolist(),
+        ]
+        for rows in _chunks(columns):
+            conn.executemany(
+                "INSERT INTO sessions (id, title, goal, scheduled_duration, start_time, end_time, "
+                "status, created_at) VALUES (?, ?, ?, ?, NULLIF(?, ''), NULLIF(?, ''), ?, ?)",
+                rows
+            )
+        total = len(i["reason"])
+        columns = [
+            session_ids[i["session_index"]].tolist(), i["reason"].tolist(),
+            orm_times(i["pause_time"]).tolist(), orm_times(i["resume_time"]).tolist(),
+        ]
+        for rows in _chunks(columns):
+            conn.executemany(
+                "INSERT INTO interruptions (session_id, reason, pause_time, resume_time) "
+                "VALUES (?, ?, ?, NULLIF(?, ''))",
+                rows
+            )
+    return n, total
+
+
+WRITERS = {"stdlib": write_stdlib, "orm": write_orm}
+
+
+def populate(path, n, schema="stdlib", seed=42, start_day="2025-01-01", days=365):
+    """Generate n sessions into the database at path and rebuild its rollup"""
+    data = generate(n, seed, start_day, days)
+    conn = sqlite3.connect(path)
+    try:
+        counts = WRITERS[schema](conn, data)
+        rollup.rebuild(conn)
+    finally:
+        conn.close()
+    return counts
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--schema", choices=WRITERS, default="stdlib",
+                        help="stdlib servers' tables or the SQLAlchemy models' tables")
+    parser.add_argument("--sessions", type=int, default=1_000_000)
+    parser.add_argument("--db", default="bench.db", help="SQLite database file")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--start-day", default="2025-01-01", help="First day of created_at (YYYY-MM-DD)")
+    parser.add_argument("--days", type=int, default=365, help="Days of history to spread sessions over")
+    parser.add_argument("--replace", action="store_true", help="Delete the database file first")
+    args = parser.parse_args(argv)
+
+    if args.replace and os.path.exists(args.db):
+        os.remove(args.db)
+    elif os.path.exists(args.db):
+        conn = sqlite3.connect(args.db)
+        try:
+            has_sessions = conn.execute(
+                "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'sessions'"
+            ).fetchone() and conn.execute("SELECT 1 FROM sessions LIMIT 1").fetchone()
+        finally:
+            conn.close()
+        if has_sessions:
+            print(f"{args.db} already has sessions; use --replace to start over", file=sys.stderr)
+            return 1
+
+    started = time.perf_counter()
+    sessions, interruptions = populate(
+        args.db, args.sessions, args.schema, args.seed, args.start_day, args.days
+    )
+    elapsed = time.perf_counter() - started
+    print(f"Wrote {sessions:,} sessions and {interruptions:,} interruptions to {args.db} "
+          f"({args.schema} schema) in {elapsed:.1f}s")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
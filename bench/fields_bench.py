@@ -0,0 +1,164 @@
+"""
+Payload size and latency of the session endpoints per ?fields= / ?include=.
+
+Seeds --sessions sessions (a third of them paused once) into the stdlib
+server (fixed_sqlite_server, in-process over HTTP, behind the slow-link
+proxy of compression_bench when --kbps or --rtt-ms are given) and into the
+FastAPI app (in-process through its TestClient), then fetches the session
+list (first --limit sessions for the FastAPI app, which pages) and one
+paused session --repeat times per variant:
+
+- full: every field, no interruptions (the default)
+- fields: ?fields=id,status,title, the projection a live-session list needs
+- include: every field and ?include=interruptions
+
+Results are the response bytes and median and p95 latency per server,
+endpoint and variant. Responses are requested with --accept-encoding
+(identity by default, so the sizes are the JSON itself).
+
+Usage:
+    python bench/fields_bench.py
+    python bench/fields_bench.py --sessions 5000 --repeat 20 --output fields.json
+    python bench/fields_bench.py --kbps 2000 --rtt-ms 40      (a slow link in front of the stdlib server)
+"""
+
+import argparse
+import json
+import os
+import statistics
+import sys
+import tempfile
+import threading
+import time
+import urllib.request
+
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..")
+sys.path.insert(0, os.path.join(ROOT, "backend"))
+sys.path.insert(0, ROOT)
+from compression_bench import SlowLink, seed
+
+VARIANTS = {
+    "full": "",
+    "fields": "fields=id,status,title",
+    "include": "include=interruptions",
+}
+
+
+def percentile(ordered, fraction):
+    return ordered[min(len(ordered) - 1, int(fraction * len(ordered)))]
+
+
+def measure(fetch, repeat):
+    """fetch() -> body, timed repeat times after a warm-up fetch"""
+    fetch()
+    latencies = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        body = fetch()
+        latencies.append((time.perf_counter() - started) * 1000)
+    latencies.sort()
+    return {
+        "bytes": len(body),
+        "p50_ms": round(statistics.median(latencies), 2),
+        "p95_ms": round(percentile(latencies, 0.95), 2),
+    }
+
+
+def paused_once(store):
+    """Id of a recent session with an interruption (seed pauses every third one)"""
+    return next(s["id"] for s in store.list_sessions(limit=3) if s["interruption_count"])
+
+
+def stdlib_server(sessions, kbps, rtt_ms):
+    """Base URL of a seeded fixed_sqlite_server, a session id and a stop function"""
+    import fixed_sqlite_server
+    from deepwork.admission import ThreadingServer
+
+    store = fixed_sqlite_server.STORES[0]
+    seed(store, sessions)
+
+    class QuietHandler(fixed_sqlite_server.APIHandler):
+        def log_message(self, *args):
+            pass
+
+    httpd = ThreadingServer(("127.0.0.1", 0), QuietHandler)
+    threading.Thread(target=httpd.serve_forever, daemon=True).start()
+    address, link = httpd.server_address, None
+    if kbps or rtt_ms:
+        link = SlowLink(address, kbps * 1000 / 8, rtt_ms / 1000)
+        address = link.address
+
+    def stop():
+        if link:
+            link.close()
+        httpd.shutdown()
+        httpd.server_close()
+
+    return f"http://{address[0]}:{address[1]}", paused_once(store), stop
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--sessions", type=int, default=2000, help="Sessions in each database")
+    parser.add_argument("--limit", type=int, default=100, help="Page size of the FastAPI session list")
+    parser.add_argument("--repeat", type=int, default=20, help="Fetches per endpoint and variant")
+    parser.add_argument("--kbps", type=float, default=0, help="Stdlib link bandwidth in kilobits per second (0: unthrottled)")
+    parser.add_argument("--rtt-ms", type=float, default=0, help="Round trip added to every stdlib request")
+    parser.add_argument("--accept-encoding", default="identity", help="Accept-Encoding of every request")
+    parser.add_argument("--output", help="Write the JSON report here as well")
+    args = parser.parse_args(argv)
+
+    output = os.path.abspath(args.output) if args.output else None
+    # Both servers open their databases in the working directory
+    os.chdir(tempfile.mkdtemp(prefix="fields-bench-"))
+    from fastapi.testclient import TestClient
+    from sqlalchemy import create_engine
+    from sqlalchemy.orm import sessionmaker
+    from app.main import create_app
+    from app.store import SQLAlchemySessionStore
+
+    headers = {"Accept-Encoding": args.accept_encoding}
+    results = {}
+
+    def report(server, endpoint, variant, result):
+        results.setdefault(server, {}).setdefault(endpoint, {})[variant] = result
+        print(f"{server:<8} {endpoint:<16} {variant:<8} {result['bytes']:>10} B "
+              f"{result['p50_ms']:>9.2f} ms p50 {result['p95_ms']:>9.2f} ms p95")
+
+    base, session_id, stop = stdlib_server(args.sessions, args.kbps, args.rtt_ms)
+    try:
+        for endpoint, path in (("/sessions/", "/sessions/"), ("/sessions/{id}", f"/sessions/{session_id}")):
+            for variant, query in VARIANTS.items():
+                url = f"{base}{path}?{query}"
+
+                def fetch():
+                    with urllib.request.urlopen(urllib.request.Request(url, headers=headers)) as response:
+                        return response.read()
+
+                report("stdlib", endpoint, variant, measure(fetch, args.repeat))
+    finally:
+        stop()
+
+    url = "sqlite:///./fastapi.db"
+    with TestClient(create_app(create_schema=True, database_url=url)) as client:
+        db = sessionmaker(bind=create_engine(url))()
+        store = SQLAlchemySessionStore(db)
+        seed(store, args.sessions)
+        session_id = paused_once(store)
+        db.close()
+        for endpoint, path in (("/sessions/", f"/sessions/?limit={args.limit}&"), ("/sessions/{id}", f"/sessions/{session_id}?")):
+            for variant, query in VARIANTS.items():
+                report("fastapi", endpoint, variant,
+                       measure(lambda: client.get(path + query, headers=headers).content, args.repeat))
+
+    if output:
+        with open(output, "w") as f:
+            json.dump({
+                "sessions": args.sessions, "limit": args.limit, "kbps": args.kbps, "rtt_ms": args.rtt_ms,
+                "accept_encoding": args.accept_encoding, "results": results,
+            }, f, indent=2)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
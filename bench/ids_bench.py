@@ -0,0 +1,141 @@
+"""
+Benchmark TEXT uuid4 primary keys against INTEGER PRIMARY KEY rowids with
+a 16-byte public_id in the stdlib servers' schema.
+
+One database is populated with the TEXT uuid layout, copied, and migrated
+in place with deepwork.ids.migrate; lookups and joins are then timed on
+both, using the queries the servers run.
+
+Usage:
+    python bench/ids_bench.py --sessions 200000
+"""
+
+import argparse
+import os
+import random
+import shutil
+import sqlite3
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'backend'))
+from deepwork import ids
+from timestamps_bench import populate
+
+HISTORY_STATUSES = "('completed', 'interrupted', 'abandoned', 'overdue')"
+
+WORKLOADS = {
+    ids.LEGACY: {
+        "lookup": "SELECT * FROM sessions WHERE id = ?",
+        "interruptions": "SELECT * FROM interruptions WHERE session_id = ?",
+        "history_join": f"""
+            SELECT i.session_id, i.start_time, i.end_time
+            FROM interruptions i JOIN sessions s ON s.id = i.session_id
+            WHERE s.status IN {HISTORY_STATUSES}
+        """,
+        "count_by_session": "SELECT session_id, COUNT(*) FROM interruptions GROUP BY session_id",
+    },
+    ids.COMPACT: {
+        "lookup": "SELECT * FROM sessions WHERE public_id = ?",
+        "interruptions": """
+            SELECT i.*, s.public_id AS session_public_id
+            FROM interruptions i JOIN sessions s ON s.id = i.session_id
+            WHERE s.public_id = ?
+        """,
+        "history_join": f"""
+            SELECT i.session_id, i.start_time, i.end_time
+            FROM interruptions i JOIN sessions s ON s.id = i.session_id
+            WHERE s.status IN {HISTORY_STATUSES}
+        """,
+        "count_by_session": "SELECT session_id, COUNT(*) FROM interruptions GROUP BY session_id",
+    },
+}
+
+# Keyed workloads run once per sampled id; the rest run over the whole table
+KEYED = ("lookup", "interruptions")
+
+
+def time_workload(conn, sql, keys, repeat):
+    best = float("inf")
+    for _ in range(repeat):
+        started = time.perf_counter()
+        if keys is None:
+            conn.execute(sql).fetchall()
+        else:
+            for key in keys:
+                conn.execute(sql, (key,)).fetchall()
+        best = min(best, time.perf_counter() - started)
+    return best
+
+
+def index_bytes(conn):
+    """Bytes used by indexes, if SQLite was built with the dbstat table"""
+    try:
+        row = conn.execute(
+            "SELECT SUM(pgsize) FROM dbstat WHERE name IN "
+            "(SELECT name FROM sqlite_master WHERE type = 'index')"
+        ).fetchone()
+    except sqlite3.OperationalError:
+        return None
+    return row[0] or 0
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--sessions", type=int, default=200000)
+    parser.add_argument("--lookups", type=int, default=20000)
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    workdir = tempfile.mkdtemp(prefix="ids_bench_")
+    try:
+        legacy_path = os.path.join(workdir, "text_uuid.db")
+        compact_path = os.path.join(workdir, "integer.db")
+        print(f"Populating {args.sessions} sessions...")
+        populate(legacy_path, args.sessions)
+        shutil.copy(legacy_path, compact_path)
+
+        conn = sqlite3.connect(compact_path)
+        started = time.perf_counter()
+        ids.migrate(conn)
+        print(f"migrate text_uuid -> integer: {time.perf_counter() - started:.2f}s")
+        conn.execute("VACUUM")
+        conn.close()
+        conn = sqlite3.connect(legacy_path)
+        conn.execute("VACUUM")
+        sample = [row[0] for row in conn.execute("SELECT id FROM sessions")]
+        conn.close()
+        # Same sessions on both sides, looked up by the id the API exposes
+        sample = random.Random(11).sample(sample, min(args.lookups, len(sample)))
+
+        results = {}
+        for path in (legacy_path, compact_path):
+            conn = sqlite3.connect(path)
+            layout = ids.detect_layout(conn)
+            keys = sample if layout == ids.LEGACY else [ids.parse(key) for key in sample]
+            results[layout] = {
+                name: time_workload(conn, sql, keys if name in KEYED else None, args.repeat)
+                for name, sql in WORKLOADS[layout].items()
+            }
+            results[layout]["file_mb"] = os.path.getsize(path) / 1e6
+            results[layout]["index_mb"] = (index_bytes(conn) or 0) / 1e6
+            conn.close()
+
+        legacy, compact = results[ids.LEGACY], results[ids.COMPACT]
+        print(f"{'workload':<20}{'text_uuid':>12}{'integer':>12}{'speedup':>10}")
+        for name in legacy:
+            if name.endswith("_mb"):
+                label = "file size (MB)" if name == "file_mb" else "index size (MB)"
+                ratio = legacy[name] / compact[name] if compact[name] else float("nan")
+                print(f"{label:<20}{legacy[name]:>12.1f}{compact[name]:>12.1f}{ratio:>9.2f}x")
+            else:
+                label = f"{name} x{len(sample)}" if name in KEYED else name
+                print(f"{label:<20}{legacy[name] * 1000:>10.1f}ms{compact[name] * 1000:>10.1f}ms"
+                      f"{legacy[name] / compact[name]:>9.2f}x")
+    finally:
+        shutil.rmtree(workdir)
+
+
+if __name__ == "__main__":
+    main()
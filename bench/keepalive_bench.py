@@ -0,0 +1,143 @@
+"""
+SDK lifecycle scripts with and without connection reuse.
+
+Starts fixed_sqlite_server in-process on a scratch database, behind the
+slow-link proxy of compression_bench (each new connection and each request
+held for --rtt-ms), and runs --workers threads, each running SDK scripts
+that take a session through its lifecycle (create, start, pause, resume,
+complete, then read it back) in one of these modes:
+
+- http10: the server without keep-alive (DEEPWORK_KEEPALIVE=off), so every
+  request opens a new connection whatever the client does
+- close: the server with keep-alive, the client sending Connection: close
+  (a fresh connection per call, as clients without a session pool do)
+- reuse: the server with keep-alive and the SDK's ApiClient as it is, its
+  requests.Session keeping one connection per worker
+
+Results per mode are scripts per second, script latency percentiles and
+the connections opened per script.
+
+Usage:
+    python bench/keepalive_bench.py
+    python bench/keepalive_bench.py --workers 1 8 --scripts 50 --rtt-ms 20 --output keepalive.json
+    python bench/keepalive_bench.py --rtt-ms 0      (loopback: the handshake and thread start alone)
+"""
+
+import argparse
+import json
+import os
+import sys
+import tempfile
+import threading
+import time
+
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..")
+sys.path.insert(0, os.path.join(ROOT, "backend"))
+sys.path.insert(0, ROOT)
+from compression_bench import SlowLink
+from deepwork import keepalive
+from deepwork.admission import ThreadingServer
+from deepwork_sdk import ApiClient
+from deepwork_sdk.api.sessions_api import SessionsApi
+
+MODES = ("http10", "close", "reuse")
+
+
+def percentile(ordered, fraction):
+    return ordered[min(len(ordered) - 1, int(fraction * len(ordered)))]
+
+
+def lifecycle(api, n):
+    session = api.create_session(f"Session {n}", "Benchmark connection reuse", 30)
+    api.start_session(session["id"])
+    api.pause_session(session["id"], "Slack message")
+    api.resume_session(session["id"])
+    api.complete_session(session["id"])
+    return api.get_session(session["id"])
+
+
+def run(base, mode, workers, scripts):
+    latencies = []
+
+    def worker(w):
+        client = ApiClient(base)
+        if mode == "close":
+            client.session.headers["Connection"] = "close"
+        api = SessionsApi(client)
+        for n in range(scripts):
+            started = time.perf_counter()
+            lifecycle(api, n)
+            latencies.append(time.perf_counter() - started)
+        client.session.close()
+
+    threads = [threading.Thread(target=worker, args=(w,)) for w in range(workers)]
+    started = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return time.perf_counter() - started, sorted(latencies)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--modes", nargs="+", choices=MODES, default=list(MODES))
+    parser.add_argument("--workers", type=int, nargs="+", default=[1, 8], help="Scripts run at once")
+    parser.add_argument("--scripts", type=int, default=30, help="Lifecycle scripts per worker")
+    parser.add_argument("--rtt-ms", type=float, default=10, help="Round trip added to every connection and request")
+    parser.add_argument("--output", help="Write the JSON report here as well")
+    args = parser.parse_args(argv)
+
+    output = os.path.abspath(args.output) if args.output else None
+    # The server opens its database in the working directory; it is imported
+    # without keep-alive, which is then added around its handler
+    os.chdir(tempfile.mkdtemp(prefix="keepalive-bench-"))
+    os.environ["DEEPWORK_KEEPALIVE"] = "off"
+    import fixed_sqlite_server
+
+    class QuietHandler(fixed_sqlite_server.APIHandler):
+        def log_message(self, *args):
+            pass
+
+    handlers = {
+        "http10": QuietHandler,
+        "close": keepalive.instrument_handler(QuietHandler, keepalive.KeepAlive()),
+        "reuse": keepalive.instrument_handler(QuietHandler, keepalive.KeepAlive()),
+    }
+
+    results = []
+    for mode in args.modes:
+        httpd = ThreadingServer(("127.0.0.1", 0), handlers[mode])
+        threading.Thread(target=httpd.serve_forever, daemon=True).start()
+        link = SlowLink(httpd.server_address, 0, args.rtt_ms / 1000)
+        base = f"http://{link.address[0]}:{link.address[1]}"
+        try:
+            for workers in args.workers:
+                opened = link.connections
+                elapsed, latencies = run(base, mode, workers, args.scripts)
+                result = {
+                    "mode": mode,
+                    "workers": workers,
+                    "scripts_per_s": round(len(latencies) / elapsed, 1),
+                    "p50_ms": round(percentile(latencies, 0.5) * 1000, 1),
+                    "p95_ms": round(percentile(latencies, 0.95) * 1000, 1),
+                    "p99_ms": round(percentile(latencies, 0.99) * 1000, 1),
+                    "connections_per_script": round((link.connections - opened) / len(latencies), 2),
+                }
+                results.append(result)
+                print(f"{mode:<7} {workers:>3} workers {result['scripts_per_s']:>8.1f} scripts/s "
+                      f"p50 {result['p50_ms']:>7.1f} ms p95 {result['p95_ms']:>7.1f} ms "
+                      f"p99 {result['p99_ms']:>7.1f} ms {result['connections_per_script']:>5.2f} connections/script")
+        finally:
+            link.close()
+            httpd.shutdown()
+            httpd.server_close()
+
+    if output:
+        with open(output, "w") as f:
+            json.dump({"rtt_ms": args.rtt_ms, "scripts": args.scripts, "results": results}, f, indent=2)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,403 @@
+"""
+Load generator for the session lifecycle against any of the servers.
+
+Simulated users walk sessions through create -> start -> pause/resume ->
+complete and mix in history, list and single-session reads. Two arrival
+models are supported:
+
+- closed: --users users each send a request, wait --think seconds and send
+  the next, so the offered load adapts to the server's speed
+- open: requests arrive as a Poisson process at --rate per second whatever
+  the server does; --users workers serve them, and latency is measured from
+  the scheduled arrival, so queueing delay is included
+
+Every user sends its own X-User-Id, so with --shards N a spawned server
+splits their sessions across N database files (see deepwork.shards).
+
+Latency percentiles and RPS per endpoint are written as JSON. A run can be
+saved as a baseline and later runs checked against it; the exit status is
+1 if any endpoint regressed beyond --tolerance.
+
+Usage:
+    python bench/loadgen.py --target fixed_sqlite --spawn --duration 20
+    python bench/loadgen.py --target fastapi --url http://localhost:8000 --arrival open --rate 200
+    python bench/loadgen.py --target fastapi --spawn --mix write-heavy --users 32 --shards 4
+    python bench/loadgen.py --target minimal --spawn --mix read-heavy --save-baseline bench/baselines/minimal.json
+    python bench/loadgen.py --target minimal --spawn --mix read-heavy --baseline bench/baselines/minimal.json
+"""
+
+import argparse
+import http.client
+import json
+import os
+import queue
+import random
+import shutil
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import urllib.parse
+
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..')
+
+# How each front end is started and how it takes a pause reason. The
+# stdlib servers listen on their own fixed port.
+TARGETS = {
+    "fastapi": {
+        "command": [sys.executable, "-m", "uvicorn", "--app-dir", os.path.join(ROOT, "backend"),
+                    "app.main:app", "--port", "8000", "--log-level", "warning"],
+        # A spawned server starts on an empty database
+        "env": {"DEEPWORK_CREATE_SCHEMA": "1"},
+        "url": "http://127.0.0.1:8000",
+        "pause_reason": "query",
+    },
+    "fixed_sqlite": {
+        "command": [sys.executable, os.path.join(ROOT, "fixed_sqlite_server.py")],
+        "url": "http://127.0.0.1:8090",
+        "pause_reason": "body",
+    },
+    "minimal": {
+        "command": [sys.executable, os.path.join(ROOT, "minimal_server.py")],
+        "url": "http://127.0.0.1:8090",
+        "pause_reason": "body",
+    },
+}
+
+# Relative weights of the kinds of step a user takes. A lifecycle
+# step advances the user's current session by one transition.
+MIXES = {
+    "default": {"lifecycle": 70, "history": 10, "list": 10, "get": 10},
+    "write-heavy": {"lifecycle": 95, "history": 2, "list": 2, "get": 1},
+    "read-heavy": {"lifecycle": 20, "history": 30, "list": 30, "get": 20},
+}
+
+# Chance that an active session is paused rather than completed
+PAUSE_PROBABILITY = 0.5
+
+# Latency and throughput are compared against a baseline per endpoint
+COMPARED = {"p50_ms": "lower", "p95_ms": "lower", "p99_ms": "lower", "rps": "higher"}
+
+
+def parse_mix(value):
+    """A preset name or comma-separated kind=weight pairs"""
+    if value in MIXES:
+        return dict(MIXES[value])
+    mix = {}
+    for part in value.split(","):
+        kind, _, weight = part.partition("=")
+        if kind not in MIXES["default"]:
+            raise argparse.ArgumentTypeError(f"unknown step kind {kind!r}")
+        mix[kind] = float(weight)
+    return mix
+
+
+def percentile(sorted_values, q):
+    """Nearest-rank percentile of an already sorted list"""
+    if not sorted_values:
+        return None
+    rank = max(1, int(round(q / 100 * len(sorted_values) + 0.5)))
+    return sorted_values[min(rank, len(sorted_values)) - 1]
+
+
+class Recorder:
+    """Latencies and errors per endpoint, shared by all workers"""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.latencies = {}
+        self.errors = {}
+
+    def record(self, endpoint, seconds, ok):
+        with self.lock:
+            self.latencies.setdefault(endpoint, []).append(seconds)
+            if not ok:
+                self.errors[endpoint] = self.errors.get(endpoint, 0) + 1
+
+    def summary(self, elapsed):
+        endpoints = {}
+        everything = []
+        for endpoint, values in sorted(self.latencies.items()):
+            everything.extend(values)
+            endpoints[endpoint] = self._stats(sorted(values), self.errors.get(endpoint, 0), elapsed)
+        total = self._stats(sorted(everything), sum(self.errors.values()), elapsed)
+        return endpoints, total
+
+    @staticmethod
+    def _stats(values, errors, elapsed):
+        def ms(value):
+            return round(value * 1000, 3) if value is not None else None
+        return {
+            "count": len(values),
+            "errors": errors,
+            "rps": round(len(values) / elapsed, 2) if elapsed else 0.0,
+            "mean_ms": ms(sum(values) / len(values)) if values else None,
+            "p50_ms": ms(percentile(values, 50)),
+            "p95_ms": ms(percentile(values, 95)),
+            "p99_ms": ms(percentile(values, 99)),
+            "max_ms": ms(values[-1]) if values else None,
+        }
+
+
+class User:
+    """One simulated user: an id, a connection and the session it is working on"""
+
+    def __init__(self, user_id, url, pause_reason, mix, rng, recorder):
+        self.user_id = user_id
+        parsed = urllib.parse.urlparse(url)
+        self.conn = http.client.HTTPConnection(parsed.hostname, parsed.port or 80, timeout=30)
+        self.pause_reason = pause_reason
+        self.kinds = list(mix)
+        self.weights = [mix[kind] for kind in self.kinds]
+        self.rng = rng
+        self.recorder = recorder
+        self.session_id = None
+        self.status = None
+
+    def request(self, endpoint, method, path, body=None, started=None):
+        """Send one request; latency runs from started (the arrival) if given"""
+        headers = {"X-User-Id": self.user_id}
+        payload = None
+        if body is not None:
+            payload = json.dumps(body).encode()
+            headers.update({"Content-Type": "application/json", "Content-Length": str(len(payload))})
+        started = time.perf_counter() if started is None else started
+        try:
+            self.conn.request(method, path, body=payload, headers=headers)
+            response = self.conn.getresponse()
+            data = response.read()
+            if response.will_close:
+                self.conn.close()
+            ok = 200 <= response.status < 300
+        except (OSError, http.client.HTTPException):
+            self.conn.close()
+            data, ok = b"", False
+        self.recorder.record(endpoint, time.perf_counter() - started, ok)
+        if not ok:
+            return None
+        try:
+            return json.loads(data)
+        except ValueError:
+            return None
+
+    def step(self, started=None):
+        kind = self.rng.choices(self.kinds, self.weights)[0]
+        if kind == "history":
+            self.request("GET /sessions/history", "GET", "/sessions/history", started=started)
+        elif kind == "list":
+            self.request("GET /sessions/", "GET", "/sessions/", started=started)
+        elif kind == "get" and self.session_id is not None:
+            self.request("GET /sessions/{id}", "GET", f"/sessions/{self.session_id}", started=started)
+        else:
+            self.advance(started)
+
+    def advance(self, started=None):
+        """Move the current session one step through its lifecycle"""
+        if self.status in (None, "completed", "overdue", "abandoned", "interrupted"):
+            session = self.request(
+                "POST /sessions/", "POST", "/sessions/",
+                {"title": "Load test", "goal": "Throughput", "scheduled_duration": 30}, started
+            )
+            self._track(session)
+            return
+        base = f"/sessions/{self.session_id}"
+        if self.status == "scheduled":
+            session = self.request("PATCH /sessions/{id}/start", "PATCH", f"{base}/start", started=started)
+        elif self.status == "paused":
+            session = self.request("PATCH /sessions/{id}/resume", "PATCH", f"{base}/resume", {}, started)
+        elif self.rng.random() < PAUSE_PROBABILITY:
+            if self.pause_reason == "query":
+                session = self.request(
+                    "PATCH /sessions/{id}/pause", "PATCH", f"{base}/pause?reason=Load+test", started=started
+                )
+            else:
+                session = self.request(
+                    "PATCH /sessions/{id}/pause", "PATCH", f"{base}/pause", {"reason": "Load test"}, started
+                )
+        else:
+            session = self.request("PATCH /sessions/{id}/complete", "PATCH", f"{base}/complete", started=started)
+        self._track(session)
+
+    def _track(self, session):
+        if session is None:
+            # Start over with a fresh session rather than retrying a bad state
+            self.status = None
+            return
+        self.session_id = session["id"]
+        self.status = session["status"]
+
+
+def run_closed(users, duration, think):
+    deadline = time.perf_counter() + duration
+
+    def loop(user):
+        while time.perf_counter() < deadline:
+            user.step()
+            if think:
+                time.sleep(user.rng.expovariate(1 / think))
+
+    threads = [threading.Thread(target=loop, args=(user,), daemon=True) for user in users]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+
+def run_open(users, duration, rate, rng):
+    arrivals = queue.Queue()
+
+    def worker(user):
+        while True:
+            started = arrivals.get()
+            if started is None:
+                return
+            user.step(started)
+
+    threads = [threading.Thread(target=worker, args=(user,), daemon=True) for user in users]
+    for thread in threads:
+        thread.start()
+    # Poisson arrivals on a fixed schedule, independent of completions
+    now = time.perf_counter()
+    deadline = now + duration
+    next_arrival = now
+    while True:
+        next_arrival += rng.expovariate(rate)
+        if next_arrival >= deadline:
+            break
+        delay = next_arrival - time.perf_counter()
+        if delay > 0:
+            time.sleep(delay)
+        arrivals.put(next_arrival)
+    for _ in threads:
+        arrivals.put(None)
+    for thread in threads:
+        thread.join()
+
+
+def wait_until_up(url, server=None, timeout=30.0):
+    parsed = urllib.parse.urlparse(url)
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if server is not None and server.poll() is not None:
+            # Typically the port is still held by a previous run
+            raise RuntimeError(f"Server exited with status {server.returncode} before accepting requests")
+        try:
+            conn = http.client.HTTPConnection(parsed.hostname, parsed.port or 80, timeout=2)
+            conn.request("GET", "/")
+            conn.getresponse().read()
+            conn.close()
+            return
+        except OSError:
+            time.sleep(0.2)
+    raise RuntimeError(f"Server at {url} did not come up within {timeout:.0f}s")
+
+
+def compare(result, baseline, tolerance):
+    """Regressions of result against baseline, as human-readable strings"""
+    regressions = []
+    for endpoint, base in baseline["endpoints"].items():
+        current = result["endpoints"].get(endpoint)
+        if current is None:
+            regressions.append(f"{endpoint}: not exercised in this run")
+            continue
+        for metric, better in COMPARED.items():
+            old, new = base.get(metric), current.get(metric)
+            if not old or new is None:
+                continue
+            if better == "lower" and new > old * (1 + tolerance):
+                regressions.append(f"{endpoint} {metric}: {new} vs baseline {old}")
+            elif better == "higher" and new < old * (1 - tolerance):
+                regressions.append(f"{endpoint} {metric}: {new} vs baseline {old}")
+        if current["errors"] > base.get("errors", 0):
+            regressions.append(f"{endpoint} errors: {current['errors']} vs baseline {base.get('errors', 0)}")
+    return regressions
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--target", choices=TARGETS, default="fixed_sqlite")
+    parser.add_argument("--url", help="Server to load (default: the target's usual address)")
+    parser.add_argument("--spawn", action="store_true",
+                        help="Start the target in a temporary directory for the run")
+    parser.add_argument("--arrival", choices=["closed", "open"], default="closed")
+    parser.add_argument("--users", type=int, default=10, help="Concurrent users (workers for open loop)")
+    parser.add_argument("--rate", type=float, default=100.0, help="Open-loop arrivals per second")
+    parser.add_argument("--think", type=float, default=0.0, help="Closed-loop mean think time in seconds")
+    parser.add_argument("--duration", type=float, default=10.0, help="Seconds to run")
+    parser.add_argument("--mix", type=parse_mix, default="default",
+                        help=f"Preset ({', '.join(MIXES)}) or e.g. lifecycle=60,history=20,list=10,get=10")
+    parser.add_argument("--shards", type=int, default=1,
+                        help="Database shards of a spawned server (DEEPWORK_SHARDS)")
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--output", help="Write the JSON report here as well as to stdout")
+    parser.add_argument("--save-baseline", help="Save this run as a baseline file")
+    parser.add_argument("--baseline", help="Fail if this run regressed against a saved baseline")
+    parser.add_argument("--tolerance", type=float, default=0.2,
+                        help="Allowed relative regression per metric (default 0.2)")
+    args = parser.parse_args(argv)
+    mix = args.mix
+
+    target = TARGETS[args.target]
+    url = args.url or target["url"]
+    server = workdir = None
+    if args.spawn:
+        workdir = tempfile.mkdtemp(prefix="loadgen_")
+        env = {**os.environ, **target.get("env", {}), "DEEPWORK_SHARDS": str(args.shards)}
+        server = subprocess.Popen(target["command"], cwd=workdir, env=env,
+                                  stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    try:
+        wait_until_up(url, server)
+        rng = random.Random(args.seed)
+        recorder = Recorder()
+        users = [
+            User(f"user-{n}", url, target["pause_reason"], mix, random.Random(rng.random()), recorder)
+            for n in range(args.users)
+        ]
+        started = time.perf_counter()
+        if args.arrival == "closed":
+            run_closed(users, args.duration, args.think)
+        else:
+            run_open(users, args.duration, args.rate, rng)
+        elapsed = time.perf_counter() - started
+    finally:
+        if server is not None:
+            server.terminate()
+            server.wait()
+            shutil.rmtree(workdir, ignore_errors=True)
+
+    endpoints, total = recorder.summary(elapsed)
+    result = {
+        "target": args.target,
+        "url": url,
+        "arrival": args.arrival,
+        "users": args.users,
+        "shards": args.shards,
+        "rate": args.rate if args.arrival == "open" else None,
+        "think": args.think if args.arrival == "closed" else None,
+        "duration": round(elapsed, 3),
+        "mix": mix,
+        "seed": args.seed,
+        "endpoints": endpoints,
+        "total": total,
+    }
+    report = json.dumps(result, indent=2)
+    print(report)
+    for path in (args.output, args.save_baseline):
+        if path:
+            os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+            with open(path, "w") as f:
+                f.write(report + "\n")
+
+    if args.baseline:
+        with open(args.baseline) as f:
+            regressions = compare(result, json.load(f), args.tolerance)
+        for regression in regressions:
+            print(f"REGRESSION {regression}", file=sys.stderr)
+        if regressions:
+            return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,99 @@
+"""
+Benchmark every SessionStore implementation on the same workload.
+
+Each backend runs the full lifecycle (create, start, pause, resume,
+complete) for a number of sessions, then the reads the front ends serve:
+paged listing, per-session interruptions and history. Results are
+operations per second, so the fastest store for a deployment can be picked
+directly.
+
+Usage:
+    python bench/store_bench.py --sessions 2000
+    python bench/store_bench.py --backends sqlite memory
+"""
+
+import argparse
+import os
+import shutil
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'backend'))
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+
+from app.models.models import Base
+from app.store import SQLAlchemySessionStore
+from deepwork.memstore import MemorySessionStore
+from deepwork.sqlite_store import SQLiteSessionStore
+
+
+def open_store(backend, workdir):
+    if backend == "memory":
+        return MemorySessionStore()
+    if backend == "sqlite":
+        return SQLiteSessionStore(os.path.join(workdir, "stdlib.db"))
+    engine = create_engine(f"sqlite:///{os.path.join(workdir, 'orm.db')}")
+    Base.metadata.create_all(bind=engine)
+    return SQLAlchemySessionStore(sessionmaker(autocommit=False, autoflush=False, bind=engine)())
+
+
+OPENERS = ("memory", "sqlite", "sqlalchemy")
+
+
+def timed(results, name, count, operation):
+    started = time.perf_counter()
+    value = operation()
+    results[name] = count / (time.perf_counter() - started)
+    return value
+
+
+def run(store, sessions, pauses):
+    results = {}
+    ids = timed(results, "create", sessions, lambda: [
+        store.create_session(f"Session {n}", "Benchmark", 30)["id"] for n in range(sessions)
+    ])
+    timed(results, "start", sessions, lambda: [store.start_session(i) for i in ids])
+
+    def pause_resume():
+        for i in ids:
+            for _ in range(pauses):
+                store.pause_session(i, "Benchmark")
+                store.resume_session(i)
+    timed(results, "pause+resume", sessions * pauses, pause_resume)
+    timed(results, "complete", sessions, lambda: [store.complete_session(i) for i in ids])
+    timed(results, "get", sessions, lambda: [store.get_session(i) for i in ids])
+    timed(results, "interruptions", sessions, lambda: [store.list_interruptions(i) for i in ids])
+    timed(results, "list page of 100", 20, lambda: [
+        store.list_sessions(skip=page * 100, limit=100) for page in range(20)
+    ])
+    timed(results, "history", 5, lambda: [store.session_history() for _ in range(5)])
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--sessions", type=int, default=2000)
+    parser.add_argument("--pauses", type=int, default=2, help="Pauses per session (at most 3)")
+    parser.add_argument("--backends", nargs="+", choices=OPENERS, default=list(OPENERS))
+    args = parser.parse_args()
+
+    results = {}
+    for backend in args.backends:
+        workdir = tempfile.mkdtemp(prefix="store_bench_")
+        try:
+            store = open_store(backend, workdir)
+            results[backend] = run(store, args.sessions, min(args.pauses, 3))
+            store.close()
+        finally:
+            shutil.rmtree(workdir)
+
+    workloads = list(next(iter(results.values())))
+    print(f"{'ops/sec':<20}" + "".join(f"{backend:>14}" for backend in results))
+    for name in workloads:
+        print(f"{name:<20}" + "".join(f"{results[backend][name]:>14,.0f}" for backend in results))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,163 @@
+"""
+Benchmark ISO-8601 TEXT timestamps against UTC epoch-millisecond INTEGERs
+in the stdlib servers' schema.
+
+One database is populated in the iso layout, copied, and migrated in place
+with deepwork.timestamps.migrate; the same range scans and aggregates are
+then timed on both.
+
+Usage:
+    python bench/timestamps_bench.py --sessions 200000
+"""
+
+import argparse
+import datetime
+import os
+import random
+import shutil
+import sqlite3
+import sys
+import tempfile
+import time
+import uuid
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'backend'))
+from deepwork import timestamps
+
+SCHEMA = """
+CREATE TABLE sessions (
+    id TEXT PRIMARY KEY,
+    title TEXT NOT NULL,
+    goal TEXT,
+    status TEXT NOT NULL,
+    scheduled_duration INTEGER NOT NULL,
+    created_at TEXT NOT NULL,
+    started_at TEXT,
+    paused_at TEXT,
+    completed_at TEXT,
+    actual_duration INTEGER,
+    interruption_count INTEGER DEFAULT 0
+);
+CREATE TABLE interruptions (
+    id TEXT PRIMARY KEY,
+    session_id TEXT NOT NULL,
+    reason TEXT NOT NULL,
+    start_time TEXT NOT NULL,
+    end_time TEXT,
+    FOREIGN KEY (session_id) REFERENCES sessions (id)
+);
+CREATE INDEX idx_interruptions_session_id ON interruptions (session_id);
+CREATE INDEX idx_sessions_completed_at ON sessions (completed_at);
+"""
+
+
+def populate(path, n, seed=7):
+    """Write n completed sessions with one pause each in the iso layout"""
+    rng = random.Random(seed)
+    base = datetime.datetime(2025, 1, 1)
+    conn = sqlite3.connect(path)
+    conn.executescript(SCHEMA)
+    sessions = []
+    interruptions = []
+    for _ in range(n):
+        created = base + datetime.timedelta(seconds=rng.randrange(365 * 86400))
+        started = created + datetime.timedelta(minutes=rng.randrange(1, 30))
+        scheduled = rng.choice([25, 30, 45, 60, 90])
+        completed = started + datetime.timedelta(minutes=scheduled * rng.uniform(0.7, 1.3))
+        session_id = str(uuid.UUID(int=rng.getrandbits(128)))
+        sessions.append((
+            session_id, "Bench session", None, "completed", scheduled,
+            created.isoformat(), started.isoformat(), None, completed.isoformat(),
+            int((completed - started).total_seconds() // 60), 1
+        ))
+        pause = started + datetime.timedelta(minutes=5)
+        interruptions.append((
+            str(uuid.UUID(int=rng.getrandbits(128))), session_id, "Bench pause",
+            pause.isoformat(), (pause + datetime.timedelta(minutes=2)).isoformat()
+        ))
+    conn.executemany("INSERT INTO sessions VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)", sessions)
+    conn.executemany("INSERT INTO interruptions VALUES (?, ?, ?, ?, ?)", interruptions)
+    conn.commit()
+    conn.close()
+
+
+def queries(codec):
+    """(name, sql, params) for the workloads compared across storage modes"""
+    lower = codec.bound("2025-06-01")
+    upper = codec.bound("2025-07-01")
+    if codec.mode == timestamps.EPOCH_MS:
+        duration = "(completed_at - started_at) / 60000.0"
+    else:
+        duration = "(julianday(completed_at) - julianday(started_at)) * 1440"
+    return [
+        ("range_scan", "SELECT COUNT(*), SUM(actual_duration) FROM sessions "
+                       "WHERE completed_at >= ? AND completed_at < ?", (lower, upper)),
+        ("range_rows", "SELECT id, completed_at FROM sessions "
+                       "WHERE completed_at >= ? AND completed_at < ?", (lower, upper)),
+        ("recent_50", "SELECT id, completed_at FROM sessions "
+                      "ORDER BY completed_at DESC LIMIT 50", ()),
+        ("sum_durations", f"SELECT SUM({duration}) FROM sessions", ()),
+        ("group_by_day", f"SELECT {codec.day_sql('completed_at')} AS day, SUM(actual_duration) "
+                         "FROM sessions GROUP BY day", ()),
+    ]
+
+
+def time_query(conn, sql, params, repeat):
+    best = float("inf")
+    for _ in range(repeat):
+        started = time.perf_counter()
+        conn.execute(sql, params).fetchall()
+        best = min(best, time.perf_counter() - started)
+    return best
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--sessions", type=int, default=200000)
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    workdir = tempfile.mkdtemp(prefix="timestamps_bench_")
+    try:
+        iso_path = os.path.join(workdir, "iso.db")
+        epoch_path = os.path.join(workdir, "epoch_ms.db")
+        print(f"Populating {args.sessions} sessions...")
+        populate(iso_path, args.sessions)
+        shutil.copy(iso_path, epoch_path)
+
+        conn = sqlite3.connect(epoch_path)
+        started = time.perf_counter()
+        timestamps.migrate(conn, timestamps.EPOCH_MS)
+        print(f"migrate iso -> epoch_ms: {time.perf_counter() - started:.2f}s")
+        conn.execute("VACUUM")
+        conn.close()
+        conn = sqlite3.connect(iso_path)
+        conn.execute("VACUUM")
+        conn.close()
+
+        results = {}
+        for path in (iso_path, epoch_path):
+            conn = sqlite3.connect(path)
+            codec = timestamps.for_connection(conn)
+            results[codec.mode] = {
+                name: time_query(conn, sql, params, args.repeat)
+                for name, sql, params in queries(codec)
+            }
+            results[codec.mode]["file_mb"] = os.path.getsize(path) / 1e6
+            conn.close()
+
+        iso, epoch = results[timestamps.ISO], results[timestamps.EPOCH_MS]
+        print(f"{'workload':<16}{'iso':>12}{'epoch_ms':>12}{'speedup':>10}")
+        for name in iso:
+            if name == "file_mb":
+                print(f"{'file size (MB)':<16}{iso[name]:>12.1f}{epoch[name]:>12.1f}"
+                      f"{iso[name] / epoch[name]:>9.2f}x")
+            else:
+                print(f"{name:<16}{iso[name] * 1000:>10.1f}ms{epoch[name] * 1000:>10.1f}ms"
+                      f"{iso[name] / epoch[name]:>9.2f}x")
+    finally:
+        shutil.rmtree(workdir)
+
+
+if __name__ == "__main__":
+    main()
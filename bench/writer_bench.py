@@ -0,0 +1,170 @@
+"""
+Write throughput and tail latency with and without the single writer.
+
+Each worker thread runs session lifecycles (create, start, pause, resume,
+complete) against one SQLite file:
+
+- direct: every worker writes through its own store and connection, so
+  commits contend for SQLite's lock ("database is locked" counts as an error)
+- direct-wal: the same in WAL mode
+- writer: every write goes through one deepwork.writer.SingleWriter
+- group-<N>ms: the writer with group commit, a window of N ms (--windows)
+  and at most --group-ops writes per commit
+
+With --shards N the sessions are split across N files by user (see
+deepwork.shards): worker i is user-i, writing to its user's shard, and the
+writer modes run one writer per shard.
+
+Results are writes per second, per-write latency percentiles and errors,
+at each worker and shard count, so the throughput gained by group commit
+or sharding can be read against the latency it adds.
+
+Usage:
+    python bench/writer_bench.py
+    python bench/writer_bench.py --workers 1 4 16 --sessions 200 --output writer.json
+    python bench/writer_bench.py --modes writer group --windows 0 1 2 5
+    python bench/writer_bench.py --modes direct-wal writer --workers 16 --shards 1 2 4
+"""
+
+import argparse
+import json
+import os
+import shutil
+import sqlite3
+import sys
+import tempfile
+import threading
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'backend'))
+from deepwork.shards import ShardRouter
+from deepwork.sqlite_store import SQLiteSessionStore
+from deepwork.writer import SingleWriter, WriterStore
+
+MODES = ("direct", "direct-wal", "writer", "group")
+
+
+def percentile(ordered, fraction):
+    if not ordered:
+        return None
+    return ordered[min(len(ordered) - 1, int(fraction * len(ordered)))]
+
+
+def lifecycle(store, user_id, sessions, latencies, errors):
+    """Run whole lifecycles, timing every write; failed sessions are abandoned"""
+    for n in range(sessions):
+        steps = (
+            ("create_session", lambda: store.create_session(f"Session {n}", "Benchmark", 30, user_id)),
+            ("start_session", lambda: store.start_session(session_id)),
+            ("pause_session", lambda: store.pause_session(session_id, "Benchmark")),
+            ("resume_session", lambda: store.resume_session(session_id)),
+            ("complete_session", lambda: store.complete_session(session_id)),
+        )
+        session_id = None
+        for name, step in steps:
+            started = time.perf_counter()
+            try:
+                result = step()
+            except sqlite3.OperationalError:
+                errors.append(name)
+                break
+            latencies.append(time.perf_counter() - started)
+            if name == "create_session":
+                session_id = result["id"]
+
+
+def run(mode, workers, sessions, path, window_ms=None, group_ops=64, shards=1):
+    router = ShardRouter(shards)
+    paths = router.paths(path)
+    users = [f"user-{n}" for n in range(workers)]
+    if mode in ("writer", "group"):
+        writers = [
+            SingleWriter(
+                lambda path=shard_path: SQLiteSessionStore(path, wal=True),
+                group_window=window_ms / 1000 if mode == "group" else None, group_size=group_ops,
+            )
+            for shard_path in paths
+        ]
+        stores = [
+            WriterStore(SQLiteSessionStore(paths[shard]), writers[shard])
+            for shard in map(router.shard_for, users)
+        ]
+    else:
+        stores = [
+            SQLiteSessionStore(paths[router.shard_for(user)], wal=mode == "direct-wal") for user in users
+        ]
+
+    latencies, errors = [], []
+    threads = [
+        threading.Thread(target=lifecycle, args=(store, user, sessions, latencies, errors))
+        for store, user in zip(stores, users)
+    ]
+    started = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    elapsed = time.perf_counter() - started
+
+    if mode in ("writer", "group"):
+        for writer in writers:
+            writer.close()
+        for store in stores:
+            store.reads.close()
+    else:
+        for store in stores:
+            store.close()
+
+    latencies.sort()
+    return {
+        "mode": f"group-{window_ms:g}ms" if mode == "group" else mode,
+        "workers": workers,
+        "shards": shards,
+        "writes": len(latencies),
+        "errors": len(errors),
+        "writes_per_sec": round(len(latencies) / elapsed, 1),
+        "p50_ms": round(percentile(latencies, 0.50) * 1000, 3),
+        "p99_ms": round(percentile(latencies, 0.99) * 1000, 3),
+        "max_ms": round(latencies[-1] * 1000, 3),
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--workers", type=int, nargs="+", default=[1, 4, 16])
+    parser.add_argument("--sessions", type=int, default=100, help="Lifecycles per worker")
+    parser.add_argument("--modes", nargs="+", choices=MODES, default=list(MODES))
+    parser.add_argument("--windows", type=float, nargs="+", default=[0, 2],
+                        help="Group commit windows in ms (group mode)")
+    parser.add_argument("--group-ops", type=int, default=64, help="Most writes per group commit")
+    parser.add_argument("--shards", type=int, nargs="+", default=[1], help="Shard files to split users across")
+    parser.add_argument("--output", help="Write the results as JSON here as well")
+    args = parser.parse_args(argv)
+
+    runs = [(mode, None) for mode in args.modes if mode != "group"]
+    if "group" in args.modes:
+        runs += [("group", window) for window in args.windows]
+    results = []
+    for workers in args.workers:
+        for shards in args.shards:
+            for mode, window in runs:
+                workdir = tempfile.mkdtemp(prefix="writer_bench_")
+                try:
+                    results.append(run(
+                        mode, workers, args.sessions, os.path.join(workdir, "bench.db"), window,
+                        args.group_ops, shards,
+                    ))
+                finally:
+                    shutil.rmtree(workdir)
+
+    print(f"{'mode':<12}{'workers':>8}{'shards':>7}{'writes/s':>11}{'p50 ms':>9}{'p99 ms':>9}{'max ms':>9}{'errors':>8}")
+    for r in results:
+        print(f"{r['mode']:<12}{r['workers']:>8}{r['shards']:>7}{r['writes_per_sec']:>11,.0f}"
+              f"{r['p50_ms']:>9.2f}{r['p99_ms']:>9.2f}{r['max_ms']:>9.2f}{r['errors']:>8}")
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump({"results": results}, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
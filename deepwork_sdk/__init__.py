@@ -6,16 +6,23 @@ class ApiClient:
     """
     Default API client for DeepWork API
     """
-    def __init__(self, base_url="http://localhost:8090"):
+    def __init__(self, base_url="http://localhost:8090", compress=True):
         """
         Initialize the API client
         
         Args:
             base_url (str): Base URL for the API
+            compress (bool): Ask for compressed responses, in every encoding
+                this interpreter can decode (gzip and deflate; br and zstd
+                when brotli and zstandard are installed)
         """
         import requests
+        from urllib3.util import make_headers
         self.base_url = base_url
         self.session = requests.Session()
+        self.session.headers["Accept-Encoding"] = (
+            make_headers(accept_encoding=True)["accept-encoding"] if compress else "identity"
+        )
     
     def call_api(self, method, path, data=None, params=None):
         """
@@ -4,6 +4,15 @@ Sessions API for DeepWork SDK
 
 from ..import ApiClient
 
+def _projection(fields, include):
+    """Query parameters for ?fields= and ?include= (none when not given)"""
+    params = {}
+    if fields:
+        params["fields"] = ",".join(fields)
+    if include:
+        params["include"] = ",".join(include)
+    return params or None
+
 class SessionsApi:
     """
     API for managing DeepWork sessions
@@ -34,26 +43,34 @@ class SessionsApi:
             data["goal"] = goal
         return self.api_client.call_api("POST", "/sessions/", data=data)
     
-    def get_sessions(self):
+    def get_sessions(self, fields=None, include=None):
         """
         Get all sessions
         
+        Args:
+            fields (list, optional): Session fields to return (id is always returned)
+            include (list, optional): Related data to embed, e.g. ["interruptions"]
+            
         Returns:
             list: List of sessions
         """
-        return self.api_client.call_api("GET", "/sessions/")
+        return self.api_client.call_api("GET", "/sessions/", params=_projection(fields, include))
     
-    def get_session(self, session_id):
+    def get_session(self, session_id, fields=None, include=None):
         """
         Get a session by ID
         
         Args:
             session_id (int): Session ID
+            fields (list, optional): Session fields to return (id is always returned)
+            include (list, optional): Related data to embed, e.g. ["interruptions"]
             
         Returns:
             dict: Session data
         """
-        return self.api_client.call_api("GET", f"/sessions/{session_id}")
+        return self.api_client.call_api(
+            "GET", f"/sessions/{session_id}", params=_projection(fields, include)
+        )
     
     def start_session(self, session_id):
         """
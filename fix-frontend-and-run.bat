@@ -8,7 +8,7 @@ copy /Y "frontend\src\pages\ActiveSession.fixed.js" "frontend\src\pages\ActiveSe
 echo.
 echo ===== Starting Backend Server =====
 echo.
-start cmd /k "cd backend && venv\Scripts\activate.bat && cd app && python -m uvicorn main:app --reload --port 8000"
+start cmd /k "cd backend && venv\Scripts\activate.bat && python -m alembic upgrade head && python -m uvicorn app.main:app --reload --port 8000"
 
 echo.
 echo ===== Starting Frontend Server =====
@@ -1,3 +1,4 @@
+import contextlib
 import http.server
 import socketserver
 import json
@@ -5,59 +6,100 @@ import urllib.parse
 import datetime
 import sqlite3
 import os
-import uuid
+import sys
+
+# Shared engine code lives in backend/deepwork
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), 'backend'))
+from deepwork import (
+    admission, analytics, archive, compression, keepalive, metrics, profiler, projection, rollup, tracing,
+)
+from deepwork.slowlog import SlowQueryLog
+from deepwork.sqlite_store import SQLiteSessionStore
+from deepwork.replica import FRESHNESS_HEADER, SnapshotReplica, oldest_freshness
+from deepwork.shards import USER_HEADER, ShardRouter
+from deepwork.store import SessionNotFound, isoformat
+from deepwork.writer import SingleWriter, WriterStore
 
 # SQLite database setup
 DB_PATH = 'deepwork.db'
 
-def init_db():
-    """Initialize the SQLite database with required tables"""
-    conn = sqlite3.connect(DB_PATH)
-    cursor = conn.cursor()
-    
-    # Create sessions table
-    cursor.execute('''
-    CREATE TABLE IF NOT EXISTS sessions (
-        id TEXT PRIMARY KEY,
-        title TEXT NOT NULL,
-        goal TEXT,
-        status TEXT NOT NULL,
-        scheduled_duration INTEGER NOT NULL,
-        created_at TEXT NOT NULL,
-        started_at TEXT,
-        paused_at TEXT,
-        completed_at TEXT,
-        actual_duration INTEGER,
-        interruption_count INTEGER DEFAULT 0
-    )
-    ''')
-    
-    # Create interruptions table
-    cursor.execute('''
-    CREATE TABLE IF NOT EXISTS interruptions (
-        id TEXT PRIMARY KEY,
-        session_id TEXT NOT NULL,
-        reason TEXT NOT NULL,
-        start_time TEXT NOT NULL,
-        end_time TEXT,
-        FOREIGN KEY (session_id) REFERENCES sessions (id)
+# Per-route request metrics, served at /metrics
+METRICS = metrics.Metrics()
+
+# Sampled request tracing (DEEPWORK_TRACE_SAMPLE), recent traces at /debug/traces
+TRACER = tracing.Tracer.from_environ(service_name=os.path.splitext(os.path.basename(__file__))[0])
+
+# Opt-in SQL profiling (DEEPWORK_SQL_PROFILE=warn|fail)
+PROFILER = profiler.Profiler.from_environ()
+
+# Opt-in admission control (DEEPWORK_MAX_IN_FLIGHT=<n>): at most n requests
+# handled at once, a short queue per priority lane and 503 + Retry-After
+# beyond it; its queue and rejection counts are served at /metrics
+ADMISSION = admission.AdmissionController.from_environ()
+if ADMISSION:
+    METRICS.register(ADMISSION)
+
+# Response compression negotiated with Accept-Encoding (off with
+# DEEPWORK_COMPRESSION=off; DEEPWORK_COMPRESS_MIN_BYTES sets the threshold)
+COMPRESSION = compression.Compression.from_environ()
+
+# HTTP/1.1 keep-alive (off with DEEPWORK_KEEPALIVE=off): connections are
+# reused until idle for DEEPWORK_KEEPALIVE_TIMEOUT seconds or after
+# DEEPWORK_KEEPALIVE_MAX_REQUESTS requests, each on its own thread
+KEEPALIVE = keepalive.KeepAlive.from_environ()
+
+# Opt-in slow-query log (DEEPWORK_SLOW_QUERY_MS); every connection is timed
+SLOW_QUERIES = SlowQueryLog.from_environ()
+CONNECTION_FACTORY = SLOW_QUERIES.connection_factory() if SLOW_QUERIES else metrics.TimedConnection
+
+# Opt-in archive of old finished sessions (DEEPWORK_ARCHIVE=<path>), filled by
+# `python -m deepwork.archive run`; reads include it only when they need it
+ARCHIVE_PATH = os.environ.get("DEEPWORK_ARCHIVE")
+
+# Opt-in sharding by user (DEEPWORK_SHARDS=<n>): each user's sessions live in
+# one of n database files, picked from the X-User-Id header; see deepwork.shards
+SHARDS = ShardRouter.from_environ()
+DB_PATHS = SHARDS.paths(DB_PATH)
+ARCHIVE_PATHS = SHARDS.paths(ARCHIVE_PATH) if ARCHIVE_PATH else [None] * len(SHARDS)
+
+def open_store(shard, **options):
+    """A store on one shard's database file"""
+    return SQLiteSessionStore(
+        DB_PATHS[shard], connection_factory=CONNECTION_FACTORY, archive_path=ARCHIVE_PATHS[shard], **options
     )
-    ''')
-    
-    conn.commit()
-    conn.close()
 
-# Initialize the database
-init_db()
+# All session reads and writes go through the shared stores, one per shard;
+# databases from before integer keys are rebuilt in place when they open
+STORES = [open_store(shard) for shard in SHARDS]
+for store in STORES:
+    if store.migrated_keys:
+        print(f"Migrated {store.path} to integer keys")
+
+# Databases created before epoch timestamps keep their ISO text until migrated
+TIMESTAMPS = STORES[0].timestamps
+
+# Opt-in single writer (DEEPWORK_SINGLE_WRITER=1): writes run in order on one
+# thread per shard with its own connection while reads stay on the store's;
+# with DEEPWORK_GROUP_COMMIT_MS it commits the writes of each window together
+for shard in SHARDS:
+    writer = SingleWriter.from_environ(lambda shard=shard: open_store(shard, wal=True))
+    if writer:
+        STORES[shard] = WriterStore(STORES[shard], writer)
+
+# Opt-in snapshot replica (DEEPWORK_REPLICA=memory|<path>): history and stats
+# read a copy at most DEEPWORK_REPLICA_MAX_STALENESS seconds old, one per shard
+REPLICAS = [
+    SnapshotReplica.from_environ(
+        DB_PATHS[shard], connection_factory=CONNECTION_FACTORY, archive_path=ARCHIVE_PATHS[shard],
+        shard=shard, shards=len(SHARDS),
+    )
+    for shard in SHARDS
+]
 
 # Simple server on port 8090
 PORT = 8090
 
 # Helper functions
-def get_current_time():
-    """Get current timestamp in ISO format"""
-    return datetime.datetime.now().isoformat()
-
 def dict_factory(cursor, row):
     """Convert SQLite row to dictionary"""
     d = {}
@@ -65,39 +107,117 @@ def dict_factory(cursor, row):
         d[col[0]] = row[idx]
     return d
 
-def get_db_connection():
-    """Get database connection with row factory"""
-    conn = sqlite3.connect(DB_PATH)
+def get_db_connection(shard=0):
+    """Get a connection to one shard's database with row factory"""
+    conn = sqlite3.connect(DB_PATHS[shard], factory=CONNECTION_FACTORY)
+    if ARCHIVE_PATHS[shard]:
+        archive.attach(conn, ARCHIVE_PATHS[shard])
     conn.row_factory = dict_factory
     return conn
 
-def find_session(session_id):
-    """Find session by ID"""
-    conn = get_db_connection()
-    cursor = conn.cursor()
-    cursor.execute("SELECT * FROM sessions WHERE id = ?", (session_id,))
-    session = cursor.fetchone()
-    conn.close()
-    return session
+@contextlib.contextmanager
+def read_snapshot(shard=0):
+    """The replica snapshot a shard's history and stats read from, or None without a replica"""
+    if REPLICAS[shard] is None:
+        yield None
+    else:
+        with REPLICAS[shard].read() as snapshot:
+            yield snapshot
+
+def read_all_shards(read):
+    """
+    read(conn) on every shard at once (on its snapshot when there is a
+    replica); returns the results in shard order and the snapshots read
+    """
+    snapshots = []
+    def read_shard(shard):
+        with read_snapshot(shard) as snapshot:
+            if snapshot:
+                snapshots.append(snapshot)
+                return read(snapshot.connection)
+            with contextlib.closing(get_db_connection(shard)) as conn:
+                return read(conn)
+    return SHARDS.fan_out(read_shard), snapshots
 
-def get_interruptions_for_session(session_id):
-    """Get interruptions for a session"""
-    conn = get_db_connection()
-    cursor = conn.cursor()
-    cursor.execute("SELECT * FROM interruptions WHERE session_id = ?", (session_id,))
-    interruptions = cursor.fetchall()
-    conn.close()
-    return interruptions
+# Session JSON field -> record key, in this server's column names
+SESSION_JSON_FIELDS = {
+    "id": "id",
+    "title": "title",
+    "goal": "goal",
+    "status": "status",
+    "scheduled_duration": "scheduled_duration",
+    "created_at": "created_at",
+    "started_at": "start_time",
+    "paused_at": "paused_at",
+    "completed_at": "end_time",
+    "actual_duration": "actual_duration",
+    "interruption_count": "interruption_count",
+    "user_id": "user_id",
+}
 
-def update_interruption_count(session_id):
-    """Update the interruption count for a session"""
-    conn = get_db_connection()
-    cursor = conn.cursor()
-    cursor.execute("SELECT COUNT(*) as count FROM interruptions WHERE session_id = ?", (session_id,))
-    count = cursor.fetchone()['count']
-    cursor.execute("UPDATE sessions SET interruption_count = ? WHERE id = ?", (count, session_id))
-    conn.commit()
-    conn.close()
+def session_json(session, fields=tuple(SESSION_JSON_FIELDS)):
+    """JSON shape of a session record with the given fields, in this server's column names"""
+    return {field: isoformat(session[SESSION_JSON_FIELDS[field]]) for field in fields}
+
+def interruption_json(interruption):
+    """JSON shape of an interruption record, in this server's column names"""
+    return {
+        "id": interruption["id"],
+        "session_id": interruption["session_id"],
+        "reason": interruption["reason"],
+        "start_time": isoformat(interruption["pause_time"]),
+        "end_time": isoformat(interruption["resume_time"]),
+    }
+
+def session_projection(query):
+    """
+    The JSON fields (None: all of them) and whether to embed interruptions
+    asked for by ?fields= and ?include= on the session list and detail
+    endpoints; raises projection.InvalidProjection for unknown names
+    """
+    query = urllib.parse.parse_qs(query)
+    fields = projection.parse_fields(query.get('fields', [''])[0], SESSION_JSON_FIELDS)
+    include = projection.parse_include(query.get('include', [''])[0])
+    return fields, 'interruptions' in include
+
+def read_sessions(store, read, fields, interruptions):
+    """
+    JSON of the sessions read(record_keys) returns (record_keys None: all
+    of them), with only the given fields; interruptions of all of them are
+    read in one query, when asked
+    """
+    if fields is None:
+        fields, sessions = tuple(SESSION_JSON_FIELDS), read(None)
+    else:
+        sessions = read([SESSION_JSON_FIELDS[field] for field in fields])
+    found = store.interruptions_for_sessions([s["id"] for s in sessions]) if interruptions else {}
+    items = []
+    for session in sessions:
+        item = session_json(session, fields)
+        if interruptions:
+            item["interruptions"] = [interruption_json(i) for i in found.get(session["id"], [])]
+        items.append(item)
+    return items
+
+def history_json(item):
+    """JSON shape of a history record (nulls as empty strings)"""
+    history_item = {
+        "id": item["id"],
+        "title": item["title"],
+        "goal": item["goal"],
+        "status": item["status"],
+        "scheduled_duration": item["scheduled_duration"],
+        "actual_duration": item["actual_duration"],
+        "interruption_count": item["interruption_count"],
+        "completion_date": isoformat(item["end_time"]),
+        "focused_minutes": round(item["focused_minutes"], 2),
+        "longest_stretch_minutes": round(item["longest_stretch_minutes"], 2),
+        "idle_minutes": round(item["idle_minutes"], 2),
+    }
+    for key, value in history_item.items():
+        if value is None:
+            history_item[key] = ""
+    return history_item
 
 # Handler class
 class APIHandler(http.server.SimpleHTTPRequestHandler):
@@ -105,9 +225,34 @@ class APIHandler(http.server.SimpleHTTPRequestHandler):
     def end_headers(self):
         self.send_header('Access-Control-Allow-Origin', '*')
         self.send_header('Access-Control-Allow-Methods', 'GET, POST, OPTIONS, PATCH')
-        self.send_header('Access-Control-Allow-Headers', 'Content-Type')
+        self.send_header('Access-Control-Allow-Headers', f'Content-Type, traceparent, {USER_HEADER}')
+        self.send_header('Access-Control-Expose-Headers', f'X-DB-Queries, X-DB-Time, X-Trace-Id, {FRESHNESS_HEADER}, Retry-After')
         super().end_headers()
     
+    # Age of the snapshots a response was read from (the oldest of them)
+    def send_freshness(self, *snapshots):
+        snapshots = [snapshot for snapshot in snapshots if snapshot is not None]
+        if snapshots:
+            self.send_header(FRESHNESS_HEADER, oldest_freshness(snapshots))
+    
+    # The requesting user (X-User-Id header), None when anonymous
+    def user_id(self):
+        return self.headers.get(USER_HEADER) or None
+    
+    # The store of the requesting user's shard, which only finds that user's sessions by id
+    def store(self):
+        return STORES[SHARDS.shard_for(self.user_id())]
+    
+    # JSON response with its Content-Length, plus the age of any snapshots it was read from
+    def send_json(self, status, payload, *snapshots):
+        body = json.dumps(payload).encode()
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        self.send_freshness(*snapshots)
+        self.end_headers()
+        self.wfile.write(body)
+    
     # Parse request body
     def parse_request_body(self):
         content_length = int(self.headers['Content-Length'])
@@ -117,6 +262,7 @@ class APIHandler(http.server.SimpleHTTPRequestHandler):
     # Handle OPTIONS requests (for CORS preflight)
     def do_OPTIONS(self):
         self.send_response(200)
+        self.send_header('Content-Length', '0')
         self.end_headers()
     
     # Handle POST requests
@@ -125,301 +271,52 @@ class APIHandler(http.server.SimpleHTTPRequestHandler):
             # Create a new session
             try:
                 data = self.parse_request_body()
-                session_id = str(uuid.uuid4())
-                
-                conn = get_db_connection()
-                cursor = conn.cursor()
-                cursor.execute(
-                    """
-                    INSERT INTO sessions 
-                    (id, title, goal, status, scheduled_duration, created_at) 
-                    VALUES (?, ?, ?, ?, ?, ?)
-                    """, 
-                    (
-                        session_id, 
-                        data.get("title", "Untitled Session"),
-                        data.get("goal", ""),
-                        "scheduled",
-                        data.get("scheduled_duration", 30),
-                        get_current_time()
-                    )
+                new_session = self.store().create_session(
+                    data.get("title", "Untitled Session"),
+                    data.get("goal", ""),
+                    data.get("scheduled_duration", 30),
+                    self.user_id()
                 )
-                conn.commit()
-                
-                # Get the newly created session
-                cursor.execute("SELECT * FROM sessions WHERE id = ?", (session_id,))
-                new_session = cursor.fetchone()
-                conn.close()
                 
-                self.send_response(201)
-                self.send_header('Content-Type', 'application/json')
-                self.end_headers()
-                self.wfile.write(json.dumps(new_session).encode())
+                self.send_json(201, session_json(new_session))
             except Exception as e:
-                self.send_response(400)
-                self.send_header('Content-Type', 'application/json')
-                self.end_headers()
-                self.wfile.write(json.dumps({"error": str(e)}).encode())
+                self.send_json(400, {"error": str(e)})
+        else:
+            self.send_json(404, {"error": "Endpoint not found"})
     
     # Handle PATCH requests
     def do_PATCH(self):
         parsed_url = urllib.parse.urlparse(self.path)
         path = parsed_url.path
         
-        # Start session endpoint
-        if path.endswith('/start'):
-            try:
-                session_id = path.split('/')[-2]
-                session = find_session(session_id)
-                
-                if not session:
-                    self.send_response(404)
-                    self.send_header('Content-Type', 'application/json')
-                    self.end_headers()
-                    self.wfile.write(json.dumps({"error": "Session not found"}).encode())
-                    return
-                
-                if session['status'] != 'scheduled':
-                    self.send_response(400)
-                    self.send_header('Content-Type', 'application/json')
-                    self.end_headers()
-                    self.wfile.write(json.dumps({"error": "Session can only be started from scheduled state"}).encode())
-                    return
-                
-                # Update session status to active
-                conn = get_db_connection()
-                cursor = conn.cursor()
-                current_time = get_current_time()
-                cursor.execute(
-                    "UPDATE sessions SET status = ?, started_at = ? WHERE id = ?",
-                    ("active", current_time, session_id)
-                )
-                conn.commit()
-                
-                # Get updated session
-                cursor.execute("SELECT * FROM sessions WHERE id = ?", (session_id,))
-                updated_session = cursor.fetchone()
-                conn.close()
-                
-                self.send_response(200)
-                self.send_header('Content-Type', 'application/json')
-                self.end_headers()
-                self.wfile.write(json.dumps(updated_session).encode())
-            except Exception as e:
-                self.send_response(400)
-                self.send_header('Content-Type', 'application/json')
-                self.end_headers()
-                self.wfile.write(json.dumps({"error": str(e)}).encode())
-        
-        # Pause session endpoint
-        elif path.endswith('/pause'):
-            try:
-                session_id = path.split('/')[-2]
-                session = find_session(session_id)
-                
-                if not session:
-                    self.send_response(404)
-                    self.send_header('Content-Type', 'application/json')
-                    self.end_headers()
-                    self.wfile.write(json.dumps({"error": "Session not found"}).encode())
-                    return
-                
-                if session['status'] != 'active':
-                    self.send_response(400)
-                    self.send_header('Content-Type', 'application/json')
-                    self.end_headers()
-                    self.wfile.write(json.dumps({"error": "Session can only be paused from active state"}).encode())
-                    return
-                
-                # Get reason from request body
-                data = self.parse_request_body()
-                reason = data.get('reason', 'No reason provided')
-                
-                # Create interruption record
-                interruption_id = str(uuid.uuid4())
-                current_time = get_current_time()
-                
-                conn = get_db_connection()
-                cursor = conn.cursor()
-                
-                # Add interruption
-                cursor.execute(
-                    """
-                    INSERT INTO interruptions 
-                    (id, session_id, reason, start_time) 
-                    VALUES (?, ?, ?, ?)
-                    """, 
-                    (interruption_id, session_id, reason, current_time)
-                )
-                
-                # Update session status
-                cursor.execute(
-                    "UPDATE sessions SET status = ?, paused_at = ? WHERE id = ?",
-                    ("paused", current_time, session_id)
-                )
-                conn.commit()
-                
-                # Update interruption count
-                update_interruption_count(session_id)
-                
-                # Get updated session
-                cursor.execute("SELECT * FROM sessions WHERE id = ?", (session_id,))
-                updated_session = cursor.fetchone()
-                conn.close()
-                
-                self.send_response(200)
-                self.send_header('Content-Type', 'application/json')
-                self.end_headers()
-                self.wfile.write(json.dumps(updated_session).encode())
-            except Exception as e:
-                self.send_response(400)
-                self.send_header('Content-Type', 'application/json')
-                self.end_headers()
-                self.wfile.write(json.dumps({"error": str(e)}).encode())
-        
-        # Resume session endpoint
-        elif path.endswith('/resume'):
-            try:
-                session_id = path.split('/')[-2]
-                session = find_session(session_id)
-                
-                if not session:
-                    self.send_response(404)
-                    self.send_header('Content-Type', 'application/json')
-                    self.end_headers()
-                    self.wfile.write(json.dumps({"error": "Session not found"}).encode())
-                    return
-                
-                if session['status'] != 'paused':
-                    self.send_response(400)
-                    self.send_header('Content-Type', 'application/json')
-                    self.end_headers()
-                    self.wfile.write(json.dumps({"error": "Session can only be resumed from paused state"}).encode())
-                    return
-                
-                # Update the latest interruption with end time
-                conn = get_db_connection()
-                cursor = conn.cursor()
-                current_time = get_current_time()
-                
-                # Find the latest interruption without an end time
-                cursor.execute(
-                    """
-                    SELECT id FROM interruptions 
-                    WHERE session_id = ? AND end_time IS NULL 
-                    ORDER BY start_time DESC LIMIT 1
-                    """, 
-                    (session_id,)
-                )
-                latest_interruption = cursor.fetchone()
-                
-                if latest_interruption:
-                    # Update the interruption with end time
-                    cursor.execute(
-                        "UPDATE interruptions SET end_time = ? WHERE id = ?",
-                        (current_time, latest_interruption['id'])
-                    )
-                
-                # Update session status
-                cursor.execute(
-                    "UPDATE sessions SET status = ?, paused_at = NULL WHERE id = ?",
-                    ("active", session_id)
-                )
-                conn.commit()
-                
-                # Get updated session
-                cursor.execute("SELECT * FROM sessions WHERE id = ?", (session_id,))
-                updated_session = cursor.fetchone()
-                conn.close()
-                
-                self.send_response(200)
-                self.send_header('Content-Type', 'application/json')
-                self.end_headers()
-                self.wfile.write(json.dumps(updated_session).encode())
-            except Exception as e:
-                self.send_response(400)
-                self.send_header('Content-Type', 'application/json')
-                self.end_headers()
-                self.wfile.write(json.dumps({"error": str(e)}).encode())
+        parts = path.split('/')
         
-        # Complete session endpoint
-        elif path.endswith('/complete'):
+        # Session lifecycle endpoints: /sessions/{id}/start|pause|resume|complete
+        if len(parts) == 4 and parts[1] == 'sessions' and parts[3] in ('start', 'pause', 'resume', 'complete'):
             try:
-                session_id = path.split('/')[-2]
-                session = find_session(session_id)
-                
-                if not session:
-                    self.send_response(404)
-                    self.send_header('Content-Type', 'application/json')
-                    self.end_headers()
-                    self.wfile.write(json.dumps({"error": "Session not found"}).encode())
-                    return
-                
-                if session['status'] not in ['active', 'paused']:
-                    self.send_response(400)
-                    self.send_header('Content-Type', 'application/json')
-                    self.end_headers()
-                    self.wfile.write(json.dumps({"error": "Session can only be completed from active or paused state"}).encode())
-                    return
-                
-                # Calculate actual duration
-                conn = get_db_connection()
-                cursor = conn.cursor()
-                current_time = get_current_time()
-                
-                # If the session was started
-                if session['started_at']:
-                    start_time = datetime.datetime.fromisoformat(session['started_at'])
-                    end_time = datetime.datetime.fromisoformat(current_time)
-                    duration_minutes = (end_time - start_time).total_seconds() / 60
-                    
-                    # Subtract interruption times if any
-                    cursor.execute(
-                        """
-                        SELECT SUM((julianday(IFNULL(end_time, ?)) - julianday(start_time)) * 1440) as total_interruption_minutes
-                        FROM interruptions
-                        WHERE session_id = ?
-                        """,
-                        (current_time, session_id)
+                session_id, action = parts[2], parts[3]
+                if action == 'start':
+                    session = self.store().start_session(session_id, self.user_id())
+                elif action == 'pause':
+                    # Reason comes from the request body
+                    data = self.parse_request_body()
+                    session = self.store().pause_session(
+                        session_id, data.get('reason', 'No reason provided'), self.user_id()
                     )
-                    result = cursor.fetchone()
-                    interruption_minutes = result['total_interruption_minutes'] or 0
-                    
-                    actual_duration = max(0, round(duration_minutes - interruption_minutes))
+                elif action == 'resume':
+                    session = self.store().resume_session(session_id, self.user_id())
                 else:
-                    actual_duration = 0
-                
-                # Update session
-                cursor.execute(
-                    """
-                    UPDATE sessions 
-                    SET status = ?, completed_at = ?, actual_duration = ? 
-                    WHERE id = ?
-                    """,
-                    ("completed", current_time, actual_duration, session_id)
-                )
-                conn.commit()
+                    # Completion also rolls the session into today's totals
+                    session = self.store().complete_session(session_id, self.user_id())
                 
-                # Get updated session
-                cursor.execute("SELECT * FROM sessions WHERE id = ?", (session_id,))
-                updated_session = cursor.fetchone()
-                conn.close()
-                
-                self.send_response(200)
-                self.send_header('Content-Type', 'application/json')
-                self.end_headers()
-                self.wfile.write(json.dumps(updated_session).encode())
+                self.send_json(200, session_json(session))
+            except SessionNotFound:
+                self.send_json(404, {"error": "Session not found"})
             except Exception as e:
-                self.send_response(400)
-                self.send_header('Content-Type', 'application/json')
-                self.end_headers()
-                self.wfile.write(json.dumps({"error": str(e)}).encode())
+                self.send_json(400, {"error": str(e)})
         
         else:
-            self.send_response(404)
-            self.send_header('Content-Type', 'application/json')
-            self.end_headers()
-            self.wfile.write(json.dumps({"error": "Endpoint not found"}).encode())
+            self.send_json(404, {"error": "Endpoint not found"})
     
     # Handle GET requests
     def do_GET(self):
@@ -428,92 +325,92 @@ class APIHandler(http.server.SimpleHTTPRequestHandler):
         
         # Root endpoint
         if path == '/':
-            self.send_response(200)
-            self.send_header('Content-Type', 'application/json')
-            self.end_headers()
-            self.wfile.write(json.dumps({
+            self.send_json(200, {
                 "message": "✅ DeepWork API is running!",
                 "status": "online",
                 "version": "1.0.0"
-            }).encode())
+            })
         
         # All sessions endpoint
         elif path == '/sessions/' or path == '/sessions':
-            conn = get_db_connection()
-            cursor = conn.cursor()
-            cursor.execute("SELECT * FROM sessions ORDER BY created_at DESC")
-            sessions = cursor.fetchall()
-            conn.close()
-            
-            self.send_response(200)
-            self.send_header('Content-Type', 'application/json')
-            self.end_headers()
-            self.wfile.write(json.dumps(sessions).encode())
+            try:
+                # Only the columns behind ?fields=, interruptions only when included
+                fields, interruptions = session_projection(parsed_url.query)
+                store, user_id = self.store(), self.user_id()
+                sessions = read_sessions(
+                    store, lambda keys: store.list_sessions(user_id=user_id, fields=keys), fields, interruptions
+                )
+                
+                self.send_json(200, sessions)
+            except projection.InvalidProjection as e:
+                self.send_json(400, {"error": str(e)})
         
         # Single session endpoint
         elif path.startswith('/sessions/') and len(path.split('/')) == 3 and path.split('/')[2] != 'history':
             try:
                 session_id = path.split('/')[2]
-                session = find_session(session_id)
+                fields, interruptions = session_projection(parsed_url.query)
+                store, user_id = self.store(), self.user_id()
+                session, = read_sessions(
+                    store, lambda keys: [store.get_session(session_id, fields=keys, user_id=user_id)],
+                    fields, interruptions
+                )
                 
-                if session:
-                    self.send_response(200)
-                    self.send_header('Content-Type', 'application/json')
-                    self.end_headers()
-                    self.wfile.write(json.dumps(session).encode())
-                else:
-                    self.send_response(404)
-                    self.send_header('Content-Type', 'application/json')
-                    self.end_headers()
-                    self.wfile.write(json.dumps({"error": "Session not found"}).encode())
+                self.send_json(200, session)
+            except SessionNotFound:
+                self.send_json(404, {"error": "Session not found"})
             except Exception as e:
-                self.send_response(400)
-                self.send_header('Content-Type', 'application/json')
-                self.end_headers()
-                self.wfile.write(json.dumps({"error": str(e)}).encode())
+                self.send_json(400, {"error": str(e)})
         
         # Session history endpoint
         elif path == '/sessions/history':
             try:
-                conn = get_db_connection()
-                cursor = conn.cursor()
+                # Finished sessions, most recently completed first, with focus breakdown
+                user_id = self.user_id()
+                with read_snapshot(SHARDS.shard_for(user_id)) as snapshot:
+                    store = snapshot.store() if snapshot else self.store()
+                    history = [history_json(item) for item in store.session_history(user_id)]
                 
-                # Get completed sessions with formatted data for history
-                cursor.execute(
-                    """
-                    SELECT 
-                        id,
-                        title,
-                        goal,
-                        status,
-                        scheduled_duration,
-                        actual_duration,
-                        interruption_count,
-                        completed_at as completion_date
-                    FROM sessions 
-                    WHERE status IN ('completed', 'interrupted', 'abandoned', 'overdue')
-                    ORDER BY completed_at DESC
-                    """
-                )
-                history = cursor.fetchall()
-                conn.close()
+                self.send_json(200, history, snapshot)
+            except Exception as e:
+                print(f"Error in session history endpoint: {e}")
+                self.send_json(200, [])  # Still return 200 to avoid frontend errors
+        
+        # Daily focus rollup endpoint
+        elif path == '/stats/daily-focus':
+            try:
+                query = urllib.parse.parse_qs(parsed_url.query)
+                days = max(1, min(366, int(query.get('days', ['7'])[0])))
+                end_day = datetime.date.today()
+                start_day = end_day - datetime.timedelta(days=days - 1)
+                
+                def read_daily_focus(conn):
+                    cursor = conn.cursor()
+                    cursor.row_factory = dict_factory
+                    cursor.execute(
+                        rollup.SELECT_RANGE_SQL,
+                        {"start_day": start_day.isoformat(), "end_day": end_day.isoformat()}
+                    )
+                    return cursor.fetchall()
                 
-                # Handle null values for JSON serialization
-                for item in history:
-                    for key, value in item.items():
-                        if value is None:
-                            item[key] = ""
+                # Every user's totals: summed across the shards
+                shard_rows, snapshots = read_all_shards(read_daily_focus)
+                daily_focus = rollup.merge(shard_rows)
                 
-                self.send_response(200)
-                self.send_header('Content-Type', 'application/json')
-                self.end_headers()
-                self.wfile.write(json.dumps(history).encode())
+                self.send_json(200, daily_focus, *snapshots)
             except Exception as e:
-                print(f"Error in session history endpoint: {e}")
-                self.send_response(200)  # Still return 200 to avoid frontend errors
-                self.send_header('Content-Type', 'application/json')
-                self.end_headers()
-                self.wfile.write(json.dumps([]).encode())  # Return empty array instead of error
+                self.send_json(400, {"error": str(e)})
+        
+        # Session distributions endpoint
+        elif path == '/stats/distributions':
+            try:
+                # Every user's sessions: columns loaded from each shard, then combined
+                columns, snapshots = read_all_shards(analytics.load_columns)
+                distributions = analytics.distributions(analytics.SessionColumns.concat(columns))
+                
+                self.send_json(200, distributions, *snapshots)
+            except Exception as e:
+                self.send_json(400, {"error": str(e)})
         
         # Session interruptions endpoint
         elif path.startswith('/sessions/') and path.endswith('/interruptions'):
@@ -521,26 +418,18 @@ class APIHandler(http.server.SimpleHTTPRequestHandler):
                 parts = path.split('/')
                 if len(parts) == 4 and parts[3] == 'interruptions':
                     session_id = parts[2]
-                    interruptions = get_interruptions_for_session(session_id)
+                    interruptions = self.store().list_interruptions(session_id, self.user_id())
                     
-                    self.send_response(200)
-                    self.send_header('Content-Type', 'application/json')
-                    self.end_headers()
-                    self.wfile.write(json.dumps(interruptions).encode())
+                    self.send_json(200, [interruption_json(i) for i in interruptions])
                 else:
                     raise ValueError("Invalid path")
+            except SessionNotFound:
+                self.send_json(404, {"error": "Session not found"})
             except Exception as e:
-                self.send_response(400)
-                self.send_header('Content-Type', 'application/json')
-                self.end_headers()
-                self.wfile.write(json.dumps({"error": str(e)}).encode())
+                self.send_json(400, {"error": str(e)})
         
         # OpenAPI specification endpoint
         elif path == '/openapi.json':
-            self.send_response(200)
-            self.send_header('Content-Type', 'application/json')
-            self.end_headers()
-            
             # Simple OpenAPI specification
             openapi_spec = {
                 "openapi": "3.0.0",
@@ -605,22 +494,49 @@ class APIHandler(http.server.SimpleHTTPRequestHandler):
                 }
             }
             
-            self.wfile.write(json.dumps(openapi_spec).encode())
+            self.send_json(200, openapi_spec)
         
         # Default response for unknown endpoints
         else:
-            self.send_response(404)
-            self.send_header('Content-Type', 'application/json')
-            self.end_headers()
-            self.wfile.write(json.dumps({"error": "Endpoint not found"}).encode())
+            self.send_json(404, {"error": "Endpoint not found"})
+
+# Every request is recorded in METRICS, traced when sampled, and profiled and
+# admitted through ADMISSION when enabled; large bodies are compressed and
+# connections kept open between requests
+if COMPRESSION:
+    APIHandler = compression.instrument_handler(APIHandler, COMPRESSION)
+if PROFILER:
+    APIHandler = profiler.instrument_handler(APIHandler, PROFILER)
+if ADMISSION:
+    APIHandler = admission.instrument_handler(APIHandler, ADMISSION, metrics.SESSION_ROUTES)
+if KEEPALIVE:
+    APIHandler = keepalive.instrument_handler(APIHandler, KEEPALIVE)
+APIHandler = tracing.instrument_handler(APIHandler, TRACER, metrics.SESSION_ROUTES)
+APIHandler = metrics.instrument_handler(APIHandler, metrics.SESSION_ROUTES, METRICS)
 
 # Start server
 if __name__ == "__main__":
     print(f"Starting server at http://localhost:{PORT}")
-    print(f"Database file: {os.path.abspath(DB_PATH)}")
-    httpd = socketserver.TCPServer(("", PORT), APIHandler)
+    for path in DB_PATHS:
+        print(f"Database file: {os.path.abspath(path)}")
+    for replica in REPLICAS:
+        if replica:
+            replica.start()
+    # Admission control needs requests on threads to bound; without it they
+    # are handled one at a time
+    server_class = admission.ThreadingServer if ADMISSION or KEEPALIVE else socketserver.TCPServer
+    httpd = server_class(("", PORT), APIHandler)
     try:
         httpd.serve_forever()
     except KeyboardInterrupt:
         print("\nShutting down server...")
+    finally:
+        for store in STORES:
+            store.close()
+        for replica in REPLICAS:
+            if replica:
+                replica.close()
+        SHARDS.close()
+        if SLOW_QUERIES:
+            SLOW_QUERIES.close()
         httpd.server_close()
@@ -259,7 +259,8 @@ const SessionList = () => {
   const fetchSessions = async () => {
     try {
       setIsLoading(true);
-      const data = await sessionApi.getSessions();
+      // Only what the session cards show
+      const data = await sessionApi.getSessions({ fields: 'id,title,goal,status,scheduled_duration' });
       setSessions(data);
     } catch (error) {
       console.error('Error fetching sessions:', error);
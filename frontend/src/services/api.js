@@ -11,15 +11,16 @@ const api = axios.create({
 
 // Session API functions
 export const sessionApi = {
-  // Get all sessions
-  getSessions: async () => {
-    const response = await api.get('/sessions/');
+  // Get all sessions; params may pick fields ({ fields: 'id,status,title' })
+  // or embed related data ({ include: 'interruptions' })
+  getSessions: async (params) => {
+    const response = await api.get('/sessions/', { params });
     return response.data;
   },
 
-  // Get a single session by ID
-  getSession: async (sessionId) => {
-    const response = await api.get(`/sessions/${sessionId}`);
+  // Get a single session by ID, with the same optional params as getSessions
+  getSession: async (sessionId, params) => {
+    const response = await api.get(`/sessions/${sessionId}`, { params });
     return response.data;
   },
 
@@ -1,95 +1,82 @@
 import http.server
 import json
-import urllib.parse
-import datetime
-import sqlite3
 import os
-from typing import Dict, List, Optional, Any
-import uuid
+import socketserver
+import sys
+import urllib.parse
+from urllib.parse import parse_qs
 
-# SQLite database setup
-DB_PATH = 'deepwork.db'
+# Shared engine code lives in backend/deepwork
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), 'backend'))
+from deepwork import admission, keepalive, metrics, projection, tracing
+from deepwork.memstore import InMemoryStore, MemorySessionStore
+from deepwork.store import SESSION_FIELDS, SessionNotFound, isoformat
 
-def init_db():
-    """Initialize the SQLite database with required tables"""
-    conn = sqlite3.connect(DB_PATH)
-    cursor = conn.cursor()
-    
-    # Create sessions table
-    cursor.execute('''
-    CREATE TABLE IF NOT EXISTS sessions (
-        id TEXT PRIMARY KEY,
-        title TEXT NOT NULL,
-        goal TEXT,
-        status TEXT NOT NULL,
-        scheduled_duration INTEGER NOT NULL,
-        created_at TEXT NOT NULL,
-        started_at TEXT,
-        paused_at TEXT,
-        completed_at TEXT,
-        actual_duration INTEGER,
-        interruption_count INTEGER DEFAULT 0
-    )
-    ''')
-    
-    # Create interruptions table
-    cursor.execute('''
-    CREATE TABLE IF NOT EXISTS interruptions (
-        id TEXT PRIMARY KEY,
-        session_id TEXT NOT NULL,
-        reason TEXT NOT NULL,
-        start_time TEXT NOT NULL,
-        end_time TEXT,
-        FOREIGN KEY (session_id) REFERENCES sessions (id)
-    )
-    ''')
-    
-    conn.commit()
-    conn.close()
-    
-# Initialize the database
-init_db()
+# In-memory store, persisted as a snapshot plus an append-only journal
+SNAPSHOT_PATH = 'deepwork_memory.json'
+JOURNAL_PATH = 'deepwork_memory.journal'
+
+STORE = InMemoryStore(snapshot_path=SNAPSHOT_PATH, journal_path=JOURNAL_PATH)
+
+# Session lifecycle on top of the raw records
+SESSIONS = MemorySessionStore(STORE)
+
+# Per-route request metrics, served at /metrics
+METRICS = metrics.Metrics()
+
+# Sampled request tracing (DEEPWORK_TRACE_SAMPLE), recent traces at /debug/traces
+TRACER = tracing.Tracer.from_environ(service_name=os.path.splitext(os.path.basename(__file__))[0])
+
+# HTTP/1.1 keep-alive (off with DEEPWORK_KEEPALIVE=off): connections are
+# reused until idle for DEEPWORK_KEEPALIVE_TIMEOUT seconds or after
+# DEEPWORK_KEEPALIVE_MAX_REQUESTS requests, each on its own thread
+KEEPALIVE = keepalive.KeepAlive.from_environ()
 
 # Simple server on port 8090
 PORT = 8090
 
-        "created_at": "2025-05-10T08:00:00"
-    },
-    {
-        "id": 2,
-        "title": "Research Session",
-        "goal": "Research new technologies",
-        "status": "completed",
-        "scheduled_duration": 45,
-        "start_time": "2025-05-09T10:00:00",
-        "end_time": "2025-05-09T10:45:00",
-        "created_at": "2025-05-09T09:00:00"
-    }
-]
-
-INTERRUPTIONS = [
-    {
-        "id": 1,
-        "session_id": 2,
-        "reason": "Phone call",
-        "pause_time": "2025-05-09T10:15:00"
-    }
-]
+# Sample data for a fresh store
+if not STORE.sessions():
+    STORE.create_session(
+        title="Deep Work Session",
+        goal="Focus on important tasks",
+        scheduled_duration=60,
+        created_at="2025-05-10T08:00:00"
+    )
+    research = STORE.create_session(
+        title="Research Session",
+        goal="Research new technologies",
+        scheduled_duration=45,
+        created_at="2025-05-09T09:00:00",
+        status="completed",
+        start_time="2025-05-09T10:00:00",
+        end_time="2025-05-09T10:45:00"
+    )
+    STORE.add_interruption(research.id, "Phone call", "2025-05-09T10:15:00")
 
-# Get current timestamp in ISO format
-def get_current_time():
-    return datetime.datetime.now().isoformat()
+# JSON shape of a store record (timestamps as ISO strings)
+def record_json(record):
+    return {key: isoformat(value) for key, value in record.items()}
 
-# Find session by ID
-def find_session(session_id):
-    for session in SESSIONS:
-        if session["id"] == session_id:
-            return session
-    return None
+# The record keys (None: all of them) and whether to embed interruptions
+# asked for by ?fields= and ?include=; raises projection.InvalidProjection
+# for unknown names
+def session_projection(query):
+    query = parse_qs(query)
+    fields = projection.parse_fields(query.get('fields', [''])[0], SESSION_FIELDS)
+    include = projection.parse_include(query.get('include', [''])[0])
+    return fields, 'interruptions' in include
 
-# Get interruptions for a session
-def get_interruptions_for_session(session_id):
-    return [i for i in INTERRUPTIONS if i["session_id"] == session_id]
+# JSON of the given session records, each with its interruptions when asked
+def sessions_json(sessions, interruptions):
+    found = SESSIONS.interruptions_for_sessions([s["id"] for s in sessions]) if interruptions else {}
+    items = []
+    for session in sessions:
+        item = record_json(session)
+        if interruptions:
+            item["interruptions"] = [record_json(i) for i in found.get(session["id"], [])]
+        items.append(item)
+    return items
 
 # Handler class
 class APIHandler(http.server.SimpleHTTPRequestHandler):
@@ -97,9 +84,19 @@ class APIHandler(http.server.SimpleHTTPRequestHandler):
     def end_headers(self):
         self.send_header('Access-Control-Allow-Origin', '*')
         self.send_header('Access-Control-Allow-Methods', 'GET, POST, OPTIONS, PATCH')
-        self.send_header('Access-Control-Allow-Headers', 'Content-Type')
+        self.send_header('Access-Control-Allow-Headers', 'Content-Type, traceparent')
+        self.send_header('Access-Control-Expose-Headers', 'X-Trace-Id')
         super().end_headers()
     
+    # JSON response with its Content-Length
+    def send_json(self, status, payload):
+        body = json.dumps(payload).encode()
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+    
     # Parse request body
     def parse_request_body(self):
         content_length = int(self.headers['Content-Length'])
@@ -109,6 +106,7 @@ class APIHandler(http.server.SimpleHTTPRequestHandler):
     # Handle OPTIONS requests (for CORS preflight)
     def do_OPTIONS(self):
         self.send_response(200)
+        self.send_header('Content-Length', '0')
         self.end_headers()
     
     # Handle POST requests
@@ -117,32 +115,17 @@ class APIHandler(http.server.SimpleHTTPRequestHandler):
             # Create a new session
             try:
                 data = self.parse_request_body()
-                new_session = {
-                    "id": len(SESSIONS) + 1,
-                    "title": data.get("title", "Untitled Session"),
-                    "goal": data.get("goal", ""),
-                    "status": "scheduled",
-                    "scheduled_duration": data.get("scheduled_duration", 30),
-                    "start_time": None,
-                    "end_time": None,
-                    "created_at": get_current_time()
-                }
-                SESSIONS.append(new_session)
+                new_session = SESSIONS.create_session(
+                    data.get("title", "Untitled Session"),
+                    data.get("goal", ""),
+                    data.get("scheduled_duration", 30)
+                )
                 
-                self.send_response(201)
-                self.send_header('Content-Type', 'application/json')
-                self.end_headers()
-                self.wfile.write(json.dumps(new_session).encode())
+                self.send_json(201, record_json(new_session))
             except Exception as e:
-                self.send_response(400)
-                self.send_header('Content-Type', 'application/json')
-                self.end_headers()
-                self.wfile.write(json.dumps({"error": str(e)}).encode())
+                self.send_json(400, {"error": str(e)})
         else:
-            self.send_response(404)
-            self.send_header('Content-Type', 'application/json')
-            self.end_headers()
-            self.wfile.write(json.dumps({"error": "Endpoint not found"}).encode())
+            self.send_json(404, {"error": "Endpoint not found"})
     
     # Handle PATCH requests
     def do_PATCH(self):
@@ -151,22 +134,13 @@ class APIHandler(http.server.SimpleHTTPRequestHandler):
         # Check if this is a session-related PATCH
         if len(path_parts) >= 4 and path_parts[1] == 'sessions' and path_parts[3] in ['start', 'pause', 'resume', 'complete']:
             try:
-                session_id = int(path_parts[2])
+                session_id = path_parts[2]
                 action = path_parts[3]
-                session = find_session(session_id)
-                
-                if not session:
-                    self.send_response(404)
-                    self.send_header('Content-Type', 'application/json')
-                    self.end_headers()
-                    self.wfile.write(json.dumps({"error": "Session not found"}).encode())
-                    return
                 
                 # Handle different actions
-                if action == 'start' and session['status'] == 'scheduled':
-                    session['status'] = 'active'
-                    session['start_time'] = get_current_time()
-                elif action == 'pause' and session['status'] == 'active':
+                if action == 'start':
+                    session = SESSIONS.start_session(session_id)
+                elif action == 'pause':
                     # For pause, we need to get the reason from query params or body
                     reason = ""
                     if '?' in self.path:
@@ -181,56 +155,22 @@ class APIHandler(http.server.SimpleHTTPRequestHandler):
                         except:
                             reason = 'Unknown'
                     
-                    # Add interruption
-                    interruption = {
-                        "id": len(INTERRUPTIONS) + 1,
-                        "session_id": session_id,
-                        "reason": reason,
-                        "pause_time": get_current_time()
-                    }
-                    INTERRUPTIONS.append(interruption)
-                    
-                    # Check if this is the 4th interruption
-                    session_interruptions = get_interruptions_for_session(session_id)
-                    if len(session_interruptions) >= 4:
-                        session['status'] = 'interrupted'
-                    else:
-                        session['status'] = 'paused'
-                elif action == 'resume' and session['status'] == 'paused':
-                    session['status'] = 'active'
-                elif action == 'complete' and session['status'] in ['active', 'paused']:
-                    session['status'] = 'completed'
-                    session['end_time'] = get_current_time()
-                    
-                    # Check if session is overdue
-                    if session['start_time']:
-                        start_time = datetime.datetime.fromisoformat(session['start_time'])
-                        end_time = datetime.datetime.fromisoformat(session['end_time'])
-                        duration_minutes = (end_time - start_time).total_seconds() / 60
-                        
-                        if duration_minutes > session['scheduled_duration'] * 1.1:
-                            session['status'] = 'overdue'
+                    # The 4th pause ends the session as interrupted
+                    session = SESSIONS.pause_session(session_id, reason)
+                elif action == 'resume':
+                    session = SESSIONS.resume_session(session_id)
                 else:
-                    self.send_response(400)
-                    self.send_header('Content-Type', 'application/json')
-                    self.end_headers()
-                    self.wfile.write(json.dumps({"error": f"Cannot {action} session with status {session['status']}"}).encode())
-                    return
+                    session = SESSIONS.complete_session(session_id)
                 
-                self.send_response(200)
-                self.send_header('Content-Type', 'application/json')
-                self.end_headers()
-                self.wfile.write(json.dumps(session).encode())
+                self.send_json(200, record_json(session))
+            except SessionNotFound:
+                self.send_json(404, {"error": "Session not found"})
+            except ValueError as e:
+                self.send_json(400, {"error": str(e)})
             except Exception as e:
-                self.send_response(500)
-                self.send_header('Content-Type', 'application/json')
-                self.end_headers()
-                self.wfile.write(json.dumps({"error": str(e)}).encode())
+                self.send_json(500, {"error": str(e)})
         else:
-            self.send_response(404)
-            self.send_header('Content-Type', 'application/json')
-            self.end_headers()
-            self.wfile.write(json.dumps({"error": "Endpoint not found"}).encode())
+            self.send_json(404, {"error": "Endpoint not found"})
     
     # Handle GET requests
     def do_GET(self):
@@ -239,9 +179,6 @@ class APIHandler(http.server.SimpleHTTPRequestHandler):
         
         # Root endpoint
         if path == '/':
-            self.send_response(200)
-            self.send_header('Content-Type', 'application/json')
-            self.end_headers()
             response = {
                 "message": "✅ DeepWork API is running!",
                 "status": "online",
@@ -255,14 +192,10 @@ class APIHandler(http.server.SimpleHTTPRequestHandler):
                     "history": "/sessions/history"
                 }
             }
-            self.wfile.write(json.dumps(response).encode())
+            self.send_json(200, response)
         
         # OpenAPI schema for SDK generation
         elif path == '/openapi.json':
-            self.send_response(200)
-            self.send_header('Content-Type', 'application/json')
-            self.end_headers()
-            
             # Simple OpenAPI schema
             schema = {
                 "openapi": "3.0.0",
@@ -326,97 +259,87 @@ class APIHandler(http.server.SimpleHTTPRequestHandler):
                     }
                 }
             }
-            self.wfile.write(json.dumps(schema).encode())
+            self.send_json(200, schema)
         
         # Sessions endpoint
         elif path == '/sessions/' or path == '/sessions':
-            self.send_response(200)
-            self.send_header('Content-Type', 'application/json')
-            self.end_headers()
-            self.wfile.write(json.dumps(SESSIONS).encode())
+            try:
+                # Only the fields asked for, interruptions only when included
+                fields, interruptions = session_projection(parsed_url.query)
+                sessions = SESSIONS.list_sessions(fields=fields)
+                
+                self.send_json(200, sessions_json(sessions, interruptions))
+            except projection.InvalidProjection as e:
+                self.send_json(400, {"error": str(e)})
         
         # Single session endpoint
-        elif path.startswith('/sessions/') and len(path.split('/')) == 3:
+        elif path.startswith('/sessions/') and len(path.split('/')) == 3 and path.split('/')[2] != 'history':
             try:
-                session_id = int(path.split('/')[2])
-                session = find_session(session_id)
+                fields, interruptions = session_projection(parsed_url.query)
+                session = SESSIONS.get_session(path.split('/')[2], fields=fields)
                 
-                if session:
-                    self.send_response(200)
-                    self.send_header('Content-Type', 'application/json')
-                    self.end_headers()
-                    self.wfile.write(json.dumps(session).encode())
-                else:
-                    self.send_response(404)
-                    self.send_header('Content-Type', 'application/json')
-                    self.end_headers()
-                    self.wfile.write(json.dumps({"error": "Session not found"}).encode())
+                self.send_json(200, sessions_json([session], interruptions)[0])
+            except SessionNotFound:
+                self.send_json(404, {"error": "Session not found"})
+            except projection.InvalidProjection as e:
+                self.send_json(400, {"error": str(e)})
             except:
-                self.send_response(400)
-                self.send_header('Content-Type', 'application/json')
-                self.end_headers()
-                self.wfile.write(json.dumps({"error": "Invalid session ID"}).encode())
+                self.send_json(400, {"error": "Invalid session ID"})
         
         # Session history endpoint
         elif path == '/sessions/history':
-            self.send_response(200)
-            self.send_header('Content-Type', 'application/json')
-            self.end_headers()
-            
-            # Create history with more details
-            history = []
-            for session in SESSIONS:
-                if session['status'] in ['completed', 'interrupted', 'abandoned', 'overdue']:
-                    interruptions = get_interruptions_for_session(session['id'])
-                    history_item = {
-                        "id": session['id'],
-                        "title": session['title'],
-                        "status": session['status'],
-                        "scheduled_duration": session['scheduled_duration'],
-                        "actual_duration": 0,  # Calculate this based on start/end times
-                        "interruption_count": len(interruptions),
-                        "completion_date": session['end_time']
-                    }
-                    
-                    # Calculate actual duration if available
-                    if session['start_time'] and session['end_time']:
-                        start_time = datetime.datetime.fromisoformat(session['start_time'])
-                        end_time = datetime.datetime.fromisoformat(session['end_time'])
-                        duration_minutes = (end_time - start_time).total_seconds() / 60
-                        history_item['actual_duration'] = round(duration_minutes)
-                    
-                    history.append(history_item)
+            # Finished sessions, most recently completed first
+            history = [
+                {
+                    "id": item["id"],
+                    "title": item["title"],
+                    "status": item["status"],
+                    "scheduled_duration": item["scheduled_duration"],
+                    "actual_duration": item["actual_duration"],
+                    "interruption_count": item["interruption_count"],
+                    "completion_date": isoformat(item["end_time"])
+                }
+                for item in SESSIONS.session_history()
+            ]
             
-            self.wfile.write(json.dumps(history).encode())
+            self.send_json(200, history)
         
         # Session interruptions endpoint
         elif path.startswith('/sessions/') and path.endswith('/interruptions'):
             try:
                 parts = path.split('/')
                 if len(parts) == 4 and parts[3] == 'interruptions':
-                    session_id = int(parts[2])
-                    interruptions = get_interruptions_for_session(session_id)
+                    interruptions = [record_json(i) for i in SESSIONS.list_interruptions(parts[2])]
                     
-                    self.send_response(200)
-                    self.send_header('Content-Type', 'application/json')
-                    self.end_headers()
-                    self.wfile.write(json.dumps(interruptions).encode())
+                    self.send_json(200, interruptions)
                 else:
                     raise ValueError("Invalid path")
+            except SessionNotFound:
+                self.send_json(404, {"error": "Session not found"})
             except Exception as e:
-                self.send_response(400)
-                self.send_header('Content-Type', 'application/json')
-                self.end_headers()
-                self.wfile.write(json.dumps({"error": str(e)}).encode())
+                self.send_json(400, {"error": str(e)})
         
         # Default response for unknown endpoints
         else:
-            self.send_response(404)
-            self.send_header('Content-Type', 'application/json')
-            self.end_headers()
-            self.wfile.write(json.dumps({"error": "Endpoint not found"}).encode())
+            self.send_json(404, {"error": "Endpoint not found"})
+
+# Every request is recorded in METRICS and traced when sampled; connections
+# are kept open between requests
+if KEEPALIVE:
+    APIHandler = keepalive.instrument_handler(APIHandler, KEEPALIVE)
+APIHandler = tracing.instrument_handler(APIHandler, TRACER, metrics.SESSION_ROUTES)
+APIHandler = metrics.instrument_handler(APIHandler, metrics.SESSION_ROUTES, METRICS)
 
 # Start server
-print(f"Starting server at http://localhost:{PORT}")
-httpd = socketserver.TCPServer(("", PORT), APIHandler)
-httpd.serve_forever()
+if __name__ == "__main__":
+    print(f"Starting server at http://localhost:{PORT}")
+    server_class = admission.ThreadingServer if KEEPALIVE else socketserver.TCPServer
+    httpd = server_class(("", PORT), APIHandler)
+    try:
+        httpd.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        # Final snapshot so the next start does not replay the journal
+        STORE.close()
+        httpd.server_close()
@@ -5,5 +5,5 @@ echo.
 cd backend
 call venv\Scripts\activate.bat
 
-cd app
-python -m uvicorn main:app --reload --port 8000
+python -m alembic upgrade head
+python -m uvicorn app.main:app --reload --port 8000